@@ -0,0 +1,6 @@
+"""
+Data and UI engines for the Titanic analytics app.
+
+The modules directly inside this package only depend on NumPy so that they can be
+used without a display. Everything that needs PyQt5 lives in analytics.gui.
+"""
@@ -0,0 +1,7 @@
+import sys
+
+from analytics.app import main
+
+# The guard matters: parallel loading spawns worker processes that import this module
+if __name__ == "__main__":
+    sys.exit(main())
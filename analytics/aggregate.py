@@ -0,0 +1,206 @@
+"""
+Group-by and aggregation over whole columns.
+
+Every group key is turned into a small integer code per row (categorical codes as they are,
+integers offset from their minimum, floats through bins), the codes of several keys are
+combined into one group id with mixed radix arithmetic, and every aggregate is a single
+NumPy reduction over that id:
+
+    count, sum, mean  ->  np.bincount(group, weights=values)
+    min, max          ->  np.minimum.at / np.maximum.at
+
+There is no Python loop over rows anywhere, the only loops are over keys and aggregates.
+
+    result = aggregate(dataset, by=["Pclass", "Sex", AGE_BANDS], aggs=[("Survived", "mean")])
+    for row in result.rows():
+        print(row)
+
+Missing key values get their own group (label None). Missing values of an aggregated
+column are skipped, like SQL does.
+"""
+
+import numpy as np
+
+from analytics.schema import CATEGORICAL, Bins, AGE_BANDS  # noqa: F401 (re-exported)
+
+AGGREGATES = ("count", "sum", "mean", "min", "max")
+
+# Ints with a range up to this size are coded by offsetting from the minimum, anything
+# wider goes through np.unique
+_DIRECT_RANGE = 1 << 16
+
+
+class GroupResult:
+    """
+    Output of aggregate(): one entry per non-empty group.
+
+    keys maps each key name to the label of every group, values maps "column:agg" (or
+    "count") to the aggregate of every group.
+    """
+
+    def __init__(self, key_names: list, keys: dict, values: dict) -> None:
+        self.key_names = key_names
+        self.keys = keys
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(next(iter(self.values.values()))) if self.values else 0
+
+    @property
+    def columns(self) -> list:
+        return self.key_names + list(self.values)
+
+    def rows(self):
+        """
+        Yields one tuple per group, key labels first. Groups are few, this is for display.
+        """
+        columns = [self.keys[name] for name in self.key_names] + list(self.values.values())
+        return zip(*[col.tolist() if isinstance(col, np.ndarray) else col for col in columns])
+
+
+def _key_codes(dataset, key, rows):
+    """
+    Returns (codes, cardinality, labels) for one group key. Code cardinality - 1 is the
+    null group wherever the column can be null.
+    """
+    if isinstance(key, Bins):
+        col = dataset[key.column]
+        values = col.values if rows is None else col.values[rows]
+        edges = np.asarray(key.edges)
+        codes = np.searchsorted(edges, values, side="right")
+        # NaN would land in the top open bin, give it the null slot instead
+        codes[np.isnan(values)] = len(edges) + 1
+        return codes, len(edges) + 2, key.labels() + [None]
+
+    col = dataset[key]
+    if col.kind == CATEGORICAL:
+        codes = col.codes if rows is None else col.codes[rows]
+        card = len(col.categories) + 1
+        # -1 (null) wraps around to the last slot
+        return np.where(codes < 0, card - 1, codes), card, col.categories + [None]
+
+    values = col.values if rows is None else col.values[rows]
+    null = None
+    if col.validity is not None:
+        null = col.null_mask() if rows is None else col.null_mask()[rows]
+
+    if values.dtype.kind in "iu" and len(values):
+        low, high = int(values.min()), int(values.max())
+        if high - low < _DIRECT_RANGE:
+            codes = values.astype(np.int64) - low
+            labels = list(range(low, high + 1))
+            if null is not None:
+                codes[null] = len(labels)
+            return codes, len(labels) + 1, labels + [None]
+
+    if null is not None:
+        uniques, codes = np.unique(values[~null], return_inverse=True)
+        full = np.full(len(values), len(uniques), dtype=np.int64)
+        full[~null] = codes
+        return full, len(uniques) + 1, uniques.tolist() + [None]
+    uniques, codes = np.unique(values, return_inverse=True)
+    return codes.ravel(), len(uniques), uniques.tolist()
+
+
+def group_ids(dataset, by: list, rows=None) -> tuple:
+    """
+    Combines the codes of all keys into one group id per row.
+
+    Returns (group, labels) where labels[k][g] is the label of key k for group id g and
+    group only uses ids of groups that actually occur, numbered densely from 0.
+    """
+    group = None
+    radix_labels = []
+    for key in by:
+        codes, card, labels = _key_codes(dataset, key, rows)
+        radix_labels.append((card, labels))
+        group = codes.astype(np.int64) if group is None else group * card + codes
+
+    if group is None:
+        n = len(dataset) if rows is None else len(rows)
+        return np.zeros(n, dtype=np.int64), []
+
+    # Compact the mixed radix ids down to the groups that occur. For small id spaces a
+    # bincount is cheaper than np.unique's sort.
+    space = int(np.prod([card for card, _ in radix_labels], dtype=np.float64))
+    if space <= max(4 * len(group), 1 << 20):
+        present = np.flatnonzero(np.bincount(group, minlength=space))
+        remap = np.empty(space, dtype=np.int64)
+        remap[present] = np.arange(len(present))
+        group = remap[group]
+    else:
+        present, group = np.unique(group, return_inverse=True)
+        group = group.ravel()
+
+    # Split the occurring mixed radix ids back into one label per key
+    labels = []
+    rest = present
+    for card, key_labels in reversed(radix_labels):
+        lookup = np.array(key_labels + [None], dtype=object)
+        labels.append(lookup[rest % card])
+        rest = rest // card
+    labels.reverse()
+    return group, labels
+
+
+def aggregate(dataset, by: list, aggs: list = (("*", "count"),), rows=None) -> GroupResult:
+    """
+    Groups the dataset by the `by` keys (column names or Bins) and computes aggs, a list
+    of (column, aggregate) pairs. ("*", "count") counts rows.
+
+    rows limits the computation to a subset, as an index array or boolean mask.
+    """
+    if rows is not None:
+        rows = np.asarray(rows)
+        if rows.dtype == np.bool_:
+            rows = np.flatnonzero(rows)
+
+    group, labels = group_ids(dataset, by, rows)
+    n_groups = len(labels[0]) if labels else 1
+
+    values = {}
+    for column, func in aggs:
+        if func not in AGGREGATES:
+            raise ValueError("Unknown aggregate {!r}, expected one of {}".format(func, AGGREGATES))
+        if column == "*":
+            if func != "count":
+                raise ValueError("Only count can be computed over all columns")
+            values["count"] = np.bincount(group, minlength=n_groups)
+            continue
+
+        col = dataset[column]
+        data = col.values if rows is None else col.values[rows]
+        g = group
+        if col.validity is not None:
+            valid = ~(col.null_mask() if rows is None else col.null_mask()[rows])
+            data, g = data[valid], group[valid]
+
+        name = "{}:{}".format(column, func)
+        if func == "count":
+            values[name] = np.bincount(g, minlength=n_groups)
+        elif func in ("sum", "mean"):
+            total = np.bincount(g, weights=data, minlength=n_groups)
+            if func == "sum":
+                values[name] = total
+            else:
+                count = np.bincount(g, minlength=n_groups)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    values[name] = total / count
+        else:
+            ufunc = np.minimum if func == "min" else np.maximum
+            start = np.inf if func == "min" else -np.inf
+            out = np.full(n_groups, start, dtype=np.float64)
+            ufunc.at(out, g, data)
+            # Groups without a single valid value have no min/max
+            out[np.isinf(out) & (np.bincount(g, minlength=n_groups) == 0)] = np.nan
+            values[name] = out
+
+    key_names = [key.name if isinstance(key, Bins) else key for key in by]
+    return GroupResult(key_names, dict(zip(key_names, labels)), values)
+
+
+def survival_rate(dataset, by: list, rows=None) -> GroupResult:
+    """
+    The dashboard's main table: passenger count and survival rate per group.
+    """
+    return aggregate(dataset, by, [("*", "count"), ("Survived", "mean")], rows=rows)
@@ -0,0 +1,98 @@
+"""
+Application entry point.
+
+    python -m analytics [data/train.csv] [--profile-startup [timeline.json]] [--profile-slots [trace.json]]
+
+The order of startup is chosen for time to first paint:
+
+    1. import PyQt5 and the window module (no NumPy, see gui/main_window.py)
+    2. build and show the window
+    3. after the first paint event, start loading the data, which is when NumPy and the
+       data engines get imported
+
+--profile-startup prints the startup timeline (imports, window construction, first paint,
+data ready) to stderr once the data is shown, or writes it as JSON to the given file.
+
+--profile-slots times every slot and event handler of the GUI classes and shows the
+slowest in a dock (see gui/profiler.py). The calls are written to the given file in
+Chrome trace format on exit.
+
+Without a display, python -m analytics.batch runs the same reports over many files (see
+analytics/batch.py).
+"""
+
+# Must be the first import so the timeline starts as early as possible
+from analytics.startup import timeline
+
+import argparse
+import sys
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m analytics", description="Passenger analytics")
+    parser.add_argument("path", nargs="?", default="data/train.csv", help="passenger CSV to open")
+    parser.add_argument("--profile-startup", nargs="?", const="-", default=None, metavar="FILE",
+                        help="record the startup timeline, print it or write it to FILE as JSON")
+    parser.add_argument("--profile-slots", nargs="?", const="", default=None, metavar="FILE",
+                        help="time slots and event handlers, write a Chrome trace to FILE on exit")
+    parser.add_argument("--exit-when-ready", action="store_true",
+                        help="quit as soon as the data is shown, for measuring startup")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    QtWidgets = timeline.import_module("PyQt5.QtWidgets")
+    QtCore = timeline.import_module("PyQt5.QtCore")
+
+    with timeline.span("create QApplication"):
+        app = QtWidgets.QApplication(sys.argv[:1])
+
+    if args.profile_slots is not None:
+        # Before the GUI modules are imported, their classes are instrumented as they're created
+        timeline.import_module("analytics.gui.profiler").profiler.enable()
+    main_window = timeline.import_module("analytics.gui.main_window")
+    with timeline.span("construct main window"):
+        window = main_window.MainWindow()
+
+    class FirstPaint(QtCore.QObject):
+        """
+        Notices the window's first paint, then starts the deferred part of startup.
+        """
+
+        def eventFilter(self, obj, event) -> bool:
+            if event.type() == QtCore.QEvent.Paint:
+                window.removeEventFilter(self)
+                # Runs after the paint has been handled and the frame is on screen
+                QtCore.QTimer.singleShot(0, after_first_paint)
+            return False
+
+    def after_first_paint() -> None:
+        timeline.mark("first paint")
+        window.open_file(args.path)
+
+    def on_data_ready(dataset) -> None:
+        window.dataset_loaded.disconnect(on_data_ready)
+        timeline.mark("data ready ({:,} rows)".format(len(dataset)))
+        if args.profile_startup:
+            timeline.dump(args.profile_startup)
+        if args.exit_when_ready:
+            app.quit()
+
+    first_paint = FirstPaint()
+    window.installEventFilter(first_paint)
+    window.dataset_loaded.connect(on_data_ready)
+
+    with timeline.span("show main window"):
+        window.show()
+
+    status = app.exec()
+    if args.profile_slots:
+        from analytics.gui.profiler import profiler
+        profiler.write_trace(args.profile_slots)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
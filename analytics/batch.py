@@ -0,0 +1,185 @@
+"""
+Headless batch mode: run a report over many passenger files without a display.
+
+    python -m analytics.batch data/train.csv data/test.csv [--report report.json]
+                              [--workers N] [--out results.json] [--out-dir DIR]
+
+The GUI (python -m analytics) only exists around QApplication.exec(). This runs the same
+loaders and report sections (see analytics/reports.py, which the window's pages use too)
+and never imports PyQt5, so it works on a machine without a display or without Qt.
+
+Without --report the report is reports.DEFAULT_REPORT, every summary tab and the
+distributions of Age and Fare.
+
+Files are the unit of parallelism: with several files each is loaded and reported on in
+its own spawned worker process, one per core by default (--workers). Workers load files
+through their sidecars like the window does, parsing with one process, the cores are
+already busy with other files. A single file is run in this process and parsed on every
+core instead.
+
+Every stage (loading, every section) is timed per file. A summary per stage (files,
+total, median and slowest) is printed after the results, and --out writes the results
+and timings of every file as JSON. A file that fails doesn't stop the others,
+the exit status is 1 if any did.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analytics.reports import DEFAULT_REPORT, check_report, section_name, run_section
+
+LOAD_STAGE = "load"
+
+
+def run_file(path: str, report: dict, out_dir: str = None, workers: int = 1) -> dict:
+    """
+    Loads the file at path and runs every section of report over it. Returns the
+    results and the seconds every stage took, or the error if one failed.
+    """
+    from analytics.loader import load_dataset
+    stages, sections = [], []
+    result = {"path": path, "stages": stages, "sections": sections}
+    try:
+        start = time.perf_counter()
+        dataset = load_dataset(path, workers=workers)
+        stages.append((LOAD_STAGE, time.perf_counter() - start))
+        result["rows"] = len(dataset)
+        for section in report["sections"]:
+            start = time.perf_counter()
+            sections.append(run_section(dataset, section, out_dir))
+            stages.append((section_name(section), time.perf_counter() - start))
+    except Exception:
+        result["error"] = traceback.format_exc()
+    return result
+
+
+def run_batch(paths: list, report: dict = None, workers: int = None, out_dir: str = None,
+              progress=None) -> list:
+    """
+    run_file() for every path, in parallel across processes when there are several.
+    Results come back in the order of paths. progress, if given, is called as
+    progress(fraction, message) after every file.
+    """
+    report = report or DEFAULT_REPORT
+    check_report(report)
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    results = [None] * len(paths)
+    if workers <= 1 or len(paths) == 1:
+        for i, path in enumerate(paths):
+            # Alone, a file can be parsed on every core
+            results[i] = run_file(path, report, out_dir, workers=None if len(paths) == 1 else 1)
+            if progress is not None:
+                progress((i + 1) / len(paths), "Reported on {}".format(os.path.basename(path)))
+        return results
+    # spawn, like analytics.parallel: the workers start clean
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {executor.submit(run_file, path, report, out_dir): i for i, path in enumerate(paths)}
+        for done, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            results[i] = future.result()
+            if progress is not None:
+                progress(done / len(paths), "Reported on {}".format(os.path.basename(paths[i])))
+    return results
+
+
+def stage_stats(results: list) -> list:
+    """
+    (stage, files, total, median, max seconds) for every stage, in report order.
+    """
+    seconds = {}
+    for result in results:
+        for stage, elapsed in result["stages"]:
+            seconds.setdefault(stage, []).append(elapsed)
+    stats = []
+    for stage, values in seconds.items():
+        values = sorted(values)
+        middle = len(values) // 2
+        median = values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+        stats.append((stage, len(values), sum(values), median, values[-1]))
+    return stats
+
+
+def format_table(header: list, rows: list) -> str:
+    widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)]
+    return "\n".join("  ".join(str(x).rjust(w) for x, w in zip(line, widths)) for line in [header] + rows)
+
+
+def _cell(value) -> str:
+    if isinstance(value, float):
+        return "{:.4g}".format(value)
+    return "" if value is None else str(value)
+
+
+def format_results(results: list, details: bool = True) -> str:
+    """
+    The report of every file as text tables (only the failures if details is False),
+    then the timing of every stage.
+    """
+    parts = []
+    for result in results:
+        if not details:
+            if "error" in result:
+                parts.extend(["!! {} failed:\n{}".format(result["path"], result["error"]), ""])
+            continue
+        parts.append("== {} ({} rows)".format(result["path"], "{:,}".format(result["rows"]) if "rows" in result else "?"))
+        for section in result["sections"]:
+            parts.append("-- " + section["section"])
+            if "columns" in section:
+                parts.append(format_table(section["columns"], [[_cell(v) for v in row] for row in section["rows"]]))
+            else:
+                parts.append("\n".join("{}: {}".format(key, json.dumps(value)) for key, value in section.items()
+                                       if key != "section"))
+        if "error" in result:
+            parts.append("!! failed:\n" + result["error"])
+        parts.append("")
+    parts.append(format_table(
+        ["stage", "files", "total s", "median s", "max s"],
+        [[stage, files, "{:.3f}".format(total), "{:.3f}".format(median), "{:.3f}".format(longest)]
+         for stage, files, total, median, longest in stage_stats(results)],
+    ))
+    return "\n".join(parts)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m analytics.batch",
+                                     description="Run a report over passenger files without a display")
+    parser.add_argument("paths", nargs="+", help="passenger files (CSV or column store)")
+    parser.add_argument("--report", help="report JSON file, see analytics/reports.py (default: the summary tabs)")
+    parser.add_argument("--workers", type=int, default=None, help="processes, default one per core")
+    parser.add_argument("--out", help="write results and timings to this JSON file")
+    parser.add_argument("--out-dir", help="directory for files sections write, default the current one")
+    parser.add_argument("--quiet", action="store_true", help="only print the stage timings")
+    args = parser.parse_args(argv)
+
+    report = DEFAULT_REPORT
+    try:
+        if args.report:
+            with open(args.report) as f:
+                report = json.load(f)
+        check_report(report)
+    except (OSError, ValueError) as e:
+        parser.error("{}: {}".format(args.report or "report", e))
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = run_batch(args.paths, report, args.workers, args.out_dir)
+    elapsed = time.perf_counter() - start
+    print(format_results(results, details=not args.quiet))
+    print("{} files in {:.3f} s".format(len(results), elapsed))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"report": report, "seconds": elapsed, "files": results}, f, indent=2)
+    return 1 if any("error" in result for result in results) else 0
+
+
+# The guard matters: run_batch spawns worker processes that import this module
+if __name__ == "__main__":
+    sys.exit(main())
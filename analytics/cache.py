@@ -0,0 +1,193 @@
+"""
+Memoized query results with LRU eviction under a memory budget.
+
+Results are keyed on the dataset they were computed from (its source file and
+fingerprint, see loader.file_fingerprint) plus the normalized query, so switching back
+to a view that was already computed is a dictionary lookup:
+
+    result = cache.get_or_compute(dataset, ("survival", ["Pclass", "Sex"]),
+                                  lambda: survival_rate(dataset, ["Pclass", "Sex"]))
+
+Only datasets loaded from a file can be cached. Derived datasets (Dataset.take) have no
+fingerprint and always miss.
+
+When a CSV changes on disk its fingerprint no longer matches, so results of the old
+version are never served again. invalidate_stale() drops them right away, lookups also
+notice with a single stat call.
+
+The cache is shared by the GUI thread and task pool threads, so every access to the
+entries goes through a lock. Computing a missing result happens outside the lock.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from analytics.loader import is_stale
+
+DEFAULT_BUDGET = 256 * 1024 * 1024
+
+
+def normalize_query(query):
+    """
+    Turns a query description into a hashable, canonical key. Lists become tuples, dicts
+    and sets are sorted, and arrays (e.g. the rows of a filter) are replaced by a digest
+    of their contents.
+    """
+    if isinstance(query, np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(query).view(np.uint8), digest_size=16)
+        return ("ndarray", query.dtype.str, query.shape, digest.hexdigest())
+    if isinstance(query, dict):
+        return ("dict",) + tuple(sorted((k, normalize_query(v)) for k, v in query.items()))
+    if isinstance(query, (set, frozenset)):
+        return ("set",) + tuple(sorted(normalize_query(v) for v in query))
+    if isinstance(query, (list, tuple)):
+        # A list is the same query as a tuple of the same values. namedtuples (e.g.
+        # schema.Bins) keep their type so they don't collide with either.
+        name = "tuple" if type(query) in (list, tuple) else type(query).__name__
+        return (name,) + tuple(normalize_query(v) for v in query)
+    return query
+
+
+def estimate_size(value, _seen=None) -> int:
+    """
+    Rough number of bytes held by a cached value. Arrays count their buffers, containers
+    and plain objects are walked.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        size = value.nbytes
+        if value.dtype == object:
+            size += sum(estimate_size(v, _seen) for v in value.flat)
+        return size
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, _seen) for v in value)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), _seen)
+    return size
+
+
+class ResultCache:
+
+    def __init__(self, budget: int = DEFAULT_BUDGET) -> None:
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._used = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(dataset, query) -> tuple:
+        return (dataset.source, dataset.fingerprint, normalize_query(query))
+
+    def get(self, dataset, query, default=None):
+        if dataset.fingerprint is None:
+            with self._lock:
+                self.misses += 1
+            return default
+        if dataset.source is not None and is_stale(dataset.fingerprint, dataset.source):
+            self.invalidate(dataset.source, dataset.fingerprint)
+            with self._lock:
+                self.misses += 1
+            return default
+
+        key = self.key(dataset, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, dataset, query, value, size: int = None) -> None:
+        """
+        Stores a result. Values bigger than the whole budget are not cached at all.
+        """
+        if dataset.fingerprint is None:
+            return
+        if size is None:
+            size = estimate_size(value)
+        if size > self.budget:
+            return
+
+        key = self.key(dataset, query)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._used -= old[1]
+            self._entries[key] = (value, size)
+            self._used += size
+            while self._used > self.budget:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._used -= evicted
+                self.evictions += 1
+
+    def get_or_compute(self, dataset, query, compute):
+        """
+        Returns the cached result for query, computing and storing it on a miss.
+        """
+        missing = object()
+        value = self.get(dataset, query, missing)
+        if value is missing:
+            value = compute()
+            self.put(dataset, query, value)
+        return value
+
+    def invalidate(self, source: str = None, fingerprint: tuple = None) -> int:
+        """
+        Drops every result computed from source (only from that version of it if a
+        fingerprint is given), or everything. Returns how many were dropped.
+        """
+        with self._lock:
+            keys = [
+                k for k in self._entries
+                if (source is None or k[0] == source) and (fingerprint is None or k[1] == fingerprint)
+            ]
+            for k in keys:
+                self._used -= self._entries.pop(k)[1]
+            return len(keys)
+
+    def invalidate_stale(self) -> int:
+        """
+        Drops the results of every file that changed on disk since it was loaded.
+        """
+        with self._lock:
+            versions = {(k[0], k[1]) for k in self._entries if k[0] is not None}
+        dropped = 0
+        for source, fingerprint in versions:
+            if is_stale(fingerprint, source):
+                dropped += self.invalidate(source, fingerprint)
+        return dropped
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._used,
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
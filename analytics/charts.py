@@ -0,0 +1,263 @@
+"""
+Level-of-detail data for the charts, so drawing costs depend on pixels and not on rows.
+
+Everything row-sized happens once, when the chart data is built for a dataset (on a task
+thread). After that every frame of a pan or zoom only touches pre-aggregated arrays whose
+size is about the number of pixels on screen:
+
+    Histogram1D     counts on a fine fixed grid of BASE_BINS bins with cached edges. The bars
+                    of any view are sums of whole fine bins (np.add.reduceat).
+    MinMaxPyramid   min/max of a series over blocks of 2, 4, 8, ... rows. A line over any
+                    row range reads about two blocks per pixel column, so it still shows
+                    every spike a full-resolution line would (min/max decimation).
+    DensityGrid     2D counts of (x, y) per class on a GRID x GRID grid and its summed-area
+                    table. Any block of cells sums in four lookups, so a scatter plot view
+                    costs four gathers per pixel at every zoom level. Zoomed in further
+                    than the grid, cells cover several pixels until the view holds at most
+                    RAW_POINTS points, which are then binned directly (found with a binary
+                    search in a copy sorted by x).
+
+Counts are kept per class (Survived 0/1), so the views can colour by survival.
+"""
+
+import numpy as np
+
+BASE_BINS = 4096
+GRID = 1024
+RAW_POINTS = 200_000
+# Coarsest level kept by MinMaxPyramid
+_MIN_LEVEL = 64
+
+
+def value_range(values: np.ndarray) -> tuple:
+    """
+    (min, max) of the finite values, widened a little so the maximum falls inside the
+    last bin. (0, 1) if there are none.
+    """
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return 0.0, 1.0
+    lo, hi = float(finite.min()), float(finite.max())
+    if hi <= lo:
+        return lo - 0.5, hi + 0.5
+    return lo, hi + (hi - lo) * 1e-9
+
+
+def nice_ticks(lo: float, hi: float, count: int = 6) -> np.ndarray:
+    """
+    Round tick positions (multiples of 1, 2 or 5 times a power of ten) inside [lo, hi].
+    """
+    if not hi > lo:
+        return np.array([lo])
+    raw = (hi - lo) / max(count, 1)
+    power = 10 ** np.floor(np.log10(raw))
+    step = power * min((m for m in (1, 2, 5, 10) if m * power >= raw), default=10)
+    return np.arange(np.ceil(lo / step), np.floor(hi / step) + 1) * step
+
+
+def _class_codes(classes, n: int, n_classes: int) -> tuple:
+    """
+    Class of every value and the number of classes. The number is fixed by the caller,
+    not taken from the data: a subset where nobody survived still has two classes, so
+    its colors and the shapes of its counts match every other view's.
+    """
+    if classes is None:
+        return np.zeros(n, dtype=np.int64), 1
+    classes = np.clip(np.asarray(classes, dtype=np.int64), 0, n_classes - 1)
+    return classes, n_classes
+
+
+class Histogram1D:
+    """
+    Histogram of one column on a fine grid, per class.
+    """
+
+    def __init__(self, values: np.ndarray, classes=None, bins: int = BASE_BINS, n_classes: int = 2) -> None:
+        # float32 arithmetic would put values next to an edge into the wrong bin
+        values = np.asarray(values, dtype=np.float64)
+        self.lo, self.hi = value_range(values)
+        self.bins = bins
+        self.width = (self.hi - self.lo) / bins
+        # The edges every view's bars are cut from
+        self.edges = self.lo + np.arange(bins + 1) * self.width
+
+        classes, self.n_classes = _class_codes(classes, len(values), n_classes)
+        finite = np.isfinite(values)
+        index = ((values[finite] - self.lo) / self.width).astype(np.int64)
+        np.clip(index, 0, bins - 1, out=index)
+        flat = classes[finite] * bins + index
+        self.counts = np.bincount(flat, minlength=self.n_classes * bins).reshape(self.n_classes, bins)
+        self.missing = int(len(values) - finite.sum())
+
+    def view(self, x0: float, x1: float, max_bars: int) -> tuple:
+        """
+        Bars for the range [x0, x1], at most max_bars of them. Returns (edges, counts)
+        with counts shaped (classes, bars).
+
+        Bars are whole multiples of the fine bin width aligned to a multiple of the bar
+        width, so panning moves the bars instead of re-cutting them.
+        """
+        i0 = int(np.floor((x0 - self.lo) / self.width))
+        i1 = int(np.ceil((x1 - self.lo) / self.width))
+        step = max(1, -(-(i1 - i0) // max(max_bars, 1)))
+        i0 = max(0, i0 // step * step)
+        i1 = min(self.bins, max(-(-i1 // step) * step, i0 + 1))
+        if i0 >= self.bins or i1 <= 0:
+            return self.edges[:1], np.zeros((self.n_classes, 0), dtype=self.counts.dtype)
+        starts = np.arange(i0, i1, step)
+        counts = np.add.reduceat(self.counts[:, i0:i1], starts - i0, axis=1)
+        edges = np.append(self.edges[starts], self.edges[min(starts[-1] + step, self.bins)])
+        return edges, counts
+
+
+class MinMaxPyramid:
+    """
+    Min/max decimation of a series y over its row index.
+    """
+
+    def __init__(self, y: np.ndarray) -> None:
+        y = np.asarray(y, dtype=np.float64)
+        self.length = len(y)
+        self.lo, self.hi = value_range(y)
+        # levels[k] = (mins, maxs) over blocks of 2**k rows. fmin/fmax skip NaN.
+        self.levels = [(y, y)]
+        mins, maxs = y, y
+        while len(mins) > _MIN_LEVEL:
+            if len(mins) % 2:
+                mins, maxs = np.append(mins, np.nan), np.append(maxs, np.nan)
+            mins = np.fmin(mins[0::2], mins[1::2])
+            maxs = np.fmax(maxs[0::2], maxs[1::2])
+            self.levels.append((mins, maxs))
+
+    def view(self, i0: float, i1: float, pixels: int) -> tuple:
+        """
+        Min and max of y for each of `pixels` columns covering rows [i0, i1).
+        Returns (rows, mins, maxs), rows being the first row of every column.
+        """
+        i0 = max(0, int(np.floor(i0)))
+        i1 = min(self.length, int(np.ceil(i1)))
+        if i1 <= i0 or pixels <= 0:
+            empty = np.zeros(0)
+            return empty, empty, empty
+        span = (i1 - i0) / pixels
+        # Coarsest level whose blocks still fit at least twice into a pixel column
+        level = 0
+        while level + 1 < len(self.levels) and 2 ** (level + 1) * 2 <= span:
+            level += 1
+        block = 2 ** level
+        mins, maxs = self.levels[level]
+        j0, j1 = i0 // block, -(-i1 // block)
+        starts = np.unique(j0 + (np.arange(pixels) * (j1 - j0)) // pixels)
+        with np.errstate(invalid="ignore"):
+            col_min = np.fmin.reduceat(mins[j0:j1], starts - j0)
+            col_max = np.fmax.reduceat(maxs[j0:j1], starts - j0)
+        return starts * block, col_min, col_max
+
+
+class DensityGrid:
+    """
+    2D histogram of (x, y) points per class, for scatter plots of any size.
+    """
+
+    def __init__(self, x: np.ndarray, y: np.ndarray, classes=None, size: int = GRID, n_classes: int = 2) -> None:
+        valid = np.isfinite(x) & np.isfinite(y)
+        classes, self.n_classes = _class_codes(classes, len(x), n_classes)
+        x, y, classes = x[valid].astype(np.float64), y[valid].astype(np.float64), classes[valid]
+        self.points = len(x)
+
+        self.size = size
+        self.x_lo, self.x_hi = value_range(x)
+        self.y_lo, self.y_hi = value_range(y)
+        self.cell_x = (self.x_hi - self.x_lo) / size
+        self.cell_y = (self.y_hi - self.y_lo) / size
+
+        ix = np.clip(((x - self.x_lo) / self.cell_x).astype(np.int64), 0, size - 1)
+        iy = np.clip(((y - self.y_lo) / self.cell_y).astype(np.int64), 0, size - 1)
+        counts = np.bincount((classes * size + iy) * size + ix, minlength=self.n_classes * size * size)
+        # [class, y, x]
+        self.grid = counts.reshape(self.n_classes, size, size).astype(np.int32)
+        # Summed-area table: table[c, r, k] is the count of cells [0, r) x [0, k), so the
+        # count of any block of cells is four lookups
+        self.table = np.zeros((self.n_classes, size + 1, size + 1), dtype=np.int64)
+        np.cumsum(np.cumsum(self.grid, axis=1), axis=2, out=self.table[:, 1:, 1:])
+
+        # For views zoomed in past the grid. Compact types, this copy is row sized.
+        order = np.argsort(x, kind="stable")
+        self.sorted_x = x[order].astype(np.float32)
+        self.sorted_y = y[order].astype(np.float32)
+        self.sorted_class = classes[order].astype(np.int8)
+
+    def view(self, x0: float, x1: float, y0: float, y1: float, width: int, height: int) -> np.ndarray:
+        """
+        Counts per pixel for the data rectangle [x0, x1] x [y0, y1] drawn on width x
+        height pixels, shaped (classes, height, width) with row 0 at y0.
+        """
+        width, height = max(int(width), 1), max(int(height), 1)
+        px, py = (x1 - x0) / width, (y1 - y0) / height
+        if px < self.cell_x or py < self.cell_y:
+            # Search with float32 keys, float64 ones would make NumPy convert the whole array
+            a, b = np.searchsorted(self.sorted_x, np.array([x0, x1], dtype=self.sorted_x.dtype))
+            if b - a <= RAW_POINTS:
+                return self._points_view(a, b, x0, x1, y0, y1, width, height)
+            return self._cells_view(x0, x1, y0, y1, width, height)
+
+        # Every pixel edge snaps to the nearest cell edge, each pixel then gets the cells
+        # between its edges from the summed-area table
+        cols = np.rint((x0 + np.arange(width + 1) * px - self.x_lo) / self.cell_x)
+        rows = np.rint((y0 + np.arange(height + 1) * py - self.y_lo) / self.cell_y)
+        cols = np.clip(cols, 0, self.size).astype(np.intp)
+        rows = np.clip(rows, 0, self.size).astype(np.intp)
+        corners = self.table[:, rows[:, None], cols[None, :]]
+        return corners[:, 1:, 1:] - corners[:, :-1, 1:] - corners[:, 1:, :-1] + corners[:, :-1, :-1]
+
+    def _cells_view(self, x0, x1, y0, y1, width, height) -> np.ndarray:
+        # Each pixel shows the cell under its centre
+        cols = np.floor((x0 + (np.arange(width) + 0.5) * (x1 - x0) / width - self.x_lo) / self.cell_x)
+        rows = np.floor((y0 + (np.arange(height) + 0.5) * (y1 - y0) / height - self.y_lo) / self.cell_y)
+        cols, rows = cols.astype(np.int64), rows.astype(np.int64)
+        col_ok = (cols >= 0) & (cols < self.size)
+        row_ok = (rows >= 0) & (rows < self.size)
+        out = self.grid[:, np.clip(rows, 0, self.size - 1)[:, None], np.clip(cols, 0, self.size - 1)[None, :]]
+        out[:, ~row_ok, :] = 0
+        out[:, :, ~col_ok] = 0
+        return out
+
+    def _points_view(self, a, b, x0, x1, y0, y1, width, height) -> np.ndarray:
+        x, y, c = self.sorted_x[a:b], self.sorted_y[a:b], self.sorted_class[a:b]
+        inside = (y >= y0) & (y < y1)
+        x, y, c = x[inside].astype(np.float64), y[inside].astype(np.float64), c[inside].astype(np.int64)
+        ix = np.clip(((x - x0) / (x1 - x0) * width).astype(np.int64), 0, width - 1)
+        iy = np.clip(((y - y0) / (y1 - y0) * height).astype(np.int64), 0, height - 1)
+        flat = (c * height + iy) * width + ix
+        return np.bincount(flat, minlength=self.n_classes * height * width).reshape(self.n_classes, height, width)
+
+
+class ChartData:
+    """
+    Everything the chart views of one dataset (or filtered subset of it) need.
+    """
+
+    def __init__(self, dataset, rows=None, progress=None) -> None:
+        def column(name):
+            values = dataset[name].values
+            return values if rows is None else values[rows]
+
+        classes = None
+        if "Survived" in dataset:
+            classes = column("Survived")
+        self.classes = 2 if classes is not None else 1
+        self.rows = len(dataset) if rows is None else len(rows)
+
+        steps = 4
+        self.age = Histogram1D(column("Age"), classes, n_classes=self.classes)
+        if progress is not None:
+            progress(1 / steps, "Charting")
+        self.fare = Histogram1D(column("Fare"), classes, n_classes=self.classes)
+        if progress is not None:
+            progress(2 / steps, "Charting")
+        self.fare_line = MinMaxPyramid(column("Fare"))
+        if progress is not None:
+            progress(3 / steps, "Charting")
+        self.age_fare = DensityGrid(column("Age"), column("Fare"), classes, n_classes=self.classes)
+        if progress is not None:
+            progress(1.0, "Charting")
@@ -0,0 +1,302 @@
+"""
+Array-backed columns and the Dataset that holds them.
+
+A Dataset is one loaded file: a dict of equal length columns. Nothing here stores a
+Python object per row, every column is made of NumPy arrays that can come straight out
+of a memory-mapped cache file. Strings (StringColumn) are kept UTF-8 encoded back to back
+in one byte buffer with an offsets array, and only become str objects for the rows that
+are formatted or decoded.
+
+Null values are tracked with a packed bitmap (1 bit per row, 1 = valid, little bit order,
+the same layout Arrow uses). Columns without any blanks have no bitmap at all.
+"""
+
+import numpy as np
+
+from analytics.schema import NUMERIC, CATEGORICAL, STRING
+
+
+def pack_validity(valid: np.ndarray):
+    """
+    Packs a boolean "is valid" mask into a null bitmap. Returns None if nothing is null.
+    """
+    if valid.all():
+        return None
+    return np.packbits(valid, bitorder="little")
+
+
+def unpack_validity(bitmap: np.ndarray, length: int) -> np.ndarray:
+    """
+    Inverse of pack_validity, returns a boolean mask that is True for valid rows.
+    """
+    return np.unpackbits(bitmap, count=length, bitorder="little").view(np.bool_)
+
+
+class Column:
+    kind = None
+
+    def __init__(self, name: str, validity=None) -> None:
+        self.name = name
+        self.validity = validity
+        self._null_mask = None
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def null_mask(self) -> np.ndarray:
+        """
+        Boolean array that is True where the value is missing. Unpacked once and kept.
+        """
+        if self._null_mask is None:
+            if self.validity is None:
+                self._null_mask = np.zeros(len(self), dtype=np.bool_)
+            else:
+                self._null_mask = ~unpack_validity(self.validity, len(self))
+        return self._null_mask
+
+    def is_null(self, row: int) -> bool:
+        if self.validity is None:
+            return False
+        return not (self.validity[row >> 3] >> (row & 7)) & 1
+
+    def format(self, row: int) -> str:
+        """
+        Display text for a single cell. Blank for nulls, like in the source CSV.
+        """
+        raise NotImplementedError
+
+    def take(self, rows: np.ndarray) -> "Column":
+        """
+        Returns a new column holding only the given row indices.
+        """
+        raise NotImplementedError
+
+    def _take_validity(self, rows):
+        if self.validity is None:
+            return None
+        return pack_validity(~self.null_mask()[rows])
+
+
+class NumericColumn(Column):
+    kind = NUMERIC
+
+    def __init__(self, name: str, values: np.ndarray, validity=None) -> None:
+        super().__init__(name, validity)
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def format(self, row: int) -> str:
+        if self.is_null(row):
+            return ""
+        value = self.values[row]
+        if self.values.dtype.kind == "f":
+            return "{:g}".format(value)
+        return str(value)
+
+    def take(self, rows):
+        return NumericColumn(self.name, self.values[rows], self._take_validity(rows))
+
+
+class CategoricalColumn(Column):
+    """
+    Dictionary encoded column. codes index into categories, -1 means null.
+    """
+    kind = CATEGORICAL
+
+    def __init__(self, name: str, codes: np.ndarray, categories: list, validity=None) -> None:
+        super().__init__(name, validity)
+        self.codes = codes
+        self.categories = list(categories)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def values(self) -> np.ndarray:
+        """
+        Decoded object array. Only meant for small selections, use codes for everything else.
+        """
+        # The extra "" at the end is what code -1 indexes to
+        lookup = np.array(self.categories + [""], dtype=object)
+        return lookup[self.codes]
+
+    def decode(self, start: int = 0, end: int = None) -> list:
+        """
+        The values of rows [start, end) as a list of str, like StringColumn.decode.
+        """
+        lookup = np.array(self.categories + [""], dtype=object)
+        return lookup[self.codes[start:end]].tolist()
+
+    def code_of(self, category: str) -> int:
+        """
+        Returns the code for a category, or -1 if it never appears in the column.
+        """
+        try:
+            return self.categories.index(category)
+        except ValueError:
+            return -1
+
+    def format(self, row: int) -> str:
+        code = self.codes[row]
+        if code < 0:
+            return ""
+        return self.categories[code]
+
+    def take(self, rows):
+        return CategoricalColumn(self.name, self.codes[rows], self.categories, self._take_validity(rows))
+
+
+def encode_strings(values) -> tuple:
+    """
+    Encodes a sequence of str into (data, offsets): the UTF-8 bytes of every value back to
+    back in a uint8 array, value i being data[offsets[i]:offsets[i + 1]].
+    """
+    values = list(values)
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    joined = "".join(values).encode("utf-8")
+    if len(joined) != lengths.sum():
+        # Not all ASCII, character counts aren't byte counts
+        encoded = [value.encode("utf-8") for value in values]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.frombuffer(joined, dtype=np.uint8), offsets
+
+
+def join_strings(parts) -> tuple:
+    """
+    Concatenates (data, offsets) pairs into one pair whose offsets start at 0.
+    """
+    parts = list(parts)
+    chunks = [data[offsets[0]:offsets[-1]] for data, offsets in parts]
+    offsets = np.zeros(1 + sum(len(o) - 1 for _, o in parts), dtype=np.int64)
+    row, base = 1, 0
+    for (_, part), chunk in zip(parts, chunks):
+        offsets[row:row + len(part) - 1] = part[1:] - part[0] + base
+        row += len(part) - 1
+        base += len(chunk)
+    data = np.concatenate(chunks) if chunks else np.array([], dtype=np.uint8)
+    return data, offsets
+
+
+class StringColumn(Column):
+    """
+    Variable length strings in one UTF-8 buffer: row i is data[offsets[i]:offsets[i + 1]].
+
+    offsets has one entry more than there are rows and doesn't have to start at 0, so a
+    range of rows is a view of the same buffers. format() decodes a single value, decode()
+    a range of rows, and values (all of them, as an object array) is only for small
+    columns and tests.
+    """
+    kind = STRING
+
+    def __init__(self, name: str, data: np.ndarray, offsets: np.ndarray, validity=None) -> None:
+        super().__init__(name, validity)
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_values(cls, name: str, values, validity=None) -> "StringColumn":
+        data, offsets = encode_strings(values)
+        return cls(name, data, offsets, validity)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.offsets[-1] - self.offsets[0]) + self.offsets.nbytes
+
+    @property
+    def values(self) -> np.ndarray:
+        return np.array(self.decode(), dtype=object)
+
+    def decode(self, start: int = 0, end: int = None) -> list:
+        """
+        The values of rows [start, end) as a list of str, "" for nulls.
+        """
+        end = len(self) if end is None else min(end, len(self))
+        if start >= end:
+            return []
+        bounds = self.offsets[start:end + 1]
+        raw = self.data[bounds[0]:bounds[-1]].tobytes()
+        bounds = (bounds - bounds[0]).tolist()
+        text = raw.decode("utf-8")
+        # ASCII text has one character per byte, so it can be sliced like the bytes
+        source = text if len(text) == len(raw) else raw
+        values = [source[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        return values if source is text else [value.decode("utf-8") for value in values]
+
+    def compact(self) -> tuple:
+        """
+        (data, offsets) holding just this column's rows, offsets starting at 0. No copy
+        when the column already is laid out like that.
+        """
+        first, last = int(self.offsets[0]), int(self.offsets[-1])
+        if first == 0 and last == len(self.data):
+            return self.data, self.offsets
+        return self.data[first:last], self.offsets - first
+
+    def format(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def take(self, rows):
+        if isinstance(rows, slice) and rows.step in (None, 1):
+            start, stop, _ = rows.indices(len(self))
+            stop = max(start, stop)
+            return StringColumn(self.name, self.data, self.offsets[start:stop + 1], self._take_validity(rows))
+        rows = np.arange(len(self))[rows] if isinstance(rows, slice) else np.asarray(rows)
+        starts = self.offsets[:-1][rows]
+        lengths = self.offsets[1:][rows] - starts
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Source position of every output byte: the start of its row plus its place in it
+        index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return StringColumn(self.name, self.data[index], offsets, self._take_validity(rows))
+
+
+class Dataset:
+    """
+    A loaded passenger file.
+
+    source is the CSV path it came from and fingerprint identifies the exact version of
+    that file (see loader.file_fingerprint), caches use it to know when to throw results away.
+    extras holds summaries built from the columns at load time and stored with them in the
+    sidecar cache, e.g. extras["sketches"] (see sketches.SketchIndex).
+    """
+
+    def __init__(self, columns: dict, source: str = None, fingerprint: tuple = None) -> None:
+        lengths = {len(col) for col in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("Columns have different lengths: {}".format(sorted(lengths)))
+
+        self.columns = dict(columns)
+        self.source = source
+        self.fingerprint = fingerprint
+        self.extras = {}
+        self._length = lengths.pop() if lengths else 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, name: str) -> Column:
+        return self.columns[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    @property
+    def column_names(self) -> list:
+        return list(self.columns)
+
+    def take(self, rows: np.ndarray) -> "Dataset":
+        """
+        Returns a new dataset holding only the given row indices, in that order.
+        The result is derived data, so it doesn't carry the file's fingerprint or extras.
+        """
+        return Dataset({name: col.take(rows) for name, col in self.columns.items()}, self.source)
+
+    def __repr__(self) -> str:
+        return "Dataset({!r}, rows={}, columns={})".format(self.source, len(self), self.column_names)
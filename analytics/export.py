@@ -0,0 +1,425 @@
+"""
+Bulk export of passenger rows and predictions to CSV, JSON Lines or a column store file.
+
+The rows to export are a selection of a dataset in display order: None for every row,
+an index array (the table's filtered and sorted rows) or a boolean mask. They are
+written in blocks of EXPORT_BLOCK_ROWS and every block is formatted by NumPy on the
+column buffers, without a Python object per row or per cell:
+
+    numbers       digits come from vectorized divmod by 10. Floats are written with the
+                  fewest decimals that read back as the same value ("7.25", "22"), the
+                  way the source CSVs write them. JSON has no infinities, they are
+                  written as null like missing values
+    categories    every category is encoded once, the codes pick the bytes
+    strings       the UTF-8 bytes of StringColumn are gathered as they are. CSV fields
+                  with a comma, quote or newline are quoted and their quotes doubled,
+                  JSON strings get their quotes, backslashes and control bytes escaped
+
+A block is a list of "pieces" per row: the bytes of every field and the separators
+between them. _join() lays the rows out in one uint8 buffer and scatters every piece into
+it with one fancy assignment, which is written to the file as it is.
+
+Column store exports (.pcol) are analytics.store.write_store() of the selected rows.
+
+    report = export_rows(dataset, "subset.jsonl", rows=window.rows, progress=progress)
+    export_predictions(model, dataset, "submission.csv")
+
+Prediction files have the gender_submission.csv columns, PassengerId,Survived.
+"""
+
+import csv
+import io
+import json
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from analytics.columns import Dataset, NumericColumn, StringColumn
+from analytics.schema import NUMERIC, CATEGORICAL, DERIVED_FROM
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".pcol": "pcol"}
+EXPORT_BLOCK_ROWS = 128 * 1024
+# Floats with more decimals than this are left to NumPy's repr
+_MAX_DECIMALS = {4: 9, 8: 17}
+# Beyond this the scaled value doesn't fit an int64 digit loop
+_MAX_FIXED = 1e15
+
+_QUOTE = ord('"')
+_BACKSLASH = ord("\\")
+_COMMA, _NEWLINE, _RETURN = ord(","), ord("\n"), ord("\r")
+# JSON: second byte of the two byte escapes, 0 for bytes that need none
+_JSON_SHORT = np.zeros(256, dtype=np.uint8)
+for _byte, _escape in {_QUOTE: '"', _BACKSLASH: "\\", 8: "b", 9: "t", 10: "n", 12: "f", 13: "r"}.items():
+    _JSON_SHORT[_byte] = ord(_escape)
+_HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+class ExportReport(namedtuple("ExportReport", ["path", "rows", "bytes", "seconds"])):
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds > 0 else float("inf")
+
+
+def format_for(path: str) -> str:
+    """
+    The export format for a file name, by its extension.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError("Can't export to {}, expected one of {}".format(path, ", ".join(sorted(FORMATS))))
+    return FORMATS[ext]
+
+
+# Pieces: (data, offsets) like StringColumn, piece i of a block being
+# data[offsets[i]:offsets[i + 1]], or bytes that every row gets
+
+
+def _lengths(offsets: np.ndarray) -> np.ndarray:
+    return np.diff(offsets)
+
+
+def _offsets(lengths: np.ndarray) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _where(text: bytes, mask: np.ndarray) -> tuple:
+    """
+    A piece that is text in the rows where mask is set and empty elsewhere.
+    """
+    count = int(mask.sum())
+    data = np.tile(np.frombuffer(text, dtype=np.uint8), count)
+    return data, _offsets(mask.astype(np.int64) * len(text))
+
+
+def _join(pieces: list, n: int) -> np.ndarray:
+    """
+    Concatenates the pieces of every row, rows one after the other, into one buffer.
+    """
+    lengths = [np.full(n, len(p), dtype=np.int64) if isinstance(p, bytes) else _lengths(p[1]) for p in pieces]
+    out_offsets = _offsets(np.sum(lengths, axis=0) if lengths else np.zeros(n, dtype=np.int64))
+    out = np.empty(int(out_offsets[-1]), dtype=np.uint8)
+    # The byte indices are the bulk of the work, half as many bytes to move in 32 bits
+    index_type = np.int32 if len(out) < 2 ** 31 else np.int64
+    position = out_offsets[:-1].astype(index_type)
+    for piece, length in zip(pieces, lengths):
+        if isinstance(piece, bytes):
+            if piece:
+                out[position[:, None] + np.arange(len(piece), dtype=index_type)] = np.frombuffer(piece, dtype=np.uint8)
+        else:
+            data, offsets = piece
+            total = int(offsets[-1] - offsets[0])
+            if total:
+                # Destination of every byte: its row's position plus its place in the piece
+                start = position - (offsets[:-1] - offsets[0]).astype(index_type)
+                index = np.repeat(start, length)
+                index += np.arange(total, dtype=index_type)
+                out[index] = data[offsets[0]:offsets[-1]]
+        position += length.astype(index_type)
+    return out
+
+
+def _digits(magnitude: np.ndarray, width: np.ndarray = None) -> tuple:
+    """
+    Decimal digits of non-negative int64 values as a piece. width, if given, pads every
+    value with leading zeros to that many digits.
+    """
+    n = len(magnitude)
+    top = int(magnitude.max()) if n else 0
+    columns = max(len(str(top)), int(width.max()) if width is not None and n else 1)
+    matrix = np.empty((n, columns), dtype=np.uint8)
+    # Dividing 32 bit integers is several times faster than 64 bit ones
+    rest = magnitude.astype(np.uint32 if top < 2 ** 32 else np.uint64)
+    for j in range(columns - 1, -1, -1):
+        rest, digit = np.divmod(rest, 10)
+        matrix[:, j] = digit
+    matrix += ord("0")
+    if width is None:
+        count = 1 + np.searchsorted(10 ** np.arange(1, columns, dtype=np.int64), magnitude, side="right")
+    else:
+        count = width.astype(np.int64)
+    keep = np.arange(columns) >= (columns - count)[:, None]
+    return matrix[keep], _offsets(count)
+
+
+def _integer_pieces(values: np.ndarray, null: np.ndarray) -> list:
+    values = values.astype(np.int64)
+    negative = values < 0
+    digits, offsets = _digits(np.abs(values))
+    if null is not None and null.any():
+        digits, offsets = _mask_rows(digits, offsets, ~null)
+    pieces = [_where(b"-", negative & ~null if null is not None else negative)] if negative.any() else []
+    return pieces + [(digits, offsets)]
+
+
+def _mask_rows(data: np.ndarray, offsets: np.ndarray, keep: np.ndarray) -> tuple:
+    """
+    The piece with the rows where keep is False made empty.
+    """
+    lengths = _lengths(offsets) * keep
+    return data[np.repeat(keep, _lengths(offsets))], _offsets(lengths)
+
+
+def _fixed_pieces(fixed: np.ndarray) -> tuple:
+    """
+    A piece from an "S" array (NumPy's own formatting, the fallback for odd floats).
+    """
+    width = fixed.dtype.itemsize
+    matrix = np.ascontiguousarray(fixed).view(np.uint8).reshape(len(fixed), width)
+    keep = matrix != 0
+    return matrix[keep], _offsets(keep.sum(axis=1))
+
+
+def _float_pieces(values: np.ndarray, missing: np.ndarray) -> list:
+    """
+    [sign, integer digits, ".", decimals] with the fewest decimals that read back as the
+    same value, or NumPy's repr for values that need more (or are too big). Missing
+    values are left empty.
+    """
+    n = len(values)
+    decimals = np.full(n, -1, dtype=np.int64)
+    scaled = np.zeros(n, dtype=np.int64)
+    finite = ~missing & np.isfinite(values) & (np.abs(values) < _MAX_FIXED)
+    pending = np.flatnonzero(finite)
+    wide = values.astype(np.float64)
+    for d in range(_MAX_DECIMALS.get(values.dtype.itemsize, 17) + 1):
+        if not len(pending):
+            break
+        power = 10.0 ** d
+        rounded = np.rint(wide[pending] * power)
+        if np.abs(rounded).max() >= 2 ** 62:
+            break
+        exact = (rounded / power).astype(values.dtype) == values[pending]
+        decimals[pending[exact]] = d
+        scaled[pending[exact]] = rounded[exact].astype(np.int64)
+        pending = pending[~exact]
+
+    fixed = decimals >= 0
+    magnitude = np.abs(scaled)
+    power = 10 ** np.maximum(decimals, 0)
+    whole, fraction = magnitude // power, magnitude % power
+    # signbit, not scaled < 0: -0.0 keeps its sign
+    negative = fixed & np.signbit(values)
+    int_digits, int_offsets = _mask_rows(*_digits(whole), fixed)
+    # "-0.0", JSON readers take "-0" for the integer 0
+    point = fixed & ((decimals > 0) | (negative & (scaled == 0)))
+    frac_digits, frac_offsets = _mask_rows(*_digits(fraction, np.maximum(decimals, 1)), point)
+    pieces = [_where(b"-", negative), (int_digits, int_offsets), _where(b".", point), (frac_digits, frac_offsets)]
+
+    odd = ~fixed & ~missing
+    if odd.any():
+        # Very big or very precise values, and infinities: leave them to NumPy
+        repr_data, repr_offsets = _fixed_pieces(values.astype("S32"))
+        pieces.append(_mask_rows(repr_data, repr_offsets, odd))
+    return pieces
+
+
+def _number_pieces(col, rows, finite: bool = False) -> tuple:
+    """
+    (pieces, nulls) of a numeric column. With finite, infinities are nulls too: JSON
+    has no way to write them.
+    """
+    values = col.values[rows]
+    null = col.null_mask()[rows] if col.validity is not None else None
+    if values.dtype.kind == "f":
+        unwritable = ~np.isfinite(values) if finite else np.isnan(values)
+        missing = unwritable if null is None else null | unwritable
+        return _float_pieces(values, missing), missing
+    return _integer_pieces(values, null), null
+
+
+def _text_piece(col, rows) -> tuple:
+    """
+    (data, offsets) of the UTF-8 text of a categorical or string column, and its nulls.
+    """
+    if col.kind == CATEGORICAL:
+        codes = col.codes[rows]
+        # Code -1 (null) picks the trailing ""
+        categories = StringColumn.from_values(col.name, col.categories + [""])
+        return categories.take(codes).compact(), codes < 0
+    taken = col.take(rows)
+    null = taken.null_mask() if taken.validity is not None else None
+    return taken.compact(), null
+
+
+def _csv_quote(data: np.ndarray, offsets: np.ndarray) -> list:
+    """
+    CSV pieces of a text piece: fields with a comma, quote or newline quoted, their
+    quotes doubled.
+    """
+    base = offsets[0]
+    data = data[base:offsets[-1]]
+    offsets = offsets - base
+    lengths = _lengths(offsets)
+    if not len(data):
+        return [(data, offsets)]
+    special = (data == _COMMA) | (data == _QUOTE) | (data == _NEWLINE) | (data == _RETURN)
+    # Empty fields would pick the byte of the next one
+    quoted = np.logical_or.reduceat(special, np.minimum(offsets[:-1], len(data) - 1)) & (lengths > 0)
+    if not quoted.any():
+        return [(data, offsets)]
+    # Quotes are few: insert the second one of every pair rather than rewrite every byte
+    quotes = np.flatnonzero(data == _QUOTE)
+    if len(quotes):
+        data = np.insert(data, quotes, _QUOTE)
+        lengths = lengths + _lengths(np.searchsorted(quotes, offsets))
+    return [_where(b'"', quoted), (data, _offsets(lengths)), _where(b'"', quoted)]
+
+
+def _json_escape(data: np.ndarray, offsets: np.ndarray) -> tuple:
+    """
+    A text piece with JSON string escapes applied, without the surrounding quotes.
+    """
+    base = offsets[0]
+    data = data[base:offsets[-1]]
+    offsets = offsets - base
+    escaped = np.flatnonzero((data < 0x20) | (data == _QUOTE) | (data == _BACKSLASH))
+    if not len(escaped):
+        return data, offsets
+    # Escapes are few: insert the bytes they add before the byte they replace
+    short = _JSON_SHORT[data[escaped]]
+    added = np.where(short > 0, 1, 5)
+    data = np.insert(data, np.repeat(escaped, added), 0)
+    start = escaped + np.cumsum(added) - added
+    data[start] = _BACKSLASH
+    data[start[short > 0] + 1] = short[short > 0]
+    control = start[short == 0]
+    for i, byte in enumerate(b"u00"):
+        data[control + 1 + i] = byte
+    code = data[control + 5]
+    data[control + 4] = _HEX[code >> 4]
+    data[control + 5] = _HEX[code & 15]
+    moved = np.zeros(len(escaped) + 1, dtype=np.int64)
+    np.cumsum(added, out=moved[1:])
+    return data, offsets + moved[np.searchsorted(escaped, offsets)]
+
+
+def format_block(columns: list, rows, fmt: str) -> np.ndarray:
+    """
+    The CSV or JSON Lines text (a uint8 array) of the given rows of columns, one line per
+    row. rows is an index array or a slice.
+    """
+    n = len(range(len(columns[0]))[rows]) if isinstance(rows, slice) else len(rows)
+    pieces = []
+    for i, col in enumerate(columns):
+        if fmt == "csv":
+            if i:
+                pieces.append(b",")
+        else:
+            pieces.append(("{" if i == 0 else ",").encode() + json.dumps(col.name).encode() + b":")
+        if col.kind == NUMERIC:
+            parts, null = _number_pieces(col, rows, finite=fmt == "jsonl")
+            pieces.extend(parts)
+            if fmt == "jsonl" and null is not None:
+                pieces.append(_where(b"null", null))
+        else:
+            text, null = _text_piece(col, rows)
+            if fmt == "csv":
+                pieces.extend(_csv_quote(*text))
+            else:
+                quoted = np.ones(n, dtype=np.bool_) if null is None else ~null
+                pieces.append(_where(b'"', quoted))
+                pieces.append(_json_escape(*text))
+                pieces.append(_where(b'"', quoted))
+                if null is not None:
+                    pieces.append(_where(b"null", null))
+    pieces.append(b"\n" if fmt == "csv" else b"}\n")
+    return _join(pieces, n)
+
+
+def _selection(dataset: Dataset, rows) -> np.ndarray:
+    if rows is None:
+        return None
+    rows = np.asarray(rows)
+    if rows.dtype == np.bool_:
+        if len(rows) != len(dataset):
+            raise ValueError("Selection mask has {} rows, the dataset {}".format(len(rows), len(dataset)))
+        return np.flatnonzero(rows)
+    return rows
+
+
+def export_rows(dataset: Dataset, path: str, rows=None, columns=None, fmt: str = None,
+                block_rows: int = EXPORT_BLOCK_ROWS, progress=None) -> ExportReport:
+    """
+    Writes the given rows (None for all, an index array in the order to write them or a
+    boolean mask) and columns of dataset to path. The columns default to those of the
+    file, the derived ones (schema.DERIVED_COLUMNS) are parsed again when the export is
+    loaded. fmt is "csv", "jsonl" or "pcol", by default taken from the extension.
+    progress, if given, is called as progress(fraction, message) after every block.
+    """
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATS.values():
+        raise ValueError("Unknown export format {!r}, expected one of {}".format(fmt, sorted(FORMATS.values())))
+    if columns is None:
+        columns = [name for name in dataset.column_names if DERIVED_FROM.get(name) not in dataset]
+    names = list(columns)
+    rows = _selection(dataset, rows)
+    count = len(dataset) if rows is None else len(rows)
+    message = "Exporting {}".format(os.path.basename(path))
+    start = time.perf_counter()
+
+    if fmt == "pcol":
+        from analytics.store import write_store
+        subset = Dataset({name: dataset[name] for name in names}, dataset.source)
+        if rows is not None:
+            subset = subset.take(rows)
+        write_store(subset, path, progress=progress)
+        return ExportReport(path, count, os.path.getsize(path), time.perf_counter() - start)
+
+    cols = [dataset[name] for name in names]
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            if fmt == "csv":
+                header = io.StringIO()
+                csv.writer(header, lineterminator="\n").writerow(names)
+                f.write(header.getvalue().encode("utf-8"))
+            for first in range(0, count, block_rows):
+                last = min(first + block_rows, count)
+                block = slice(first, last) if rows is None else rows[first:last]
+                f.write(format_block(cols, block, fmt))
+                if progress is not None:
+                    progress(last / count, message)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return ExportReport(path, count, os.path.getsize(path), time.perf_counter() - start)
+
+
+def predictions(model, dataset: Dataset, rows=None, block_rows: int = EXPORT_BLOCK_ROWS, progress=None) -> Dataset:
+    """
+    A PassengerId,Survived dataset of the model's predictions for the given rows.
+    """
+    if "PassengerId" not in dataset:
+        raise ValueError("{} has no PassengerId column".format(dataset.source))
+    rows = _selection(dataset, rows)
+    count = len(dataset) if rows is None else len(rows)
+    survived = np.empty(count, dtype=np.int8)
+    for first in range(0, count, block_rows):
+        last = min(first + block_rows, count)
+        survived[first:last] = model.predict(dataset, slice(first, last) if rows is None else rows[first:last])
+        if progress is not None:
+            progress(last / max(count, 1), "Predicting with {}".format(model.name))
+    ids = dataset["PassengerId"].values
+    return Dataset({
+        "PassengerId": NumericColumn("PassengerId", ids if rows is None else ids[rows]),
+        "Survived": NumericColumn("Survived", survived),
+    }, dataset.source)
+
+
+def export_predictions(model, dataset: Dataset, path: str, rows=None, fmt: str = None, progress=None) -> ExportReport:
+    """
+    Predicts the given rows of dataset and writes them in the gender_submission.csv
+    layout (or as JSON Lines or a column store, see export_rows).
+    """
+    predicted = predictions(model, dataset, rows, progress=progress)
+    return export_rows(predicted, path, fmt=fmt, progress=progress)
@@ -0,0 +1,285 @@
+"""
+Bitmap index over the low-cardinality columns, for facet filters and facet counts.
+
+Facet filters are what the filter panel's widgets ask for: Pclass in {1, 3}, Sex female,
+Embarked S, SibSp >= 1. Every one of them is a set of allowed values of one column, and a
+row passes when it passes every column's set. For each value of each FACET_COLUMNS column
+the index keeps a bitmap of the rows holding it (NumPy packed bits in uint64 words, bit i
+of the little-endian bytes is row i), so
+
+    one column's filter  = OR of the bitmaps of its allowed values
+    the whole filter     = AND of the column filters (and of the search result, if any)
+    count of a bitmap    = popcount of its words
+
+On 10M rows a bitmap is 156k words and each of those operations takes a fraction of a
+millisecond. Facet counts are what every widget shows next to its values: for each
+column, how many rows each value would have under the filters of all the *other* columns
+(the usual faceted search behaviour, so ticking "1st class" doesn't zero the counts of
+2nd and 3rd). That is one AND and one popcount per value.
+
+The bitmaps are plain packed bits, not compressed. With at most MAX_VALUES values per
+column they are a few bytes per row in total, and they are stored in and memory-mapped
+from the sidecar cache like the columns (see loader.EXTRAS). extend() adds appended rows
+by writing only the words they fall in (see analytics/tail.py).
+
+    facets = dataset.extras["facets"]
+    result = facet_filter(facets, {"Pclass": [1, 3], "Sex": ["female"]})
+    result.rows, result.counts["Embarked"]
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from analytics.schema import CATEGORICAL
+
+FACET_COLUMNS = ("Pclass", "Sex", "Embarked", "SibSp", "Parch", "Survived")
+# Numeric columns with more distinct values than this aren't facets
+MAX_VALUES = 64
+# Words per bitmap and step when counting (64 KiB)
+_BLOCK_WORDS = 8192
+
+FacetResult = namedtuple("FacetResult", ["rows", "counts", "matched"])
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    # NumPy < 2.0 has no popcount ufunc, count through the bytes instead
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        counts = _BYTE_COUNTS[words.view(np.uint8)]
+        return counts.reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def _words(length: int) -> int:
+    return -(-length // 64)
+
+
+def pack_rows(mask: np.ndarray) -> np.ndarray:
+    """
+    Packs a boolean row mask into uint64 bitmap words.
+    """
+    packed = np.zeros(_words(len(mask)) * 8, dtype=np.uint8)
+    packed[:-(-len(mask) // 8)] = np.packbits(mask, bitorder="little")
+    return packed.view("<u8")
+
+
+def unpack_rows(words: np.ndarray, length: int) -> np.ndarray:
+    """
+    Row indices of the set bits of a bitmap.
+    """
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), count=length, bitorder="little"))
+
+
+def _value_order(value) -> tuple:
+    # Values of one column are all numbers or all strings, missing goes last
+    return (value is None, 0 if value is None else value)
+
+
+def _value_codes(col, start: int = 0) -> tuple:
+    """
+    (codes, keys, labels) of the rows of col from start on: the array to compare, the
+    key of every value present and its label (None for missing).
+    """
+    if col.kind == CATEGORICAL:
+        codes = col.codes[start:]
+        present = np.flatnonzero(np.bincount(codes + 1, minlength=len(col.categories) + 1))
+        return codes, present - 1, [None if p == 0 else col.categories[p - 1] for p in present]
+    codes = col.values[start:]
+    keys = np.unique(codes)
+    return codes, keys, keys.tolist()
+
+
+class BitmapIndex:
+    """
+    One bitmap per value of every facet column. bitmaps[column] is shaped (values, words).
+    """
+
+    def __init__(self, length: int, values: dict, bitmaps: dict, storage: dict = None) -> None:
+        self.length = length
+        self.values = values  # column -> list of values, None for missing
+        self.bitmaps = bitmaps
+        self._positions = {name: {v: i for i, v in enumerate(vals)} for name, vals in values.items()}
+        # All rows, the bits past the last row stay 0
+        self.all = np.full(_words(length), np.uint64(0xFFFFFFFFFFFFFFFF), dtype="<u8")
+        if length % 64:
+            self.all[-1] = np.uint64((1 << (length % 64)) - 1)
+        # Over-allocated buffers the bitmaps are views of once extend() has run, shared
+        # by the indexes it returns
+        self._storage = {} if storage is None else storage
+
+    @property
+    def columns(self) -> list:
+        return list(self.values)
+
+    @staticmethod
+    def applies(dataset) -> bool:
+        return any(name in dataset for name in FACET_COLUMNS)
+
+    @classmethod
+    def build(cls, dataset, columns=FACET_COLUMNS) -> "BitmapIndex":
+        values, bitmaps = {}, {}
+        for name in columns:
+            if name not in dataset:
+                continue
+            col = dataset[name]
+            if col.kind != CATEGORICAL and col.values.dtype.kind == "f":
+                continue
+            codes, keys, labels = _value_codes(col)
+            if len(keys) > MAX_VALUES:
+                continue
+            order = sorted(range(len(labels)), key=lambda i: _value_order(labels[i]))
+            values[name] = [labels[i] for i in order]
+            bitmaps[name] = np.stack([pack_rows(codes == keys[i]) for i in order])
+        return cls(len(dataset), values, bitmaps)
+
+    def extend(self, dataset, start: int) -> "BitmapIndex":
+        """
+        Index of dataset, which is the dataset of this index with rows from `start` on
+        appended. Only the words from the one holding row `start` on are written, into
+        buffers with room to grow (the first call copies the bitmaps into them once).
+        Values seen for the first time are added at the end of their column's values.
+
+        self stays valid: the words it shares with the result only change in bits past
+        its last row, which its own self.all masks out.
+        """
+        end = len(dataset)
+        if start >= end:
+            return self
+        first = start // 64
+        words = _words(end)
+        values, bitmaps = {}, {}
+        for name, old_values in self.values.items():
+            codes, keys, labels = _value_codes(dataset[name], first * 64)
+            column_values = list(old_values)
+            positions = dict(self._positions[name])
+            for label in labels:
+                if label not in positions:
+                    positions[label] = len(column_values)
+                    column_values.append(label)
+            # Rows before `start` in the first word are packed again, with the same bits
+            block = np.zeros((len(column_values), words - first), dtype="<u8")
+            for key, label in zip(keys, labels):
+                block[positions[label]] = pack_rows(codes == key)
+            storage = self._reserve(name, self.bitmaps[name], len(column_values), words)
+            storage[:, first:words] = block
+            values[name] = column_values
+            bitmaps[name] = storage[:, :words]
+        return BitmapIndex(end, values, bitmaps, self._storage)
+
+    def _reserve(self, name, current: np.ndarray, rows: int, words: int) -> np.ndarray:
+        """
+        A writable buffer of at least words columns whose first rows hold current,
+        shaped (rows, capacity). Grows by half its size at a time.
+        """
+        storage = self._storage.get(name)
+        if storage is None or storage.shape[0] != rows or storage.shape[1] < words:
+            capacity = max(words + words // 2, 1024)
+            grown = np.zeros((rows, capacity), dtype="<u8")
+            grown[:current.shape[0], :current.shape[1]] = current
+            self._storage[name] = storage = grown
+        return storage
+
+    def column_mask(self, column: str, allowed) -> np.ndarray:
+        """
+        Bitmap of the rows whose value in column is one of allowed. Values that never
+        occur are ignored.
+        """
+        positions = self._positions[column]
+        index = [positions[v] for v in allowed if v in positions]
+        if not index:
+            return np.zeros_like(self.all)
+        return np.bitwise_or.reduce(self.bitmaps[column][index], axis=0)
+
+    def mask(self, selection: dict, base: np.ndarray = None) -> np.ndarray:
+        """
+        Bitmap of the rows passing every column's filter in selection (column -> allowed
+        values) and the base bitmap, if given.
+        """
+        result = self.all if base is None else base
+        for column, allowed in selection.items():
+            result = result & self.column_mask(column, allowed)
+        return result
+
+    def count(self, words: np.ndarray) -> int:
+        return int(_popcount(words).sum())
+
+    def facet_counts(self, selection: dict, base: np.ndarray = None) -> dict:
+        """
+        column -> rows per value (in self.values order) under the filters of all other
+        columns.
+        """
+        filters = {column: self.column_mask(column, allowed) for column, allowed in selection.items()}
+        counts = {column: np.zeros(len(values), dtype=np.int64) for column, values in self.values.items()}
+        start_mask = self.all if base is None else base
+        # Block by block, so the temporaries stay in cache instead of being bitmap sized
+        for start in range(0, len(start_mask), _BLOCK_WORDS):
+            block = slice(start, start + _BLOCK_WORDS)
+            for column, bitmaps in self.bitmaps.items():
+                others = start_mask[block]
+                for other, mask in filters.items():
+                    if other != column:
+                        others = others & mask[block]
+                counts[column] += _popcount(bitmaps[:, block] & others).sum(axis=1, dtype=np.uint32)
+        return counts
+
+    def rows_mask(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Bitmap of a row index array, e.g. a search result, to use as base.
+        """
+        mask = np.zeros(self.length, dtype=np.bool_)
+        mask[rows] = True
+        return pack_rows(mask)
+
+    # Sidecar cache
+
+    def to_buffers(self) -> tuple:
+        meta = {"length": self.length, "values": self.values}
+        arrays = {name + ".bitmaps": bitmaps.ravel() for name, bitmaps in self.bitmaps.items()}
+        return meta, arrays
+
+    @classmethod
+    def from_buffers(cls, meta: dict, arrays: dict) -> "BitmapIndex":
+        words = _words(meta["length"])
+        bitmaps = {
+            name: arrays[name + ".bitmaps"].reshape(len(values), words)
+            for name, values in meta["values"].items()
+        }
+        return cls(meta["length"], meta["values"], bitmaps)
+
+
+def value_counts(index: BitmapIndex, dataset, start: int = 0) -> dict:
+    """
+    column -> rows per value (in index.values order) among the dataset rows from start
+    on, counted from the columns. index must know every value of those rows, e.g. be
+    extended over them already.
+    """
+    counts = {}
+    for name, values in index.values.items():
+        codes, keys, labels = _value_codes(dataset[name], start)
+        column = np.zeros(len(values), dtype=np.int64)
+        for key, label in zip(keys, labels):
+            column[index._positions[name][label]] = np.count_nonzero(codes == key)
+        counts[name] = column
+    return counts
+
+
+def facet_filter(index: BitmapIndex, selection: dict, base_rows: np.ndarray = None) -> FacetResult:
+    """
+    Applies facet filters on top of an optional row filter (base_rows, e.g. a search
+    result). Returns the matching rows (None when nothing is filtered), the facet counts
+    of every column and the number of matching rows. The rows are sorted and unique
+    either way: base_rows given out of order or with repeats are normalised first.
+    """
+    selection = {column: list(allowed) for column, allowed in selection.items() if column in index.values}
+    if base_rows is not None and len(base_rows) > 1 and not np.all(base_rows[1:] > base_rows[:-1]):
+        base_rows = np.unique(base_rows)
+    base = None if base_rows is None else index.rows_mask(base_rows)
+    counts = index.facet_counts(selection, base)
+    if not selection:
+        matched = index.length if base_rows is None else len(base_rows)
+        return FacetResult(base_rows, counts, matched)
+    mask = index.mask(selection, base)
+    rows = unpack_rows(mask, index.length)
+    return FacetResult(rows, counts, len(rows))
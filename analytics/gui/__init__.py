@@ -0,0 +1,3 @@
+"""
+PyQt5 widgets and models on top of the analytics engines.
+"""
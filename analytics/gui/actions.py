@@ -0,0 +1,187 @@
+"""
+The window's QActions, built once and shared by its menus, toolbars and context menus.
+
+tutorial/app3.py builds a QMenu and three new QActions on every right click and
+tutorial/app6.py builds the actions of every toolbar by hand. In the passenger table
+context menus open all the time, so an ActionRegistry creates every action once, by
+name, and every menu once, by key. Opening a menu again only shows the QMenu it already
+has, and a toolbar, a menu and a context menu holding the same action share its state.
+
+Actions can be enabled depending on what the user points at: an ActionContext (the
+dataset, the clicked column and its value, whether rows are selected or filtered) that
+the window builds on demand. The predicates aren't run on every selection change, that
+only marks the registry stale (invalidate()). They run once when a menu is about to show,
+and for the actions on toolbars once the selection has been still for a frame.
+
+Menu latency: popup() records the time from the request to the menu being shown, in
+latencies, per menu key. With slot profiling on it also goes to the profiler as
+"menu <key>". The cached menus open well within a frame, see benchmarks/bench_menus.py.
+
+    actions = ActionRegistry(window.action_context, parent=window)
+    actions.add("clear_filters", "&Clear filters", window.clear_filters,
+                enabled=lambda context: context.filtered)
+    toolbar.addAction(actions["clear_filters"])
+    actions.popup("table", ["filter_value", None, "clear_filters"], global_pos)
+"""
+
+import time
+from collections import deque, namedtuple
+
+from PyQt5.QtCore import QObject, QEvent, QTimer
+from PyQt5.QtWidgets import QAction, QMenu
+
+from analytics.gui.batching import FRAME_MS
+from analytics.gui.profiler import instrumented, profiler
+
+# Menu open times kept per menu
+LATENCY_SAMPLES = 256
+
+# What the actions act on. column and value are those of the cell a context menu was
+# opened on (None elsewhere), value as it is stored (a number, a category or None).
+ActionContext = namedtuple("ActionContext", ["dataset", "column", "row", "value", "selected", "filtered"])
+
+EMPTY_CONTEXT = ActionContext(None, None, None, None, False, False)
+
+
+@instrumented
+class ActionRegistry(QObject):
+    """
+    Named QActions with lazily evaluated enabled states, and the menus built from them.
+    context is called without arguments and returns the current ActionContext.
+    """
+
+    def __init__(self, context, parent=None) -> None:
+        super().__init__(parent)
+        self.context_provider = context
+        # The context the enabled states were last computed for, what slots act on
+        self.context = EMPTY_CONTEXT
+        self.actions = {}
+        self.predicates = {}
+        self.menus = {}
+        self.latencies = {}
+        self._stale = True
+        self._on_toolbars = set()
+        self._opening = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(FRAME_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def __getitem__(self, name: str) -> QAction:
+        return self.actions[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.actions
+
+    def add(self, name: str, text: str, slot=None, tip: str = None, shortcut=None,
+            checkable: bool = False, enabled=None) -> QAction:
+        """
+        Creates the action called name. slot is connected to triggered (called without
+        arguments) or, for checkable actions, to toggled. enabled, if given, is a
+        predicate of the ActionContext.
+        """
+        if name in self.actions:
+            raise ValueError("Action {} is already registered".format(name))
+        action = QAction(text, self.parent())
+        if tip is not None:
+            action.setStatusTip(tip)
+        if shortcut is not None:
+            action.setShortcut(shortcut)
+        action.setCheckable(checkable)
+        if slot is not None:
+            if checkable:
+                action.toggled.connect(slot)
+            else:
+                action.triggered.connect(lambda checked=False: slot())
+        self.actions[name] = action
+        if enabled is not None:
+            self.predicates[name] = enabled
+            self._stale = True
+        return action
+
+    def add_to_toolbar(self, toolbar, names: list) -> None:
+        """
+        Adds actions (None for a separator) to a toolbar. Their enabled state is kept up
+        to date without a menu being opened.
+        """
+        for name in names:
+            if name is None:
+                toolbar.addSeparator()
+            else:
+                toolbar.addAction(self.actions[name])
+                self._on_toolbars.add(name)
+        self.invalidate()
+
+    def menu(self, key: str, names: list = None, title: str = "") -> QMenu:
+        """
+        The menu called key, built from the actions called names (None for a separator)
+        the first time and returned as it is after that.
+        """
+        menu = self.menus.get(key)
+        if menu is None:
+            if names is None:
+                raise ValueError("Menu {} doesn't exist yet, give its actions".format(key))
+            menu = QMenu(title, self.parent())
+            for name in names:
+                if name is None:
+                    menu.addSeparator()
+                else:
+                    menu.addAction(self.actions[name])
+            menu.aboutToShow.connect(self.refresh)
+            menu.installEventFilter(self)
+            self.menus[key] = menu
+            self.latencies[key] = deque(maxlen=LATENCY_SAMPLES)
+        return menu
+
+    def popup(self, key: str, names: list, global_pos) -> QMenu:
+        """
+        Shows the menu called key (see menu()) at global_pos as a context menu, for
+        the context of right now.
+        """
+        self._opening[key] = time.perf_counter()
+        self.invalidate()
+        menu = self.menu(key, names)
+        menu.popup(global_pos)
+        return menu
+
+    def invalidate(self) -> None:
+        """
+        The context changed: recompute enabled states before they are next seen.
+        """
+        self._stale = True
+        if self._on_toolbars & set(self.predicates):
+            # Restarting the timer waits for the selection to settle
+            self._timer.start()
+
+    def refresh(self) -> None:
+        """
+        Runs the enabled predicates if the context changed since they last ran.
+        """
+        if not self._stale:
+            return
+        self._timer.stop()
+        self._stale = False
+        self.context = context = self.context_provider()
+        for name, predicate in self.predicates.items():
+            self.actions[name].setEnabled(bool(predicate(context)))
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() == QEvent.Show:
+            for key, menu in self.menus.items():
+                if menu is watched and key in self._opening:
+                    start = self._opening.pop(key)
+                    end = time.perf_counter()
+                    self.latencies[key].append((end - start) * 1000)
+                    if profiler.enabled:
+                        profiler.record("menu {}".format(key), start, end)
+        return False
+
+    def latency(self, key: str) -> tuple:
+        """
+        (median, max) milliseconds between popup() and the menu called key showing,
+        over its last LATENCY_SAMPLES openings. None before it was opened.
+        """
+        samples = sorted(self.latencies.get(key, ()))
+        if not samples:
+            return None
+        return samples[len(samples) // 2], samples[-1]
@@ -0,0 +1,140 @@
+"""
+Coalesces high-frequency updates into one widget update per frame.
+
+tutorial/app2.py connects textChanged straight to label.setText. That is right for
+typing, but a background job that emits thousands of progress or row-count signals per
+second then makes the label relayout and repaint thousands of times, and the event loop
+spends its time painting text nobody can read.
+
+An UpdateBatcher sits between such signals and the widgets. Updates are posted under a
+key, only the newest update of a key is kept, and all pending updates are applied together
+once per frame from a QTimer:
+
+    batcher = UpdateBatcher(parent=self)
+    batcher.add_widget(self.label)
+    job.progress.connect(batcher.slot("label", self.label.setText))
+
+Updates that must not be dropped (rows to append, log lines) are collected with
+append() instead and handed over as one list.
+
+While a flush runs, the registered widgets have updates disabled (one repaint at the end
+instead of one per change) and optionally their signals blocked, see bulk_update().
+"""
+
+import time
+from contextlib import contextmanager
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from analytics.gui.profiler import instrumented
+
+# One flush per 60 Hz frame at most
+FRAME_MS = 16
+
+
+@contextmanager
+def bulk_update(widgets, block_signals: bool = False):
+    """
+    Makes many changes to widgets look like one: painting is suspended until the block
+    ends, and with block_signals their own signals (e.g. a setText echoing back as
+    textChanged) aren't emitted in between.
+    """
+    widgets = [w for w in widgets if w.updatesEnabled()]
+    blocked = [w.blockSignals(True) for w in widgets] if block_signals else None
+    for w in widgets:
+        w.setUpdatesEnabled(False)
+    try:
+        yield
+    finally:
+        for i, w in enumerate(widgets):
+            if block_signals:
+                w.blockSignals(blocked[i])
+            # Re-enabling schedules a single repaint of the widget
+            w.setUpdatesEnabled(True)
+
+
+@instrumented
+class UpdateBatcher(QObject):
+    """
+    Collects updates and applies them at most once per interval milliseconds.
+    """
+
+    flushed = pyqtSignal(int)  # number of updates applied
+
+    def __init__(self, interval: int = FRAME_MS, parent=None) -> None:
+        super().__init__(parent)
+        self.interval = interval
+        self.posted = 0
+        self.applied = 0
+        self._widgets = []
+        self._block_signals = False
+        self._pending = {}  # key -> (fn, args), in the order keys were first posted
+        self._appended = {}  # key -> (fn, list of items)
+        self._last_flush = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    def add_widget(self, widget, block_signals: bool = False) -> None:
+        """
+        Widget that flushes touch. Its painting is suspended while a flush runs.
+        """
+        self._widgets.append(widget)
+        self._block_signals = self._block_signals or block_signals
+
+    def post(self, key, fn, *args) -> None:
+        """
+        Schedules fn(*args). A newer post with the same key replaces it.
+        """
+        self.posted += 1
+        self._pending[key] = (fn, args)
+        self._schedule()
+
+    def append(self, key, fn, item) -> None:
+        """
+        Collects item, fn gets every item collected under key since the last flush.
+        """
+        self.posted += 1
+        entry = self._appended.get(key)
+        if entry is None:
+            self._appended[key] = (fn, [item])
+        else:
+            entry[1].append(item)
+        self._schedule()
+
+    def slot(self, key, fn):
+        """
+        A callable to connect a signal to, it posts fn with the signal's arguments.
+        """
+        return lambda *args: self.post(key, fn, *args)
+
+    def _schedule(self) -> None:
+        if self._timer.isActive():
+            return
+        # The first update after a quiet period goes out on the next loop iteration,
+        # later ones wait for the rest of the frame
+        since = (time.monotonic() - self._last_flush) * 1000
+        self._timer.start(max(0, int(self.interval - since)))
+
+    def pending(self) -> int:
+        return len(self._pending) + len(self._appended)
+
+    def flush(self) -> None:
+        """
+        Applies every pending update now.
+        """
+        self._timer.stop()
+        self._last_flush = time.monotonic()
+        if not self._pending and not self._appended:
+            return
+        pending, self._pending = self._pending, {}
+        appended, self._appended = self._appended, {}
+
+        with bulk_update(self._widgets, self._block_signals):
+            for fn, args in pending.values():
+                fn(*args)
+            for fn, items in appended.values():
+                fn(items)
+        count = len(pending) + len(appended)
+        self.applied += count
+        self.flushed.emit(count)
@@ -0,0 +1,378 @@
+"""
+Charts of Age and Fare, coloured by survival, drawn with QPainter.
+
+ChartWidget never looks at rows. Each frame asks the level-of-detail structures in
+analytics.charts for the current view at the current widget size and draws the answer:
+a few dozen bars, one vertical min/max segment per pixel column, or one small image
+with a dot per couple of pixels. Panning and zooming a chart of 10M passengers costs the same as one of 891.
+
+    drag            pan
+    wheel           zoom around the cursor (histograms and the line zoom horizontally)
+    double click    back to the full range
+"""
+
+import time
+
+import numpy as np
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QRectF, QLineF, QPointF
+from PyQt5.QtGui import QPainter, QColor, QImage, QPen
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QLabel, QSizePolicy
+
+from analytics.charts import ChartData, nice_ticks
+from analytics.gui.profiler import instrumented
+
+# (label, kind)
+CHARTS = [
+    ("Age histogram", "age"),
+    ("Fare histogram", "fare"),
+    ("Age vs Fare", "scatter"),
+    ("Fare in file order", "line"),
+]
+AXIS_LABELS = {
+    "age": ("Age", "Passengers"),
+    "fare": ("Fare", "Passengers"),
+    "scatter": ("Age", "Fare"),
+    "line": ("Row", "Fare"),
+}
+
+DIED = QColor(214, 39, 40)
+SURVIVED = QColor(31, 119, 180)
+NEUTRAL = QColor(90, 90, 90)
+MIN_BAR_PX = 6
+MAX_BARS = 80
+# Scatter plots are rendered at 1/DOT_PX resolution, which quarters the per-frame work
+# at no visible cost. Sparse ones use bigger dots so single passengers stay visible.
+DOT_PX = 2
+SPARSE_POINTS = 100_000
+SPARSE_DOT_PX = 3
+ZOOM_STEP = 0.8
+_MARGINS = (64, 12, 12, 36)  # left, top, right, bottom
+
+
+def chart_query(rows) -> tuple:
+    return ("charts", rows)
+
+
+def compute_charts(results, dataset, rows, progress):
+    """
+    Chart task, builds the level-of-detail data and stores it in the cache.
+    """
+    data = ChartData(dataset, rows, progress)
+    results.put(dataset, chart_query(rows), data)
+    return data
+
+
+def class_colors(n_classes: int) -> list:
+    return [DIED, SURVIVED] if n_classes == 2 else [NEUTRAL]
+
+
+def _palette(n_classes: int) -> np.ndarray:
+    """
+    RGB of survival rates 0/255 .. 255/255 packed the way Format_RGBA8888 stores them
+    in memory (little endian words), alpha left at 0.
+    """
+    colors = class_colors(n_classes)
+    low = np.array(colors[0].getRgb()[:3], dtype=np.float32)
+    high = np.array(colors[-1].getRgb()[:3], dtype=np.float32)
+    rgb = (low + (high - low) * np.linspace(0, 1, 256, dtype=np.float32)[:, None]).astype(np.uint32)
+    return rgb[:, 0] | (rgb[:, 1] << 8) | (rgb[:, 2] << 16)
+
+
+@instrumented
+class ChartWidget(QWidget):
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setMinimumSize(320, 240)
+        self.data = None
+        self.kind = "age"
+        self.views = {}  # kind -> [x0, x1, y0, y1]
+        self._frame = None
+        self._frame_key = None
+        self._drag = None
+        # How long preparing the last frame took, in seconds
+        self.prepare_time = 0.0
+
+    def set_data(self, data) -> None:
+        self.data = data
+        self.views = {}
+        self._frame_key = None
+        self.update()
+
+    def set_kind(self, kind: str) -> None:
+        self.kind = kind
+        self._frame_key = None
+        self.update()
+
+    # Views
+
+    def full_view(self, kind: str) -> list:
+        data = self.data
+        if kind in ("age", "fare"):
+            hist = data.age if kind == "age" else data.fare
+            return [hist.lo, hist.hi, 0.0, 1.0]
+        if kind == "scatter":
+            grid = data.age_fare
+            return [grid.x_lo, grid.x_hi, grid.y_lo, grid.y_hi]
+        line = data.fare_line
+        return [0.0, float(max(line.length, 1)), line.lo, line.hi]
+
+    @property
+    def view(self) -> list:
+        if self.kind not in self.views:
+            self.views[self.kind] = self.full_view(self.kind)
+        return self.views[self.kind]
+
+    def reset_view(self) -> None:
+        self.views.pop(self.kind, None)
+        self.update()
+
+    def plot_rect(self) -> QRectF:
+        left, top, right, bottom = _MARGINS
+        return QRectF(left, top, max(self.width() - left - right, 1), max(self.height() - top - bottom, 1))
+
+    def zoom(self, factor: float, anchor: QPointF = None) -> None:
+        """
+        Zooms by factor (< 1 zooms in) keeping the data point under anchor in place.
+        """
+        if self.data is None:
+            return
+        rect = self.plot_rect()
+        anchor = anchor or rect.center()
+        x0, x1, y0, y1 = self.view
+        fx = (anchor.x() - rect.left()) / rect.width()
+        ax = x0 + fx * (x1 - x0)
+        view = [ax - fx * (x1 - x0) * factor, ax + (1 - fx) * (x1 - x0) * factor, y0, y1]
+        if self.kind == "scatter":
+            fy = (rect.bottom() - anchor.y()) / rect.height()
+            ay = y0 + fy * (y1 - y0)
+            view[2:] = [ay - fy * (y1 - y0) * factor, ay + (1 - fy) * (y1 - y0) * factor]
+        self.views[self.kind] = view
+        self.update()
+
+    def pan(self, dx_px: float, dy_px: float) -> None:
+        if self.data is None:
+            return
+        rect = self.plot_rect()
+        x0, x1, y0, y1 = self.view
+        dx = dx_px * (x1 - x0) / rect.width()
+        view = [x0 - dx, x1 - dx, y0, y1]
+        if self.kind == "scatter":
+            dy = dy_px * (y1 - y0) / rect.height()
+            view[2:] = [y0 + dy, y1 + dy]
+        self.views[self.kind] = view
+        self.update()
+
+    # Frames
+
+    def _prepare(self):
+        """
+        Asks the level-of-detail data for the current view. Called only when the view,
+        the chart or the size changed.
+        """
+        rect = self.plot_rect()
+        width, height = int(rect.width()), int(rect.height())
+        x0, x1, y0, y1 = self.view
+        data = self.data
+
+        if self.kind in ("age", "fare"):
+            hist = data.age if self.kind == "age" else data.fare
+            edges, counts = hist.view(x0, x1, max(min(width // MIN_BAR_PX, MAX_BARS), 1))
+            top = float(counts.sum(axis=0).max()) * 1.1 if counts.size else 1.0
+            return {"edges": edges, "counts": counts, "y": (0.0, max(top, 1.0))}
+
+        if self.kind == "line":
+            rows, mins, maxs = data.fare_line.view(x0, x1, width)
+            finite = np.isfinite(mins)
+            if finite.any():
+                lo, hi = float(mins[finite].min()), float(maxs[finite].max())
+                pad = (hi - lo) * 0.05 or 0.5
+                y = (lo - pad, hi + pad)
+            else:
+                y = (y0, y1)
+            return {"rows": rows, "mins": mins, "maxs": maxs, "y": y}
+
+        grid = data.age_fare
+        dot = SPARSE_DOT_PX if grid.points < SPARSE_POINTS else DOT_PX
+        counts = grid.view(x0, x1, y0, y1, width // dot, height // dot)
+        return {"image": self._density_image(counts), "y": (y0, y1)}
+
+    @staticmethod
+    def _density_image(counts: np.ndarray) -> QImage:
+        """
+        Colours every pixel by its survival rate, opacity by log density.
+        """
+        total = counts.sum(axis=0, dtype=np.float32)
+        height, width = total.shape
+        alpha = np.log1p(total)
+        alpha *= 145 / (alpha.max() or 1.0)
+        alpha += 110
+        alpha[total == 0] = 0
+
+        # Pixels are RGBA8888 words, the colour comes from a 256 entry palette
+        palette = _palette(counts.shape[0])
+        if counts.shape[0] == 2:
+            share = counts[1] * np.float32(255)
+            share /= np.maximum(total, 1)
+            pixels = palette[share.astype(np.uint8)]
+        else:
+            pixels = np.full(total.shape, palette[0], dtype=np.uint32)
+        pixels |= alpha.astype(np.uint32) << 24
+        # Row 0 is the bottom of the view, images start at the top
+        rgba = np.empty((height, width), dtype=np.uint32)
+        rgba[::-1] = pixels
+        image = QImage(rgba.data, width, height, width * 4, QImage.Format_RGBA8888)
+        # QImage doesn't own the buffer, keep it alive as long as the image
+        image.buffer = rgba
+        return image
+
+    def frame(self):
+        key = (self.kind, tuple(self.view), self.width(), self.height())
+        if key != self._frame_key:
+            start = time.perf_counter()
+            self._frame = self._prepare()
+            self.prepare_time = time.perf_counter() - start
+            self._frame_key = key
+        return self._frame
+
+    # Painting
+
+    def paintEvent(self, event) -> None:
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        if self.data is None:
+            painter.drawText(self.rect(), Qt.AlignCenter, "No data")
+            return
+
+        frame = self.frame()
+        rect = self.plot_rect()
+        x0, x1 = self.view[:2]
+        y0, y1 = frame["y"]
+
+        def sx(x):
+            return rect.left() + (x - x0) / (x1 - x0) * rect.width()
+
+        def sy(y):
+            return rect.bottom() - (y - y0) / (y1 - y0) * rect.height()
+
+        painter.save()
+        painter.setClipRect(rect)
+        if "image" in frame:
+            # Scaled up without smoothing when sparse plots use bigger dots
+            painter.drawImage(rect, frame["image"])
+        elif "edges" in frame:
+            edges, counts = frame["edges"], frame["counts"]
+            left, right = sx(edges[:-1]), sx(edges[1:])
+            painter.setPen(Qt.NoPen)
+            base = np.zeros(counts.shape[1])
+            for color, row in zip(class_colors(len(counts)), counts):
+                painter.setBrush(color)
+                top, bottom = sy(base + row), sy(base)
+                for i in np.flatnonzero(row):
+                    painter.drawRect(QRectF(left[i], top[i], max(right[i] - left[i] - 1, 1), bottom[i] - top[i]))
+                base = base + row
+        else:
+            painter.setPen(QPen(NEUTRAL, 1))
+            xs = sx(frame["rows"].astype(np.float64))
+            lows, highs = sy(frame["mins"]), sy(frame["maxs"])
+            finite = np.isfinite(lows)
+            painter.drawLines([
+                QLineF(x, lo, x, min(hi, lo - 1)) for x, lo, hi in zip(xs[finite], lows[finite], highs[finite])
+            ])
+        painter.restore()
+        self._paint_axes(painter, rect, (x0, x1), (y0, y1), sx, sy)
+
+    def _paint_axes(self, painter, rect, x_range, y_range, sx, sy) -> None:
+        painter.setPen(QPen(Qt.black, 1))
+        painter.drawLine(rect.bottomLeft(), rect.bottomRight())
+        painter.drawLine(rect.bottomLeft(), rect.topLeft())
+        metrics = painter.fontMetrics()
+        for tick in nice_ticks(*x_range, count=max(int(rect.width() // 80), 2)):
+            x = sx(tick)
+            painter.drawLine(QLineF(x, rect.bottom(), x, rect.bottom() + 4))
+            text = "{:g}".format(tick)
+            painter.drawText(QPointF(x - metrics.width(text) / 2, rect.bottom() + 6 + metrics.ascent()), text)
+        for tick in nice_ticks(*y_range, count=max(int(rect.height() // 50), 2)):
+            y = sy(tick)
+            painter.drawLine(QLineF(rect.left() - 4, y, rect.left(), y))
+            text = "{:g}".format(tick)
+            painter.drawText(QPointF(rect.left() - 6 - metrics.width(text), y + metrics.ascent() / 2), text)
+
+        x_label, y_label = AXIS_LABELS[self.kind]
+        painter.drawText(QPointF(rect.right() - metrics.width(x_label), self.height() - 4), x_label)
+        painter.drawText(QPointF(4, metrics.ascent()), y_label)
+
+    # Mouse
+
+    def mousePressEvent(self, event) -> None:
+        if event.button() == Qt.LeftButton:
+            self._drag = event.pos()
+
+    def mouseMoveEvent(self, event) -> None:
+        if self._drag is not None:
+            delta = event.pos() - self._drag
+            self._drag = event.pos()
+            self.pan(delta.x(), delta.y())
+
+    def mouseReleaseEvent(self, event) -> None:
+        self._drag = None
+
+    def mouseDoubleClickEvent(self, event) -> None:
+        self.reset_view()
+
+    def wheelEvent(self, event) -> None:
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.zoom(ZOOM_STEP ** steps, QPointF(event.pos()))
+
+
+@instrumented
+class ChartPage(QWidget):
+
+    def __init__(self, main_window, parent=None) -> None:
+        super().__init__(parent)
+        self.main_window = main_window
+        self.shown_query = None
+
+        self.picker = QComboBox()
+        for label, kind in CHARTS:
+            self.picker.addItem(label, kind)
+        self.info = QLabel()
+        self.chart = ChartWidget()
+        self.picker.currentIndexChanged.connect(lambda i: self.chart.set_kind(self.picker.itemData(i)))
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.picker)
+        controls.addWidget(self.info, 1)
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.chart)
+        self.setLayout(layout)
+
+    def on_page_activated(self) -> None:
+        window = self.main_window
+        if window.dataset is None:
+            return
+        rows = window.rows
+        if self.shown_query is not None and self.shown_query[0] is window.dataset \
+                and self.shown_query[1] is rows:
+            return
+
+        cached = window.results.get(window.dataset, chart_query(rows))
+        if cached is not None:
+            self.show_data(cached, window.dataset, rows)
+            return
+        dataset = window.dataset
+        window.tasks.submit(
+            "Charting", compute_charts, window.results, dataset, rows,
+            on_result=lambda data: self.show_data(data, dataset, rows),
+        )
+
+    def show_data(self, data, dataset, rows) -> None:
+        if sip.isdeleted(self):
+            return
+        self.shown_query = (dataset, rows)
+        self.info.setText("{:,} passengers, {:,} with Age and Fare".format(data.rows, data.age_fare.points))
+        self.chart.set_data(data)
@@ -0,0 +1,105 @@
+"""
+Distribution page: count, missing values and quantiles of Age or Fare, overall and per
+class, sex and port.
+
+Without a search filter, and with facet filters on class, sex and port only, the table
+comes straight from the quantile sketches built at load time (analytics.sketches), which
+takes well under a millisecond at any row count, so it is computed on the GUI thread.
+Any other filtered view is computed exactly on a task and kept in the window's
+ResultCache like the summary pages.
+"""
+
+from PyQt5 import sip
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QTableView, QHeaderView
+
+from analytics.sketches import describe, PARTITION_KEYS, SKETCH_COLUMNS, K
+from analytics.gui.profiler import instrumented
+from analytics.gui.summary_page import GroupResultModel
+
+
+def distribution_query(column: str, rows) -> tuple:
+    return ("distribution", column, rows)
+
+
+def sketch_selection(window):
+    """
+    The facet selection the window's rows come from when the sketches can answer for
+    them (no search, only PARTITION_KEYS facets), else None.
+    """
+    if "sketches" not in window.dataset.extras or window.search_result is not None \
+            or window.search_box.text():
+        return None
+    selection = window.facet_panel.selection()
+    if not set(selection) <= set(PARTITION_KEYS):
+        return None
+    return selection
+
+
+def compute_distribution(results, dataset, column: str, rows, progress):
+    result = describe(dataset, column, rows)
+    results.put(dataset, distribution_query(column, rows), result)
+    return result
+
+
+@instrumented
+class DistributionPage(QWidget):
+
+    def __init__(self, main_window, parent=None) -> None:
+        super().__init__(parent)
+        self.main_window = main_window
+        self.shown_query = None
+
+        self.column = QComboBox()
+        self.column.addItems(SKETCH_COLUMNS)
+        self.column.currentIndexChanged.connect(self.on_page_activated)
+        self.info = QLabel()
+
+        self.model = GroupResultModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.column)
+        controls.addWidget(self.info, 1)
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+    def on_page_activated(self) -> None:
+        window = self.main_window
+        if window.dataset is None:
+            return
+        dataset = window.dataset
+        column = self.column.currentText()
+        rows = window.rows
+        if self.shown_query is not None and self.shown_query[0] is dataset \
+                and self.shown_query[1] == column and self.shown_query[2] is rows:
+            return
+
+        where = sketch_selection(window)
+        if where is not None:
+            self.show_result(describe(dataset, column, rows, where=where), dataset, column, rows, sketched=True)
+            return
+        query = distribution_query(column, rows)
+        cached = window.results.get(dataset, query)
+        if cached is not None:
+            self.show_result(cached, dataset, column, rows)
+            return
+        window.tasks.submit(
+            "Distributions", compute_distribution, window.results, dataset, column, rows,
+            on_result=lambda result: self.show_result(result, dataset, column, rows),
+        )
+
+    def show_result(self, result, dataset, column: str, rows, sketched: bool = False) -> None:
+        # The page may have been unloaded while its task ran
+        if sip.isdeleted(self):
+            return
+        self.shown_query = (dataset, column, rows)
+        self.model.set_result(result)
+        if sketched:
+            # 3N/K ranks, see the accuracy notes in analytics/sketches.py
+            self.info.setText("Quantiles from sketches, within {:.2%} in rank".format(3 / K))
+        else:
+            self.info.setText("Exact, over {:,} rows".format(len(dataset) if rows is None else len(rows)))
@@ -0,0 +1,277 @@
+"""
+Facet filter panel: the widgets of tutorial/app4.py as filters on the loaded dataset.
+
+    Class, Port          QCheckBox per value, any checked value passes
+    Sex, Survived        QComboBox, "Any" or one value
+    Siblings/spouses     QSpinBox, at least this many
+    Parents/children     QSlider, at most this many
+
+Every widget turns its state into the list of allowed values of its column (None when it
+lets everything through) and the panel emits the combined selection, which the window
+hands to analytics.facets.facet_filter. The facet counts that come back are shown next
+to every value: how many rows it would have given the other widgets' filters.
+
+Like the rest of the GUI modules this one doesn't import NumPy, the counts it receives
+are only indexed.
+"""
+
+from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtWidgets import (
+    QWidget, QGroupBox, QVBoxLayout, QHBoxLayout, QCheckBox, QComboBox, QSpinBox, QSlider, QLabel,
+    QPushButton,
+)
+
+from analytics.gui.batching import bulk_update
+from analytics.gui.profiler import instrumented
+
+VALUE_LABELS = {
+    "Pclass": {1: "1st", 2: "2nd", 3: "3rd"},
+    "Embarked": {"C": "Cherbourg", "Q": "Queenstown", "S": "Southampton"},
+    "Survived": {0: "No", 1: "Yes"},
+}
+
+
+def value_label(column: str, value) -> str:
+    if value is None:
+        return "(missing)"
+    return VALUE_LABELS.get(column, {}).get(value, str(value))
+
+
+@instrumented
+class _Facet(QGroupBox):
+    """
+    One column's filter widget. allowed() is None while it filters nothing.
+    """
+
+    changed = pyqtSignal()
+    # Whether select() can narrow the facet to a single value
+    selectable = False
+
+    def __init__(self, column: str, title: str, values: list, parent=None) -> None:
+        super().__init__(title, parent)
+        self.column = column
+        self.values = list(values)
+        self.setLayout(QVBoxLayout())
+
+    def allowed(self):
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        raise NotImplementedError
+
+    def select(self, value) -> None:
+        """
+        Lets only value through.
+        """
+        raise NotImplementedError
+
+    def set_counts(self, counts) -> None:
+        raise NotImplementedError
+
+
+@instrumented
+class CheckFacet(_Facet):
+    selectable = True
+
+    def __init__(self, column: str, title: str, values: list, parent=None) -> None:
+        super().__init__(column, title, values, parent)
+        self.boxes = []
+        for value in self.values:
+            box = QCheckBox(value_label(column, value))
+            box.setChecked(True)
+            box.toggled.connect(self.changed)
+            self.layout().addWidget(box)
+            self.boxes.append(box)
+
+    def allowed(self):
+        if all(box.isChecked() for box in self.boxes):
+            return None
+        return [value for value, box in zip(self.values, self.boxes) if box.isChecked()]
+
+    def reset(self) -> None:
+        for box in self.boxes:
+            box.setChecked(True)
+
+    def select(self, value) -> None:
+        # One changed signal, not one per box
+        self.blockSignals(True)
+        for other, box in zip(self.values, self.boxes):
+            box.setChecked(other == value)
+        self.blockSignals(False)
+        self.changed.emit()
+
+    def set_counts(self, counts) -> None:
+        for value, box, count in zip(self.values, self.boxes, counts):
+            box.setText("{} ({:,})".format(value_label(self.column, value), int(count)))
+
+
+@instrumented
+class ChoiceFacet(_Facet):
+    selectable = True
+
+    def __init__(self, column: str, title: str, values: list, parent=None) -> None:
+        super().__init__(column, title, values, parent)
+        self.combo = QComboBox()
+        self.combo.addItems(["Any"] + [value_label(column, value) for value in self.values])
+        self.combo.currentIndexChanged.connect(self.changed)
+        self.layout().addWidget(self.combo)
+
+    def allowed(self):
+        index = self.combo.currentIndex()
+        return None if index <= 0 else [self.values[index - 1]]
+
+    def reset(self) -> None:
+        self.combo.setCurrentIndex(0)
+
+    def select(self, value) -> None:
+        self.combo.setCurrentIndex(self.values.index(value) + 1)
+
+    def set_counts(self, counts) -> None:
+        counts = [int(c) for c in counts]
+        self.combo.setItemText(0, "Any ({:,})".format(sum(counts)))
+        for i, (value, count) in enumerate(zip(self.values, counts)):
+            self.combo.setItemText(i + 1, "{} ({:,})".format(value_label(self.column, value), count))
+
+
+@instrumented
+class MinFacet(_Facet):
+    """
+    Values of at least the spin box value.
+    """
+
+    def __init__(self, column: str, title: str, values: list, parent=None) -> None:
+        super().__init__(column, title, values, parent)
+        self.spin = QSpinBox()
+        self.spin.setRange(min(self.values), max(self.values))
+        self.spin.valueChanged.connect(self.changed)
+        self.label = QLabel()
+        row = QHBoxLayout()
+        row.addWidget(self.spin)
+        row.addWidget(self.label, 1)
+        self.layout().addLayout(row)
+
+    def allowed(self):
+        if self.spin.value() <= self.spin.minimum():
+            return None
+        return [value for value in self.values if value >= self.spin.value()]
+
+    def reset(self) -> None:
+        self.spin.setValue(self.spin.minimum())
+
+    def set_counts(self, counts) -> None:
+        matching = sum(int(c) for value, c in zip(self.values, counts) if value >= self.spin.value())
+        self.label.setText("{:,} rows".format(matching))
+
+
+@instrumented
+class MaxFacet(_Facet):
+    """
+    Values of at most the slider value.
+    """
+
+    def __init__(self, column: str, title: str, values: list, parent=None) -> None:
+        super().__init__(column, title, values, parent)
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setRange(min(self.values), max(self.values))
+        self.slider.setValue(self.slider.maximum())
+        self.slider.valueChanged.connect(self.changed)
+        self.label = QLabel()
+        self.layout().addWidget(self.slider)
+        self.layout().addWidget(self.label)
+
+    def allowed(self):
+        if self.slider.value() >= self.slider.maximum():
+            return None
+        return [value for value in self.values if value <= self.slider.value()]
+
+    def reset(self) -> None:
+        self.slider.setValue(self.slider.maximum())
+
+    def set_counts(self, counts) -> None:
+        matching = sum(int(c) for value, c in zip(self.values, counts) if value <= self.slider.value())
+        self.label.setText("<= {}: {:,} rows".format(self.slider.value(), matching))
+
+
+# (column, title, widget), in panel order. Columns the dataset has no facet for are skipped.
+FACETS = [
+    ("Pclass", "Class", CheckFacet),
+    ("Sex", "Sex", ChoiceFacet),
+    ("Embarked", "Port", CheckFacet),
+    ("SibSp", "Siblings/spouses at least", MinFacet),
+    ("Parch", "Parents/children at most", MaxFacet),
+    ("Survived", "Survived", ChoiceFacet),
+]
+
+
+@instrumented
+class FacetPanel(QWidget):
+
+    selection_changed = pyqtSignal(dict)
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.facets = []
+        self.clear_button = QPushButton("Clear filters")
+        self.clear_button.clicked.connect(self.reset)
+
+        self.facet_layout = QVBoxLayout()
+        layout = QVBoxLayout()
+        layout.addLayout(self.facet_layout)
+        layout.addWidget(self.clear_button)
+        layout.addStretch(1)
+        self.setLayout(layout)
+
+    def set_facets(self, values: dict) -> None:
+        """
+        Rebuilds the widgets for a dataset's facet values (BitmapIndex.values).
+        """
+        for facet in self.facets:
+            self.facet_layout.removeWidget(facet)
+            facet.deleteLater()
+        self.facets = []
+        for column, title, facet_type in FACETS:
+            if values.get(column):
+                facet = facet_type(column, title, values[column])
+                facet.changed.connect(self.on_changed)
+                self.facet_layout.addWidget(facet)
+                self.facets.append(facet)
+
+    def selection(self) -> dict:
+        selection = {}
+        for facet in self.facets:
+            allowed = facet.allowed()
+            if allowed is not None:
+                selection[facet.column] = allowed
+        return selection
+
+    def facet_for(self, column: str, value):
+        """
+        The facet that can be narrowed to value of column (see select()), or None.
+        """
+        for facet in self.facets:
+            if facet.column == column and facet.selectable and value in facet.values:
+                return facet
+        return None
+
+    def select(self, column: str, value) -> None:
+        """
+        Narrows the facet of column to value, the other facets stay as they are.
+        """
+        self.facet_for(column, value).select(value)
+
+    def reset(self) -> None:
+        for facet in self.facets:
+            facet.blockSignals(True)
+            facet.reset()
+            facet.blockSignals(False)
+        self.on_changed()
+
+    def set_counts(self, counts: dict) -> None:
+        # One repaint for all the labels
+        with bulk_update([self]):
+            for facet in self.facets:
+                if facet.column in counts:
+                    facet.set_counts(counts[facet.column])
+
+    def on_changed(self) -> None:
+        self.selection_changed.emit(self.selection())
@@ -0,0 +1,181 @@
+"""
+Tab and stack pages that are only built when they are first shown.
+
+MainWindowTW and TabbedWindow in tutorial/app5.py build every page in the constructor.
+With real pages (tables, charts, models) that means paying for pages the user may never
+open before the window even appears. Here each page starts as an empty LazyPage holding a
+factory, and the real widget is created the first time the page becomes current.
+
+If the real widget has an on_page_activated() method it is called every time the page is
+shown, which is where pages load (or refresh) their data.
+
+Built pages can be unloaded again: set max_loaded to keep only the most recently used
+pages alive, or rss_budget to unload idle pages while the process uses more memory than
+that. An unloaded page is simply rebuilt the next time it is shown.
+"""
+
+import os
+import time
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTabWidget, QStackedLayout
+
+from analytics.gui.profiler import instrumented
+
+MEMORY_CHECK_MS = 5000
+
+
+def current_rss() -> int:
+    """
+    Resident memory of this process in bytes, or 0 where that can't be read cheaply.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+@instrumented
+class LazyPage(QWidget):
+    """
+    Placeholder that builds its real widget with factory() on demand.
+    """
+
+    def __init__(self, factory, parent=None) -> None:
+        super().__init__(parent)
+        self.factory = factory
+        self.widget = None
+        self.last_shown = 0.0
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+    @property
+    def built(self) -> bool:
+        return self.widget is not None
+
+    def activate(self) -> None:
+        self.last_shown = time.monotonic()
+        if self.widget is None:
+            self.widget = self.factory()
+            self.layout().addWidget(self.widget)
+        if hasattr(self.widget, "on_page_activated"):
+            self.widget.on_page_activated()
+
+    def unload(self) -> None:
+        if self.widget is None:
+            return
+        self.layout().removeWidget(self.widget)
+        self.widget.deleteLater()
+        self.widget = None
+
+
+@instrumented
+class _LazyPages:
+    """
+    Bookkeeping shared by LazyTabWidget and LazyStackedLayout. The host calls
+    _page_changed() whenever its current page changes.
+    """
+
+    def _init_lazy(self, max_loaded, rss_budget) -> None:
+        self.max_loaded = max_loaded
+        self.rss_budget = rss_budget
+        self.lazy_pages = []
+        if rss_budget:
+            self._memory_timer = QTimer()
+            self._memory_timer.timeout.connect(self.check_memory)
+            self._memory_timer.start(MEMORY_CHECK_MS)
+
+    def _page_changed(self, index: int) -> None:
+        page = self._page_at(index)
+        if page is None:
+            return
+        page.activate()
+        if self.max_loaded:
+            built = [p for p in self.lazy_pages if p.built]
+            for idle in sorted(built, key=lambda p: p.last_shown)[:max(0, len(built) - self.max_loaded)]:
+                idle.unload()
+
+    def _current_page(self):
+        raise NotImplementedError
+
+    def _page_at(self, index: int):
+        raise NotImplementedError
+
+    def refresh_current(self) -> None:
+        """
+        Calls on_page_activated() of the current page again, e.g. after new data loaded.
+        """
+        page = self._current_page()
+        if page is not None:
+            page.activate()
+
+    def unload_idle(self, keep: int = 0) -> int:
+        """
+        Unloads every built page except the current one and the `keep` most recently used.
+        Returns the number of pages unloaded.
+        """
+        current = self._current_page()
+        idle = [p for p in self.lazy_pages if p.built and p is not current]
+        idle.sort(key=lambda p: p.last_shown, reverse=True)
+        for page in idle[keep:]:
+            page.unload()
+        return len(idle[keep:])
+
+    def check_memory(self) -> None:
+        rss = current_rss()
+        if self.rss_budget and rss > self.rss_budget:
+            self.unload_idle()
+
+
+@instrumented
+class LazyTabWidget(QTabWidget, _LazyPages):
+
+    def __init__(self, max_loaded: int = None, rss_budget: int = None, parent=None) -> None:
+        QTabWidget.__init__(self, parent)
+        self._init_lazy(max_loaded, rss_budget)
+        self.currentChanged.connect(self._page_changed)
+
+    def add_lazy_tab(self, factory, label: str) -> int:
+        page = LazyPage(factory)
+        self.lazy_pages.append(page)
+        index = self.addTab(page, label)
+        # Depending on the Qt version the first page can become current without a
+        # currentChanged we see, make sure it gets built
+        if self.currentIndex() == index and not page.built:
+            page.activate()
+        return index
+
+    def _current_page(self):
+        return self._page_at(self.currentIndex())
+
+    def _page_at(self, index: int):
+        page = self.widget(index)
+        return page if isinstance(page, LazyPage) else None
+
+
+@instrumented
+class LazyStackedLayout(QStackedLayout, _LazyPages):
+
+    def __init__(self, max_loaded: int = None, rss_budget: int = None, parent=None) -> None:
+        QStackedLayout.__init__(self, parent)
+        self._init_lazy(max_loaded, rss_budget)
+        self.currentChanged.connect(self._page_changed)
+
+    def add_lazy_widget(self, factory) -> int:
+        page = LazyPage(factory)
+        self.lazy_pages.append(page)
+        index = self.addWidget(page)
+        if self.currentIndex() == index and not page.built:
+            page.activate()
+        return index
+
+    def _current_page(self):
+        return self._page_at(self.currentIndex())
+
+    def _page_at(self, index: int):
+        page = self.widget(index)
+        return page if isinstance(page, LazyPage) else None
@@ -0,0 +1,680 @@
+"""
+The analytics main window: the passenger table with a search box, a dock of facet
+filters, a File menu and a status bar that shows the progress of whatever is running in
+the background.
+
+The rows every view shows (window.rows, None for all) are the search result narrowed by
+the facet filters. Both are applied on the task pool, facet filters through the bitmap
+index built at load time (see analytics/facets.py). Clicking a column header sorts the
+table: the filtered rows are mapped through a permutation the SortEngine computes once
+per sort key and keeps (see analytics/sorting.py), also on the pool.
+
+File > Follow file keeps up with rows appended to the open CSV. Every change on disk (and
+a poll every FOLLOW_INTERVAL_MS, for filesystems that don't report changes) runs a
+TailFollower poll on the pool, which parses only the new bytes and extends the dataset
+and its indexes (see analytics/tail.py). The table gets the new rows inserted, summary
+pages show running aggregates and the facet counts come with the update, so nothing is
+recomputed over the whole file unless a filter is active. A file that was replaced
+rather than appended to is loaded again.
+
+File > Export rows writes the rows the table shows, filtered and in its sort order, to
+CSV, JSON Lines or a column store; Export predictions writes the last trained model's
+predictions for them in the gender_submission.csv layout. Both run on the pool, formatting
+whole blocks of the column buffers with NumPy (see analytics/export.py).
+
+Right-clicking a cell opens the table's context menu: filter by the cell's value (through
+its facet), sort, group by the column in a new summary tab, copy the selected rows. Its
+actions, the File menu's and the toolbar's come from one ActionRegistry (see
+analytics/gui/actions.py) that builds them and the menus once.
+
+Start it with the app entry point (see analytics/app.py):
+
+    python -m analytics data/train.csv
+
+This module only imports Qt and the light GUI modules. NumPy and everything built on it
+(loader, search, aggregation, cache, summary, distribution, chart, model and submission
+pages) is imported the first time it is needed, which is after the window has painted,
+so importing them never delays the first frame.
+
+With slot profiling on (--profile-slots, see analytics/gui/profiler.py) every GUI class
+is timed and a "Slot timings" dock shows the slowest slots and event handlers.
+"""
+
+import os
+
+from PyQt5.QtWidgets import QMainWindow, QApplication, QFileDialog, QStatusBar, QMessageBox, QToolBar, QDockWidget
+from PyQt5.QtCore import Qt, QFileSystemWatcher, QPersistentModelIndex, QTimer, pyqtSignal
+from PyQt5.QtGui import QKeySequence
+
+from analytics.reports import SUMMARY_PAGES
+from analytics.schema import NUMERIC, CATEGORICAL
+from analytics.startup import timeline
+from analytics.gui.actions import ActionRegistry, ActionContext, EMPTY_CONTEXT
+from analytics.gui.facet_panel import FacetPanel
+from analytics.gui.lazy_pages import LazyTabWidget
+from analytics.gui.profiler import instrumented, profiler, ProfilerPanel
+from analytics.gui.search_box import SearchBox
+from analytics.gui.table_model import PassengerTableModel, PassengerTableView
+from analytics.gui.tasks import TaskManager, TaskProgress
+
+
+def load_passengers(path: str, progress) -> tuple:
+    """
+    Load task: the dataset plus the indexes built from it once at load time.
+    """
+    # Deferred imports, see the module docstring. After the first load they're cached.
+    load_dataset = timeline.import_module("analytics.loader").load_dataset
+    SearchIndex = timeline.import_module("analytics.search").SearchIndex
+
+    with timeline.span("load {}".format(os.path.basename(path))):
+        # Files without an up to date sidecar are parsed on every core
+        dataset = load_dataset(path, progress=progress, workers=None)
+    with timeline.span("build search index"):
+        index = SearchIndex.build(dataset, progress=progress)
+    return dataset, index
+
+
+FOLLOW_INTERVAL_MS = 1000
+# Categorical columns with more categories than this have no "Group by" in the table menu
+MAX_GROUPS = 64
+# Rows "Copy rows" puts on the clipboard at most
+COPY_MAX_ROWS = 10_000
+# File > Export file types, matching analytics.export.FORMATS
+EXPORT_FILTERS = "CSV files (*.csv);;JSON Lines (*.jsonl);;Column stores (*.pcol)"
+
+
+def cell_value(col, row: int):
+    """
+    The value of one cell as it is stored: a number, a category or a string, None if missing.
+    """
+    if col.is_null(row):
+        return None
+    if col.kind == NUMERIC:
+        return col.values[row].item()
+    return col.format(row)
+
+
+def search_passengers(index, text: str, previous, progress):
+    return index.search(text, previous)
+
+
+def filter_facets(facets, selection: dict, search_rows, progress):
+    from analytics.facets import facet_filter
+    return facet_filter(facets, selection, search_rows)
+
+
+def sort_passengers(sorter, keys, rows, progress):
+    return sorter.sorted_rows(keys, rows)
+
+
+def poll_tail(follower, progress):
+    return follower.poll(progress)
+
+
+@instrumented
+class MainWindow(QMainWindow):
+
+    dataset_loaded = pyqtSignal(object)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.setWindowTitle("Passenger Analytics")
+        self.resize(1100, 700)
+
+        self.tasks = TaskManager(parent=self)
+        # Created with the first dataset, it needs NumPy
+        self.results = None
+        self.dataset = None
+        self.search_index = None
+        self.search_result = None
+        # Rows shown after search and facet filters, None for all
+        self.rows = None
+        # SortEngine of the current dataset, created with the first sort
+        self.sorter = None
+        self.stream_page = None
+        # Follow mode, see show_tail_update. live_summaries maps summary page keys to
+        # their running aggregates over the current dataset.
+        self.follower = None
+        self.live_summaries = {}
+        # Trained survival models, see gui/model_page.py
+        self.models = []
+        # Loaded submission files, see gui/submission_page.py
+        self.submissions = []
+
+        self.model = PassengerTableModel(parent=self)
+        self.model.sort_requested.connect(lambda keys: self.update_table())
+        self.table = PassengerTableView()
+        self.table.setModel(self.model)
+
+        # Only the table is built up front, the other pages are built (and
+        # computed) the first time their tab is opened
+        self.tabs = LazyTabWidget()
+        self.tabs.addTab(self.table, "Passengers")
+        for label, title, keys in SUMMARY_PAGES:
+            self.tabs.add_lazy_tab(lambda title=title, keys=keys: self.make_summary_page(title, keys), label)
+        self.tabs.add_lazy_tab(self.make_distribution_page, "Distributions")
+        self.tabs.add_lazy_tab(self.make_chart_page, "Charts")
+        self.tabs.add_lazy_tab(self.make_model_page, "Models")
+        self.tabs.add_lazy_tab(self.make_submission_page, "Submissions")
+        self.setCentralWidget(self.tabs)
+
+        self.setStatusBar(QStatusBar(self))
+        self.statusBar().addPermanentWidget(TaskProgress(self.tasks))
+        self.tasks.failed.connect(self.on_task_failed)
+
+        # Reload when the open CSV changes on disk, cached results of the old version
+        # are dropped on the way
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.follow_timer = QTimer(self)
+        self.follow_timer.setInterval(FOLLOW_INTERVAL_MS)
+        self.follow_timer.timeout.connect(self.poll_file)
+
+        # Every action is built once and shared by the menus, the toolbar and the table's
+        # context menu, see analytics/gui/actions.py. menu_index is the cell the context
+        # menu was opened on, a persistent index: a model reset (new rows) invalidates it.
+        self.menu_index = None
+        # Column -> index of its "By <column>" tab, see group_by_column
+        self.group_pages = {}
+        self.actions = ActionRegistry(self.action_context, parent=self)
+        self.add_actions()
+        self.follow_action = self.actions["follow"]
+        self.menuBar().addMenu(self.actions.menu(
+            "file", ["open", "stream", "save_store", None, "export_rows", "export_predictions", None, "follow"], "&File"
+        ))
+
+        self.search_box = SearchBox()
+        self.search_box.search_requested.connect(self.on_search_requested)
+        toolbar = QToolBar("Filter")
+        toolbar.addWidget(self.search_box)
+        self.actions.add_to_toolbar(toolbar, ["clear_filters", "copy"])
+        self.addToolBar(toolbar)
+
+        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.on_table_context_menu)
+        self.table.selectionModel().selectionChanged.connect(self.actions.invalidate)
+
+        self.facet_panel = FacetPanel()
+        self.facet_panel.selection_changed.connect(self.apply_filters)
+        dock = QDockWidget("Filters", self)
+        dock.setWidget(self.facet_panel)
+        self.addDockWidget(Qt.LeftDockWidgetArea, dock)
+
+        view_menu = self.menuBar().addMenu("&View")
+        view_menu.addAction(dock.toggleViewAction())
+        if profiler.enabled:
+            # Slowest slots and event handlers, see analytics/gui/profiler.py
+            profiler_dock = QDockWidget("Slot timings", self)
+            profiler_dock.setWidget(ProfilerPanel(profiler))
+            self.addDockWidget(Qt.BottomDockWidgetArea, profiler_dock)
+            view_menu.addAction(profiler_dock.toggleViewAction())
+
+    def add_actions(self) -> None:
+        actions = self.actions
+
+        def has_data(context) -> bool:
+            return context.dataset is not None
+
+        def on_cell(context) -> bool:
+            return context.column is not None
+
+        actions.add("open", "&Open...", self.on_open_clicked, "Open a passenger CSV", QKeySequence.Open)
+        actions.add(
+            "stream", "&Stream summary...", self.on_stream_clicked,
+            "Summarize a CSV too big to load, chunk by chunk",
+        )
+        actions.add(
+            "save_store", "Save as &column store...", self.on_save_store_clicked,
+            "Write the open file in row groups that later opens read in part", enabled=has_data,
+        )
+        actions.add(
+            "export_rows", "&Export rows...", self.on_export_rows_clicked,
+            "Write the rows shown, in table order, to CSV, JSON Lines or a column store", enabled=has_data,
+        )
+        actions.add(
+            "export_predictions", "Export &predictions...", self.on_export_predictions_clicked,
+            "Write the last trained model's predictions for the rows shown as PassengerId,Survived",
+            enabled=lambda context: has_data(context) and bool(self.models),
+        )
+        actions.add(
+            "follow", "&Follow file", self.on_follow_toggled,
+            "Pick up rows appended to the open file as they arrive", checkable=True,
+        )
+        actions.add(
+            "clear_filters", "Clear filters", self.clear_filters,
+            "Show every row again", enabled=lambda context: context.filtered,
+        )
+        actions.add(
+            "copy", "Copy rows", self.copy_selection, "Copy the selected rows as tab separated text",
+            QKeySequence.Copy, enabled=lambda context: context.selected,
+        )
+        actions.add(
+            "filter_value", "Filter by this value", self.filter_by_value,
+            enabled=lambda context: on_cell(context) and self.facet_panel.facet_for(context.column, context.value),
+        )
+        actions.add("sort_ascending", "Sort ascending", lambda: self.sort_by_menu_column(Qt.AscendingOrder),
+                    enabled=on_cell)
+        actions.add("sort_descending", "Sort descending", lambda: self.sort_by_menu_column(Qt.DescendingOrder),
+                    enabled=on_cell)
+        actions.add(
+            "group_by", "Group by this column", self.group_by_column,
+            "Survival by the values of this column", enabled=self.can_group_by,
+        )
+
+    def action_context(self):
+        """
+        What the actions act on right now, see ActionRegistry.
+        """
+        if self.dataset is None:
+            return EMPTY_CONTEXT
+        column = row = value = None
+        index = self.menu_index
+        if index is not None and index.isValid() and index.model() is self.model \
+                and index.row() < self.model.rowCount():
+            column = self.model.headerData(index.column(), Qt.Horizontal)
+            row = self.model.dataset_row(index.row())
+            value = cell_value(self.dataset[column], row)
+        filtered = self.rows is not None or bool(self.search_box.text()) or bool(self.facet_panel.selection())
+        return ActionContext(
+            self.dataset, column, row, value, self.table.selectionModel().hasSelection(), filtered,
+        )
+
+    def on_table_context_menu(self, pos) -> None:
+        self.menu_index = QPersistentModelIndex(self.table.indexAt(pos))
+        self.actions.popup("table", [
+            "filter_value", "clear_filters", None, "sort_ascending", "sort_descending", "group_by", None, "copy",
+        ], self.table.viewport().mapToGlobal(pos))
+
+    def clear_filters(self) -> None:
+        # One filter run for both: the search box is cleared without its signal
+        self.search_box.blockSignals(True)
+        self.search_box.clear()
+        self.search_box.blockSignals(False)
+        self.search_result = None
+        self.facet_panel.reset()
+
+    def filter_by_value(self) -> None:
+        context = self.actions.context
+        self.facet_panel.select(context.column, context.value)
+
+    def sort_by_menu_column(self, order) -> None:
+        if self.menu_index is not None and self.menu_index.isValid():
+            self.table.sortByColumn(self.menu_index.column(), order)
+
+    def can_group_by(self, context) -> bool:
+        if context.column is None or "Survived" not in context.dataset:
+            return False
+        facets = context.dataset.extras.get("facets")
+        if facets is not None and context.column in facets.values:
+            return True
+        col = context.dataset[context.column]
+        return col.kind == CATEGORICAL and len(col.categories) <= MAX_GROUPS
+
+    def group_by_column(self) -> None:
+        column = self.actions.context.column
+        index = self.group_pages.get(column)
+        if index is None:
+            title = "Survival by {}".format(column)
+            index = self.tabs.add_lazy_tab(
+                lambda: self.make_summary_page(title, [column]), "By {}".format(column)
+            )
+            self.group_pages[column] = index
+        self.tabs.setCurrentIndex(index)
+
+    def copy_selection(self) -> None:
+        """
+        Puts the selected rows (up to COPY_MAX_ROWS) on the clipboard, tab separated
+        with a header line.
+        """
+        model = self.model
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        if not rows:
+            return
+        copied = rows[:COPY_MAX_ROWS]
+        columns = [self.dataset[model.headerData(c, Qt.Horizontal)] for c in range(model.columnCount())]
+        lines = ["\t".join(col.name for col in columns)]
+        for row in copied:
+            row = model.dataset_row(row)
+            lines.append("\t".join(col.format(row) for col in columns))
+        QApplication.clipboard().setText("\n".join(lines) + "\n")
+        self.statusBar().showMessage("Copied {:,} of {:,} selected rows".format(len(copied), len(rows)))
+
+    def make_summary_page(self, title: str, keys: list):
+        from analytics.gui.summary_page import SummaryPage
+        return SummaryPage(self, title, keys)
+
+    def make_distribution_page(self):
+        from analytics.gui.distribution_page import DistributionPage
+        return DistributionPage(self)
+
+    def make_chart_page(self):
+        from analytics.gui.chart_page import ChartPage
+        return ChartPage(self)
+
+    def make_model_page(self):
+        from analytics.gui.model_page import ModelPage
+        return ModelPage(self)
+
+    def make_submission_page(self):
+        from analytics.gui.submission_page import SubmissionPage
+        return SubmissionPage(self)
+
+    def on_open_clicked(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Open passenger file", "data", "Passenger files (*.csv *.pcol);;CSV files (*.csv);;Column stores (*.pcol)"
+        )
+        if path:
+            self.open_file(path)
+
+    def on_stream_clicked(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, "Stream passenger file", "data", "CSV files (*.csv)")
+        if path:
+            self.stream_summary(path)
+
+    def on_save_store_clicked(self) -> None:
+        if self.dataset is None:
+            return
+        default = os.path.splitext(self.dataset.source)[0] + ".pcol"
+        path, _ = QFileDialog.getSaveFileName(self, "Save as column store", default, "Column stores (*.pcol)")
+        if path:
+            self.save_store(path)
+
+    def save_store(self, path: str, compression: str = None) -> None:
+        """
+        Writes the open dataset to a column store file (see analytics/store.py) in the
+        background.
+        """
+        from analytics.store import write_store
+        self.tasks.submit(
+            "Saving", write_store, self.dataset, path, compression=compression,
+            on_result=lambda written: self.statusBar().showMessage("Saved {}".format(written)),
+        )
+
+    def export_path(self, title: str, default: str) -> str:
+        path, _ = QFileDialog.getSaveFileName(self, title, default, EXPORT_FILTERS)
+        return path
+
+    def on_export_rows_clicked(self) -> None:
+        if self.dataset is None:
+            return
+        base, ext = os.path.splitext(self.dataset.source)
+        path = self.export_path("Export rows", "{}_rows{}".format(base, ".csv" if ext == ".pcol" else ext))
+        if path:
+            self.export_rows(path)
+
+    def on_export_predictions_clicked(self) -> None:
+        if self.dataset is None or not self.models:
+            return
+        model = self.models[-1]
+        default = os.path.join(os.path.dirname(self.dataset.source), "{}_submission.csv".format(model.kind))
+        path = self.export_path("Export predictions of {}".format(model.name), default)
+        if path:
+            self.export_predictions(model, path)
+
+    def export_rows(self, path: str) -> None:
+        """
+        Writes the rows the table shows, in its order, to path in the background. The
+        format comes from the extension, see analytics/export.py.
+        """
+        from analytics.export import export_rows
+        self.tasks.submit("Exporting", export_rows, self.dataset, path, self.model.rows,
+                          on_result=self.show_exported)
+
+    def export_predictions(self, model, path: str) -> None:
+        """
+        Writes model's predictions for the rows the table shows to path in the
+        background, in the gender_submission.csv layout.
+        """
+        from analytics.export import export_predictions
+        self.tasks.submit("Exporting", export_predictions, model, self.dataset, path, self.model.rows,
+                          on_result=self.show_exported)
+
+    def show_exported(self, report) -> None:
+        self.statusBar().showMessage("Exported {:,} rows to {} ({:,.0f} rows/s, {:.0f} MB/s)".format(
+            report.rows, report.path, report.rows_per_second, report.megabytes_per_second))
+
+    def stream_summary(self, path: str, keys: list = None) -> None:
+        """
+        Aggregates a CSV in the background without loading it, the "Streamed" tab fills
+        in as chunks are read. Memory use doesn't depend on the size of the file.
+        """
+        from analytics.gui.summary_page import StreamSummaryPage, compute_stream_summary
+        title, keys = (SUMMARY_PAGES[0][1], SUMMARY_PAGES[0][2]) if keys is None else ("Survival", keys)
+        if self.stream_page is None:
+            self.stream_page = StreamSummaryPage()
+            self.tabs.addTab(self.stream_page, "Streamed")
+        self.stream_page.start(path, title)
+        self.tabs.setCurrentWidget(self.stream_page)
+        self.tasks.submit(
+            "Streaming", compute_stream_summary, path, keys,
+            on_partial=self.stream_page.show_partial, on_result=self.stream_page.show_result,
+        )
+
+    def open_file(self, path: str) -> None:
+        """
+        Loads a CSV in the background. Opening another file before this one is done
+        cancels it.
+        """
+        self.statusBar().showMessage("Loading {}".format(path))
+        self.tasks.submit("Loading", load_passengers, path, on_result=self.show_dataset)
+
+    def show_dataset(self, loaded: tuple) -> None:
+        if self.results is None:
+            from analytics.cache import ResultCache
+            self.results = ResultCache()
+        self.dataset, self.search_index = loaded
+        # Results of the previous file still on the pool would land on this one
+        for key in ("Filtering", "Faceting", "Sorting"):
+            self.tasks.cancel(key)
+        self.menu_index = None
+        self.search_result = None
+        self.rows = None
+        self.sorter = None
+        self.follower = None
+        self.live_summaries = {}
+        self.model.set_dataset(self.dataset)
+        facets = self.dataset.extras.get("facets")
+        self.facet_panel.set_facets(facets.values if facets is not None else {})
+        if self.watcher.files():
+            self.watcher.removePaths(self.watcher.files())
+        self.watcher.addPath(self.dataset.source)
+        self.setWindowTitle("Passenger Analytics - {}".format(os.path.basename(self.dataset.source)))
+        self.statusBar().showMessage("{:,} rows".format(len(self.dataset)))
+        if self.search_box.text():
+            self.on_search_requested(self.search_box.text())
+        else:
+            self.apply_filters()
+        self.dataset_loaded.emit(self.dataset)
+
+    def on_file_changed(self, path: str) -> None:
+        self.results.invalidate_stale()
+        if self.follow_action.isChecked():
+            self.poll_file()
+            # Replacing the file removes it from the watcher
+            if os.path.exists(path) and path not in self.watcher.files():
+                self.watcher.addPath(path)
+            return
+        # Editors often replace the file, which removes it from the watcher
+        if os.path.exists(path):
+            self.open_file(path)
+
+    def on_follow_toggled(self, checked: bool) -> None:
+        if checked:
+            self.follow_timer.start()
+            self.poll_file()
+        else:
+            self.follow_timer.stop()
+            self.tasks.cancel("Appending")
+            self.follower = None
+            self.live_summaries = {}
+
+    def poll_file(self) -> None:
+        """
+        Looks for rows appended to the open file, on the pool. Polls don't queue up
+        behind each other or behind a load.
+        """
+        if self.dataset is None or self.tasks.is_running("Appending") or self.tasks.is_running("Loading"):
+            return
+        if not self.dataset.source.endswith(".csv"):
+            # Column stores are rewritten whole, the watcher reloads them
+            return
+        if self.follower is None:
+            from analytics.tail import TailFollower
+            try:
+                self.follower = TailFollower(
+                    self.dataset, self.search_index, [keys for _, _, keys in SUMMARY_PAGES]
+                )
+            except OSError:
+                # Gone for now, e.g. being replaced. The next poll tries again.
+                return
+        follower = self.follower
+        self.tasks.submit(
+            "Appending", poll_tail, follower,
+            on_result=lambda update: self.show_tail_update(follower, update),
+        )
+
+    def show_tail_update(self, follower, update) -> None:
+        if follower is not self.follower or not self.follow_action.isChecked():
+            return
+        if update.kind == "replaced":
+            self.open_file(self.dataset.source)
+            return
+        follower.accept(update)
+        if update.summaries is not None:
+            self.live_summaries = update.summaries
+        if update.kind != "appended":
+            return
+
+        facets = self.dataset.extras.get("facets")
+        new_facets = update.dataset.extras.get("facets")
+        self.dataset = update.dataset
+        self.search_index = update.search_index
+        self.model.append_dataset(self.dataset)
+        if new_facets is not None and (facets is None or new_facets.values != facets.values):
+            # A value never seen before, e.g. a new port
+            self.facet_panel.set_facets(new_facets.values)
+
+        if self.search_box.text():
+            # The previous result can't be narrowed, it doesn't know the new rows
+            self.search_result = None
+            self.on_search_requested(self.search_box.text())
+        elif self.facet_panel.selection() or new_facets is None or self.tasks.is_running("Faceting"):
+            # A facet run still on the pool was for the old rows, its result is dropped
+            self.apply_filters()
+        else:
+            # Nothing filtered: the table already has the new rows and the counts come
+            # with the update
+            self.facet_panel.set_counts(update.facet_counts)
+            if self.model.sort_keys:
+                # The new rows belong somewhere in the middle
+                self.update_table()
+            self.statusBar().showMessage("{:,} rows, {:,} new".format(
+                len(self.dataset), len(self.dataset) - update.start))
+            self.tabs.refresh_current()
+
+    def on_search_requested(self, text: str) -> None:
+        if self.search_index is None:
+            return
+        from analytics.search import normalize
+        query = ("search", normalize(text))
+        cached = self.results.get(self.dataset, query)
+        if cached is not None:
+            # Going back to an earlier search doesn't need the pool at all
+            self.tasks.cancel("Filtering")
+            self.show_search_result(cached)
+            return
+        dataset = self.dataset
+        self.tasks.submit(
+            "Filtering", search_passengers, self.search_index, text, self.search_result,
+            on_result=lambda result: self.show_search_result(result, query, dataset),
+        )
+
+    def show_search_result(self, result, query=None, dataset=None) -> None:
+        """
+        dataset is the one the search ran on, its result is dropped if another file (or
+        more rows) arrived in the meantime.
+        """
+        if dataset is not None:
+            if dataset is not self.dataset:
+                return
+            self.results.put(dataset, query, result)
+        self.search_result = result
+        self.apply_filters()
+
+    def apply_filters(self, selection: dict = None) -> None:
+        """
+        Narrows the search result by the facet filters and updates the facet counts.
+        """
+        if self.dataset is None:
+            return
+        search_rows = self.search_result.rows if self.search_result is not None else None
+        facets = self.dataset.extras.get("facets")
+        if facets is None:
+            self.show_rows(search_rows)
+            return
+        if selection is None:
+            selection = self.facet_panel.selection()
+        query = ("facets", selection, search_rows)
+        cached = self.results.get(self.dataset, query)
+        if cached is not None:
+            self.tasks.cancel("Faceting")
+            self.show_facet_result(cached)
+            return
+        dataset = self.dataset
+        self.tasks.submit(
+            "Faceting", filter_facets, facets, selection, search_rows,
+            on_result=lambda result: self.show_facet_result(result, query, dataset),
+        )
+
+    def show_facet_result(self, result, query=None, dataset=None) -> None:
+        """
+        Like show_search_result, drops the result of a dataset no longer shown.
+        """
+        if dataset is not None:
+            if dataset is not self.dataset:
+                return
+            self.results.put(dataset, query, result)
+        self.facet_panel.set_counts(result.counts)
+        self.show_rows(result.rows)
+
+    def show_rows(self, rows) -> None:
+        self.rows = rows
+        self.actions.invalidate()
+        self.update_table()
+        if rows is None:
+            self.statusBar().showMessage("{:,} rows".format(len(self.dataset)))
+        else:
+            self.statusBar().showMessage("{:,} of {:,} rows match".format(len(rows), len(self.dataset)))
+        self.tabs.refresh_current()
+
+    def update_table(self) -> None:
+        """
+        Shows window.rows in the table, in the model's sort order. Sorted rows come from
+        the pool: the first sort by a key sorts the whole dataset, after that (and for
+        the reverse order) the cached permutation only has to be filtered.
+        """
+        keys = self.model.sort_keys
+        if not keys or self.dataset is None:
+            self.tasks.cancel("Sorting")
+            self.model.set_rows(self.rows)
+            return
+        if self.sorter is None or self.sorter.dataset is not self.dataset:
+            from analytics.sorting import SortEngine
+            self.sorter = SortEngine(self.dataset)
+        sorter = self.sorter
+        self.tasks.submit(
+            "Sorting", sort_passengers, sorter, keys, self.rows,
+            on_result=lambda rows: self.show_sorted_rows(sorter, rows),
+        )
+
+    def show_sorted_rows(self, sorter, rows) -> None:
+        # Rows of a sort that ran on another file (or before rows were appended) would
+        # index the wrong rows
+        if sorter.dataset is not self.dataset or sorter.dataset is not self.model.dataset:
+            return
+        self.model.set_rows(rows)
+
+    def on_task_failed(self, key: str, error) -> None:
+        self.statusBar().showMessage("{} failed: {}".format(key, error))
+        QMessageBox.warning(self, key, str(error))
+
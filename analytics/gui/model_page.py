@@ -0,0 +1,176 @@
+"""
+Models page: train survival models on the shown passengers and score other files.
+
+Training runs out of process (see analytics/training.py) as the "Training" task, so the
+status bar shows its progress and Cancel stops the child process right away. It trains
+on window.rows, the passengers the search and filters leave, all of them by default.
+
+Trained models live on the window (window.models), not on the page, which may be
+unloaded and rebuilt by the tab widget at any time. Scoring writes a submission file in
+the gender_submission.csv format on the pool and records the scoring rate of the model.
+"""
+
+import os
+
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QTableView, QHeaderView,
+    QAbstractItemView, QFileDialog
+)
+
+from analytics.models import MODELS
+from analytics.training import train_in_process, score_file
+from analytics.gui.profiler import instrumented
+
+
+def _percent(metrics: dict, key: str) -> str:
+    return "{:.1%}".format(metrics[key]) if key in metrics else ""
+
+
+@instrumented
+class ModelListModel(QAbstractTableModel):
+    """
+    One row per trained model. Models are few, so the cells are formatted eagerly.
+    """
+
+    HEADERS = ["Model", "Trained on", "Validation accuracy", "Train accuracy", "Train s", "Scored rows/s"]
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.cells = []
+
+    def set_models(self, models: list) -> None:
+        self.beginResetModel()
+        self.cells = [[
+            model.name,
+            "{:,} rows".format(model.metrics["rows"]),
+            _percent(model.metrics, "validation_accuracy"),
+            _percent(model.metrics, "train_accuracy"),
+            "{:.2f}".format(model.metrics["seconds"]),
+            "{:,.0f}".format(model.metrics["rows_per_second"]) if "rows_per_second" in model.metrics else "",
+        ] for model in models]
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.cells)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return self.cells[index.row()][index.column()]
+        if role == Qt.TextAlignmentRole and index.column() > 0:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+
+@instrumented
+class ModelPage(QWidget):
+
+    def __init__(self, main_window, parent=None) -> None:
+        super().__init__(parent)
+        self.main_window = main_window
+
+        self.kind = QComboBox()
+        for kind, model_type in MODELS.items():
+            self.kind.addItem(model_type.name, kind)
+        train_button = QPushButton("Train")
+        train_button.clicked.connect(self.on_train_clicked)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.on_cancel_clicked)
+        score_button = QPushButton("Score file...")
+        score_button.clicked.connect(self.on_score_clicked)
+        self.info = QLabel()
+
+        self.model = ModelListModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        controls = QHBoxLayout()
+        controls.addWidget(self.kind)
+        controls.addWidget(train_button)
+        controls.addWidget(cancel_button)
+        controls.addWidget(score_button)
+        controls.addWidget(self.info, 1)
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+    def on_page_activated(self) -> None:
+        self.model.set_models(self.main_window.models)
+
+    def selected_model(self):
+        models = self.main_window.models
+        selected = self.table.selectionModel().selectedRows()
+        if selected:
+            return models[selected[0].row()]
+        return models[-1] if models else None
+
+    def on_train_clicked(self) -> None:
+        window = self.main_window
+        if window.dataset is None:
+            return
+        if "Survived" not in window.dataset:
+            self.info.setText("{} has no Survived column to train on".format(os.path.basename(window.dataset.source)))
+            return
+        kind = self.kind.currentData()
+        rows = window.rows
+        self.info.setText("Training on {:,} rows".format(len(window.dataset) if rows is None else len(rows)))
+        window.tasks.submit(
+            "Training", train_in_process, window.dataset.source, kind, None, rows,
+            on_result=lambda model: self.show_trained(window, model),
+        )
+
+    def on_cancel_clicked(self) -> None:
+        self.main_window.tasks.cancel("Training")
+        self.info.setText("Training cancelled")
+
+    def show_trained(self, window, model) -> None:
+        window.models.append(model)
+        window.statusBar().showMessage("{} trained, {} on held out rows".format(
+            model.name, _percent(model.metrics, "validation_accuracy")))
+        # The page may have been unloaded while its task ran
+        if sip.isdeleted(self):
+            return
+        self.info.setText("")
+        self.model.set_models(window.models)
+
+    def on_score_clicked(self) -> None:
+        model = self.selected_model()
+        if model is None:
+            self.info.setText("Train a model first")
+            return
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Score passenger file", os.path.join("data", "test.csv"), "Passenger files (*.csv *.pcol)"
+        )
+        if not path:
+            return
+        default = os.path.join(os.path.dirname(path), "{}_submission.csv".format(model.kind))
+        out, _ = QFileDialog.getSaveFileName(self, "Save submission", default, "CSV files (*.csv)")
+        if out:
+            self.score(model, path, out)
+
+    def score(self, model, path: str, out: str) -> None:
+        window = self.main_window
+        window.tasks.submit(
+            "Scoring", score_file, model, path, out,
+            on_result=lambda report: self.show_scored(window, model, report),
+        )
+
+    def show_scored(self, window, model, report) -> None:
+        model.metrics["rows_per_second"] = report.rows_per_second
+        window.statusBar().showMessage("{:,} rows scored at {:,.0f} rows/s, {:,} survivors -> {}".format(
+            report.rows, report.rows_per_second, report.survivors, report.path))
+        if not sip.isdeleted(self):
+            self.model.set_models(window.models)
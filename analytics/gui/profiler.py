@@ -0,0 +1,325 @@
+"""
+Slot and event handler profiler: which Python code the event loop spends its time in.
+
+When the UI stutters the culprit is a slot (the_button_was_clicked in tutorial/app1.py,
+onMyToolBarButtonClick in tutorial/app6.py) or an event handler (mousePressEvent in
+tutorial/app3.py, paintEvent, data() of a model) that takes too long on the GUI thread.
+With profiling on, every method of the GUI classes is timed:
+
+    calls, total, mean and max time per method ("MainWindow.apply_filters")
+    how many of the calls ran off the GUI thread (task pool workers)
+    one trace event per call, for chrome://tracing or https://ui.perfetto.dev
+
+The GUI classes are marked with the @instrumented class decorator. It wraps the methods
+a class defines when the class is created, and only if profiling was enabled before the
+module got imported. Otherwise it returns the class untouched, so a normal run has no
+wrapper, no check and no extra call anywhere: the cost of the instrumentation when it is
+off is one boolean test per class at import time. Enable it with the app's
+--profile-slots flag or ANALYTICS_PROFILE_SLOTS=1 in the environment.
+
+Times are inclusive: a slot that calls another instrumented method is charged for it too,
+the trace shows the nesting.
+
+ProfilerPanel shows the slowest methods live, the main window puts it in a "Slot timings"
+dock when profiling is on. Scripts that don't know about any of this, like the tutorial
+apps, can be profiled from the outside, every QObject subclass they define gets
+instrumented:
+
+    python -m analytics.gui.profiler tutorial/app1.py --trace app1_trace.json
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+import types
+from collections import deque
+
+from PyQt5.QtCore import Qt, QObject, QAbstractTableModel, QModelIndex, QTimer
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableView, QHeaderView, QFileDialog
+
+# Trace events kept for export, the oldest are dropped first
+TRACE_EVENTS = 200_000
+REFRESH_MS = 500
+
+
+def _positional_count(fn):
+    """
+    How many positional arguments fn takes, None if it takes any number. Signals pass
+    all their arguments to the wrapper, the slot itself may want fewer.
+    """
+    # Only imported with profiling on, it would cost every startup otherwise
+    import inspect
+    count = 0
+    for parameter in inspect.signature(fn).parameters.values():
+        if parameter.kind == parameter.VAR_POSITIONAL:
+            return None
+        if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD):
+            count += 1
+    return count
+
+
+class SlotProfiler:
+
+    def __init__(self) -> None:
+        self.enabled = bool(os.environ.get("ANALYTICS_PROFILE_SLOTS"))
+        self.gui_thread = threading.main_thread().ident
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self) -> None:
+        """
+        Turns profiling on for every instrumented class created from now on.
+        """
+        self.enabled = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.perf_counter()
+            self.stats = {}  # name -> [calls, total s, max s, calls off the GUI thread]
+            self.events = deque(maxlen=TRACE_EVENTS)  # (name, start, duration, thread)
+
+    def wrap(self, fn, name: str):
+        """
+        fn with every call timed and recorded under name.
+        """
+        count = _positional_count(fn)
+        clock = time.perf_counter
+        record = self.record
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            if count is not None:
+                args = args[:count]
+            start = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, start, clock())
+        return timed
+
+    def instrument(self, cls):
+        """
+        Wraps the plain functions defined in cls itself (not inherited ones, they are
+        wrapped in their own class). Dunder methods are left alone.
+        """
+        for attr, value in list(vars(cls).items()):
+            if isinstance(value, types.FunctionType) and not (attr.startswith("__") and attr.endswith("__")):
+                setattr(cls, attr, self.wrap(value, "{}.{}".format(cls.__name__, attr)))
+        return cls
+
+    def record(self, name: str, start: float, end: float) -> None:
+        thread = threading.get_ident()
+        duration = end - start
+        with self._lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = [0, 0.0, 0.0, 0]
+            stat[0] += 1
+            stat[1] += duration
+            if duration > stat[2]:
+                stat[2] = duration
+            if thread != self.gui_thread:
+                stat[3] += 1
+            self.events.append((name, start, duration, thread))
+
+    def rows(self) -> list:
+        """
+        (name, calls, calls per second, total s, mean s, max s, calls off the GUI thread)
+        per method, slowest total first.
+        """
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        with self._lock:
+            stats = [(name,) + tuple(stat) for name, stat in self.stats.items()]
+        rows = [
+            (name, calls, calls / elapsed, total, total / calls, longest, off)
+            for name, calls, total, longest, off in stats
+        ]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def report(self, limit: int = 30) -> str:
+        lines = ["{:>10} {:>10} {:>10} {:>10} {:>8}  {}".format(
+            "calls", "total ms", "mean ms", "max ms", "off GUI", "method")]
+        for name, calls, _, total, mean, longest, off in self.rows()[:limit]:
+            lines.append("{:>10,} {:>10.1f} {:>10.3f} {:>10.1f} {:>8,}  {}".format(
+                calls, total * 1000, mean * 1000, longest * 1000, off, name))
+        return "\n".join(lines)
+
+    def trace(self) -> dict:
+        """
+        The recorded calls in Chrome's trace event format, complete ("X") events with
+        microsecond timestamps.
+        """
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+        threads = {thread for _, _, _, thread in events}
+        trace = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": thread,
+             "args": {"name": "GUI thread" if thread == self.gui_thread else "worker {}".format(thread)}}
+            for thread in sorted(threads)
+        ]
+        trace.extend(
+            {"name": name, "cat": "slot", "ph": "X", "pid": pid, "tid": thread,
+             "ts": (start - self.started) * 1e6, "dur": duration * 1e6}
+            for name, start, duration, thread in events
+        )
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path: str) -> None:
+        import json
+        with open(path, "w") as f:
+            json.dump(self.trace(), f)
+
+
+profiler = SlotProfiler()
+
+
+def instrumented(cls):
+    """
+    Class decorator: times every method of cls while profiling is enabled, see the
+    module docstring. Without profiling it returns cls as it is.
+    """
+    if not profiler.enabled:
+        return cls
+    return profiler.instrument(cls)
+
+
+class ProfilerModel(QAbstractTableModel):
+
+    HEADERS = ["Method", "Calls", "Calls/s", "Total ms", "Mean ms", "Max ms", "Off GUI thread"]
+
+    def __init__(self, source: SlotProfiler, parent=None) -> None:
+        super().__init__(parent)
+        self.source = source
+        self.cells = []
+        self.sort_column = 3
+        self.sort_order = Qt.DescendingOrder
+
+    def refresh(self) -> None:
+        rows = self.source.rows()
+        rows.sort(key=lambda row: row[self.sort_column], reverse=self.sort_order == Qt.DescendingOrder)
+        self.beginResetModel()
+        self.cells = [[
+            name, "{:,}".format(calls), "{:.1f}".format(rate), "{:.1f}".format(total * 1000),
+            "{:.3f}".format(mean * 1000), "{:.1f}".format(longest * 1000), "{:,}".format(off),
+        ] for name, calls, rate, total, mean, longest, off in rows]
+        self.endResetModel()
+
+    def sort(self, column: int, order=Qt.AscendingOrder) -> None:
+        self.sort_column, self.sort_order = column, order
+        self.refresh()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.cells)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return self.cells[index.row()][index.column()]
+        if role == Qt.TextAlignmentRole and index.column() > 0:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+
+class ProfilerPanel(QWidget):
+    """
+    Live table of the profiled methods, refreshed every REFRESH_MS while visible.
+    Deliberately not instrumented, it would mostly measure itself.
+    """
+
+    def __init__(self, source: SlotProfiler = profiler, parent=None) -> None:
+        super().__init__(parent)
+        self.source = source
+        self.model = ProfilerModel(source, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSortingEnabled(True)
+        self.table.sortByColumn(3, Qt.DescendingOrder)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.on_reset_clicked)
+        export_button = QPushButton("Export trace...")
+        export_button.clicked.connect(self.on_export_clicked)
+        buttons = QHBoxLayout()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(export_button)
+        buttons.addStretch(1)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.model.refresh)
+
+    def showEvent(self, event) -> None:
+        self.model.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event) -> None:
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def on_reset_clicked(self) -> None:
+        self.source.reset()
+        self.model.refresh()
+
+    def on_export_clicked(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "Export trace", "slot_trace.json", "Trace files (*.json)")
+        if path:
+            self.source.write_trace(path)
+
+
+def run_script(path: str, args: list, trace: str = None) -> None:
+    """
+    Runs a Python script with every QObject subclass it defines instrumented, then
+    prints the report to stderr and writes the trace, if asked to.
+    """
+    import builtins
+    import runpy
+    profiler.enable()
+    build_class = builtins.__build_class__
+
+    def instrumenting_build_class(func, name, *bases, **kwargs):
+        cls = build_class(func, name, *bases, **kwargs)
+        if isinstance(cls, type) and issubclass(cls, QObject):
+            profiler.instrument(cls)
+        return cls
+
+    builtins.__build_class__ = instrumenting_build_class
+    sys.argv = [path] + list(args)
+    try:
+        runpy.run_path(path, run_name="__main__")
+    finally:
+        builtins.__build_class__ = build_class
+        print(profiler.report(), file=sys.stderr)
+        if trace:
+            profiler.write_trace(trace)
+
+
+def main(argv=None) -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Profile the slots and event handlers of a PyQt script")
+    parser.add_argument("script")
+    parser.add_argument("--trace", metavar="FILE", help="write the calls to FILE in Chrome trace format")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments for the script")
+    args = parser.parse_args(argv)
+    run_script(args.script, args.args, args.trace)
+
+
+if __name__ == "__main__":
+    main()
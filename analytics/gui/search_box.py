@@ -0,0 +1,48 @@
+"""
+Debounced search box.
+
+tutorial/app2.py connects QLineEdit.textChanged straight to a slot, so the slot runs on
+every keystroke. SearchBox restarts a single-shot QTimer on every keystroke instead and only
+emits search_requested once the user has stopped typing for `delay_ms`.
+"""
+
+from PyQt5.QtCore import QTimer, pyqtSignal
+from PyQt5.QtWidgets import QLineEdit
+
+from analytics.gui.profiler import instrumented
+
+DEBOUNCE_MS = 150
+
+
+@instrumented
+class SearchBox(QLineEdit):
+
+    search_requested = pyqtSignal(str)
+
+    def __init__(self, delay_ms: int = DEBOUNCE_MS, parent=None) -> None:
+        super().__init__(parent)
+        self.setPlaceholderText("Search name or ticket")
+        self.setClearButtonEnabled(True)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+        self.set_delay(delay_ms)
+
+        self.textChanged.connect(self.on_text_changed)
+        # Enter searches right away
+        self.returnPressed.connect(self.flush)
+
+    def set_delay(self, delay_ms: int) -> None:
+        self.timer.setInterval(delay_ms)
+
+    def on_text_changed(self, text: str) -> None:
+        # Restarting the timer drops the pending search for the previous text
+        self.timer.start()
+
+    def on_timeout(self) -> None:
+        self.search_requested.emit(self.text())
+
+    def flush(self) -> None:
+        self.timer.stop()
+        self.search_requested.emit(self.text())
@@ -0,0 +1,177 @@
+"""
+Submissions page: compare prediction files against the open passenger file.
+
+Submission files (PassengerId,Survived, like data/gender_submission.csv or what the
+Models page and File > Export predictions write) are joined to the open file on
+PassengerId, see analytics/joins.py. With train.csv open, its Survived column is the
+truth and the page shows every submission's accuracy and confusion matrix. With test.csv
+open there is no truth, only how much the submissions agree with each other.
+
+Loaded submissions live on the window (window.submissions) like its models, the page can
+be unloaded at any time. The comparison runs on the pool as the "Comparing" task, with
+the join indexes and alignments in the window's ResultCache: adding one more submission
+costs one pass over its keys.
+"""
+
+import os
+
+import numpy as np
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableView, QHeaderView, QFileDialog
+)
+
+from analytics.joins import compare_submissions
+from analytics.loader import load_dataset
+from analytics.gui.profiler import instrumented
+
+
+def compare_files(results, dataset, submissions: list, paths: list, progress):
+    """
+    Comparing task: loads the submission files at paths and compares them, with the
+    already loaded submissions, against dataset. Returns (submissions, comparison).
+    """
+    submissions = list(submissions)
+    for i, path in enumerate(paths):
+        progress(i / len(paths), "Loading {}".format(os.path.basename(path)))
+        submissions.append(load_dataset(path))
+    return submissions, compare_submissions(dataset, submissions, cache=results)
+
+
+def _percent(value: float) -> str:
+    return "" if np.isnan(value) else "{:.1%}".format(value)
+
+
+@instrumented
+class CellsModel(QAbstractTableModel):
+    """
+    A small table of preformatted cells with column and row headers.
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.headers = []
+        self.row_headers = []
+        self.cells = []
+
+    def set_cells(self, headers: list, row_headers: list, cells: list) -> None:
+        self.beginResetModel()
+        self.headers = headers
+        self.row_headers = row_headers
+        self.cells = cells
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.cells)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return self.cells[index.row()][index.column()]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        return self.headers[section] if orientation == Qt.Horizontal else self.row_headers[section]
+
+
+@instrumented
+class SubmissionPage(QWidget):
+
+    def __init__(self, main_window, parent=None) -> None:
+        super().__init__(parent)
+        self.main_window = main_window
+        self.shown = None
+
+        add_button = QPushButton("Add submissions...")
+        add_button.clicked.connect(self.on_add_clicked)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.on_clear_clicked)
+        self.info = QLabel()
+
+        self.scores = CellsModel(self)
+        self.agreement = CellsModel(self)
+        tables = []
+        for model in (self.scores, self.agreement):
+            table = QTableView()
+            table.setModel(model)
+            table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+            tables.append(table)
+
+        controls = QHBoxLayout()
+        controls.addWidget(add_button)
+        controls.addWidget(clear_button)
+        controls.addWidget(self.info, 1)
+        layout = QVBoxLayout()
+        layout.addLayout(controls)
+        layout.addWidget(tables[0])
+        layout.addWidget(QLabel("Agreement: passengers both predict the same for"))
+        layout.addWidget(tables[1])
+        self.setLayout(layout)
+
+    def on_page_activated(self) -> None:
+        window = self.main_window
+        if window.dataset is None or not window.submissions:
+            return
+        if self.shown == (window.dataset, len(window.submissions)):
+            return
+        self.compare([])
+
+    def on_add_clicked(self) -> None:
+        if self.main_window.dataset is None:
+            self.info.setText("Open a passenger file first")
+            return
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, "Add submissions", "data", "Submission files (*.csv *.pcol)"
+        )
+        if paths:
+            self.compare(paths)
+
+    def on_clear_clicked(self) -> None:
+        self.main_window.submissions = []
+        self.shown = None
+        self.info.setText("")
+        self.scores.set_cells([], [], [])
+        self.agreement.set_cells([], [], [])
+
+    def compare(self, paths: list) -> None:
+        window = self.main_window
+        dataset = window.dataset
+        window.tasks.submit(
+            "Comparing", compare_files, window.results, dataset, window.submissions, paths,
+            on_result=lambda result: self.show_comparison(window, dataset, *result),
+        )
+
+    def show_comparison(self, window, dataset, submissions: list, comparison) -> None:
+        window.submissions = submissions
+        if sip.isdeleted(self):
+            return
+        self.shown = (dataset, len(submissions))
+        base = os.path.basename(dataset.source)
+        names = comparison.names
+        matched = comparison.matched()
+        if comparison.truth is None:
+            self.info.setText("{} has no Survived column, showing agreement only".format(base))
+            self.scores.set_cells(
+                ["Predicted passengers"], names, [["{:,} of {:,}".format(m, len(dataset))] for m in matched],
+            )
+        else:
+            self.info.setText("Scored against Survived of {}".format(base))
+            accuracy = comparison.accuracy()
+            cells = []
+            for i, m in enumerate(matched):
+                (tn, fp), (fn, tp) = comparison.confusion(i).tolist()
+                cells.append(["{:,} of {:,}".format(m, len(dataset)), _percent(accuracy[i])] +
+                             ["{:,}".format(count) for count in (tp, fp, tn, fn)])
+            self.scores.set_cells(
+                ["Predicted passengers", "Accuracy", "True survived", "False survived", "True died",
+                 "False died"], names, cells,
+            )
+        agreement = comparison.agreement()
+        self.agreement.set_cells(names, names, [[_percent(value) for value in row] for row in agreement])
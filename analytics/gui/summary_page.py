@@ -0,0 +1,192 @@
+"""
+Survival summary pages: passenger count and survival rate grouped by a few keys.
+
+Pages are meant to live in a LazyTabWidget. They compute nothing until they are shown,
+and every time they are shown they ask the window's ResultCache first, so flipping back
+and forth between tabs only computes each grouping once per dataset and filter.
+
+StreamSummaryPage shows the same kind of table for a file that is aggregated chunk by
+chunk without loading it (see analytics.streaming), updated after every chunk.
+"""
+
+import csv
+import os
+
+import numpy as np
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QTableView, QHeaderView
+
+from analytics.aggregate import GroupResult
+from analytics.gui.profiler import instrumented
+from analytics.reports import summary
+from analytics.streaming import stream_aggregate
+
+HEADERS = {"count": "Passengers", "Survived:mean": "Survival rate", "missing": "Missing"}
+
+
+def summary_query(keys: list, rows) -> tuple:
+    return ("survival", keys, rows)
+
+
+def compute_summary(results, dataset, keys: list, rows, progress):
+    """
+    Summary task, stores its result in the cache for the next time the page is shown.
+    Files without a Survived column (test.csv) only get passenger counts.
+    """
+    result = summary(dataset, keys, rows=rows)
+    results.put(dataset, summary_query(keys, rows), result)
+    return result
+
+
+def compute_stream_summary(path: str, keys: list, progress):
+    """
+    Streaming summary task. Partial results go to the page after every chunk.
+    """
+    with open(path, newline="") as f:
+        header = next(csv.reader(f), [])
+    # test.csv has no Survived column, only count passengers there
+    aggs = [("*", "count")]
+    if "Survived" in header:
+        aggs.append(("Survived", "mean"))
+    return stream_aggregate(path, keys, aggs, progress=progress, partial=progress.partial)
+
+
+@instrumented
+class GroupResultModel(QAbstractTableModel):
+    """
+    Shows an aggregate.GroupResult. Groups are few, so this one can format eagerly.
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.headers = []
+        self.cells = []
+
+    def set_result(self, result) -> None:
+        self.beginResetModel()
+        self.headers = [HEADERS.get(c, c) for c in result.columns]
+        formats = ["{:.1%}" if c == "Survived:mean" else "{:g}" for c in result.columns]
+        self.cells = [[self._format(v, f) for v, f in zip(row, formats)] for row in result.rows()]
+        self.endResetModel()
+
+    @staticmethod
+    def _format(value, fmt: str) -> str:
+        if value is None:
+            return "(missing)"
+        if isinstance(value, float):
+            return "" if np.isnan(value) else fmt.format(value)
+        return str(value)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.cells)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return self.cells[index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return None
+
+
+@instrumented
+class SummaryPage(QWidget):
+
+    def __init__(self, main_window, title: str, keys: list, parent=None) -> None:
+        super().__init__(parent)
+        self.main_window = main_window
+        self.keys = list(keys)
+        self.shown_query = None
+
+        self.title = QLabel(title)
+        font = self.title.font()
+        font.setPointSize(font.pointSize() + 4)
+        self.title.setFont(font)
+
+        self.model = GroupResultModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.title)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+    def on_page_activated(self) -> None:
+        window = self.main_window
+        if window.dataset is None:
+            return
+        rows = window.rows
+        query = summary_query(self.keys, rows)
+        if self.shown_query is not None and self.shown_query[0] is window.dataset \
+                and self.shown_query[1] is rows:
+            return
+
+        # While following the file, see MainWindow.show_tail_update
+        live = window.live_summaries.get(tuple(self.keys)) if rows is None else None
+        if live is not None:
+            self.show_result(live, window.dataset, rows)
+            return
+        cached = window.results.get(window.dataset, query)
+        if cached is not None:
+            self.show_result(cached, window.dataset, rows)
+            return
+        dataset = window.dataset
+        window.tasks.submit(
+            "Grouping", compute_summary, window.results, dataset, self.keys, rows,
+            on_result=lambda result: self.show_result(result, dataset, rows),
+        )
+
+    def show_result(self, result, dataset, rows) -> None:
+        # The page may have been unloaded while its task ran
+        if sip.isdeleted(self):
+            return
+        self.shown_query = (dataset, rows)
+        self.model.set_result(result)
+
+
+@instrumented
+class StreamSummaryPage(QWidget):
+    """
+    Survival summary of a file that is streamed instead of loaded, see
+    compute_stream_summary(). Not a lazy page, the window adds it when a stream starts.
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self.title = QLabel()
+        font = self.title.font()
+        font.setPointSize(font.pointSize() + 4)
+        self.title.setFont(font)
+        self.status = QLabel()
+
+        self.model = GroupResultModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.title)
+        layout.addWidget(self.table)
+        layout.addWidget(self.status)
+        self.setLayout(layout)
+
+    def start(self, path: str, title: str) -> None:
+        self.title.setText("{} ({})".format(title, os.path.basename(path)))
+        self.status.setText("Reading...")
+        self.model.set_result(GroupResult([], {}, {}))
+
+    def show_partial(self, result) -> None:
+        self.model.set_result(result)
+        self.status.setText("{:,} rows so far".format(int(result.values["count"].sum())))
+
+    def show_result(self, result) -> None:
+        self.model.set_result(result)
+        self.status.setText("{:,} rows".format(int(result.values["count"].sum())))
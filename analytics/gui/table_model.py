@@ -0,0 +1,209 @@
+"""
+Passenger table: a QAbstractTableModel that reads straight out of a Dataset's columns.
+
+Unlike the QListWidget in tutorial/app4.py, which creates an item per row, the model keeps
+nothing per row. The view asks data() for the handful of cells that are on screen and each
+one is formatted from the column arrays on demand, so a 10M row file costs the same to show
+as a 10 row one.
+
+Rows are handed to the view in batches through canFetchMore/fetchMore. rowCount() only
+returns how many rows have been fetched so far, it never counts anything.
+
+Filters don't copy the data either: set_rows() gives the model an array of dataset row
+indices to show, and data() looks the visible row up in it.
+
+Sorting works the same way. A header click doesn't sort anything in the model, it sets
+sort_keys and emits sort_requested. The owner computes the sorted rows off the GUI thread
+(see analytics/sorting.py) and hands them back through set_rows(), often as the cached
+permutation array itself. Shift+click adds the column as a further key, so Fare, then Age,
+then Name is three clicks. This replaces QSortFilterProxyModel, whose lessThan() would be
+called from Python n log n times.
+"""
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QTableView, QHeaderView, QAbstractItemView
+
+from analytics.schema import NUMERIC
+from analytics.gui.profiler import instrumented
+
+FETCH_BATCH = 100_000
+ROW_HEIGHT = 22
+
+
+@instrumented
+class PassengerTableModel(QAbstractTableModel):
+
+    # The new sort_keys, ((column name, ascending), ...), empty for file order
+    sort_requested = pyqtSignal(object)
+
+    def __init__(self, dataset=None, columns=None, fetch_batch: int = FETCH_BATCH, parent=None) -> None:
+        super().__init__(parent)
+        self.fetch_batch = fetch_batch
+        self._dataset = None
+        self._columns = []
+        self._rows = None
+        self._loaded = 0
+        # Kept across set_dataset() and set_rows(), the rows given are expected in this order
+        self.sort_keys = ()
+        self.set_dataset(dataset, columns)
+
+    @property
+    def dataset(self):
+        return self._dataset
+
+    def set_dataset(self, dataset, columns=None) -> None:
+        """
+        Swaps the dataset shown by the model. columns picks and orders the visible columns.
+        """
+        self.beginResetModel()
+        self._dataset = dataset
+        if dataset is None:
+            self._columns = []
+        else:
+            names = columns or dataset.column_names
+            self._columns = [dataset[name] for name in names]
+        self._rows = None
+        self._loaded = min(self._total_rows(), self.fetch_batch)
+        self.endResetModel()
+
+    def append_dataset(self, dataset) -> None:
+        """
+        Swaps in a dataset holding the current one's rows plus rows appended at the end
+        (see analytics/tail.py) without resetting the view. When every row is shown and
+        fetched, the new ones are inserted like fetchMore() inserts them. A filtered view
+        keeps its rows until the next set_rows().
+        """
+        names = [col.name for col in self._columns]
+        fetched_all = self._rows is None and self._loaded == self._total_rows()
+        self._dataset = dataset
+        self._columns = [dataset[name] for name in names]
+        if fetched_all:
+            self.fetchMore()
+
+    def set_rows(self, rows) -> None:
+        """
+        Shows only the given dataset rows, in the given order. None shows every row.
+        """
+        self.beginResetModel()
+        self._rows = rows
+        self._loaded = min(self._total_rows(), self.fetch_batch)
+        self.endResetModel()
+
+    @property
+    def rows(self):
+        """
+        The dataset rows shown, in display order, None for every row in file order.
+        """
+        return self._rows
+
+    def dataset_row(self, row: int) -> int:
+        """
+        Maps a row of the model to the row of the dataset it shows.
+        """
+        if self._rows is None:
+            return row
+        return int(self._rows[row])
+
+    def _total_rows(self) -> int:
+        if self._rows is not None:
+            return len(self._rows)
+        return 0 if self._dataset is None else len(self._dataset)
+
+    def sort_column(self, section: int, ascending: bool, add: bool = False) -> None:
+        """
+        Sorts by the column at section (-1 for file order) or, with add, by the current
+        keys and then that column. The rows arrive later through set_rows().
+        """
+        if section < 0 or section >= len(self._columns):
+            keys = ()
+        else:
+            name = self._columns[section].name
+            keys = ((name, ascending),)
+            if add:
+                others = tuple(key for key in self.sort_keys if key[0] != name)
+                keys = others + keys
+        if keys != self.sort_keys:
+            self.sort_keys = keys
+            self.sort_requested.emit(keys)
+
+    # QAbstractTableModel interface
+
+    def sort(self, column: int, order=Qt.AscendingOrder) -> None:
+        add = bool(QApplication.keyboardModifiers() & Qt.ShiftModifier)
+        self.sort_column(column, order == Qt.AscendingOrder, add)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        # Table models have no children, Qt asks with a valid parent to check for that
+        if parent.isValid():
+            return 0
+        return self._loaded
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return self._columns[index.column()].format(self.dataset_row(index.row()))
+        if role == Qt.TextAlignmentRole:
+            if self._columns[index.column()].kind == NUMERIC:
+                return Qt.AlignRight | Qt.AlignVCenter
+            return Qt.AlignLeft | Qt.AlignVCenter
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self._columns[section].name
+        return str(self.dataset_row(section) + 1)
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        if parent.isValid():
+            return False
+        return self._loaded < self._total_rows()
+
+    def fetchMore(self, parent=QModelIndex()) -> None:
+        if parent.isValid():
+            return
+        count = min(self.fetch_batch, self._total_rows() - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def fetch_all(self) -> None:
+        """
+        Makes every row available at once, e.g. before jumping to the end of the table.
+        """
+        remaining = self._total_rows() - self._loaded
+        if remaining > 0:
+            self.beginInsertRows(QModelIndex(), self._loaded, self._total_rows() - 1)
+            self._loaded = self._total_rows()
+            self.endInsertRows()
+
+
+@instrumented
+class PassengerTableView(QTableView):
+    """
+    QTableView set up so that nothing in the view scales with the number of rows.
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        # With fixed section sizes the headers never measure rows, which is what keeps
+        # scrolling constant time on huge models. Interactive/ResizeToContents would
+        # ask for the size hint of every row.
+        vertical = self.verticalHeader()
+        vertical.setSectionResizeMode(QHeaderView.Fixed)
+        vertical.setDefaultSectionSize(ROW_HEIGHT)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setWordWrap(False)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        # Unsorted until a header is clicked, see PassengerTableModel.sort_column
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.setSortingEnabled(True)
+
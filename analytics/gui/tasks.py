@@ -0,0 +1,274 @@
+"""
+Background tasks on QThreadPool so slots never do heavy work on the GUI thread.
+
+In the tutorial apps every slot runs on the event loop thread, see
+MainWindow.the_button_was_clicked in tutorial/app1.py. That is fine for setting a label but
+a slot that parses a CSV freezes the window until it returns. Instead, slots hand the work
+to a TaskManager:
+
+    self.tasks.submit("load", load_dataset, path, on_result=self.show_dataset)
+
+The function runs on a pool thread and gets a TaskContext as its `progress` keyword, which
+it uses to report progress and which raises TaskCancelled once the task is cancelled.
+Long tasks can also hand over intermediate results with progress.partial(value).
+Results come back on the GUI thread through queued signals.
+
+Tasks are submitted under a key. Submitting a new task with a key that is still running
+cancels the old one, and only the newest task of a key ever delivers its result, so typing
+in a filter box or clicking through tabs never shows a stale answer.
+"""
+
+import threading
+import time
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QWidget, QLabel, QProgressBar, QHBoxLayout
+
+from analytics.gui.batching import UpdateBatcher
+from analytics.gui.profiler import instrumented
+
+# Minimum time between two progress signals of the same task. Workers can call progress()
+# as often as they like, the event loop only sees ~30 updates per second.
+PROGRESS_INTERVAL = 0.033
+
+
+class TaskCancelled(Exception):
+    """
+    Raised inside a task by TaskContext.check()/progress() once it has been cancelled.
+    """
+
+
+class TaskContext:
+    """
+    Handed to the task function. Calling it reports progress, e.g. progress(0.5, "Parsing").
+    """
+
+    def __init__(self, emit, emit_partial=None) -> None:
+        self._emit = emit
+        self._emit_partial = emit_partial
+        self._cancelled = threading.Event()
+        self._last_emit = 0.0
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self) -> None:
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+
+    def __call__(self, fraction: float, message: str = "") -> None:
+        self.check()
+        now = time.monotonic()
+        if now - self._last_emit >= PROGRESS_INTERVAL or fraction >= 1.0:
+            self._last_emit = now
+            self._emit(float(fraction), message)
+
+    def partial(self, value) -> None:
+        """
+        Delivers an intermediate result to the task's on_partial callback.
+        """
+        self.check()
+        if self._emit_partial is not None:
+            self._emit_partial(value)
+
+
+class _TaskSignals(QObject):
+    # QRunnable isn't a QObject, so the signals live on this helper
+    progress = pyqtSignal(object, float, str)
+    partial = pyqtSignal(object, object)
+    result = pyqtSignal(object, object)
+    error = pyqtSignal(object, object)
+    done = pyqtSignal(object)
+
+
+@instrumented
+class Task(QRunnable):
+
+    def __init__(self, key: str, generation: int, fn, args, kwargs) -> None:
+        super().__init__()
+        # The manager keeps the Python object alive, don't let Qt delete it under us
+        self.setAutoDelete(False)
+        self.key = key
+        self.generation = generation
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = _TaskSignals()
+        self.context = TaskContext(
+            lambda fraction, message: self.signals.progress.emit(self, fraction, message),
+            lambda value: self.signals.partial.emit(self, value),
+        )
+
+    def run(self) -> None:
+        try:
+            self.context.check()
+            value = self.fn(*self.args, progress=self.context, **self.kwargs)
+            self.context.check()
+        except TaskCancelled:
+            pass
+        except Exception as e:
+            e.traceback = traceback.format_exc()
+            self.signals.error.emit(self, e)
+        else:
+            self.signals.result.emit(self, value)
+        finally:
+            self.signals.done.emit(self)
+
+
+@instrumented
+class TaskManager(QObject):
+    """
+    Runs keyed tasks on a QThreadPool and delivers the newest result of each key.
+    """
+
+    progress = pyqtSignal(str, float, str)  # key, fraction, message
+    started = pyqtSignal(str)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str, object)  # key, exception
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, pool: QThreadPool = None, parent=None) -> None:
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._latest = {}  # key -> newest Task
+        self._callbacks = {}  # Task -> (on_result, on_error, on_partial)
+        self._generation = 0
+
+    def submit(self, key: str, fn, *args, on_result=None, on_error=None, on_partial=None,
+               **kwargs) -> Task:
+        """
+        Runs fn(*args, progress=context, **kwargs) in the pool. Any task of the same key that
+        hasn't finished yet is cancelled and its result will never be delivered.
+        on_partial receives the values the task passes to progress.partial().
+        """
+        self.cancel(key)
+        self._generation += 1
+        task = Task(key, self._generation, fn, args, kwargs)
+        task.signals.progress.connect(self._on_progress)
+        task.signals.partial.connect(self._on_partial)
+        task.signals.result.connect(self._on_result)
+        task.signals.error.connect(self._on_error)
+        task.signals.done.connect(self._on_done)
+
+        was_busy = self.busy
+        self._latest[key] = task
+        self._callbacks[task] = (on_result, on_error, on_partial)
+        self.pool.start(task)
+        self.started.emit(key)
+        if not was_busy:
+            self.busy_changed.emit(True)
+        return task
+
+    def cancel(self, key: str) -> None:
+        task = self._latest.get(key)
+        if task is None:
+            return
+        task.context.cancel()
+        # If it hasn't started yet we can take it back from the queue entirely
+        if self.pool.tryTake(task):
+            self._forget(task)
+
+    def cancel_all(self) -> None:
+        for key in list(self._latest):
+            self.cancel(key)
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._latest)
+
+    def is_running(self, key: str) -> bool:
+        return key in self._latest
+
+    def _is_current(self, task) -> bool:
+        return self._latest.get(task.key) is task and not task.context.cancelled
+
+    def _on_progress(self, task, fraction, message) -> None:
+        if self._is_current(task):
+            self.progress.emit(task.key, fraction, message)
+
+    def _on_partial(self, task, value) -> None:
+        if not self._is_current(task):
+            return
+        on_partial = self._callbacks[task][2]
+        if on_partial is not None:
+            on_partial(value)
+
+    def _on_result(self, task, value) -> None:
+        if not self._is_current(task):
+            return
+        on_result = self._callbacks[task][0]
+        if on_result is not None:
+            on_result(value)
+
+    def _on_error(self, task, error) -> None:
+        if not self._is_current(task):
+            return
+        on_error = self._callbacks[task][1]
+        if on_error is not None:
+            on_error(error)
+        self.failed.emit(task.key, error)
+
+    def _on_done(self, task) -> None:
+        self._forget(task)
+
+    def _forget(self, task) -> None:
+        self._callbacks.pop(task, None)
+        if self._latest.get(task.key) is task:
+            del self._latest[task.key]
+            self.finished.emit(task.key)
+            if not self._latest:
+                self.busy_changed.emit(False)
+
+
+@instrumented
+class TaskProgress(QWidget):
+    """
+    Status bar widget showing the message and progress of the running tasks.
+
+        window.statusBar().addPermanentWidget(TaskProgress(window.tasks))
+    """
+
+    def __init__(self, manager: TaskManager, parent=None) -> None:
+        super().__init__(parent)
+        self.label = QLabel()
+        self.bar = QProgressBar()
+        self.bar.setRange(0, 1000)
+        self.bar.setMaximumWidth(160)
+        self.bar.setTextVisible(False)
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label)
+        layout.addWidget(self.bar)
+        self.setLayout(layout)
+        self.setVisible(False)
+
+        # Several tasks can report at once, the widgets change at most once per frame
+        self.batcher = UpdateBatcher(parent=self)
+        self.batcher.add_widget(self.label)
+        self.batcher.add_widget(self.bar)
+
+        manager.progress.connect(self.on_progress)
+        manager.started.connect(self.on_started)
+        manager.busy_changed.connect(self.setVisible)
+
+    def on_started(self, key: str) -> None:
+        self.batcher.post("progress", self._show_busy, key)
+
+    def on_progress(self, key: str, fraction: float, message: str) -> None:
+        self.batcher.post("progress", self._show_progress, message or key, fraction)
+
+    def _show_busy(self, text: str) -> None:
+        self.label.setText(text)
+        # Busy indicator until the task reports its first progress
+        self.bar.setRange(0, 0)
+
+    def _show_progress(self, text: str, fraction: float) -> None:
+        self.label.setText(text)
+        self.bar.setRange(0, 1000)
+        self.bar.setValue(int(fraction * 1000))
@@ -0,0 +1,292 @@
+"""
+Joining passenger files on PassengerId, and comparing submission files.
+
+data/test.csv, data/gender_submission.csv and every model's submission share the
+PassengerId column. A JoinIndex maps the keys of one dataset to its rows, so joining
+another dataset to it is one vectorized lookup of the other's keys, never a Python loop
+or a dict per row:
+
+    dense     integer keys spanning at most DENSE_RATIO times the rows (PassengerIds are
+              1..n) get a slot table indexed by key - min, one gather per lookup
+    sorted    other keys are argsorted once and looked up with searchsorted, the NumPy
+              counterpart of a hash table that doesn't need one Python object per key
+
+The indexed side must have unique keys, the other side may repeat them. join_rows()
+gives the matching (left rows, right rows) of an inner or left join and join() the joined
+dataset, right columns null where a left join found no match.
+
+compare_submissions() aligns any number of submission files to a base file (train.csv,
+whose Survived is the ground truth, or test.csv) and returns a SubmissionComparison:
+accuracy and a confusion matrix per submission when the base has the truth, and the
+agreement of every pair of submissions on the passengers both predict.
+
+Indexes and alignments go to a ResultCache when one is given, keyed on the file version
+like every other cached result. The base index is built once, and comparing one more
+submission costs a single lookup pass over its keys, the others are cache hits.
+
+    comparison = compare_submissions(load_dataset("data/train.csv"), submissions, cache=results)
+    comparison.accuracy()
+"""
+
+import os
+
+import numpy as np
+
+from analytics.columns import Dataset, NumericColumn, CategoricalColumn, StringColumn, pack_validity
+from analytics.schema import NUMERIC, CATEGORICAL
+
+JOIN_KEY = "PassengerId"
+# Keys spanning up to this many times the number of rows get a dense slot table
+DENSE_RATIO = 4
+# Lookups of more keys than this in a sorted index search them in sorted order, which
+# keeps the binary searches in cache
+SORTED_LOOKUP_MIN = 65536
+
+
+class JoinIndex:
+    """
+    Row of every key of one column. Null keys are left out and never match.
+    """
+
+    def __init__(self, keys: np.ndarray, null: np.ndarray = None) -> None:
+        rows = np.arange(len(keys)) if null is None else np.flatnonzero(~null)
+        keys = keys if null is None else keys[rows]
+        self.size = len(keys)
+        self.dense = False
+        if keys.dtype.kind in "iu" and len(keys):
+            low, high = int(keys.min()), int(keys.max())
+            span = high - low + 1
+            if span <= DENSE_RATIO * len(keys):
+                self.dense = True
+                self.low = low
+                counts = np.bincount(keys.astype(np.int64) - low, minlength=span)
+                if counts.max() > 1:
+                    self._duplicate(keys[counts[keys.astype(np.int64) - low] > 1])
+                index_type = np.int32 if len(rows) < 2 ** 31 else np.int64
+                self.slots = np.full(span, -1, dtype=index_type)
+                self.slots[keys.astype(np.int64) - low] = rows
+                return
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.rows = rows[order]
+        repeated = self.keys[1:] == self.keys[:-1]
+        if repeated.any():
+            self._duplicate(self.keys[1:][repeated])
+
+    @staticmethod
+    def _duplicate(keys: np.ndarray) -> None:
+        raise ValueError("Join keys must be unique, {} appears more than once".format(keys[0]))
+
+    @classmethod
+    def build(cls, dataset: Dataset, on: str = JOIN_KEY) -> "JoinIndex":
+        col = _key_column(dataset, on)
+        return cls(col.values, col.null_mask() if col.validity is not None else None)
+
+    def lookup(self, keys: np.ndarray, null: np.ndarray = None) -> np.ndarray:
+        """
+        The indexed row of every key, -1 where it isn't in the index (or null).
+        """
+        result = np.full(len(keys), -1, dtype=np.int64)
+        if self.size == 0:
+            return result
+        if self.dense:
+            if keys.dtype.kind == "f":
+                whole = np.isfinite(keys) & (keys == np.floor(keys))
+                keys = np.where(whole, keys, self.low - 1)
+            offset = keys.astype(np.int64) - self.low
+            inside = (offset >= 0) & (offset < len(self.slots))
+            result[inside] = self.slots[offset[inside]]
+        else:
+            if len(keys) >= SORTED_LOOKUP_MIN:
+                order = np.argsort(keys)
+                position = np.empty(len(keys), dtype=np.int64)
+                position[order] = np.searchsorted(self.keys, keys[order])
+            else:
+                position = np.searchsorted(self.keys, keys)
+            position = np.minimum(position, self.size - 1)
+            found = self.keys[position] == keys
+            result[found] = self.rows[position[found]]
+        if null is not None:
+            result[null] = -1
+        return result
+
+
+def _key_column(dataset: Dataset, on: str):
+    if on not in dataset:
+        raise ValueError("{} has no {} column to join on".format(dataset.source, on))
+    col = dataset[on]
+    if col.kind != NUMERIC:
+        raise ValueError("Join column {} of {} isn't numeric".format(on, dataset.source))
+    return col
+
+
+def index_for(dataset: Dataset, on: str = JOIN_KEY, cache=None) -> JoinIndex:
+    """
+    The JoinIndex of dataset's on column, from cache (a ResultCache) when given.
+    """
+    if cache is None:
+        return JoinIndex.build(dataset, on)
+    return cache.get_or_compute(dataset, ("join index", on), lambda: JoinIndex.build(dataset, on))
+
+
+def join_rows(left: Dataset, right: Dataset, on: str = JOIN_KEY, how: str = "inner", cache=None) -> tuple:
+    """
+    (left rows, right rows) of the rows of left and right with the same key, in the
+    order of left. right's keys must be unique. With how="left" every row of left is
+    kept and right rows is -1 where it has no match.
+    """
+    if how not in ("inner", "left"):
+        raise ValueError("Unknown join {!r}, expected 'inner' or 'left'".format(how))
+    col = _key_column(left, on)
+    matched = index_for(right, on, cache).lookup(col.values, col.null_mask() if col.validity is not None else None)
+    if how == "left":
+        return np.arange(len(left)), matched
+    found = np.flatnonzero(matched >= 0)
+    return found, matched[found]
+
+
+def _take_or_null(col, rows: np.ndarray):
+    """
+    col.take(rows), with nulls where rows is -1.
+    """
+    missing = rows < 0
+    if not missing.any():
+        return col.take(rows)
+    present = np.flatnonzero(~missing)
+    taken = col.take(rows[present])
+    valid = np.zeros(len(rows), dtype=np.bool_)
+    valid[present] = ~taken.null_mask()
+    validity = pack_validity(valid)
+    if col.kind == NUMERIC:
+        values = np.zeros(len(rows), dtype=taken.values.dtype)
+        if values.dtype.kind == "f":
+            values[:] = np.nan
+        values[present] = taken.values
+        return NumericColumn(col.name, values, validity)
+    if col.kind == CATEGORICAL:
+        codes = np.full(len(rows), -1, dtype=taken.codes.dtype)
+        codes[present] = taken.codes
+        return CategoricalColumn(col.name, codes, col.categories, validity)
+    data, offsets = taken.compact()
+    lengths = np.zeros(len(rows), dtype=np.int64)
+    lengths[present] = np.diff(offsets)
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return StringColumn(col.name, data, offsets, validity)
+
+
+def join(left: Dataset, right: Dataset, on: str = JOIN_KEY, how: str = "inner", suffix: str = "_right",
+         cache=None) -> Dataset:
+    """
+    The columns of left and right side by side for rows with the same key (see
+    join_rows). right's key column is dropped, its other columns that left has too get
+    suffix appended to their name.
+    """
+    left_rows, right_rows = join_rows(left, right, on, how, cache)
+    columns = {name: left[name].take(left_rows) for name in left.column_names}
+    for name in right.column_names:
+        if name == on:
+            continue
+        col = _take_or_null(right[name], right_rows)
+        if name in columns:
+            col.name = name + suffix
+        columns[col.name] = col
+    return Dataset(columns, left.source)
+
+
+def _aligned(base: Dataset, submission: Dataset, on: str, target: str, cache) -> np.ndarray:
+    """
+    submission's target for every row of base as int8, -1 where it has no prediction.
+    """
+    if target not in submission:
+        raise ValueError("{} has no {} column".format(submission.source, target))
+    key, col = _key_column(submission, on), submission[target]
+    # One lookup of the submission's keys in base's (cached) index
+    rows = index_for(base, on, cache).lookup(key.values, key.null_mask() if key.validity is not None else None)
+    found = rows >= 0
+    if col.validity is not None:
+        found &= ~col.null_mask()
+    values = np.full(len(base), -1, dtype=np.int8)
+    values[rows[found]] = col.values[found] != 0
+    return values
+
+
+class SubmissionComparison:
+    """
+    Predictions of several submissions aligned to the rows of a base file.
+
+    predictions is an int8 (submissions, rows) matrix, -1 where a submission has no
+    prediction for a passenger. truth is the base's own target column (or None).
+    """
+
+    def __init__(self, names: list, predictions: np.ndarray, truth: np.ndarray = None) -> None:
+        self.names = list(names)
+        self.predictions = predictions
+        self.truth = truth
+
+    def matched(self) -> np.ndarray:
+        """
+        Passengers of the base every submission predicts.
+        """
+        return (self.predictions >= 0).sum(axis=1)
+
+    def confusion(self, i: int) -> np.ndarray:
+        """
+        2x2 counts of submission i against the truth: rows actual 0/1, columns predicted
+        0/1.
+        """
+        if self.truth is None:
+            raise ValueError("The base file has no ground truth to compare with")
+        predicted = self.predictions[i]
+        both = (predicted >= 0) & (self.truth >= 0)
+        cells = 2 * self.truth[both].astype(np.int64) + predicted[both]
+        return np.bincount(cells, minlength=4).reshape(2, 2)
+
+    def accuracy(self) -> np.ndarray:
+        """
+        Fraction of correct predictions per submission (NaN with nothing to score).
+        """
+        if self.truth is None:
+            raise ValueError("The base file has no ground truth to compare with")
+        both = (self.predictions >= 0) & (self.truth >= 0)
+        correct = (both & (self.predictions == self.truth)).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return correct / both.sum(axis=1)
+
+    def agreement(self) -> np.ndarray:
+        """
+        (submissions, submissions) fraction of the passengers two submissions both
+        predict on which they predict the same.
+        """
+        present = (self.predictions >= 0).astype(np.float64)
+        survived = present * (self.predictions == 1)
+        died = present - survived
+        both = present @ present.T
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (survived @ survived.T + died @ died.T) / both
+
+
+def compare_submissions(base: Dataset, submissions: list, on: str = JOIN_KEY, target: str = "Survived",
+                        cache=None) -> SubmissionComparison:
+    """
+    Aligns the target column of every submission dataset to the rows of base. base's
+    own target, if it has one, is the truth.
+    """
+    names = [os.path.basename(s.source) if s.source else "submission {}".format(i + 1)
+             for i, s in enumerate(submissions)]
+    predictions = np.empty((len(submissions), len(base)), dtype=np.int8)
+    for i, submission in enumerate(submissions):
+        query = ("aligned", base.source, base.fingerprint, on, target)
+        if cache is None or base.fingerprint is None:
+            predictions[i] = _aligned(base, submission, on, target, cache)
+        else:
+            predictions[i] = cache.get_or_compute(
+                submission, query, lambda: _aligned(base, submission, on, target, cache)
+            )
+    truth = None
+    if target in base:
+        col = base[target]
+        truth = (col.values != 0).astype(np.int8)
+        if col.validity is not None:
+            truth[col.null_mask()] = -1
+    return SubmissionComparison(names, predictions, truth)
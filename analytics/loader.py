@@ -0,0 +1,471 @@
+"""
+Loads the passenger CSVs in data/ into typed columns.
+
+The CSV is only parsed the first time a file is opened. The parsed columns are then written
+to a binary sidecar next to the CSV (train.csv -> train.csv.cols) and every later load just
+memory-maps that file, so no parsing happens at startup at all. The sidecar remembers the
+size and modification time of the CSV it was built from and is rebuilt when they change.
+
+Parsing works on blocks of rows: csv.reader splits a block, zip(*rows) turns it into one
+tuple per column and NumPy converts each tuple in a single call. We never build a dict or
+any other Python object per row that outlives its block: string columns are encoded into
+one UTF-8 buffer per column (see columns.StringColumn) and the derived columns (title,
+surname, ticket prefix and deck, see schema.DERIVED_COLUMNS) are parsed from the block's
+fields and dictionary encoded right away.
+
+Summaries that are cheap to keep but expensive to recompute (EXTRAS: the per-partition
+quantile sketches and the facet bitmaps) are built right after parsing and stored in the
+same sidecar.
+
+Sidecar layout:
+    MAGIC | uint64 header length | JSON header | column and extras buffers (each aligned to 64 bytes)
+"""
+
+import csv
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from dataclasses import replace
+from itertools import islice
+
+import numpy as np
+
+from analytics.columns import (
+    Dataset, NumericColumn, CategoricalColumn, StringColumn, pack_validity, encode_strings, join_strings
+)
+from analytics.schema import NUMERIC, CATEGORICAL, STRING, PASSENGER_COLUMNS, DERIVED_FROM, spec_for
+from analytics.facets import BitmapIndex
+from analytics.sketches import SketchIndex
+
+CACHE_SUFFIX = ".cols"
+CACHE_MAGIC = b"SQTCOLS1"
+CACHE_VERSION = 5
+# Each block is parsed by C code that holds the GIL, small blocks let the GUI thread run
+# in between when loading on a worker thread (see gui/tasks.py)
+BLOCK_ROWS = 8192
+_ALIGN = 64
+_SAMPLE_BYTES = 64 * 1024
+# Below this size starting worker processes costs more than it saves
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+# Columns that aren't in the schema are dictionary encoded when at most this share of
+# their values is distinct
+INTERN_RATIO = 0.5
+# Dataset.extras built at load time. Each type has applies(dataset), build(dataset),
+# extend(dataset, start) for appended rows (see analytics/tail.py),
+# to_buffers() -> (meta, arrays) and from_buffers(meta, arrays).
+EXTRAS = {"sketches": SketchIndex, "facets": BitmapIndex}
+
+
+def file_fingerprint(path: str) -> tuple:
+    """
+    Identifies one version of a file on disk: (size, mtime in ns, content hash).
+
+    Hashing a multi-gigabyte file would take longer than loading it, so the hash only
+    covers the first and last 64 KiB. Together with size and mtime that catches rewrites
+    that keep the timestamp, e.g. on filesystems with coarse mtimes.
+    """
+    st = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(_SAMPLE_BYTES))
+        if st.st_size > _SAMPLE_BYTES:
+            f.seek(max(_SAMPLE_BYTES, st.st_size - _SAMPLE_BYTES))
+            digest.update(f.read(_SAMPLE_BYTES))
+    return (st.st_size, st.st_mtime_ns, digest.hexdigest())
+
+
+def is_stale(fingerprint: tuple, path: str) -> bool:
+    """
+    Cheap check (one stat call) for whether the file changed since fingerprint was taken.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return True
+    return fingerprint is None or (st.st_size, st.st_mtime_ns) != tuple(fingerprint[:2])
+
+
+def cache_path(path: str) -> str:
+    return path + CACHE_SUFFIX
+
+
+class _ColumnBuilder:
+    """
+    Collects the blocks of one column and converts them to the spec's storage type.
+    """
+
+    def __init__(self, spec) -> None:
+        self.spec = spec
+        self.parts = []
+        self.valid_parts = []
+        # Categorical columns share one dictionary across all blocks
+        self.categories = {}
+
+    def append(self, raw: tuple) -> None:
+        spec = self.spec
+        if spec.kind == STRING:
+            data, offsets = encode_strings(raw)
+            blank = offsets[1:] == offsets[:-1]
+        else:
+            text = np.array(raw)
+            blank = text == ""
+        if blank.any():
+            if not spec.nullable:
+                raise ValueError("Column {} has blank values but is not nullable".format(spec.name))
+        self.valid_parts.append(~blank)
+
+        if spec.kind == NUMERIC:
+            if blank.any():
+                if np.dtype(spec.dtype).kind != "f":
+                    raise ValueError("Column {} can't store blanks in {}".format(spec.name, spec.dtype))
+                # np.where widens the dtype, assigning into a <U2 block would store "na"
+                text = np.where(blank, "nan", text)
+            self.parts.append(text.astype(spec.dtype))
+
+        elif spec.kind == CATEGORICAL:
+            uniques, inverse = np.unique(text, return_inverse=True)
+            # Map the block-local codes from np.unique onto the column wide dictionary
+            remap = np.array(
+                [-1 if u == "" else self.categories.setdefault(u, len(self.categories)) for u in uniques.tolist()],
+                dtype=np.int32,
+            )
+            self.parts.append(remap[inverse.ravel()])
+
+        else:
+            self.parts.append((data, offsets))
+
+    def flush(self):
+        """
+        Returns the rows appended since the last flush as a column. The categorical
+        dictionary is kept, so codes mean the same thing in every flushed column.
+        """
+        spec = self.spec
+        if spec.kind == STRING:
+            data, offsets = join_strings(self.parts)
+            validity = pack_validity(np.concatenate(self.valid_parts)) if self.valid_parts else None
+            self.parts = []
+            self.valid_parts = []
+            return StringColumn(spec.name, data, offsets, validity)
+        if not self.parts:
+            self.parts = [np.array([], dtype=spec.dtype or object)]
+            self.valid_parts = [np.array([], dtype=np.bool_)]
+
+        values = np.concatenate(self.parts)
+        validity = pack_validity(np.concatenate(self.valid_parts))
+        self.parts = []
+        self.valid_parts = []
+        if spec.kind == NUMERIC:
+            return NumericColumn(spec.name, values, validity)
+        code_type = np.int16 if len(self.categories) < np.iinfo(np.int16).max else np.int32
+        return CategoricalColumn(spec.name, values.astype(code_type), list(self.categories), validity)
+
+
+def _title(name: str) -> str:
+    # "Braund, Mr. Owen Harris" -> "Mr"
+    _, comma, rest = name.partition(",")
+    title, dot, _ = rest.partition(".")
+    return title.strip() if comma and dot else ""
+
+
+def _surname(name: str) -> str:
+    surname, comma, _ = name.partition(",")
+    return surname.strip() if comma else ""
+
+
+def _ticket_prefix(ticket: str) -> str:
+    # "STON/O2. 3101282" -> "STON/O2.", "113803" -> "", "LINE" -> "LINE"
+    prefix, _, _ = ticket.rpartition(" ")
+    return prefix if prefix or ticket.isdigit() else ticket
+
+
+def _deck(cabin: str) -> str:
+    # "C85" -> "C", several cabins are on one deck
+    return cabin[:1]
+
+
+# Derived column -> function that parses it from one value of its source column
+# (schema.DERIVED_FROM), blank when the value doesn't have the field
+DERIVED_FIELDS = {"Title": _title, "Surname": _surname, "TicketPrefix": _ticket_prefix, "Deck": _deck}
+
+
+class TableBuilder:
+    """
+    Turns blocks of parsed CSV rows (lists of field strings) into typed columns, followed
+    by the derived columns of the columns it has.
+
+    header may be the column names of a loaded dataset, its derived columns are left out.
+    """
+
+    def __init__(self, header: list, source: str = None) -> None:
+        self.header = [name for name in header if DERIVED_FROM.get(name) not in header]
+        self.source = source
+        self.builders = [_ColumnBuilder(spec_for(name)) for name in self.header]
+        self.derived = [
+            (self.header.index(DERIVED_FROM[name]), DERIVED_FIELDS[name], _ColumnBuilder(spec_for(name)))
+            for name in DERIVED_FIELDS if DERIVED_FROM[name] in self.header
+        ]
+
+    def append_rows(self, rows: list) -> None:
+        width = len(self.header)
+        # zip would silently drop the extra fields of a ragged row, so check first
+        if any(len(row) != width for row in rows):
+            bad = next(row for row in rows if len(row) != width)
+            raise ValueError("{}: expected {} fields, got {} in row {!r}".format(self.source, width, len(bad), bad))
+        fields = list(zip(*rows))
+        for builder, raw in zip(self.builders, fields):
+            builder.append(raw)
+        for index, parse, builder in self.derived:
+            builder.append(tuple(map(parse, fields[index])))
+
+    def continue_from(self, dataset: Dataset) -> "TableBuilder":
+        """
+        Makes the rows appended from now on continue dataset: categorical codes mean
+        what they mean in its columns and new categories get the next codes.
+        """
+        for builder in self.builders + [builder for _, _, builder in self.derived]:
+            col = dataset[builder.spec.name]
+            if col.kind == CATEGORICAL:
+                # Also for string columns intern_strings() dictionary encoded
+                builder.spec = replace(builder.spec, kind=CATEGORICAL)
+                builder.categories = {c: i for i, c in enumerate(col.categories)}
+        return self
+
+    def flush(self, fingerprint: tuple = None) -> Dataset:
+        """
+        Returns the rows appended since the last flush as a Dataset.
+        """
+        builders = self.builders + [builder for _, _, builder in self.derived]
+        columns = {builder.spec.name: builder.flush() for builder in builders}
+        return Dataset(columns, source=self.source, fingerprint=fingerprint)
+
+
+def intern_strings(dataset: Dataset, ratio: float = INTERN_RATIO) -> Dataset:
+    """
+    Dictionary encodes the string columns that aren't in the schema (which keeps Name
+    and Ticket as strings) when at most `ratio` of their values are distinct. Categories
+    are sorted. Replaces the columns in place and returns dataset.
+    """
+    for name, col in list(dataset.columns.items()):
+        if col.kind != STRING or name in PASSENGER_COLUMNS or len(col) == 0:
+            continue
+        # A look at the first block rules out most columns without decoding them all
+        sample = col.decode(0, BLOCK_ROWS)
+        if len(set(sample)) > ratio * len(sample):
+            continue
+        categories, codes = np.unique(np.array(col.decode(), dtype=object), return_inverse=True)
+        codes = codes.ravel().astype(np.int32)
+        if len(categories) and categories[0] == "":
+            # Blank is null, code -1
+            codes -= 1
+            categories = categories[1:]
+        if len(categories) > ratio * len(col):
+            continue
+        code_type = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+        dataset.columns[name] = CategoricalColumn(name, codes.astype(code_type), categories.tolist(), col.validity)
+    return dataset
+
+
+def read_csv(path: str, block_rows: int = BLOCK_ROWS, progress=None) -> Dataset:
+    """
+    Parses a passenger CSV into a Dataset without touching the sidecar cache.
+    progress, if given, is called as progress(fraction, message) after every block.
+    """
+    fingerprint = file_fingerprint(path)
+    size = max(fingerprint[0], 1)
+    message = "Parsing {}".format(os.path.basename(path))
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        table = TableBuilder(next(reader), source=path)
+
+        while True:
+            rows = list(islice(reader, block_rows))
+            if not rows:
+                break
+            table.append_rows(rows)
+            if progress is not None:
+                # The text layer can't tell() while iterating, the byte buffer under it can
+                progress(min(f.buffer.tell() / size, 1.0), message)
+
+    return intern_strings(table.flush(fingerprint))
+
+
+# Sidecar cache
+
+def write_cache(dataset: Dataset, path: str = None) -> str:
+    """
+    Writes the dataset to its binary sidecar file and returns the sidecar path.
+    """
+    path = path or cache_path(dataset.source)
+    buffers = []
+    entries = []
+    columns = []
+
+    def add(array) -> dict:
+        array = np.ascontiguousarray(array)
+        buffers.append(array)
+        entries.append({"dtype": array.dtype.str, "count": len(array)})
+        return entries[-1]
+
+    for col in dataset.columns.values():
+        entry = {"name": col.name, "kind": col.kind}
+        if col.kind == NUMERIC:
+            entry["values"] = add(col.values)
+        elif col.kind == CATEGORICAL:
+            entry["codes"] = add(col.codes)
+            entry["categories"] = col.categories
+        else:
+            data, offsets = col.compact()
+            entry["data"] = add(data)
+            entry["offsets"] = add(offsets)
+        if col.validity is not None:
+            entry["validity"] = add(col.validity)
+        columns.append(entry)
+
+    extras = {}
+    for name, extra in dataset.extras.items():
+        meta, arrays = extra.to_buffers()
+        extras[name] = {"meta": meta, "buffers": {key: add(array) for key, array in arrays.items()}}
+
+    # Lay the buffers out after the header, each aligned so it can be viewed in place
+    def layout(header_size: int) -> int:
+        offset = len(CACHE_MAGIC) + 8 + header_size
+        for entry, array in zip(entries, buffers):
+            offset = -(-offset // _ALIGN) * _ALIGN
+            entry["offset"] = offset
+            offset += array.nbytes
+        return offset
+
+    header = {
+        "version": CACHE_VERSION,
+        "fingerprint": list(dataset.fingerprint) if dataset.fingerprint else None,
+        "rows": len(dataset),
+        "columns": columns,
+        "extras": extras,
+    }
+    # Offsets depend on the header size and the header contains the offsets, so lay out
+    # twice with padding room for the header to grow
+    layout(0)
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_size = len(header_bytes) + 256
+    layout(header_size)
+    header_bytes = json.dumps(header).encode("utf-8").ljust(header_size)
+
+    # A temporary file of its own: batch workers loading the same file write the same
+    # sidecar at the same time, and a shared name would let them clobber each other
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                                    dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(CACHE_MAGIC)
+            f.write(struct.pack("<Q", header_size))
+            f.write(header_bytes)
+            for entry, array in zip(entries, buffers):
+                f.write(b"\0" * (entry["offset"] - f.tell()))
+                f.write(array.tobytes())
+        # Readers may have the old sidecar mapped, replace it atomically instead of truncating
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+def read_cache_header(path: str) -> dict:
+    with open(path, "rb") as f:
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            raise ValueError("{} is not a column cache".format(path))
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        return json.loads(f.read(header_size))
+
+
+def read_cache(path: str, source: str = None) -> Dataset:
+    """
+    Memory-maps a sidecar file. Every column is a view into the map (strings included,
+    they are stored as their UTF-8 buffer), nothing is copied until it is modified.
+    """
+    header = read_cache_header(path)
+    if header["version"] != CACHE_VERSION:
+        raise ValueError("{} has cache version {}, expected {}".format(path, header["version"], CACHE_VERSION))
+
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def view(entry) -> np.ndarray:
+        dtype = np.dtype(entry["dtype"])
+        start = entry["offset"]
+        return mapped[start:start + dtype.itemsize * entry["count"]].view(dtype)
+
+    columns = {}
+    for entry in header["columns"]:
+        name = entry["name"]
+        validity = view(entry["validity"]) if "validity" in entry else None
+        if entry["kind"] == NUMERIC:
+            columns[name] = NumericColumn(name, view(entry["values"]), validity)
+        elif entry["kind"] == CATEGORICAL:
+            columns[name] = CategoricalColumn(name, view(entry["codes"]), entry["categories"], validity)
+        else:
+            columns[name] = StringColumn(name, view(entry["data"]), view(entry["offsets"]), validity)
+
+    fingerprint = tuple(header["fingerprint"]) if header["fingerprint"] else None
+    dataset = Dataset(columns, source=source, fingerprint=fingerprint)
+    for name, entry in header["extras"].items():
+        if name in EXTRAS:
+            arrays = {key: view(buffer) for key, buffer in entry["buffers"].items()}
+            dataset.extras[name] = EXTRAS[name].from_buffers(entry["meta"], arrays)
+    return dataset
+
+
+def build_extras(dataset: Dataset) -> Dataset:
+    """
+    Fills dataset.extras with every EXTRAS type that applies to its columns.
+    """
+    for name, extra_type in EXTRAS.items():
+        if extra_type.applies(dataset):
+            dataset.extras[name] = extra_type.build(dataset)
+    return dataset
+
+
+def parse_csv(path: str, workers: int = 1, progress=None) -> Dataset:
+    """
+    read_csv, or analytics.parallel.read_csv_parallel for big files when workers is more
+    than 1. workers=None means one per core.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and os.path.getsize(path) >= PARALLEL_MIN_BYTES:
+        from analytics.parallel import read_csv_parallel
+        return read_csv_parallel(path, workers, progress=progress)
+    return read_csv(path, progress=progress)
+
+
+def load_dataset(path: str, use_cache: bool = True, progress=None, workers: int = 1) -> Dataset:
+    """
+    Loads a passenger CSV, going through the sidecar cache whenever it is up to date.
+    A CSV that has to be parsed is parsed by `workers` processes, see parse_csv.
+    Column store files (.pcol, see analytics/store.py) are read as they are.
+    """
+    if path.endswith(".pcol"):
+        from analytics.store import read_store
+        return read_store(path)
+    if not use_cache:
+        return build_extras(parse_csv(path, workers, progress=progress))
+
+    sidecar = cache_path(path)
+    fingerprint = file_fingerprint(path)
+    if os.path.exists(sidecar):
+        try:
+            header = read_cache_header(sidecar)
+            if header["version"] == CACHE_VERSION and tuple(header["fingerprint"] or ()) == fingerprint:
+                return read_cache(sidecar, source=path)
+        except (ValueError, OSError, KeyError):
+            # A corrupt or foreign sidecar is just rebuilt below
+            pass
+
+    dataset = build_extras(parse_csv(path, workers, progress=progress))
+    try:
+        write_cache(dataset, sidecar)
+    except OSError:
+        # data/ may be read-only, the cache is an optimisation only
+        pass
+    return dataset
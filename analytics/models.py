@@ -0,0 +1,385 @@
+"""
+Survival models trained on the passenger columns: feature encoding, logistic regression
+and gradient-boosted trees, in NumPy only.
+
+FeatureEncoder turns a Dataset into a float32 matrix without a loop over rows:
+
+    Pclass, Sex, Embarked   one-hot, through a lookup from each dataset's category codes
+                            to the encoder's columns (test.csv numbers its categories in
+                            its own order). A missing port is all zeros.
+    Age                     missing ages imputed with the median of the passenger's class
+                            and sex in the training data, plus an Age missing flag
+    SibSp, Parch            as they are
+    Fare                    log(1 + fare), missing fares get their class's median
+
+Everything it learns (categories, medians) comes from the training rows, so encoding the
+test file uses the training statistics.
+
+LogisticRegression fits with Newton's method (IRLS) and an L2 penalty. The features are
+standardized first, so a dozen iterations converge and each one is two matrix products
+over the rows.
+
+GradientBoostedTrees is histogram based: every feature is cut into at most `bins`
+quantile bins once, and every level of every tree is grown from per-node sums of the
+log-loss gradients and hessians (np.bincount per feature), with Newton leaf values.
+Trees are complete binary trees in arrays, a node that doesn't split sends all its rows
+left, so predicting is `depth` vectorized steps over all rows.
+
+train_model() fits on a seeded split, reports accuracy on the held out part and refits on
+all rows. It takes a progress(fraction, message) callback like the loaders. Training out
+of process and scoring files are in analytics/training.py.
+"""
+
+import time
+
+import numpy as np
+
+from analytics.schema import CATEGORICAL
+
+ONE_HOT = ["Pclass", "Sex", "Embarked"]
+TARGET = "Survived"
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -35, 35)))
+
+
+def _values(col) -> list:
+    # Category names of a categorical column, distinct values of a numeric one
+    if col.kind == CATEGORICAL:
+        return list(col.categories)
+    return np.unique(col.values).tolist()
+
+
+def _take(values: np.ndarray, rows) -> np.ndarray:
+    return values if rows is None else values[rows]
+
+
+def _one_hot_index(col, values: list, rows) -> np.ndarray:
+    """
+    Position of each row's value in values, -1 for nulls and unseen values.
+    """
+    position = {v: i for i, v in enumerate(values)}
+    if col.kind == CATEGORICAL:
+        lookup = np.array([position.get(c, -1) for c in col.categories] + [-1], dtype=np.int64)
+        # Code -1 (null) picks the trailing -1
+        return lookup[_take(col.codes, rows)]
+    data = _take(col.values, rows)
+    known = np.array(values)
+    index = np.searchsorted(known, data)
+    index = np.minimum(index, len(known) - 1)
+    return np.where(known[index] == data, index, -1)
+
+
+class FeatureEncoder:
+
+    def __init__(self) -> None:
+        self.categories = {}  # one-hot column -> values, in feature order
+        self.age_medians = None  # [Pclass position, Sex position] -> median age
+        self.age_median = None
+        self.fare_medians = None  # [Pclass position] -> median fare
+        self.feature_names = []
+
+    def fit(self, dataset, rows=None) -> "FeatureEncoder":
+        self.categories = {name: _values(dataset[name]) for name in ONE_HOT if name in dataset}
+        missing = [name for name in ["Pclass", "Sex", "Age", "SibSp", "Parch", "Fare"] if name not in dataset]
+        if missing:
+            raise ValueError("Can't encode without the columns {}".format(", ".join(missing)))
+
+        pclass = _one_hot_index(dataset["Pclass"], self.categories["Pclass"], rows)
+        sex = _one_hot_index(dataset["Sex"], self.categories["Sex"], rows)
+        age = self._numeric(dataset, "Age", rows)
+        fare = self._numeric(dataset, "Fare", rows)
+        classes, sexes = len(self.categories["Pclass"]), len(self.categories["Sex"])
+
+        known = ~np.isnan(age)
+        self.age_median = float(np.median(age[known])) if known.any() else 0.0
+        self.age_medians = np.full((classes, sexes), self.age_median)
+        group = pclass * sexes + sex
+        for g in np.unique(group[known & (pclass >= 0) & (sex >= 0)]):
+            self.age_medians.flat[g] = np.median(age[known & (group == g)])
+
+        known = ~np.isnan(fare)
+        overall = float(np.median(fare[known])) if known.any() else 0.0
+        self.fare_medians = np.full(classes, overall)
+        for c in range(classes):
+            in_class = known & (pclass == c)
+            if in_class.any():
+                self.fare_medians[c] = np.median(fare[in_class])
+
+        self.feature_names = (
+            ["{}={}".format(name, v) for name in ONE_HOT if name in self.categories for v in self.categories[name]]
+            + ["Age", "Age missing", "SibSp", "Parch", "log Fare"]
+        )
+        return self
+
+    @staticmethod
+    def _numeric(dataset, name: str, rows) -> np.ndarray:
+        col = dataset[name]
+        values = _take(col.values, rows).astype(np.float64)
+        if col.validity is not None:
+            values[_take(col.null_mask(), rows)] = np.nan
+        return values
+
+    def transform(self, dataset, rows=None) -> np.ndarray:
+        """
+        Feature matrix (rows x len(feature_names), float32) for dataset rows: None for
+        all, an index array, or a slice (batches of a big file, the columns are sliced
+        without a copy).
+        """
+        if rows is None:
+            count = len(dataset)
+        elif isinstance(rows, slice):
+            count = len(range(*rows.indices(len(dataset))))
+        else:
+            count = len(rows)
+        X = np.zeros((count, len(self.feature_names)), dtype=np.float32)
+        column = 0
+        positions = {}
+        for name, values in self.categories.items():
+            if name in dataset:
+                index = _one_hot_index(dataset[name], values, rows)
+                positions[name] = index
+                hit = np.flatnonzero(index >= 0)
+                X[hit, column + index[hit]] = 1.0
+            else:
+                positions[name] = np.full(count, -1)
+            column += len(values)
+
+        age = self._numeric(dataset, "Age", rows)
+        missing = np.isnan(age)
+        pclass, sex = positions["Pclass"], positions["Sex"]
+        known_group = (pclass >= 0) & (sex >= 0)
+        imputed = np.where(known_group, self.age_medians[np.maximum(pclass, 0), np.maximum(sex, 0)], self.age_median)
+        X[:, column] = np.where(missing, imputed, age)
+        X[:, column + 1] = missing
+        X[:, column + 2] = _take(dataset["SibSp"].values, rows)
+        X[:, column + 3] = _take(dataset["Parch"].values, rows)
+        fare = self._numeric(dataset, "Fare", rows)
+        imputed = np.where(pclass >= 0, self.fare_medians[np.maximum(pclass, 0)], np.median(self.fare_medians))
+        X[:, column + 4] = np.log1p(np.maximum(np.where(np.isnan(fare), imputed, fare), 0))
+        return X
+
+
+class LogisticRegression:
+
+    name = "Logistic regression"
+
+    def __init__(self, l2: float = 1.0, iterations: int = 25, tolerance: float = 1e-6) -> None:
+        self.l2 = l2
+        self.iterations = iterations
+        self.tolerance = tolerance
+        self.mean = None
+        self.scale = None
+        self.weights = None
+
+    def fit(self, X: np.ndarray, y: np.ndarray, progress=None) -> "LogisticRegression":
+        self.mean = X.mean(axis=0, dtype=np.float64)
+        self.scale = X.std(axis=0, dtype=np.float64)
+        self.scale[self.scale == 0] = 1.0
+        Z = self._design(X)
+        penalty = np.full(Z.shape[1], self.l2)
+        penalty[-1] = 0.0  # the intercept isn't penalized
+        w = np.zeros(Z.shape[1])
+        for i in range(self.iterations):
+            p = _sigmoid(Z @ w)
+            gradient = Z.T @ (p - y) + penalty * w
+            hessian = (Z * (p * (1 - p))[:, None]).T @ Z + np.diag(penalty)
+            step = np.linalg.solve(hessian + 1e-9 * np.eye(len(w)), gradient)
+            w -= step
+            if progress is not None:
+                progress((i + 1) / self.iterations, "Newton step {}".format(i + 1))
+            if np.abs(step).max() < self.tolerance:
+                break
+        self.weights = w
+        return self
+
+    def _design(self, X: np.ndarray) -> np.ndarray:
+        Z = np.empty((len(X), X.shape[1] + 1))
+        np.divide(X - self.mean, self.scale, out=Z[:, :-1])
+        Z[:, -1] = 1.0
+        return Z
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return _sigmoid(self._design(X) @ self.weights)
+
+
+class GradientBoostedTrees:
+
+    name = "Gradient-boosted trees"
+
+    def __init__(self, trees: int = 100, depth: int = 3, learning_rate: float = 0.1, bins: int = 32,
+                 l2: float = 1.0, min_leaf: int = 5) -> None:
+        self.trees = trees
+        self.depth = depth
+        self.learning_rate = learning_rate
+        self.bins = bins
+        self.l2 = l2
+        self.min_leaf = min_leaf
+        self.base = 0.0
+        self.features = None    # (trees, internal nodes) split feature
+        self.thresholds = None  # (trees, internal nodes), rows with x >= threshold go right
+        self.leaves = None      # (trees, 2 ** depth) leaf values
+
+    def _edges(self, X: np.ndarray) -> list:
+        quantiles = np.linspace(0, 1, self.bins + 1)[1:-1]
+        edges = []
+        for j in range(X.shape[1]):
+            values = np.unique(X[:, j])
+            if len(values) <= self.bins:
+                # Few distinct values: split between every pair of them
+                edges.append(((values[1:] + values[:-1]) / 2).astype(np.float32))
+            else:
+                edges.append(np.unique(np.quantile(X[:, j], quantiles).astype(np.float32)))
+        return edges
+
+    def fit(self, X: np.ndarray, y: np.ndarray, progress=None) -> "GradientBoostedTrees":
+        n, k = X.shape
+        edges = self._edges(X)
+        B = max(len(e) for e in edges) + 1
+        # bin b holds edges[b - 1] <= x < edges[b], "x >= edges[t]" is "bin > t"
+        binned = np.stack([np.searchsorted(e, X[:, j], side="right") for j, e in enumerate(edges)], axis=1)
+        binned = binned.astype(np.uint8 if B <= 256 else np.uint16)
+
+        positive = float(np.clip(y.mean(), 1e-6, 1 - 1e-6))
+        self.base = float(np.log(positive / (1 - positive)))
+        internal = 2 ** self.depth - 1
+        self.features = np.zeros((self.trees, internal), dtype=np.int32)
+        self.thresholds = np.full((self.trees, internal), np.inf, dtype=np.float32)
+        self.leaves = np.zeros((self.trees, 2 ** self.depth))
+        score = np.full(n, self.base)
+
+        for t in range(self.trees):
+            p = _sigmoid(score)
+            g, h = p - y, p * (1 - p)
+            node = np.zeros(n, dtype=np.int64)  # heap index within the current level
+            for level in range(self.depth):
+                nodes = 2 ** level
+                best_gain = np.zeros(nodes)
+                best_feature = np.zeros(nodes, dtype=np.int32)
+                best_bin = np.full(nodes, -1)
+                for j in range(k):
+                    key = node * B + binned[:, j]
+                    G = np.bincount(key, weights=g, minlength=nodes * B).reshape(nodes, B)
+                    H = np.bincount(key, weights=h, minlength=nodes * B).reshape(nodes, B)
+                    C = np.bincount(key, minlength=nodes * B).reshape(nodes, B)
+                    GL, HL, CL = np.cumsum(G, 1)[:, :-1], np.cumsum(H, 1)[:, :-1], np.cumsum(C, 1)[:, :-1]
+                    Gt, Ht, Ct = G.sum(1, keepdims=True), H.sum(1, keepdims=True), C.sum(1, keepdims=True)
+                    GR, HR, CR = Gt - GL, Ht - HL, Ct - CL
+                    gain = GL ** 2 / (HL + self.l2) + GR ** 2 / (HR + self.l2) - Gt ** 2 / (Ht + self.l2)
+                    gain[(CL < self.min_leaf) | (CR < self.min_leaf)] = 0.0
+                    if gain.shape[1] == 0:
+                        continue
+                    split = np.argmax(gain, axis=1)
+                    top = gain[np.arange(nodes), split]
+                    better = top > best_gain
+                    best_gain[better] = top[better]
+                    best_feature[better] = j
+                    best_bin[better] = split[better]
+                heap = nodes - 1 + np.arange(nodes)
+                splits = best_bin >= 0
+                self.features[t, heap] = best_feature
+                self.thresholds[t, heap[splits]] = [
+                    edges[f][b] for f, b in zip(best_feature[splits], best_bin[splits])
+                ]
+                right = np.zeros(n, dtype=np.bool_)
+                rows_split = splits[node]
+                right[rows_split] = binned[rows_split, best_feature[node[rows_split]]] > best_bin[node[rows_split]]
+                node = 2 * node + right
+
+            leaves = 2 ** self.depth
+            G = np.bincount(node, weights=g, minlength=leaves)
+            H = np.bincount(node, weights=h, minlength=leaves)
+            self.leaves[t] = -self.learning_rate * G / (H + self.l2)
+            score += self.leaves[t][node]
+            if progress is not None:
+                progress((t + 1) / self.trees, "Tree {} of {}".format(t + 1, self.trees))
+        return self
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        n = len(X)
+        rows = np.arange(n)
+        score = np.full(n, self.base)
+        for t in range(len(self.leaves)):
+            node = np.zeros(n, dtype=np.int64)
+            for level in range(self.depth):
+                heap = 2 ** level - 1 + node
+                right = X[rows, self.features[t, heap]] >= self.thresholds[t, heap]
+                node = 2 * node + right
+            score += self.leaves[t][node]
+        return _sigmoid(score)
+
+
+MODELS = {"logistic": LogisticRegression, "gbdt": GradientBoostedTrees}
+
+
+class TrainedModel:
+    """
+    An encoder and a fitted estimator, with what was measured while training.
+    """
+
+    def __init__(self, kind: str, params: dict, encoder: FeatureEncoder, estimator, metrics: dict) -> None:
+        self.kind = kind
+        self.params = params
+        self.encoder = encoder
+        self.estimator = estimator
+        self.metrics = metrics
+
+    @property
+    def name(self) -> str:
+        return self.estimator.name
+
+    def predict_proba(self, dataset, rows=None) -> np.ndarray:
+        return self.estimator.predict_proba(self.encoder.transform(dataset, rows))
+
+    def predict(self, dataset, rows=None) -> np.ndarray:
+        return (self.predict_proba(dataset, rows) >= 0.5).astype(np.int8)
+
+
+def accuracy(y: np.ndarray, probability: np.ndarray) -> float:
+    return float(np.mean((probability >= 0.5) == (y >= 0.5))) if len(y) else float("nan")
+
+
+def train_model(dataset, kind: str, params: dict = None, rows=None, validation: float = 0.2, seed: int = 0,
+                progress=None) -> TrainedModel:
+    """
+    Fits a MODELS[kind] on dataset rows (None for all) that have a Survived value. With
+    validation > 0 a seeded fraction of them is held out first to measure accuracy,
+    then the model is fitted again on all of them.
+    """
+    if kind not in MODELS:
+        raise ValueError("Unknown model {!r}, expected one of {}".format(kind, sorted(MODELS)))
+    if TARGET not in dataset:
+        raise ValueError("{} has no {} column to train on".format(dataset.source, TARGET))
+    params = dict(params or {})
+    rows = np.arange(len(dataset)) if rows is None else np.asarray(rows)
+    target = dataset[TARGET]
+    if target.validity is not None:
+        rows = rows[~target.null_mask()[rows]]
+    if len(rows) < 2:
+        raise ValueError("Need at least 2 labelled rows to train, got {}".format(len(rows)))
+
+    def stage(start: float, end: float):
+        if progress is None:
+            return None
+        return lambda fraction, message: progress(start + (end - start) * fraction, message)
+
+    started = time.perf_counter()
+    metrics = {"rows": int(len(rows))}
+    if validation > 0:
+        order = np.random.default_rng(seed).permutation(rows)
+        held = max(1, int(len(order) * validation))
+        fit_rows, held_rows = np.sort(order[held:]), np.sort(order[:held])
+        encoder = FeatureEncoder().fit(dataset, fit_rows)
+        estimator = MODELS[kind](**params).fit(
+            encoder.transform(dataset, fit_rows), target.values[fit_rows].astype(np.float64), stage(0.0, 0.5))
+        metrics["validation_accuracy"] = accuracy(
+            target.values[held_rows], estimator.predict_proba(encoder.transform(dataset, held_rows)))
+        metrics["validation_rows"] = int(held)
+
+    encoder = FeatureEncoder().fit(dataset, rows)
+    X, y = encoder.transform(dataset, rows), target.values[rows].astype(np.float64)
+    estimator = MODELS[kind](**params).fit(X, y, stage(0.5 if validation > 0 else 0.0, 1.0))
+    metrics["train_accuracy"] = accuracy(y, estimator.predict_proba(X))
+    metrics["seconds"] = time.perf_counter() - started
+    return TrainedModel(kind, params, encoder, estimator, metrics)
@@ -0,0 +1,297 @@
+"""
+Parses one CSV with several processes.
+
+csv.reader holds the GIL, so threads don't help: parsing scales only across processes.
+The file is cut into byte ranges that each start at a record boundary, every range is
+parsed by a worker in a ProcessPoolExecutor, and the parent stitches the columns together
+in range order. String columns travel as their UTF-8 buffers (see columns.StringColumn)
+and are joined without being decoded.
+
+Finding boundaries: a newline ends a record only outside quotes (a Name can contain a
+quoted newline). Every record boundary has an even number of quotes before it, so starting
+from the previous boundary we count the quotes up to the next cut point and then look for
+the first newline after it at which the running quote count is even. That is a vectorized
+scan over a memory map of the file, a small fraction of the parse time.
+
+Workers don't pickle their columns back. Each one lays its buffers out in a single
+multiprocessing.shared_memory block, in the same layout as the sidecar cache (see
+loader.write_cache), and only returns the block name and a small header. The parent copies
+the buffers into the final columns and unlinks the blocks.
+
+The merged categorical dictionaries are put in the order read_csv gives them (new values
+sorted within each block of BLOCK_ROWS rows, blocks in file order), so the result is
+identical to loader.read_csv, codes included.
+"""
+
+import csv
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from analytics.columns import (
+    Dataset, NumericColumn, CategoricalColumn, StringColumn, pack_validity, unpack_validity, join_strings
+)
+from analytics.loader import TableBuilder, BLOCK_ROWS, file_fingerprint, intern_strings, _ALIGN
+from analytics.schema import NUMERIC, CATEGORICAL
+from analytics.streaming import iter_record_chunks, CHUNK_BYTES
+
+# More ranges than workers evens out the load and keeps cancelling responsive, a
+# cancelled load still waits for the ranges that are being parsed
+RANGES_PER_WORKER = 4
+
+_QUOTE = ord('"')
+_NEWLINE = ord("\n")
+_SCAN_BYTES = 1024 * 1024
+_COUNT_BYTES = 64 * 1024 * 1024
+
+
+def _count_quotes(mapped, start: int, end: int) -> int:
+    count = 0
+    for a in range(start, end, _COUNT_BYTES):
+        count += int(np.count_nonzero(mapped[a:min(a + _COUNT_BYTES, end)] == _QUOTE))
+    return count
+
+
+def _next_record_start(mapped, pos: int, quoted: bool) -> int:
+    """
+    Index just past the first newline at or after pos that is outside quotes. quoted
+    tells whether pos itself is inside a quoted field.
+    """
+    size = len(mapped)
+    while pos < size:
+        window = mapped[pos:pos + _SCAN_BYTES]
+        parity = (np.cumsum(window == _QUOTE, dtype=np.int64) + quoted) & 1
+        ends = np.flatnonzero((window == _NEWLINE) & (parity == 0))
+        if len(ends):
+            return pos + int(ends[0]) + 1
+        quoted = bool(parity[-1])
+        pos += len(window)
+    return size
+
+
+def record_ranges(path: str, parts: int) -> tuple:
+    """
+    Splits a CSV into about `parts` byte ranges that each hold whole records.
+    Returns (header, ranges) where ranges is a list of (start, end) offsets.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        raise ValueError("{} is empty".format(path))
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+
+    header_end = _next_record_start(mapped, 0, False)
+    header = next(csv.reader(io.StringIO(bytes(mapped[:header_end]).decode("utf-8"), newline="")))
+
+    bounds = [header_end]
+    step = max((size - header_end) // max(parts, 1), 1)
+    for i in range(1, parts):
+        target = header_end + i * step
+        if target <= bounds[-1]:
+            continue
+        quoted = bool(_count_quotes(mapped, bounds[-1], target) & 1)
+        start = _next_record_start(mapped, target, quoted)
+        if start >= size:
+            break
+        bounds.append(start)
+    bounds.append(size)
+    del mapped
+    return header, [(a, b) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+class _RangeFile:
+    """
+    Read-only view of bytes [start, end) of a file, enough for iter_record_chunks.
+    """
+
+    def __init__(self, f, start: int, end: int) -> None:
+        self.f = f
+        self.remaining = end - start
+        f.seek(start)
+
+    def read(self, size: int) -> bytes:
+        data = self.f.read(min(size, self.remaining))
+        self.remaining -= len(data)
+        return data
+
+
+def _export(dataset) -> dict:
+    """
+    Copies the columns of a parsed range into one shared memory block and returns the
+    header describing it.
+    """
+    buffers = []
+    columns = []
+
+    def add(array) -> dict:
+        buffers.append(np.ascontiguousarray(array))
+        return {"index": len(buffers) - 1}
+
+    for col in dataset.columns.values():
+        entry = {"name": col.name, "kind": col.kind}
+        if col.kind == NUMERIC:
+            entry["values"] = add(col.values)
+        elif col.kind == CATEGORICAL:
+            entry["codes"] = add(col.codes)
+            entry["categories"] = col.categories
+        else:
+            data, offsets = col.compact()
+            entry["data"] = add(data)
+            entry["offsets"] = add(offsets)
+        if col.validity is not None:
+            entry["validity"] = add(col.validity)
+        columns.append(entry)
+
+    offset = 0
+    for col in columns:
+        for key in ("values", "codes", "data", "offsets", "validity"):
+            if key in col:
+                array = buffers[col[key].pop("index")]
+                offset = -(-offset // _ALIGN) * _ALIGN
+                col[key].update(offset=offset, dtype=array.dtype.str, count=len(array))
+                col[key]["array"] = array
+                offset += array.nbytes
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    try:
+        for col in columns:
+            for key in ("values", "codes", "data", "offsets", "validity"):
+                if key in col:
+                    array = col[key].pop("array")
+                    start = col[key]["offset"]
+                    shm.buf[start:start + array.nbytes] = array.view(np.uint8)
+    finally:
+        shm.close()
+    return {"shm": shm.name, "rows": len(dataset), "columns": columns}
+
+
+def _parse_range(path: str, header: list, start: int, end: int) -> dict:
+    """
+    Worker: parses bytes [start, end) of path and exports the columns.
+    """
+    table = TableBuilder(header, source=path)
+    with open(path, "rb") as f:
+        for chunk in iter_record_chunks(_RangeFile(f, start, end), CHUNK_BYTES):
+            reader = csv.reader(io.StringIO(chunk.decode("utf-8"), newline=""))
+            del chunk
+            while True:
+                rows = list(islice(reader, BLOCK_ROWS))
+                if not rows:
+                    break
+                table.append_rows(rows)
+    return _export(table.flush())
+
+
+def _release(part: dict) -> None:
+    shm = shared_memory.SharedMemory(name=part["shm"])
+    shm.close()
+    shm.unlink()
+
+
+def _merge(parts: list, path: str, fingerprint: tuple) -> Dataset:
+    """
+    Concatenates the exported ranges, in order, into one Dataset.
+    """
+    blocks = [shared_memory.SharedMemory(name=part["shm"]) for part in parts]
+    try:
+        def view(block, entry) -> np.ndarray:
+            dtype = np.dtype(entry["dtype"])
+            start = entry["offset"]
+            return np.frombuffer(block.buf, dtype=dtype, count=entry["count"], offset=start)
+
+        columns = {}
+        # The CSV's columns followed by the derived ones
+        for i, name in enumerate(entry["name"] for entry in parts[0]["columns"]):
+            entries = [part["columns"][i] for part in parts]
+            kind = entries[0]["kind"]
+
+            if any("validity" in e for e in entries):
+                valid = np.concatenate([
+                    unpack_validity(view(b, e["validity"]), p["rows"]) if "validity" in e
+                    else np.ones(p["rows"], dtype=np.bool_)
+                    for b, e, p in zip(blocks, entries, parts)
+                ])
+                validity = pack_validity(valid)
+            else:
+                validity = None
+
+            if kind == NUMERIC:
+                # concatenate copies, nothing keeps pointing into the blocks
+                values = np.concatenate([view(b, e["values"]) for b, e in zip(blocks, entries)])
+                columns[name] = NumericColumn(name, values, validity)
+            elif kind == CATEGORICAL:
+                categories = {}
+                codes = []
+                for b, e in zip(blocks, entries):
+                    remap = np.array(
+                        [categories.setdefault(c, len(categories)) for c in e["categories"]] + [-1],
+                        dtype=np.int32,
+                    )
+                    # -1 (null) indexes the trailing -1 of remap
+                    codes.append(remap[view(b, e["codes"])])
+                codes, categories = _block_order(np.concatenate(codes), list(categories))
+                code_type = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+                columns[name] = CategoricalColumn(name, codes.astype(code_type), categories, validity)
+            else:
+                # The encoded bytes are copied as they are, nothing is decoded
+                data, offsets = join_strings(
+                    (view(b, e["data"]), view(b, e["offsets"])) for b, e in zip(blocks, entries)
+                )
+                columns[name] = StringColumn(name, data, offsets, validity)
+    finally:
+        for block in blocks:
+            block.close()
+    return Dataset(columns, source=path, fingerprint=fingerprint)
+
+
+def _block_order(codes: np.ndarray, categories: list) -> tuple:
+    """
+    Renumbers categories the way read_csv's _ColumnBuilder does: by the block of
+    BLOCK_ROWS rows they first appear in, then alphabetically.
+    """
+    valid = np.flatnonzero(codes >= 0)
+    present, first = np.unique(codes[valid], return_index=True)
+    blocks = valid[first] // BLOCK_ROWS
+    order = sorted(range(len(present)), key=lambda i: (blocks[i], categories[present[i]]))
+    remap = np.full(len(categories) + 1, -1, dtype=np.int32)
+    remap[present[order]] = np.arange(len(order))
+    return remap[codes], [categories[present[i]] for i in order]
+
+
+def read_csv_parallel(path: str, workers: int = None, progress=None) -> Dataset:
+    """
+    Same result as loader.read_csv, parsed by `workers` processes (default: one per core).
+    progress, if given, is called as progress(fraction, message) as ranges finish.
+    """
+    workers = workers or os.cpu_count() or 1
+    fingerprint = file_fingerprint(path)
+    header, ranges = record_ranges(path, workers * RANGES_PER_WORKER)
+    message = "Parsing {} ({} processes)".format(os.path.basename(path), workers)
+
+    # spawn, forking a process that runs Qt and a thread pool isn't safe
+    context = multiprocessing.get_context("spawn")
+    parts = [None] * len(ranges)
+    futures = {}
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        for i, (start, end) in enumerate(ranges):
+            futures[executor.submit(_parse_range, path, header, start, end)] = i
+        for done, future in enumerate(as_completed(futures), 1):
+            parts[futures[future]] = future.result()
+            if progress is not None:
+                progress(done / len(ranges), message)
+        return intern_strings(_merge(parts, path, fingerprint))
+    finally:
+        # Also runs on errors and cancellation: wait for the ranges still being parsed
+        # so that every block they export gets released
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future, i in futures.items():
+            if parts[i] is None and future.done() and not future.cancelled() and future.exception() is None:
+                parts[i] = future.result()
+        for part in parts:
+            if part is not None:
+                _release(part)
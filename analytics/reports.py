@@ -0,0 +1,193 @@
+"""
+Reports: what the window's pages show, as plain functions of a dataset.
+
+The GUI pages and the headless batch mode (analytics/batch.py) both go through this
+module, so a survival table, a distribution or a model score is computed by the same code
+either way and the numbers match.
+
+A report is declarative, a list of sections (a JSON file for the batch mode):
+
+    {"sections": [
+        {"summary": "By class"},
+        {"summary": ["Embarked", {"column": "Age", "edges": [0, 18, 65]}]},
+        {"describe": "Fare"},
+        {"score": "logistic", "train": "data/train.csv", "out": "{stem}_{model}_submission.csv"},
+        {"compare": ["data/gender_submission.csv"]}
+    ]}
+
+    summary     a summary tab by its label (SUMMARY_PAGES) or a list of group keys, where
+                {"column", "edges"} is a Bins key. Count and survival rate per group,
+                count only for files without Survived (test.csv).
+    describe    the Distributions page table of a numeric column
+    score       trains a model on the train file like the Models page does (once per
+                process, then reused) and predicts the file, optionally writing the
+                predictions to out ({stem} is the file's name, {model} the model kind)
+    compare     the Submissions page: the file as base, the given submission files
+
+run_section() computes one section and returns a dict that json.dumps can write.
+
+The window imports SUMMARY_PAGES from here before it has painted, so this module only
+imports the schema at the top. The engines are imported when a section runs.
+"""
+
+import os
+
+from analytics.schema import AGE_BANDS, Bins
+
+# Summary tabs: (label, title, group keys)
+SUMMARY_PAGES = [
+    ("By class", "Survival by class and sex", ["Pclass", "Sex"]),
+    ("By age", "Survival by age band and sex", [AGE_BANDS, "Sex"]),
+    ("By port", "Survival by port of embarkation", ["Embarked", "Pclass"]),
+    ("By family", "Survival by siblings/spouses and parents/children aboard", ["SibSp", "Parch"]),
+]
+
+# The batch mode's report when none is given: every summary tab and the distributions
+DEFAULT_REPORT = {
+    "sections": [{"summary": label} for label, _, _ in SUMMARY_PAGES] + [
+        {"describe": "Age"}, {"describe": "Fare"},
+    ],
+}
+
+SECTION_TYPES = ("summary", "describe", "score", "compare")
+
+# Models trained by score sections in this process: (train path, fingerprint, kind) -> model
+_trained = {}
+
+
+def summary(dataset, keys: list, rows=None):
+    """
+    A summary page's table: passenger count and survival rate per group, only the count
+    when the dataset has no Survived column.
+    """
+    from analytics.aggregate import aggregate
+    aggs = [("*", "count")]
+    if "Survived" in dataset:
+        aggs.append(("Survived", "mean"))
+    return aggregate(dataset, keys, aggs, rows=rows)
+
+
+def section_type(section: dict) -> str:
+    types = [key for key in SECTION_TYPES if key in section]
+    if len(types) != 1:
+        raise ValueError("A report section needs exactly one of {}, got {}".format(
+            ", ".join(SECTION_TYPES), sorted(section)))
+    return types[0]
+
+
+def section_name(section: dict) -> str:
+    """
+    A short label for a section, used to name its timing stage.
+    """
+    kind = section_type(section)
+    value = section[kind]
+    if kind == "summary" and not isinstance(value, str):
+        value = ", ".join(key if isinstance(key, str) else key["column"] + " bands" for key in value)
+    elif kind == "compare":
+        value = "{} submissions".format(len(value))
+    return "{} {}".format(kind, value)
+
+
+def check_report(report: dict) -> list:
+    """
+    The sections of a report, after checking that every one can run.
+    """
+    sections = report.get("sections")
+    if not isinstance(sections, list) or not sections:
+        raise ValueError("A report needs a non-empty list of sections")
+    labels = [label for label, _, _ in SUMMARY_PAGES]
+    for section in sections:
+        kind = section_type(section)
+        value = section[kind]
+        if kind == "summary" and isinstance(value, str) and value not in labels:
+            raise ValueError("Unknown summary {!r}, expected one of {} or a list of keys".format(value, labels))
+        if kind == "score":
+            from analytics.models import MODELS
+            if value not in MODELS:
+                raise ValueError("Unknown model {!r}, expected one of {}".format(value, sorted(MODELS)))
+            if "train" not in section:
+                raise ValueError("Score section {!r} needs a train file".format(value))
+    return sections
+
+
+def _summary_keys(value) -> list:
+    if isinstance(value, str):
+        return next(keys for label, _, keys in SUMMARY_PAGES if label == value)
+    return [key if isinstance(key, str) else Bins(key["column"], key["edges"]) for key in value]
+
+
+def _jsonable(value):
+    """
+    value with NumPy scalars and arrays turned into Python numbers and lists, NaN into None.
+    """
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _table(result) -> dict:
+    return {"columns": result.columns, "rows": [_jsonable(row) for row in result.rows()]}
+
+
+def trained_model(kind: str, train_path: str):
+    """
+    A MODELS[kind] trained on the file at train_path with train_model's defaults (what
+    the Models page trains), kept for the life of the process.
+    """
+    from analytics.loader import load_dataset, file_fingerprint
+    from analytics.models import train_model
+    key = (os.path.abspath(train_path), file_fingerprint(train_path), kind)
+    model = _trained.get(key)
+    if model is None:
+        model = _trained[key] = train_model(load_dataset(train_path), kind)
+    return model
+
+
+def run_section(dataset, section: dict, out_dir: str = None) -> dict:
+    """
+    Computes one report section over dataset, see the module docstring.
+    """
+    kind = section_type(section)
+    value = section[kind]
+    result = {"section": section_name(section)}
+    if kind == "summary":
+        result.update(_table(summary(dataset, _summary_keys(value))))
+    elif kind == "describe":
+        from analytics.sketches import describe
+        result.update(_table(describe(dataset, value)))
+    elif kind == "score":
+        from analytics.export import predictions, export_rows
+        model = trained_model(value, section["train"])
+        predicted = predictions(model, dataset)
+        survived = predicted["Survived"].values
+        result.update({
+            "model": model.name, "metrics": _jsonable(model.metrics),
+            "rows": len(predicted), "survivors": int(survived.sum()),
+        })
+        if "Survived" in dataset:
+            truth = dataset["Survived"]
+            scored = ~truth.null_mask()
+            result["accuracy"] = _jsonable(float((survived[scored] == (truth.values[scored] != 0)).mean()))
+        if section.get("out"):
+            stem = os.path.splitext(os.path.basename(dataset.source))[0]
+            path = section["out"].format(stem=stem, model=value)
+            if out_dir is not None and not os.path.isabs(path):
+                path = os.path.join(out_dir, path)
+            result["out"] = export_rows(predicted, path).path
+    else:
+        from analytics.joins import compare_submissions
+        from analytics.loader import load_dataset
+        comparison = compare_submissions(dataset, [load_dataset(path) for path in value])
+        result.update({
+            "submissions": comparison.names,
+            "matched": _jsonable(comparison.matched()),
+            "agreement": _jsonable(comparison.agreement()),
+        })
+        if comparison.truth is not None:
+            result["accuracy"] = _jsonable(comparison.accuracy())
+            result["confusion"] = [_jsonable(comparison.confusion(i)) for i in range(len(comparison.names))]
+    return result
@@ -0,0 +1,90 @@
+"""
+Column types for the passenger files in data/.
+
+train.csv, test.csv and gender_submission.csv share one set of column names, each file
+just uses a different subset of them. Every known column gets a ColumnSpec that tells
+the loader how to store it. Columns we don't know about are kept as strings, or
+dictionary encoded when few of their values are distinct (see loader.intern_strings).
+
+DERIVED_COLUMNS are fields parsed out of another column once, at load time, and stored
+dictionary encoded next to it: the title and surname in Name, the prefix of Ticket and
+the deck letter of Cabin. Their names are reserved, a file never provides them itself.
+
+This module deliberately doesn't import NumPy (dtypes are given by name) so the GUI can
+import it before the heavy modules are loaded.
+"""
+
+from collections import namedtuple
+from dataclasses import dataclass
+
+# Storage kinds
+NUMERIC = "numeric"
+CATEGORICAL = "categorical"
+STRING = "string"
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    name: str
+    kind: str
+    dtype: str = None
+    # Nullable columns accept blank fields and record them in a null bitmap.
+    nullable: bool = False
+
+
+PASSENGER_COLUMNS = {
+    spec.name: spec for spec in [
+        ColumnSpec("PassengerId", NUMERIC, "int32"),
+        ColumnSpec("Survived", NUMERIC, "int8"),
+        ColumnSpec("Pclass", NUMERIC, "int8"),
+        ColumnSpec("Name", STRING),
+        ColumnSpec("Sex", CATEGORICAL),
+        ColumnSpec("Age", NUMERIC, "float32", nullable=True),
+        ColumnSpec("SibSp", NUMERIC, "int8"),
+        ColumnSpec("Parch", NUMERIC, "int8"),
+        ColumnSpec("Ticket", STRING),
+        # test.csv has a passenger without a fare, so Fare has to be nullable too
+        ColumnSpec("Fare", NUMERIC, "float32", nullable=True),
+        ColumnSpec("Cabin", CATEGORICAL, nullable=True),
+        ColumnSpec("Embarked", CATEGORICAL, nullable=True),
+    ]
+}
+
+
+# Derived column -> the column it is parsed from
+DERIVED_FROM = {"Title": "Name", "Surname": "Name", "TicketPrefix": "Ticket", "Deck": "Cabin"}
+
+DERIVED_COLUMNS = {name: ColumnSpec(name, CATEGORICAL, nullable=True) for name in DERIVED_FROM}
+
+
+def spec_for(name: str) -> ColumnSpec:
+    """
+    Returns the spec for a column name, falling back to a nullable string column.
+    """
+    spec = PASSENGER_COLUMNS.get(name) or DERIVED_COLUMNS.get(name)
+    if spec is None:
+        spec = ColumnSpec(name, STRING, nullable=True)
+    return spec
+
+
+class Bins(namedtuple("Bins", ["column", "edges"])):
+    """
+    Groups a numeric column by intervals: edges (0, 12, 18) gives [0, 12), [12, 18) and
+    values outside the edges get the open groups (-inf, 0) and [18, inf).
+    """
+
+    def __new__(cls, column: str, edges) -> "Bins":
+        return super().__new__(cls, column, tuple(float(e) for e in edges))
+
+    @property
+    def name(self) -> str:
+        return self.column
+
+    def labels(self) -> list:
+        edges = ["{:g}".format(e) for e in self.edges]
+        return (["<{}".format(edges[0])]
+                + ["{}-{}".format(a, b) for a, b in zip(edges[:-1], edges[1:])]
+                + ["{}+".format(edges[-1])])
+
+
+AGE_BANDS = Bins("Age", (0, 12, 18, 30, 50, 65))
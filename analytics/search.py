@@ -0,0 +1,286 @@
+"""
+Word prefix search over the string columns (Name, Ticket).
+
+The index is built once after a file is loaded. Every value is lower-cased and split into
+words, the distinct words are sorted and numbered in that order, and for every word we keep
+the sorted list of rows it appears in (CSR style: one flat row array plus start offsets).
+Because the numbering follows the sort order, all words starting with a prefix form one
+contiguous id range, found with two binary searches.
+
+A query matches a row when every word of the query is the prefix of some word in the row,
+so "braund ow" finds "Braund, Mr. Owen Harris".
+
+Searches can narrow a previous result. When the new query only extends the previous one
+(more characters typed, or another word added) the answer is a subset of the previous rows,
+and when that set is small enough we only check those rows instead of the whole index.
+
+Rows appended to a followed file (see analytics/tail.py) are indexed on their own:
+extend() returns a SegmentedSearchIndex, which searches one SearchIndex per row range.
+"""
+
+from collections import namedtuple
+import numpy as np
+
+from analytics.columns import Dataset
+
+SEARCH_COLUMNS = ("Name", "Ticket")
+
+# Punctuation that separates words. "." and "/" are kept, they are part of titles and
+# ticket prefixes ("mr.", "a/5").
+_SEPARATORS = str.maketrans({c: " " for c in ',()"\'[];:'})
+
+# Rows per block when building. The marker separates rows inside a block and can never
+# be produced by normalize() for real text.
+_BUILD_BLOCK = 65536
+_ROW_MARKER = "\x01"
+
+SearchResult = namedtuple("SearchResult", ["query", "rows"])
+
+
+def normalize(text: str) -> list:
+    """
+    Splits text into the lower-case words the index is built from.
+    """
+    return text.lower().translate(_SEPARATORS).split()
+
+
+class SearchIndex:
+
+    def __init__(self, words: np.ndarray, starts: np.ndarray, postings: np.ndarray,
+                 row_starts: np.ndarray, row_words: np.ndarray, row_count: int) -> None:
+        # Word id -> rows: postings[starts[id]:starts[id + 1]]
+        self.words = words
+        self.starts = starts
+        self.postings = postings
+        # Row -> word ids: row_words[row_starts[row]:row_starts[row + 1]], used for narrowing
+        self.row_starts = row_starts
+        self.row_words = row_words
+        self.row_count = row_count
+
+    @classmethod
+    def build(cls, dataset, columns=SEARCH_COLUMNS, progress=None) -> "SearchIndex":
+        columns = [name for name in columns if name in dataset]
+        n = len(dataset)
+        # The marker gets id -1 so every real word is numbered from 0 in first-seen order
+        ids = {_ROW_MARKER: -1}
+        pair_words = []
+        pair_rows = []
+
+        # Each block of values is joined into one string with a marker word between rows,
+        # so lower-casing and splitting happen in a handful of C calls instead of per row
+        steps = max(1, len(columns) * -(-n // _BUILD_BLOCK))
+        step = 0
+        for name in columns:
+            col = dataset[name]
+            for start in range(0, n, _BUILD_BLOCK):
+                # Only one block of the column is decoded to str at a time
+                block = col.decode(start, start + _BUILD_BLOCK)
+                text = " {} ".format(_ROW_MARKER).join(block).lower().translate(_SEPARATORS)
+                tokens = text.split()
+                for word in dict.fromkeys(tokens):
+                    if word not in ids:
+                        ids[word] = len(ids) - 1
+                codes = np.fromiter(map(ids.__getitem__, tokens), dtype=np.int32, count=len(tokens))
+                marker = codes < 0
+                rows = np.cumsum(marker, dtype=np.int64) + start
+                pair_words.append(codes[~marker])
+                pair_rows.append(rows[~marker].astype(np.int32))
+                step += 1
+                if progress is not None:
+                    progress(step / steps, "Indexing {}".format(name))
+
+        del ids[_ROW_MARKER]
+        words = np.array(list(ids), dtype=str)
+        first_seen = np.concatenate(pair_words) if pair_words else np.array([], dtype=np.int32)
+        rows = np.concatenate(pair_rows) if pair_rows else np.array([], dtype=np.int32)
+
+        # Renumber the words in sorted order so prefixes map to id ranges
+        order = np.argsort(words, kind="stable")
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        word_ids = rank[first_seen]
+        words = words[order]
+
+        # Word -> rows. A word can appear twice in a row ("Phillips, Miss. Kate Florence
+        # ("Mrs Kate Louise Phillips Marshall")"), np.unique drops the repeated pairs and
+        # sorts them by word, then row: every posting list is strictly increasing.
+        pairs = np.unique(word_ids.astype(np.int64) * max(n, 1) + rows)
+        word_ids = (pairs // max(n, 1)).astype(np.int32)
+        postings = (pairs % max(n, 1)).astype(np.int32)
+        starts = np.zeros(len(words) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(word_ids, minlength=len(words)), out=starts[1:])
+
+        # Row -> words
+        by_row = np.argsort(postings, kind="stable")
+        row_words = word_ids[by_row]
+        row_starts = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(postings, minlength=n), out=row_starts[1:])
+
+        return cls(words, starts, postings, row_starts, row_words, n)
+
+    def word_range(self, prefix: str) -> tuple:
+        """
+        Returns the [lo, hi) range of word ids that start with prefix.
+        """
+        lo = np.searchsorted(self.words, prefix, side="left")
+        # Every word with this prefix sorts before prefix + the largest code point
+        hi = np.searchsorted(self.words, prefix + "\U0010ffff", side="left")
+        return int(lo), int(hi)
+
+    def prefix_mask(self, prefix: str) -> np.ndarray:
+        """
+        Boolean array over all rows, True where a word starts with prefix.
+        """
+        lo, hi = self.word_range(prefix)
+        mask = np.zeros(self.row_count, dtype=np.bool_)
+        mask[self.postings[self.starts[lo]:self.starts[hi]]] = True
+        return mask
+
+    def rows_for_prefix(self, prefix: str) -> np.ndarray:
+        lo, hi = self.word_range(prefix)
+        rows = self.postings[self.starts[lo]:self.starts[hi]]
+        if hi - lo > 1:
+            # One word's rows are sorted and unique, but a row can have several of the
+            # words that match, and their lists interleave. Scattering
+            # into a mask is linear, np.unique would sort.
+            if len(rows) > self.row_count >> 6:
+                rows = np.flatnonzero(self.prefix_mask(prefix)).astype(np.int32)
+            else:
+                rows = np.unique(rows)
+        return rows
+
+    def narrow(self, rows: np.ndarray, prefix: str) -> np.ndarray:
+        """
+        Keeps the rows that contain a word starting with prefix. Costs O(words in rows).
+        """
+        if len(rows) == 0:
+            return rows
+        lo, hi = self.word_range(prefix)
+        begin = self.row_starts[rows]
+        count = self.row_starts[rows + 1] - begin
+        # Gather the word ids of every candidate row into one flat array
+        flat = np.repeat(begin - np.cumsum(count) + count, count) + np.arange(count.sum())
+        ids = self.row_words[flat]
+        hit = (ids >= lo) & (ids < hi)
+        owner = np.repeat(np.arange(len(rows)), count)
+        keep = np.zeros(len(rows), dtype=np.bool_)
+        keep[owner[hit]] = True
+        return rows[keep]
+
+    def _posting_size(self, prefix: str) -> int:
+        lo, hi = self.word_range(prefix)
+        return int(self.starts[hi] - self.starts[lo])
+
+    def search(self, query: str, previous: SearchResult = None) -> SearchResult:
+        """
+        Returns the rows matching every word of query. Pass the previous result to let
+        the search narrow it instead of starting over, e.g. while the user types.
+        """
+        words = normalize(query)
+        if not words:
+            return SearchResult(query, None)
+
+        rows = None
+        todo = words
+        if previous is not None and previous.rows is not None:
+            old = normalize(previous.query)
+            if _extends(old, words):
+                # Only the word being typed and the new words can drop rows
+                rows = previous.rows
+                todo = [w for i, w in enumerate(words) if i >= len(old) or w != old[i]]
+
+        words_per_row = len(self.row_words) / max(self.row_count, 1)
+        if rows is not None and len(words) == 1 and self._posting_size(words[0]) < len(rows) * words_per_row:
+            # A single word being extended: its own posting list is the exact answer and
+            # is cheaper to read than the previous rows
+            rows = None
+            todo = words
+
+        # Most selective words first so the candidate set shrinks as fast as possible
+        for word in sorted(todo, key=self._posting_size):
+            size = self._posting_size(word)
+            if rows is None:
+                rows = self.rows_for_prefix(word)
+            elif len(rows) * words_per_row <= size:
+                rows = self.narrow(rows, word)
+            elif size < len(rows):
+                rows = _intersect_sorted(rows, self.rows_for_prefix(word))
+            else:
+                rows = rows[self.prefix_mask(word)[rows]]
+        return SearchResult(query, rows)
+
+    def extend(self, dataset, start: int) -> "SegmentedSearchIndex":
+        """
+        Index of dataset, which is this index's dataset with rows from `start` on appended.
+        """
+        return SegmentedSearchIndex([(0, self.row_count, self)]).extend(dataset, start)
+
+
+class SegmentedSearchIndex:
+    """
+    SearchIndexes over consecutive row ranges of a growing dataset (see analytics/tail.py).
+
+    Appended rows get a segment of their own. Whenever a segment holds less than twice
+    the rows of the one after it, both are rebuilt as one, so there are O(log rows)
+    segments and every row is indexed O(log rows) times over any sequence of appends.
+    A search runs on every segment and concatenates the rows, which stay sorted.
+    """
+
+    def __init__(self, segments: list) -> None:
+        self.segments = segments  # (start, end, SearchIndex of rows [start, end))
+
+    @property
+    def row_count(self) -> int:
+        return self.segments[-1][1] if self.segments else 0
+
+    def extend(self, dataset, start: int) -> "SegmentedSearchIndex":
+        end = len(dataset)
+        if start >= end:
+            return self
+        segments = list(self.segments) + [(start, end, _build_range(dataset, start, end))]
+        while len(segments) > 1 and segments[-2][1] - segments[-2][0] < 2 * (segments[-1][1] - segments[-1][0]):
+            first = segments[-2][0]
+            segments[-2:] = [(first, end, _build_range(dataset, first, end))]
+        return SegmentedSearchIndex(segments)
+
+    def search(self, query: str, previous: SearchResult = None) -> SearchResult:
+        if not normalize(query):
+            return SearchResult(query, None)
+        parts = []
+        for start, end, index in self.segments:
+            before = None
+            if previous is not None and previous.rows is not None:
+                a, b = np.searchsorted(previous.rows, [start, end])
+                before = SearchResult(previous.query, previous.rows[a:b] - start)
+            rows = index.search(query, before).rows
+            parts.append(rows.astype(np.int64) + start)
+        return SearchResult(query, np.concatenate(parts))
+
+
+def _build_range(dataset, start: int, end: int) -> SearchIndex:
+    # Slices of the columns are views of the range
+    columns = {name: dataset[name].take(slice(start, end)) for name in SEARCH_COLUMNS if name in dataset}
+    return SearchIndex.build(Dataset(columns))
+
+
+def _intersect_sorted(large: np.ndarray, small: np.ndarray) -> np.ndarray:
+    """
+    Intersection of two sorted unique row arrays, O(len(small) * log(len(large))).
+    """
+    if len(large) == 0:
+        return large
+    pos = np.searchsorted(large, small)
+    pos[pos == len(large)] = 0
+    return small[large[pos] == small]
+
+
+def _extends(old: list, new: list) -> bool:
+    """
+    True if every match of `new` also matches `old`: same words, with the last old word
+    possibly extended and more words possibly added.
+    """
+    if not old or len(new) < len(old):
+        return False
+    if old[:-1] != new[:len(old) - 1]:
+        return False
+    return new[len(old) - 1].startswith(old[-1])
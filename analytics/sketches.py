@@ -0,0 +1,385 @@
+"""
+Quantile sketches and fixed-bin histograms of Age and Fare, one per partition of the
+categorical columns, built once at load time.
+
+Dashboards ask for quantiles and histograms of a numeric column for some combination of
+Pclass, Sex and Embarked ("median Fare of 1st and 2nd class women from Southampton").
+Instead of filtering and sorting the column for every question, the rows are split once
+into partitions, one per (Pclass, Sex, Embarked) combination, and every partition keeps
+a small summary of each column. A query picks the partitions that match and merges their
+summaries, which costs the same for 891 rows as for 100M.
+
+    sketches = dataset.extras["sketches"]
+    sketches.quantiles("Fare", [0.25, 0.5, 0.75], where={"Pclass": [1, 2], "Sex": ["female"]})
+    edges, counts = sketches.histogram("Age", where={"Embarked": ["S"]})
+
+QuantileSketch is KLL-style: the sorted values of a partition compacted into at most
+about K items, every item standing for w = 2**h consecutive ranks (w = 1 and the sketch
+is exact while the partition has at most K values). Merging is a weighted union.
+
+Accuracy: each item is the middle value of its block of w ranks, so a single sketch of
+n values answers every quantile with a value whose rank is off by at most w/2 <= n/K.
+Merging adds up those errors plus at most one item weight, so a query over N rows is off
+by at most 3N/K ranks. With K = 2048 that is 0.15% of the selected rows: the median
+returned lies between the 49.85th and 50.15th percentile (sketch.error has the bound of
+each answer, benchmarks/bench_sketches.py measures about half of it at worst).
+Minimum and maximum are exact. Histograms are exact counts on fixed global bins.
+
+The index is stored in the sidecar cache next to the columns, see loader.write_cache.
+When a followed file grows (analytics/tail.py) SketchIndex.extend adds the new rows
+without re-reading the old ones.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from analytics.aggregate import group_ids, GroupResult
+
+K = 2048
+HIST_BINS = 64
+PARTITION_KEYS = ("Pclass", "Sex", "Embarked")
+SKETCH_COLUMNS = ("Age", "Fare")
+# What describe() reports, by value name
+QUANTILES = {"min": 0.0, "p10": 0.1, "p25": 0.25, "median": 0.5, "p75": 0.75, "p90": 0.9, "max": 1.0}
+
+
+class QuantileSketch:
+    """
+    Sorted items with integer weights (ranks they stand for), plus the exact min and max.
+    error is the worst rank error of a quantile answered from it.
+    """
+
+    def __init__(self, items: np.ndarray, weights: np.ndarray, low: float, high: float, error: float) -> None:
+        self.items = items
+        self.weights = weights
+        self.low = low
+        self.high = high
+        self.error = error
+        self._cumulative = None
+
+    @property
+    def count(self) -> int:
+        return int(self.weights.sum())
+
+    @classmethod
+    def from_sorted(cls, values: np.ndarray, k: int = K) -> "QuantileSketch":
+        """
+        Sketch of already sorted values without NaN.
+        """
+        n = len(values)
+        if n == 0:
+            return cls(np.zeros(0), np.zeros(0, dtype=np.int64), np.nan, np.nan, 0.0)
+        if n <= k:
+            return cls(np.asarray(values, dtype=np.float64), np.ones(n, dtype=np.int64),
+                       float(values[0]), float(values[-1]), 0.0)
+
+        w = 1 << int(np.ceil(np.log2(n / k)))
+        # The middle value of every block of w ranks, the last block may be shorter
+        starts = np.arange(0, n, w)
+        ends = np.minimum(starts + w, n)
+        items = values[(starts + ends - 1) // 2].astype(np.float64)
+        return cls(items, (ends - starts).astype(np.int64), float(values[0]), float(values[-1]), w / 2)
+
+    @classmethod
+    def merge(cls, sketches: list) -> "QuantileSketch":
+        sketches = [s for s in sketches if len(s.items)]
+        if not sketches:
+            return cls.from_sorted(np.zeros(0))
+        if len(sketches) == 1:
+            return sketches[0]
+        items = np.concatenate([s.items for s in sketches])
+        weights = np.concatenate([s.weights for s in sketches])
+        order = np.argsort(items, kind="stable")
+        return cls(
+            items[order], weights[order],
+            min(s.low for s in sketches), max(s.high for s in sketches),
+            sum(s.error for s in sketches) + max(int(s.weights.max()) for s in sketches),
+        )
+
+    def quantiles(self, qs) -> np.ndarray:
+        """
+        Values at the quantiles qs (0..1) by the nearest rank definition, NaN when empty.
+        """
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if len(self.items) == 0:
+            return np.full(len(qs), np.nan)
+        if self._cumulative is None:
+            self._cumulative = np.cumsum(self.weights)
+        total = self._cumulative[-1]
+        index = np.searchsorted(self._cumulative, np.ceil(qs * total), side="left")
+        out = self.items[np.clip(index, 0, len(self.items) - 1)]
+        out[qs <= 0] = self.low
+        out[qs >= 1] = self.high
+        return out
+
+
+SketchRun = namedtuple("SketchRun", ["start", "end", "sketches"])
+
+
+def _grow(counts: np.ndarray, parts: int) -> np.ndarray:
+    """
+    counts with zero rows added for partitions that appeared since.
+    """
+    if len(counts) >= parts:
+        return counts
+    extra = np.zeros((parts - len(counts),) + counts.shape[1:], dtype=counts.dtype)
+    return np.concatenate([counts, extra])
+
+
+class SketchIndex:
+    """
+    Quantile sketches, histograms and null counts of SKETCH_COLUMNS per partition.
+
+    The sketches are kept per run of rows (see extend), a query merges the sketches of
+    the matching partitions of every run.
+    """
+
+    def __init__(self, keys: list, labels: list, rows: np.ndarray, edges: dict, histograms: dict,
+                 nulls: dict, runs: list, k: int = K) -> None:
+        self.keys = keys
+        self.labels = labels  # one label tuple per partition
+        self.rows = rows  # rows per partition
+        self.edges = edges  # column -> histogram bin edges
+        self.histograms = histograms  # column -> (partitions, bins) counts
+        self.nulls = nulls  # column -> missing values per partition
+        self.runs = runs  # SketchRuns: rows [start, end), column -> QuantileSketch per partition
+        self.k = k
+
+    @staticmethod
+    def applies(dataset) -> bool:
+        return all(name in dataset for name in PARTITION_KEYS + SKETCH_COLUMNS)
+
+    @classmethod
+    def build(cls, dataset, k: int = K, bins: int = HIST_BINS) -> "SketchIndex":
+        edges, histograms, nulls = {}, {}, {}
+        for name in SKETCH_COLUMNS:
+            values = dataset[name].values
+            valid = values[~np.isnan(values)]
+            lo, hi = (float(valid.min()), float(valid.max())) if len(valid) else (0.0, 1.0)
+            edges[name] = np.linspace(lo, hi if hi > lo else lo + 1, bins + 1)
+            histograms[name] = np.zeros((0, bins), dtype=np.int64)
+            nulls[name] = np.zeros(0, dtype=np.int64)
+        empty = cls(list(PARTITION_KEYS), [], np.zeros(0, dtype=np.int64), edges, histograms, nulls, [], k)
+        return empty.extend(dataset, 0)
+
+    def extend(self, dataset, start: int) -> "SketchIndex":
+        """
+        Index of dataset, which is the dataset of this index with rows from `start` on
+        appended. Costs are proportional to the new rows (amortized, see below); self is
+        left as it was, so it can still be read while this runs.
+
+        The new rows get a run of their own. Whenever the run before the last one holds
+        less than twice the rows of the last one, both are rebuilt from the dataset as a
+        single run, so there are O(log rows) runs and every row is re-sketched O(log rows)
+        times over any sequence of appends. Sketches of runs are merged at query time like
+        those of partitions, the accuracy bound stays the same.
+
+        Histogram bins stay those of the first build: later values outside its range
+        are counted in the first or last bin.
+        """
+        end = len(dataset)
+        if start >= end:
+            return self
+        labels = list(self.labels)
+        positions = {label: i for i, label in enumerate(labels)}
+        group = self._partitions(dataset, start, end, labels, positions)
+        n_parts = len(labels)
+
+        rows = _grow(self.rows, n_parts) + np.bincount(group, minlength=n_parts)
+        histograms, nulls = {}, {}
+        for name in SKETCH_COLUMNS:
+            values = dataset[name].values[start:end]
+            valid = ~np.isnan(values)
+            nulls[name] = _grow(self.nulls[name], n_parts) + np.bincount(group[~valid], minlength=n_parts)
+            bins = len(self.edges[name]) - 1
+            index = np.clip(np.searchsorted(self.edges[name], values[valid], side="right") - 1, 0, bins - 1)
+            counts = np.bincount(group[valid] * bins + index, minlength=n_parts * bins).reshape(n_parts, bins)
+            histograms[name] = _grow(self.histograms[name], n_parts) + counts
+
+        runs = list(self.runs) + [self._run(dataset, start, end, group, n_parts)]
+        while len(runs) > 1 and runs[-2].end - runs[-2].start < 2 * (runs[-1].end - runs[-1].start):
+            first = runs[-2].start
+            group = self._partitions(dataset, first, end, labels, positions)
+            runs[-2:] = [self._run(dataset, first, end, group, n_parts)]
+        return SketchIndex(self.keys, labels, rows, self.edges, histograms, nulls, runs, self.k)
+
+    def _partitions(self, dataset, start: int, end: int, labels: list, positions: dict) -> np.ndarray:
+        """
+        Partition of each row in [start, end). Partitions not seen before are added to
+        labels and positions.
+        """
+        rows = None if start == 0 and end == len(dataset) else np.arange(start, end)
+        group, key_labels = group_ids(dataset, self.keys, rows)
+        remap = np.array(
+            [positions.setdefault(label, len(positions)) for label in zip(*[lab.tolist() for lab in key_labels])],
+            dtype=np.int64,
+        )
+        labels.extend(list(positions)[len(labels):])
+        return remap[group] if len(remap) else group
+
+    def _run(self, dataset, start: int, end: int, group: np.ndarray, n_parts: int) -> SketchRun:
+        sketches = {}
+        for name in SKETCH_COLUMNS:
+            values = dataset[name].values[start:end]
+            valid = ~np.isnan(values)
+            v, g = values[valid].astype(np.float64), group[valid]
+
+            # Put the partitions one after another (a radix sort on the small group ids),
+            # then sort each one in place. Much cheaper than a lexsort of (value, group).
+            order = np.argsort(g.astype(np.int16 if n_parts < 1 << 15 else np.int64), kind="stable")
+            v, g = v[order], g[order]
+            bounds = np.searchsorted(g, np.arange(n_parts + 1))
+            for a, b in zip(bounds[:-1], bounds[1:]):
+                v[a:b].sort()
+            sketches[name] = [QuantileSketch.from_sorted(v[a:b], self.k) for a, b in zip(bounds[:-1], bounds[1:])]
+        return SketchRun(start, end, sketches)
+
+    def select(self, where: dict = None) -> np.ndarray:
+        """
+        Boolean mask of the partitions matching where, a dict of key -> allowed labels.
+        Keys that aren't given match everything, None matches missing values.
+        """
+        mask = np.ones(len(self.labels), dtype=np.bool_)
+        for key, allowed in (where or {}).items():
+            if key not in self.keys:
+                raise ValueError("Can only filter on {}, not {!r}".format(", ".join(self.keys), key))
+            i = self.keys.index(key)
+            allowed = set(allowed)
+            mask &= np.array([labels[i] in allowed for labels in self.labels], dtype=np.bool_)
+        return mask
+
+    def count(self, where: dict = None) -> int:
+        return int(self.rows[self.select(where)].sum())
+
+    def sketch(self, column: str, where: dict = None) -> QuantileSketch:
+        parts = np.flatnonzero(self.select(where)).tolist()
+        return QuantileSketch.merge([
+            run.sketches[column][p] for run in self.runs for p in parts if p < len(run.sketches[column])
+        ])
+
+    def quantiles(self, column: str, qs, where: dict = None) -> np.ndarray:
+        return self.sketch(column, where).quantiles(qs)
+
+    def median(self, column: str, where: dict = None) -> float:
+        return float(self.quantiles(column, [0.5], where)[0])
+
+    def histogram(self, column: str, where: dict = None) -> tuple:
+        """
+        (edges, counts) of column over the matching partitions, missing values excluded.
+        """
+        return self.edges[column], self.histograms[column][self.select(where)].sum(axis=0)
+
+    def missing(self, column: str, where: dict = None) -> int:
+        return int(self.nulls[column][self.select(where)].sum())
+
+    # Sidecar cache
+
+    def to_buffers(self) -> tuple:
+        """
+        (meta, arrays): JSON-able metadata and the flat arrays to store in the cache.
+        """
+        meta = {"keys": self.keys, "labels": [list(labels) for labels in self.labels], "k": self.k, "runs": []}
+        arrays = {"rows": self.rows}
+        for name in self.edges:
+            arrays[name + ".edges"] = self.edges[name]
+            arrays[name + ".histogram"] = self.histograms[name].ravel()
+            arrays[name + ".nulls"] = self.nulls[name]
+        for i, run in enumerate(self.runs):
+            columns = {}
+            for name, sketches in run.sketches.items():
+                columns[name] = {
+                    "low": [s.low for s in sketches],
+                    "high": [s.high for s in sketches],
+                    "error": [s.error for s in sketches],
+                }
+                prefix = "run{}.{}.".format(i, name)
+                offsets = np.zeros(len(sketches) + 1, dtype=np.int64)
+                np.cumsum([len(s.items) for s in sketches], out=offsets[1:])
+                arrays[prefix + "items"] = np.concatenate([s.items for s in sketches])
+                arrays[prefix + "weights"] = np.concatenate([s.weights for s in sketches])
+                arrays[prefix + "offsets"] = offsets
+            meta["runs"].append({"start": run.start, "end": run.end, "columns": columns})
+        return meta, arrays
+
+    @classmethod
+    def from_buffers(cls, meta: dict, arrays: dict) -> "SketchIndex":
+        n_parts = len(meta["labels"])
+        edges, histograms, nulls = {}, {}, {}
+        for name in SKETCH_COLUMNS:
+            edges[name] = arrays[name + ".edges"]
+            histograms[name] = arrays[name + ".histogram"].reshape(n_parts, -1)
+            nulls[name] = arrays[name + ".nulls"]
+        runs = []
+        for i, run in enumerate(meta["runs"]):
+            sketches = {}
+            for name, info in run["columns"].items():
+                prefix = "run{}.{}.".format(i, name)
+                items, weights = arrays[prefix + "items"], arrays[prefix + "weights"]
+                bounds = arrays[prefix + "offsets"].tolist()
+                sketches[name] = [
+                    QuantileSketch(items[a:b], weights[a:b], low, high, error)
+                    for a, b, low, high, error in zip(bounds[:-1], bounds[1:], info["low"], info["high"], info["error"])
+                ]
+            runs.append(SketchRun(run["start"], run["end"], sketches))
+        labels = [tuple(labels) for labels in meta["labels"]]
+        return cls(meta["keys"], labels, arrays["rows"], edges, histograms, nulls, runs, meta["k"])
+
+
+def _group_label(key: str, label) -> str:
+    return "{} {}".format(key, "(missing)" if label is None else label)
+
+
+def _label_order(label) -> tuple:
+    return (label is None, str(label))
+
+
+def describe(dataset, column: str, rows=None, where: dict = None) -> GroupResult:
+    """
+    Count, missing values and QUANTILES of column over all rows and for each value of
+    every PARTITION_KEYS column, one group per line ("All", "Pclass 1", "Sex female", ...).
+
+    Answered from dataset.extras["sketches"] when there is no row filter, or when the
+    filter is where, a selection of PARTITION_KEYS labels (see SketchIndex.select) and
+    rows are the rows it selects. Otherwise computed exactly over the given rows (a
+    filter like a name search doesn't line up with the partitions).
+    """
+    sketches = dataset.extras.get("sketches") if rows is None or where is not None else None
+    groups, counts, missing, values = ["All"], [], [], []
+
+    if sketches is not None:
+        where = where or {}
+        selected = [labels for labels, keep in zip(sketches.labels, sketches.select(where)) if keep]
+        selections = [where]
+        for i, key in enumerate(sketches.keys):
+            for label in sorted({labels[i] for labels in selected}, key=_label_order):
+                groups.append(_group_label(key, label))
+                selections.append(dict(where, **{key: [label]}))
+        for where in selections:
+            counts.append(sketches.count(where))
+            missing.append(sketches.missing(column, where))
+            values.append(sketches.quantiles(column, list(QUANTILES.values()), where))
+    else:
+        data = dataset[column].values if rows is None else dataset[column].values[rows]
+        parts = [data]
+        for key in PARTITION_KEYS:
+            if key not in dataset:
+                continue
+            group, (labels,) = group_ids(dataset, [key], rows)
+            for g in sorted(range(len(labels)), key=lambda g: _label_order(labels[g])):
+                groups.append(_group_label(key, labels[g]))
+                parts.append(data[group == g])
+        for part in parts:
+            valid = part[~np.isnan(part)].astype(np.float64)
+            counts.append(len(part))
+            missing.append(len(part) - len(valid))
+            if len(valid):
+                values.append(np.quantile(valid, list(QUANTILES.values()), method="inverted_cdf"))
+            else:
+                values.append(np.full(len(QUANTILES), np.nan))
+
+    values = np.array(values, dtype=np.float64).reshape(len(groups), len(QUANTILES))
+    result = {"count": np.array(counts), "missing": np.array(missing)}
+    for i, name in enumerate(QUANTILES):
+        result[name] = values[:, i]
+    return GroupResult(["Group"], {"Group": groups}, result)
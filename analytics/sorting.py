@@ -0,0 +1,312 @@
+"""
+Multi-column sorting of a dataset as cached permutations of its rows.
+
+Sorting the table by Fare, then Age, then Name through QSortFilterProxyModel means a
+Python lessThan() call for every comparison, n log n of them, each formatting two cells.
+Here a sort is a permutation of the row indices computed with NumPy, and the table model
+shows the permutation as its row index array (see PassengerTableModel.set_rows), so the
+data is never copied or moved.
+
+Every column is first turned into ranks: int32 codes that order like the values (equal
+values get equal ranks, missing values the largest rank, so they come last in ascending
+order and first in descending order). Ranks are computed once per column with a stable
+argsort and kept, which also gives the single-column ascending permutation for free.
+String columns are ranked on their UTF-8 bytes, never decoded (see _string_order_keys).
+A sort key is a list of (column, ascending) pairs:
+
+    one column        the rank argsort (or its reverse, see below)
+    several columns   the ranks combined into one int64 key with mixed radix arithmetic
+                      and one stable argsort, np.lexsort when the key wouldn't fit
+
+Permutations are cached per sort key (MAX_CACHED of them, least recently used dropped):
+
+    same key again          the cached array
+    every direction flipped the cached array with its runs of equal keys reversed as
+                            blocks, O(n) and no sort. Rows with equal keys stay in file
+                            order both ways, exactly as a fresh stable sort would leave them.
+    filter results          mapped through the cached permutation: the filtered rows in
+                            sorted order are perm[mask[perm]] (or, for a few rows, their
+                            positions in perm argsorted), never a sort of the values
+
+    engine = SortEngine(dataset)
+    rows = engine.sorted_rows([("Fare", False), ("Age", True), ("Name", True)], search_rows)
+
+The engine belongs to one dataset. It is safe to use from task threads.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from analytics.schema import CATEGORICAL, STRING
+
+MAX_CACHED = 8
+# Filters keeping less than 1/MAP_SORT_RATIO of the rows are ordered by sorting their
+# positions, bigger ones by masking the whole permutation
+MAP_SORT_RATIO = 32
+
+
+def normalize_keys(keys) -> tuple:
+    """
+    ((column, ascending), ...) from a list of (column, ascending) pairs or column names.
+    """
+    result = []
+    for key in keys:
+        column, ascending = (key, True) if isinstance(key, str) else key
+        result.append((column, bool(ascending)))
+    return tuple(result)
+
+
+def _dense_ranks(values: np.ndarray, null: np.ndarray = None) -> tuple:
+    """
+    (ranks, stable ascending order) of values. Nulls get the largest rank.
+    """
+    order = np.argsort(values, kind="stable")
+    if null is not None and null.any():
+        # Nulls after everything else, in file order
+        order = np.concatenate([order[~null[order]], np.flatnonzero(null)])
+    ordered = values[order]
+    change = np.empty(len(values), dtype=np.bool_)
+    if len(values):
+        change[0] = False
+        change[1:] = ordered[1:] != ordered[:-1]
+        if null is not None and null.any():
+            valid = len(values) - int(null.sum())
+            change[valid:] = False
+            if 0 < valid < len(values):
+                change[valid] = True
+    ranks = np.empty(len(values), dtype=np.int32)
+    ranks[order] = np.cumsum(change, dtype=np.int32)
+    return ranks, order
+
+
+def _words(data: np.ndarray, starts: np.ndarray, lengths: np.ndarray, position: int) -> np.ndarray:
+    """
+    Bytes [position, position + 8) of every string as a big-endian uint64, zero past
+    its end.
+    """
+    word = np.zeros(len(starts), dtype=np.uint64)
+    for i in range(8):
+        inside = lengths > position + i
+        byte = np.zeros(len(starts), dtype=np.uint64)
+        byte[inside] = data[starts[inside] + position + i]
+        word = (word << np.uint64(8)) | byte
+    return word
+
+
+def _string_order_keys(col) -> np.ndarray:
+    """
+    int64 keys that order like the strings of col, equal for equal strings: the
+    position of every string's first equal in sorted order. UTF-8 bytes order like the
+    code points they encode, so the bytes are ranked 8 at a time, each round only
+    re-sorting rows still tied with another row, and nothing is decoded.
+    """
+    data, offsets = col.compact()
+    starts, lengths = offsets[:-1], np.diff(offsets)
+    keys = np.zeros(len(lengths), dtype=np.int64)
+    active = np.arange(len(lengths))
+    width = int(lengths.max()) if len(lengths) else 0
+    position = 0
+    while len(active) > 1:
+        if position < width:
+            word = _words(data, starts[active], lengths[active], position)
+        else:
+            # Only zero bytes told them apart so far, the shorter one comes first
+            word = lengths[active].astype(np.uint64)
+        order = np.lexsort((word, keys[active]))
+        rows, group, word = active[order], keys[active][order], word[order]
+        n = len(rows)
+        index = np.arange(n)
+        group_change = np.ones(n, dtype=np.bool_)
+        group_change[1:] = group[1:] != group[:-1]
+        change = group_change.copy()
+        change[1:] |= word[1:] != word[:-1]
+        # A row moves down its tied group by how far into it its new subgroup starts
+        group_start = np.maximum.accumulate(np.where(group_change, index, 0))
+        sub_start = np.maximum.accumulate(np.where(change, index, 0))
+        keys[rows] = group + (sub_start - group_start)
+        if position >= width:
+            break
+        position += 8
+        # Subgroups still tied, unless their strings are already equal to the end
+        starts_at = np.flatnonzero(change)
+        sizes = np.diff(np.append(starts_at, n))
+        ordered_lengths = lengths[rows]
+        shortest = np.minimum.reduceat(ordered_lengths, starts_at)
+        longest = np.maximum.reduceat(ordered_lengths, starts_at)
+        open_group = (sizes > 1) & ~((shortest == longest) & (longest <= position))
+        active = rows[np.repeat(open_group, sizes)]
+    return keys
+
+
+class SortEngine:
+
+    def __init__(self, dataset, max_cached: int = MAX_CACHED) -> None:
+        self.dataset = dataset
+        self.max_cached = max_cached
+        self._ranks = {}  # column -> (ranks, cardinality)
+        self._perms = OrderedDict()  # normalized keys -> permutation
+        self._positions = {}  # normalized keys -> inverse permutation
+        self._lock = threading.Lock()
+        self._index_type = np.int32 if len(dataset) < 2 ** 31 else np.int64
+
+    # Ranks
+
+    def ranks(self, column: str) -> tuple:
+        """
+        (ranks, cardinality) of a column, computed on first use.
+        """
+        with self._lock:
+            cached = self._ranks.get(column)
+        if cached is not None:
+            return cached
+        col = self.dataset[column]
+        order = None
+        if col.kind == CATEGORICAL:
+            # Categories are numbered in first-seen order, rank them alphabetically
+            lookup = np.empty(len(col.categories) + 1, dtype=np.int32)
+            lookup[:-1] = np.argsort(np.argsort(np.array(col.categories, dtype=object), kind="stable"))
+            lookup[-1] = len(col.categories)
+            # Code -1 (null) indexes the last slot
+            ranks = lookup[col.codes]
+            cardinality = len(col.categories) + 1
+        elif col.kind == STRING:
+            ranks, order = _dense_ranks(_string_order_keys(col), col.null_mask() if col.validity is not None else None)
+            cardinality = int(ranks.max()) + 1 if len(ranks) else 1
+        else:
+            values = col.values
+            null = col.null_mask() if col.validity is not None else None
+            if values.dtype.kind in "iu" and null is None and len(values) \
+                    and int(values.max()) - int(values.min()) < 2 ** 31 - 1:
+                low = int(values.min())
+                ranks = (values.astype(np.int64) - low).astype(np.int32)
+                cardinality = int(values.max()) - low + 1
+            else:
+                if values.dtype.kind == "f":
+                    nan = np.isnan(values)
+                    null = nan if null is None else null | nan
+                ranks, order = _dense_ranks(values, null)
+                cardinality = int(ranks.max()) + 1 if len(ranks) else 1
+        with self._lock:
+            self._ranks[column] = (ranks, cardinality)
+            if order is not None:
+                self._store(((column, True),), order.astype(self._index_type, copy=False))
+        return ranks, cardinality
+
+    # Permutations
+
+    def permutation(self, keys) -> np.ndarray:
+        """
+        Rows in sorted order for a sort key, from the cache when possible.
+        """
+        keys = normalize_keys(keys)
+        if not keys:
+            return np.arange(len(self.dataset), dtype=self._index_type)
+        with self._lock:
+            perm = self._perms.get(keys)
+            if perm is not None:
+                self._perms.move_to_end(keys)
+                return perm
+            flipped = tuple((column, not ascending) for column, ascending in keys)
+            reverse_of = self._perms.get(flipped)
+        if reverse_of is not None:
+            perm = self._reverse_runs(keys, reverse_of)
+        else:
+            perm = self._sort(keys)
+        with self._lock:
+            self._store(keys, perm)
+        return perm
+
+    def sorted_rows(self, keys, rows=None) -> np.ndarray:
+        """
+        rows (dataset row indices, e.g. a filter result, None for all) in sorted order.
+        """
+        perm = self.permutation(keys)
+        if rows is None:
+            return perm
+        n = len(self.dataset)
+        if len(rows) * MAP_SORT_RATIO < n:
+            positions = self._inverse(normalize_keys(keys), perm)
+            return rows[np.argsort(positions[rows], kind="stable")]
+        mask = np.zeros(n, dtype=np.bool_)
+        mask[rows] = True
+        return perm[mask[perm]]
+
+    def _store(self, keys: tuple, perm: np.ndarray) -> None:
+        # Called with the lock held
+        self._perms[keys] = perm
+        self._perms.move_to_end(keys)
+        while len(self._perms) > self.max_cached:
+            dropped, _ = self._perms.popitem(last=False)
+            self._positions.pop(dropped, None)
+
+    def _inverse(self, keys: tuple, perm: np.ndarray) -> np.ndarray:
+        with self._lock:
+            positions = self._positions.get(keys)
+        if positions is None:
+            positions = np.empty(len(perm), dtype=self._index_type)
+            positions[perm] = np.arange(len(perm), dtype=self._index_type)
+            with self._lock:
+                if keys in self._perms:
+                    self._positions[keys] = positions
+        return positions
+
+    def _directed(self, column: str, ascending: bool) -> tuple:
+        ranks, cardinality = self.ranks(column)
+        if ascending:
+            return ranks, cardinality
+        return (cardinality - 1) - ranks, cardinality
+
+    def _sort(self, keys: tuple) -> np.ndarray:
+        if len(keys) == 1:
+            column, ascending = keys[0]
+            ranks, _ = self._directed(column, ascending)
+            with self._lock:
+                cached = self._perms.get(keys)
+            if cached is not None:
+                # ranks() just stored the ascending order
+                return cached
+            if not ascending:
+                # The ascending order exists now, descending is its runs reversed
+                return self._reverse_runs(keys, self.permutation(((column, True),)))
+            return np.argsort(ranks, kind="stable").astype(self._index_type, copy=False)
+
+        directed = [self._directed(column, ascending) for column, ascending in keys]
+        space = 1
+        for _, cardinality in directed:
+            space *= cardinality
+        if space < 2 ** 63:
+            combined = np.zeros(len(self.dataset), dtype=np.int64)
+            for ranks, cardinality in directed:
+                combined *= cardinality
+                combined += ranks
+            perm = np.argsort(combined, kind="stable")
+        else:
+            # np.lexsort sorts by the last key first
+            perm = np.lexsort([ranks for ranks, _ in reversed(directed)])
+        return perm.astype(self._index_type, copy=False)
+
+    def _reverse_runs(self, keys: tuple, perm: np.ndarray) -> np.ndarray:
+        """
+        The permutation for keys given the one for keys with every direction flipped:
+        the runs of rows with equal keys come in reverse order, each run keeping its
+        rows in file order.
+        """
+        n = len(perm)
+        if n == 0:
+            return perm
+        change = np.zeros(n, dtype=np.bool_)
+        change[0] = True
+        for column, _ in keys:
+            ranks, _ = self.ranks(column)
+            ordered = ranks[perm]
+            change[1:] |= ordered[1:] != ordered[:-1]
+        starts = np.flatnonzero(change)
+        ends = np.append(starts[1:], n)
+        group = np.cumsum(change) - 1
+        # Run g moves from [starts[g], ends[g]) to [n - ends[g], n - starts[g])
+        position = (n - ends)[group] + (np.arange(n) - starts[group])
+        reversed_perm = np.empty_like(perm)
+        reversed_perm[position] = perm
+        return reversed_perm
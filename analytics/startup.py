@@ -0,0 +1,114 @@
+"""
+Startup timeline: when each phase of launching the app finished.
+
+    from analytics.startup import timeline
+
+    with timeline.span("import PyQt5"):
+        import PyQt5.QtWidgets
+    timeline.mark("first paint")
+
+Times are measured from the moment this module was imported, which the entry point does
+before anything else. The process start itself is estimated from /proc on Linux so the
+interpreter's own startup shows up too. Recording is always on, it's a list append.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+_T0 = time.perf_counter()
+
+
+def _interpreter_startup() -> float:
+    """
+    Seconds between process start and the import of this module, or 0.0 if unknown.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 is the start time in clock ticks since boot. The command name
+            # (field 2) can contain spaces, so split after its closing parenthesis.
+            fields = f.read().rsplit(")", 1)[1].split()
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+    # Both clocks have coarse resolution (10 ms ticks), good enough for a timeline
+    return max(0.0, uptime - started - (time.perf_counter() - _T0))
+
+
+class StartupTimeline:
+
+    def __init__(self) -> None:
+        self.events = []  # (name, start, end) in seconds since _T0
+        self.interpreter = _interpreter_startup()
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return time.perf_counter() - _T0
+
+    def mark(self, name: str) -> None:
+        t = self.now()
+        with self._lock:
+            self.events.append((name, t, t))
+
+    @contextmanager
+    def span(self, name: str):
+        start = self.now()
+        try:
+            yield
+        finally:
+            end = self.now()
+            with self._lock:
+                self.events.append((name, start, end))
+
+    def import_module(self, name: str):
+        """
+        Imports a module and records how long that took. Returns the module.
+        """
+        import importlib
+        already = name in sys.modules
+        with self.span("import {}{}".format(name, " (cached)" if already else "")):
+            return importlib.import_module(name)
+
+    def find(self, name: str):
+        for event in self.events:
+            if event[0] == name:
+                return event
+        return None
+
+    def report(self) -> str:
+        lines = ["Startup timeline (ms since launch)"]
+        if self.interpreter:
+            lines.append("{:>9.1f}  {:>9}  interpreter start".format(0.0, ""))
+        offset = self.interpreter * 1000
+        for name, start, end in sorted(self.events, key=lambda e: e[1]):
+            duration = "" if end == start else "+{:.1f}".format((end - start) * 1000)
+            lines.append("{:>9.1f}  {:>9}  {}".format(offset + end * 1000, duration, name))
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        offset = self.interpreter
+        return {
+            "interpreter_s": self.interpreter,
+            "events": [
+                {"name": name, "start_s": offset + start, "end_s": offset + end}
+                for name, start, end in sorted(self.events, key=lambda e: e[1])
+            ],
+        }
+
+    def dump(self, path: str = None) -> None:
+        """
+        Writes the timeline as JSON to path, or as text to stderr if no path is given.
+        """
+        if not path or path == "-":
+            print(self.report(), file=sys.stderr)
+            return
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+timeline = StartupTimeline()
@@ -0,0 +1,402 @@
+"""
+Column store files: a passenger CSV converted once into typed columns cut in row groups.
+
+The sidecar cache (see loader.py) already saves the parse on the second open of a CSV,
+but it is one block per column that is always read whole and lives next to the CSV it
+belongs to. A column store file (train.csv -> train.pcol) stands on its own and can be
+read in part:
+
+    column pruning       only the columns asked for are touched, reading Survived,
+                         Pclass and Fare never decodes a Name
+    predicate pushdown   every column chunk (one column of one row group) records its
+                         min, max and null count, categorical chunks also which codes
+                         occur. A row group the statistics rule out for the filter is
+                         skipped without reading any of its data.
+
+    dataset = read_store("data/train.pcol", columns=["Survived", "Pclass", "Fare"],
+                         where=[("Pclass", "==", 1), ("Fare", ">", 100)])
+
+where is a list of (column, op, value) conditions that must all hold, op is one of ==,
+!=, <, <=, >, >= and "in" (value is then a list). Null values never match. The rows of
+the row groups that are read are filtered exactly, so the result is the same whether
+groups were skipped or not. Skipping pays off when the filtered column is clustered,
+e.g. a PassengerId range or a file sorted by class.
+
+Chunks are aligned like the sidecar buffers and, uncompressed, memory-mapped in place.
+With compression="zlib" every buffer is deflated on its own (and kept raw when that
+doesn't make it smaller), which trades open time for a file about a third the size.
+
+Layout (the footer goes last, so a file is written in one pass):
+    MAGIC | column chunk and extras buffers (each aligned to 64 bytes) | JSON footer |
+    uint64 footer length | MAGIC
+
+Reading every row and column of a file gives back the dataset it was written from, with
+its extras (see loader.EXTRAS), and is what load_dataset() does for a .pcol path. Convert
+files with:
+
+    python -m analytics.store data/train.csv data/test.csv --compression zlib
+"""
+
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from analytics.columns import Dataset, NumericColumn, CategoricalColumn, StringColumn, join_strings
+from analytics.loader import EXTRAS, file_fingerprint, load_dataset, _ALIGN
+from analytics.schema import NUMERIC, CATEGORICAL
+
+STORE_SUFFIX = ".pcol"
+STORE_MAGIC = b"SQTPCOL1"
+STORE_VERSION = 1
+# A multiple of 8, so the validity bitmaps of consecutive groups can be concatenated
+ROW_GROUP_ROWS = 128 * 1024
+COMPRESSIONS = (None, "zlib")
+# Categorical chunks list the codes they contain up to this many distinct ones
+PRESENT_CODES = 256
+OPS = ("==", "!=", "<", "<=", ">", ">=", "in")
+
+
+def store_path(path: str) -> str:
+    return os.path.splitext(path)[0] + STORE_SUFFIX
+
+
+def is_store(path: str) -> bool:
+    return path.endswith(STORE_SUFFIX)
+
+
+def _chunk_stats(col, start: int, end: int) -> dict:
+    null = col.null_mask()[start:end] if col.validity is not None else None
+    stats = {"nulls": int(null.sum()) if null is not None else 0}
+    if col.kind == CATEGORICAL:
+        codes = np.unique(col.codes[start:end])
+        codes = codes[codes >= 0]
+        if len(codes) <= PRESENT_CODES:
+            stats["codes"] = codes.tolist()
+        return stats
+    values = col.values[start:end] if col.kind == NUMERIC else np.array(col.decode(start, end), dtype=object)
+    if null is not None:
+        values = values[~null]
+    if col.kind == NUMERIC and values.dtype.kind == "f":
+        values = values[~np.isnan(values)]
+    if len(values):
+        if col.kind == NUMERIC:
+            stats["min"], stats["max"] = values.min().item(), values.max().item()
+        else:
+            stats["min"], stats["max"] = min(values), max(values)
+    return stats
+
+
+def write_store(dataset: Dataset, path: str, row_group_rows: int = ROW_GROUP_ROWS,
+                compression: str = None, progress=None) -> str:
+    """
+    Writes dataset to a column store file and returns its path. progress, if given, is
+    called as progress(fraction, message) after every row group.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError("Unknown compression {!r}, expected one of {}".format(compression, COMPRESSIONS))
+    if row_group_rows <= 0 or row_group_rows % 8:
+        raise ValueError("row_group_rows must be a positive multiple of 8, got {}".format(row_group_rows))
+    rows = len(dataset)
+    message = "Writing {}".format(os.path.basename(path))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(STORE_MAGIC)
+
+        def add(array) -> dict:
+            array = np.ascontiguousarray(array)
+            data = array.tobytes()
+            codec = None
+            if compression == "zlib":
+                packed = zlib.compress(data, 1)
+                if len(packed) < len(data):
+                    data, codec = packed, "zlib"
+            f.write(b"\0" * (-f.tell() % _ALIGN))
+            entry = {"dtype": array.dtype.str, "count": len(array), "offset": f.tell(), "size": len(data)}
+            if codec is not None:
+                entry["codec"] = codec
+            f.write(data)
+            return entry
+
+        groups = []
+        for start in range(0, max(rows, 1), row_group_rows):
+            end = min(start + row_group_rows, rows)
+            chunks = {}
+            for col in dataset.columns.values():
+                if col.kind == NUMERIC:
+                    buffers = {"values": add(col.values[start:end])}
+                elif col.kind == CATEGORICAL:
+                    buffers = {"codes": add(col.codes[start:end])}
+                else:
+                    data, offsets = col.take(slice(start, end)).compact()
+                    buffers = {"data": add(data), "offsets": add(offsets)}
+                if col.validity is not None:
+                    # start is a multiple of 8, so the group's bits start at a byte
+                    buffers["validity"] = add(col.validity[start // 8:(end + 7) // 8])
+                chunks[col.name] = {"buffers": buffers, "stats": _chunk_stats(col, start, end)}
+            groups.append({"start": start, "rows": end - start, "chunks": chunks})
+            if progress is not None and rows:
+                progress(end / rows, message)
+
+        extras = {}
+        for name, extra in dataset.extras.items():
+            meta, arrays = extra.to_buffers()
+            extras[name] = {"meta": meta, "buffers": {key: add(array) for key, array in arrays.items()}}
+
+        columns = []
+        for col in dataset.columns.values():
+            entry = {"name": col.name, "kind": col.kind, "nullable": col.validity is not None}
+            if col.kind == CATEGORICAL:
+                entry["categories"] = col.categories
+            columns.append(entry)
+        footer = json.dumps({
+            "version": STORE_VERSION,
+            "rows": rows,
+            "compression": compression,
+            "source_fingerprint": list(dataset.fingerprint) if dataset.fingerprint else None,
+            "columns": columns,
+            "row_groups": groups,
+            "extras": extras,
+        }).encode("utf-8")
+        f.write(footer)
+        f.write(struct.pack("<Q", len(footer)))
+        f.write(STORE_MAGIC)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _group_may_match(stats: dict, op: str, value, kind: str, categories: list) -> bool:
+    """
+    False when no row of a chunk with these statistics can satisfy `column op value`.
+    """
+    if kind == CATEGORICAL:
+        present = stats.get("codes")
+        if present is None or op not in ("==", "!=", "in"):
+            return True
+        lookup = {c: i for i, c in enumerate(categories)}
+        if op == "==":
+            return lookup.get(value, -1) in present
+        if op == "in":
+            return any(lookup.get(v, -1) in present for v in value)
+        return present != [lookup.get(value, -1)]
+    if "min" not in stats:
+        # Only nulls, which match nothing
+        return False
+    low, high = stats["min"], stats["max"]
+    if op == "==":
+        return low <= value <= high
+    if op == "!=":
+        return not low == high == value
+    if op == "<":
+        return low < value
+    if op == "<=":
+        return low <= value
+    if op == ">":
+        return high > value
+    if op == ">=":
+        return high >= value
+    return any(low <= v <= high for v in value)
+
+
+def _compare(data: np.ndarray, op: str, value) -> np.ndarray:
+    if op == "in":
+        return np.isin(data, list(value))
+    mask = {
+        "==": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal,
+        ">": np.greater, ">=": np.greater_equal,
+    }[op](data, value)
+    return np.asarray(mask, dtype=np.bool_)
+
+
+def _matches(col, op: str, value, group_rows: list) -> np.ndarray:
+    """
+    Boolean mask of the rows of col that satisfy `col op value`, False for nulls.
+    group_rows are the row counts of the row groups col was read from, strings are
+    decoded one row group at a time.
+    """
+    if col.kind == CATEGORICAL:
+        if op not in ("==", "!=", "in"):
+            raise ValueError("Column {} is categorical, {} isn't supported on it".format(col.name, op))
+        if op == "in":
+            value = [col.code_of(v) for v in value]
+        else:
+            value = col.code_of(value)
+        mask = _compare(col.codes, op, value)
+    elif col.kind == NUMERIC:
+        mask = _compare(col.values, op, value)
+    else:
+        bounds = np.cumsum([0] + list(group_rows)).tolist()
+        mask = np.concatenate([np.zeros(0, dtype=np.bool_)] + [
+            _compare(np.array(col.decode(start, end), dtype=object), op, value)
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ])
+    if col.kind == CATEGORICAL:
+        mask &= col.codes >= 0
+    elif col.validity is not None:
+        mask &= ~col.null_mask()
+    return mask
+
+
+class StoreReader:
+    """
+    An open column store file: the footer parsed and the file memory-mapped. Nothing else
+    is read until read() asks for it.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+                raise ValueError("{} is not a column store".format(path))
+            f.seek(-(8 + len(STORE_MAGIC)), os.SEEK_END)
+            (footer_size,) = struct.unpack("<Q", f.read(8))
+            if f.read(len(STORE_MAGIC)) != STORE_MAGIC:
+                raise ValueError("{} is truncated".format(path))
+            f.seek(-(8 + len(STORE_MAGIC) + footer_size), os.SEEK_END)
+            self.footer = json.loads(f.read(footer_size))
+        if self.footer["version"] != STORE_VERSION:
+            raise ValueError("{} has store version {}, expected {}".format(
+                path, self.footer["version"], STORE_VERSION))
+        self.columns = {entry["name"]: entry for entry in self.footer["columns"]}
+        self.row_groups = self.footer["row_groups"]
+        self._mapped = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def __len__(self) -> int:
+        return self.footer["rows"]
+
+    @property
+    def column_names(self) -> list:
+        return list(self.columns)
+
+    def _check(self, where) -> list:
+        where = [tuple(condition) for condition in where or ()]
+        for column, op, _ in where:
+            if column not in self.columns:
+                raise ValueError("{} has no column {}".format(self.path, column))
+            if op not in OPS:
+                raise ValueError("Unknown operator {!r}, expected one of {}".format(op, OPS))
+        return where
+
+    def matching_groups(self, where=None) -> list:
+        """
+        Indexes of the row groups the chunk statistics don't rule out for where.
+        """
+        where = self._check(where)
+        return [
+            i for i, group in enumerate(self.row_groups)
+            if all(
+                _group_may_match(group["chunks"][column]["stats"], op, value,
+                                 self.columns[column]["kind"], self.columns[column].get("categories"))
+                for column, op, value in where
+            )
+        ]
+
+    def _buffer(self, entry) -> np.ndarray:
+        dtype = np.dtype(entry["dtype"])
+        start = entry["offset"]
+        raw = self._mapped[start:start + entry["size"]]
+        if entry.get("codec") == "zlib":
+            return np.frombuffer(zlib.decompress(raw), dtype=dtype)
+        return raw.view(dtype)
+
+    def _column(self, name: str, groups: list):
+        entry = self.columns[name]
+        chunks = [self.row_groups[i]["chunks"][name]["buffers"] for i in groups]
+
+        def joined(key) -> np.ndarray:
+            parts = [self._buffer(chunk[key]) for chunk in chunks]
+            # One group is a view into the map, more are copied into one array
+            return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+        validity = None
+        if entry["nullable"] and chunks:
+            # Groups are whole bytes of the bitmap except the last one of the file, which
+            # is also last here
+            validity = joined("validity")
+        if entry["kind"] == NUMERIC:
+            return NumericColumn(name, joined("values"), validity)
+        if entry["kind"] == CATEGORICAL:
+            return CategoricalColumn(name, joined("codes"), entry["categories"], validity)
+        if len(chunks) == 1:
+            return StringColumn(name, self._buffer(chunks[0]["data"]), self._buffer(chunks[0]["offsets"]), validity)
+        data, offsets = join_strings((self._buffer(chunk["data"]), self._buffer(chunk["offsets"])) for chunk in chunks)
+        return StringColumn(name, data, offsets, validity)
+
+    def read(self, columns=None, where=None) -> Dataset:
+        """
+        The rows satisfying where, with only the given columns (all by default). A read of
+        everything is the dataset that was written, extras included, and carries the store
+        file's fingerprint. Anything less is derived data without either.
+        """
+        names = list(columns) if columns is not None else self.column_names
+        for name in names:
+            if name not in self.columns:
+                raise ValueError("{} has no column {}".format(self.path, name))
+        where = self._check(where)
+        groups = self.matching_groups(where) if where else list(range(len(self.row_groups)))
+        if not self.row_groups or len(self) == 0:
+            groups = []
+
+        needed = names + [column for column, _, _ in where if column not in names]
+        loaded = {name: self._column(name, groups) for name in needed} if groups else {
+            name: self._empty(name) for name in needed
+        }
+        if where and groups:
+            mask = np.ones(len(next(iter(loaded.values()))), dtype=np.bool_)
+            group_rows = [self.row_groups[i]["rows"] for i in groups]
+            for column, op, value in where:
+                mask &= _matches(loaded[column], op, value, group_rows)
+            rows = np.flatnonzero(mask)
+            loaded = {name: loaded[name].take(rows) for name in names}
+        dataset = Dataset({name: loaded[name] for name in names}, source=self.path)
+
+        if not where and columns is None:
+            dataset.fingerprint = file_fingerprint(self.path)
+            for name, entry in self.footer["extras"].items():
+                if name in EXTRAS:
+                    arrays = {key: self._buffer(buffer) for key, buffer in entry["buffers"].items()}
+                    dataset.extras[name] = EXTRAS[name].from_buffers(entry["meta"], arrays)
+        return dataset
+
+    def _empty(self, name: str):
+        entry = self.columns[name]
+        if entry["kind"] == NUMERIC:
+            dtype = self.row_groups[0]["chunks"][name]["buffers"]["values"]["dtype"] if self.row_groups else "<f8"
+            return NumericColumn(name, np.array([], dtype=dtype))
+        if entry["kind"] == CATEGORICAL:
+            return CategoricalColumn(name, np.array([], dtype=np.int32), entry["categories"])
+        return StringColumn.from_values(name, [])
+
+
+def read_store(path: str, columns=None, where=None) -> Dataset:
+    """
+    Reads a column store file, see StoreReader.read.
+    """
+    return StoreReader(path).read(columns, where)
+
+
+def convert_csv(path: str, out: str = None, row_group_rows: int = ROW_GROUP_ROWS,
+                compression: str = None, progress=None) -> str:
+    """
+    Converts a passenger CSV to a column store file next to it (or at out).
+    """
+    dataset = load_dataset(path, progress=progress, workers=None)
+    return write_store(dataset, out or store_path(path), row_group_rows, compression, progress)
+
+
+def main(argv=None) -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Convert passenger CSVs to column store files")
+    parser.add_argument("csv", nargs="+")
+    parser.add_argument("--compression", choices=["zlib"])
+    parser.add_argument("--row-group-rows", type=int, default=ROW_GROUP_ROWS)
+    args = parser.parse_args(argv)
+    for path in args.csv:
+        out = convert_csv(path, compression=args.compression, row_group_rows=args.row_group_rows)
+        print("{} -> {} ({:,} bytes)".format(path, out, os.path.getsize(out)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Streaming ingestion for CSVs that don't fit in memory.
+
+The file is read in fixed-size byte chunks. Each chunk is cut at its last record boundary
+and the tail is carried over to the next chunk, so a record (including a quoted field such
+as "Braund, Mr. Owen Harris" that happens to straddle two reads) is always parsed whole.
+A newline only ends a record when it is outside quotes, which is the case exactly when an
+even number of quote characters precede it in the chunk: doubled quotes ("") inside a
+field count twice and don't change the parity. That test is a cumsum over the chunk bytes.
+
+Every chunk is parsed into typed Dataset batches of at most BLOCK_ROWS rows (same column
+types and categorical codes as loader.read_csv) that are fed to RunningAggregate and
+dropped. Peak memory is a few times the chunk size plus one batch, no matter how big the
+file is:
+
+    for batch in iter_batches("passengers.csv"):
+        running.update(batch)
+
+stream_aggregate() wraps that loop with progress and partial results for the UI.
+"""
+
+import csv
+import io
+import os
+import time
+from itertools import islice
+
+import numpy as np
+
+from analytics.aggregate import aggregate, GroupResult, Bins
+from analytics.loader import TableBuilder, BLOCK_ROWS
+
+CHUNK_BYTES = 4 * 1024 * 1024
+
+# Minimum time between two partial results, regrouping the table is not free for the UI
+PARTIAL_INTERVAL = 0.25
+
+_QUOTE = ord('"')
+_NEWLINE = ord("\n")
+
+
+def last_record_end(buf: bytes) -> int:
+    """
+    Returns the index just past the last newline in buf that is not inside quotes, or 0
+    if buf contains no complete record. buf must start at a record boundary.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    newlines = np.flatnonzero(data == _NEWLINE)
+    if len(newlines) == 0:
+        return 0
+    quotes_before = np.cumsum(data == _QUOTE, dtype=np.int64)[newlines]
+    outside = newlines[(quotes_before & 1) == 0]
+    return int(outside[-1]) + 1 if len(outside) else 0
+
+
+def iter_record_chunks(f, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Reads a binary file object in chunks that each end on a record boundary.
+    """
+    carry = b""
+    while True:
+        data = f.read(chunk_bytes)
+        if not data:
+            break
+        buf = carry + data
+        end = last_record_end(buf)
+        if end == 0:
+            # A single record longer than a chunk, keep reading until it ends
+            carry = buf
+            continue
+        carry = buf[end:]
+        yield buf[:end]
+    if carry:
+        # Last record without a trailing newline
+        yield carry
+
+
+def iter_batches(path: str, chunk_bytes: int = CHUNK_BYTES, batch_rows: int = BLOCK_ROWS,
+                 progress=None):
+    """
+    Yields the rows of a passenger CSV as typed Dataset batches of up to batch_rows rows.
+    progress, if given, is called as progress(fraction, message) after every batch.
+    """
+    size = max(os.path.getsize(path), 1)
+    message = "Streaming {}".format(os.path.basename(path))
+    with open(path, "rb") as f:
+        chunks = iter_record_chunks(f, chunk_bytes)
+        table = None
+        for chunk in chunks:
+            reader = csv.reader(io.StringIO(chunk.decode("utf-8"), newline=""))
+            if table is None:
+                table = TableBuilder(next(reader), source=path)
+            done = f.tell()
+            del chunk
+            while True:
+                rows = list(islice(reader, batch_rows))
+                if not rows:
+                    break
+                table.append_rows(rows)
+                del rows
+                batch = table.flush()
+                if progress is not None:
+                    # Progress within the chunk isn't known without counting bytes, the
+                    # end of the chunk is close enough
+                    progress(min(done / size, 1.0), message)
+                yield batch
+
+
+def _measures(aggs) -> list:
+    """
+    The mergeable per-batch aggregates needed to compute aggs over the whole stream.
+    """
+    measures = []
+    for column, func in aggs:
+        if func == "mean":
+            needed = [(column, "sum"), (column, "count")]
+        else:
+            needed = [(column, func)]
+        for m in needed:
+            if m not in measures:
+                measures.append(m)
+    return measures
+
+
+def _measure_name(column: str, func: str) -> str:
+    return "count" if column == "*" else "{}:{}".format(column, func)
+
+
+class RunningAggregate:
+    """
+    Group-by aggregates (see aggregate.aggregate) maintained over a stream of batches.
+    Groups are matched by their labels, so batches don't have to share categorical codes,
+    and are listed in the order they were first seen.
+    """
+
+    def __init__(self, by: list, aggs: list) -> None:
+        self.by = list(by)
+        self.aggs = list(aggs)
+        self.measures = _measures(self.aggs)
+        self.groups = {}  # label tuple -> list of measure values
+        self.rows = 0
+
+    def update(self, batch) -> None:
+        result = aggregate(batch, self.by, self.measures)
+        self.rows += len(batch)
+        labels = list(zip(*[result.keys[name] for name in result.key_names])) if result.key_names else [()]
+        values = [result.values[_measure_name(c, f)] for c, f in self.measures]
+
+        for i, key in enumerate(labels):
+            new = [v[i] for v in values]
+            old = self.groups.get(key)
+            if old is None:
+                self.groups[key] = new
+                continue
+            for j, (_, func) in enumerate(self.measures):
+                if func in ("count", "sum"):
+                    old[j] += new[j]
+                elif func == "min":
+                    old[j] = np.fmin(old[j], new[j])
+                else:
+                    old[j] = np.fmax(old[j], new[j])
+
+    def copy(self) -> "RunningAggregate":
+        """
+        An independent copy, to update without touching this one.
+        """
+        other = RunningAggregate(self.by, self.aggs)
+        other.groups = {key: list(values) for key, values in self.groups.items()}
+        other.rows = self.rows
+        return other
+
+    def result(self) -> GroupResult:
+        keys = list(self.groups)
+        key_names = [key.name if isinstance(key, Bins) else key for key in self.by]
+        key_columns = {
+            name: np.array([key[i] for key in keys], dtype=object) for i, name in enumerate(key_names)
+        }
+        measure = {
+            m: np.array([self.groups[key][j] for key in keys]) for j, m in enumerate(self.measures)
+        }
+
+        values = {}
+        for column, func in self.aggs:
+            if func == "mean":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    values[_measure_name(column, func)] = measure[(column, "sum")] / measure[(column, "count")]
+            else:
+                values[_measure_name(column, func)] = measure[(column, func)]
+        return GroupResult(key_names, key_columns, values)
+
+
+def stream_aggregate(path: str, by: list, aggs: list, chunk_bytes: int = CHUNK_BYTES,
+                     progress=None, partial=None) -> GroupResult:
+    """
+    Aggregates a CSV of any size batch by batch. partial, if given, is called with the
+    result so far at most every PARTIAL_INTERVAL seconds.
+    """
+    running = RunningAggregate(by, aggs)
+    last_partial = time.monotonic()
+    for batch in iter_batches(path, chunk_bytes, progress=progress):
+        running.update(batch)
+        if partial is not None and time.monotonic() - last_partial >= PARTIAL_INTERVAL:
+            last_partial = time.monotonic()
+            partial(running.result())
+    return running.result()
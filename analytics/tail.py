@@ -0,0 +1,306 @@
+"""
+Following a CSV that grows: rows appended to the open file are parsed and added to the
+loaded dataset without reading the rest of the file again.
+
+Production exports keep appending to train.csv style files. A TailFollower remembers how
+far into the file the dataset goes (its byte offset) and on every poll() tells which of
+three things happened since:
+
+    unchanged  same inode, same size
+    appended   same inode, bigger, and the 4 KiB before the offset still hash the same:
+               the bytes from the offset on are parsed, up to the last complete record
+    replaced   another inode (editors and exporters that write a new file and rename it),
+               a smaller file or different bytes before the offset: reload the file
+
+Everything an append touches is updated from the new rows only:
+
+    columns       ColumnStore keeps every column in a buffer with spare capacity, the new
+                  rows are copied in and the dataset's columns become longer views of it
+    extras        SketchIndex.extend and BitmapIndex.extend (see their docstrings)
+    search index  SearchIndex.extend adds a segment for the new rows
+    summaries     RunningAggregate per summary page grouping, updated with the new rows
+    facet counts  counts of every facet value over all rows, plus those of the new rows
+
+so a poll costs time proportional to the appended bytes, amortized over the index
+rebuilds the extend() methods do now and then.
+
+Datasets are never modified. Every append makes a new Dataset (and new indexes) that
+shares the buffers of the previous one, which only ever see writes past its last row, so
+the GUI keeps showing the old one safely while a poll runs on a task. poll() also leaves
+the follower alone: the window hands the TailUpdate back with accept() once it shows it,
+which keeps the follower in step with what is on screen even when a poll's result is
+thrown away.
+
+    follower = TailFollower(dataset, search_index, summary_keys)
+    update = follower.poll()
+    if update.kind == "appended":
+        follower.accept(update)
+        show(update.dataset)
+
+The sidecar cache isn't rewritten on append, the next full load parses the file again.
+"""
+
+import csv
+import hashlib
+import io
+import os
+from collections import namedtuple
+from itertools import islice
+
+import numpy as np
+
+from analytics.columns import Dataset, NumericColumn, CategoricalColumn, StringColumn
+from analytics.facets import value_counts
+from analytics.loader import TableBuilder, BLOCK_ROWS
+from analytics.schema import NUMERIC, CATEGORICAL, Bins
+from analytics.streaming import RunningAggregate, last_record_end, CHUNK_BYTES
+
+# Bytes before the offset that must not change for the file to count as appended to
+WINDOW_BYTES = 4096
+
+TailUpdate = namedtuple(
+    "TailUpdate", ["kind", "dataset", "start", "search_index", "summaries", "facet_counts", "state"]
+)
+
+
+def _window_digest(path: str, offset: int) -> str:
+    with open(path, "rb") as f:
+        f.seek(max(0, offset - WINDOW_BYTES))
+        return hashlib.blake2b(f.read(min(offset, WINDOW_BYTES)), digest_size=16).hexdigest()
+
+
+class ColumnStore:
+    """
+    Buffers with room to grow behind the columns of a dataset that only ever gets rows
+    appended. The first append copies the columns in once (they are usually read-only
+    memory maps of the sidecar), later ones only copy the new rows. Buffers grow by half
+    their size at a time.
+    """
+
+    def __init__(self) -> None:
+        self.buffers = {}
+
+    def append(self, dataset: Dataset, rows: Dataset, fingerprint: tuple = None) -> Dataset:
+        """
+        A new dataset holding dataset's rows followed by rows, which must have the same
+        columns and come from a TableBuilder continued from dataset.
+        """
+        start, end = len(dataset), len(dataset) + len(rows)
+        columns = {}
+        for name, col in dataset.columns.items():
+            new = rows[name]
+            validity = self._append_validity(name, col, new, start, end)
+            if col.kind == CATEGORICAL:
+                codes = self._append_values(name, col.codes, new.codes, start, end)
+                columns[name] = CategoricalColumn(name, codes, new.categories, validity)
+            elif col.kind == NUMERIC:
+                values = self._append_values(name, col.values, new.values, start, end)
+                columns[name] = NumericColumn(name, values, validity)
+            else:
+                # The new rows' bytes go after the old ones, their offsets move up by as much
+                data, offsets = col.compact()
+                added, added_offsets = new.compact()
+                size = len(data)
+                data = self._append_values(name + ".data", data, added, size, size + len(added))
+                offsets = self._append_values(
+                    name + ".offsets", offsets, added_offsets[1:] + size, start + 1, end + 1,
+                )
+                columns[name] = StringColumn(name, data, offsets, validity)
+        return Dataset(columns, dataset.source, fingerprint)
+
+    def _reserve(self, key: str, current: np.ndarray, length: int, dtype) -> np.ndarray:
+        buffer = self.buffers.get(key)
+        if buffer is None or len(buffer) < length or buffer.dtype != dtype:
+            buffer = np.empty(max(length + length // 2, 1024), dtype=dtype)
+            buffer[:len(current)] = current
+            self.buffers[key] = buffer
+        return buffer
+
+    def _append_values(self, name: str, current: np.ndarray, new: np.ndarray, start: int, end: int) -> np.ndarray:
+        # Categorical codes widen when the dictionary outgrows int16
+        buffer = self._reserve(name, current, end, np.result_type(current.dtype, new.dtype))
+        buffer[start:end] = new
+        return buffer[:end]
+
+    def _append_validity(self, name: str, col, new, start: int, end: int):
+        if col.validity is None and new.validity is None:
+            return None
+        current = col.validity
+        if current is None:
+            current = np.full(-(-start // 8), 0xFF, dtype=np.uint8)
+        bits = self._reserve(name + ".validity", current, -(-end // 8), np.uint8)
+        # The byte holding row `start` is packed again with its earlier rows' bits
+        first = start // 8
+        head = np.unpackbits(bits[first:first + 1], count=start - first * 8, bitorder="little").view(np.bool_)
+        packed = np.packbits(np.concatenate([head, ~new.null_mask()]), bitorder="little")
+        bits[first:first + len(packed)] = packed
+        return bits[:-(-end // 8)]
+
+
+def _ordered(result, dataset: Dataset, by: list):
+    """
+    Puts the groups of a RunningAggregate result (first seen order) in the order
+    aggregate.aggregate gives them, so live and computed tables look the same.
+    """
+    ranks = []
+    for key in by:
+        if isinstance(key, Bins):
+            ranks.append({label: i for i, label in enumerate(key.labels())})
+        elif dataset[key].kind == CATEGORICAL:
+            ranks.append({label: i for i, label in enumerate(dataset[key].categories)})
+        else:
+            ranks.append(None)
+    names = result.key_names
+    labels = list(zip(*[result.keys[name].tolist() for name in names]))
+
+    def order(i):
+        return tuple(
+            (label is None, 0 if label is None else (label if rank is None else rank[label]))
+            for label, rank in zip(labels[i], ranks)
+        )
+
+    index = sorted(range(len(labels)), key=order)
+    result.keys = {name: values[index] for name, values in result.keys.items()}
+    result.values = {name: values[index] for name, values in result.values.items()}
+    return result
+
+
+class TailFollower:
+    """
+    Follows dataset.source from where dataset ends. summary_keys lists the groupings
+    (aggregate.aggregate `by` lists) to keep live survival summaries of.
+    """
+
+    def __init__(self, dataset: Dataset, search_index=None, summary_keys=()) -> None:
+        self.path = dataset.source
+        self.dataset = dataset
+        self.search_index = search_index
+        self.summary_keys = [list(keys) for keys in summary_keys]
+        self.store = ColumnStore()
+        # Where the dataset's rows end in the file, and what the file looked like there
+        self.offset = dataset.fingerprint[0]
+        self.inode = os.stat(self.path).st_ino
+        self.digest = _window_digest(self.path, self.offset)
+        # Seeded by the first poll, on its task
+        self.running = None
+        self.facet_counts = None
+
+    def poll(self, progress=None) -> TailUpdate:
+        """
+        Checks the file and parses whatever was appended. Doesn't change the follower,
+        see accept().
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            # Mid-replace, the next poll will see the new file
+            return self._update("unchanged")
+        if st.st_ino != self.inode or st.st_size < self.offset \
+                or _window_digest(self.path, self.offset) != self.digest:
+            return self._update("replaced")
+
+        running, facet_counts = self._seeded()
+        rows, offset = self._read_rows(st.st_size, progress)
+        if rows is None:
+            return self._update("unchanged", running=running, facet_counts=facet_counts)
+
+        start = len(self.dataset)
+        fingerprint = (offset, st.st_mtime_ns, _window_digest(self.path, offset))
+        dataset = self.store.append(self.dataset, rows, fingerprint)
+        dataset.extras = {name: extra.extend(dataset, start) for name, extra in self.dataset.extras.items()}
+        search_index = self.search_index.extend(dataset, start) if self.search_index is not None else None
+
+        running = {keys: aggregate.copy() for keys, aggregate in running.items()}
+        for aggregate in running.values():
+            aggregate.update(rows)
+        facets = dataset.extras.get("facets")
+        if facets is not None:
+            added = value_counts(facets, dataset, start)
+            totals = {}
+            for name, counts in added.items():
+                old = facet_counts.get(name, ())
+                counts[:len(old)] += old
+                totals[name] = counts
+            facet_counts = totals
+        return TailUpdate(
+            "appended", dataset, start, search_index, self._summaries(running, dataset),
+            facet_counts, (offset, fingerprint[2], running, facet_counts),
+        )
+
+    def accept(self, update: TailUpdate) -> None:
+        """
+        Makes the follower continue from an update returned by poll().
+        """
+        if update.kind == "replaced":
+            return
+        if update.kind == "appended":
+            self.dataset = update.dataset
+            self.search_index = update.search_index
+            self.offset, self.digest = update.state[:2]
+        if update.state[2] is not None:
+            self.running, self.facet_counts = update.state[2:]
+
+    def _update(self, kind: str, running=None, facet_counts=None) -> TailUpdate:
+        summaries = None if running is None else self._summaries(running, self.dataset)
+        return TailUpdate(
+            kind, self.dataset, len(self.dataset), self.search_index, summaries, facet_counts,
+            (self.offset, self.digest, running, facet_counts),
+        )
+
+    def _seeded(self) -> tuple:
+        # One pass over the loaded rows, the first time only
+        if self.running is not None:
+            return self.running, self.facet_counts
+        aggs = [("*", "count")]
+        if "Survived" in self.dataset:
+            aggs.append(("Survived", "mean"))
+        running = {}
+        for keys in self.summary_keys:
+            running[tuple(keys)] = aggregate = RunningAggregate(keys, aggs)
+            aggregate.update(self.dataset)
+        facets = self.dataset.extras.get("facets")
+        facet_counts = facets.facet_counts({}) if facets is not None else {}
+        return running, facet_counts
+
+    def _summaries(self, running: dict, dataset: Dataset) -> dict:
+        return {keys: _ordered(aggregate.result(), dataset, list(keys)) for keys, aggregate in running.items()}
+
+    def _read_rows(self, size: int, progress=None) -> tuple:
+        """
+        Parses the complete records after the offset. Returns (rows as a Dataset or None
+        if there are none, offset just past the last one).
+        """
+        table = TableBuilder(self.dataset.column_names, source=self.path).continue_from(self.dataset)
+        offset = self.offset
+        count = 0
+        message = "Reading rows appended to {}".format(os.path.basename(self.path))
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            carry = b""
+            while True:
+                data = f.read(CHUNK_BYTES)
+                if not data:
+                    break
+                buf = carry + data
+                end = last_record_end(buf)
+                # A record without its newline yet is left for the next poll
+                carry = buf[end:]
+                if end == 0:
+                    continue
+                offset += end
+                reader = csv.reader(io.StringIO(buf[:end].decode("utf-8"), newline=""))
+                del buf, data
+                while True:
+                    block = list(islice(reader, BLOCK_ROWS))
+                    if not block:
+                        break
+                    # Blank lines, e.g. after a last record that had no newline
+                    rows = [row for row in block if row]
+                    if rows:
+                        table.append_rows(rows)
+                        count += len(rows)
+                    if progress is not None:
+                        progress(min((offset - self.offset) / max(size - self.offset, 1), 1.0), message)
+        if count == 0:
+            return None, offset
+        return table.flush(), offset
@@ -0,0 +1,148 @@
+"""
+Training models in a separate process, and scoring passenger files in batches.
+
+Fitting gradient-boosted trees on a big file is seconds to minutes of NumPy work that
+holds the GIL between calls, enough to make the window stutter even from a pool thread.
+train_in_process() runs analytics.models.train_model in a spawned child process instead:
+
+    the child loads the file itself (through the sidecar, so that's a memory map) and
+    only the row indices to train on and the fitted model cross the process boundary
+    progress messages come back over a queue and are passed to progress(fraction,
+    message), the TaskContext of a GUI task
+    while waiting the parent keeps calling progress(), which raises TaskCancelled once
+    the task is cancelled, and then terminates the child. Cancelling never waits for a
+    tree to finish.
+
+score_file() predicts a passenger file BATCH_ROWS rows at a time (the columns are sliced,
+not copied, so memory stays flat) and writes a submission in the gender_submission.csv
+format, PassengerId,Survived, formatted by analytics.export.format_block(). It returns a
+ScoreReport with the scoring rate in rows per second, encoding and writing included.
+
+    python -m analytics.training --model gbdt --train data/train.csv --score data/test.csv \
+        --out gbdt_submission.csv
+"""
+
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+from collections import namedtuple
+
+from analytics.columns import NumericColumn
+from analytics.export import format_block
+from analytics.loader import load_dataset
+from analytics.models import train_model, MODELS
+
+BATCH_ROWS = 65536
+# How often the parent checks for cancellation while the child is quiet
+POLL_SECONDS = 0.1
+
+
+class ScoreReport(namedtuple("ScoreReport", ["path", "rows", "seconds", "survivors"])):
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float("inf")
+
+
+def _train_child(path: str, kind: str, params: dict, rows, validation: float, seed: int, messages) -> None:
+    try:
+        dataset = load_dataset(path)
+        model = train_model(
+            dataset, kind, params, rows=rows, validation=validation, seed=seed,
+            progress=lambda fraction, message: messages.put(("progress", fraction, message)),
+        )
+        messages.put(("result", model))
+    except Exception:
+        messages.put(("error", traceback.format_exc()))
+
+
+def train_in_process(path: str, kind: str, params: dict = None, rows=None, validation: float = 0.2,
+                     seed: int = 0, progress=None):
+    """
+    train_model() on the passenger file at path, in a child process. progress, if
+    given, receives the child's progress and may raise to stop it (see the module
+    docstring).
+    """
+    if kind not in MODELS:
+        raise ValueError("Unknown model {!r}, expected one of {}".format(kind, sorted(MODELS)))
+    # spawn, forking a process that runs Qt and a thread pool isn't safe
+    context = multiprocessing.get_context("spawn")
+    messages = context.Queue()
+    process = context.Process(
+        target=_train_child, args=(path, kind, params, rows, validation, seed, messages), daemon=True,
+    )
+    name = MODELS[kind].name
+    fraction, message = 0.0, "Starting {}".format(name)
+    process.start()
+    try:
+        while True:
+            if progress is not None:
+                progress(fraction, message)
+            try:
+                item = messages.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if not process.is_alive():
+                    raise RuntimeError("Training process exited with code {}".format(process.exitcode))
+                continue
+            if item[0] == "progress":
+                fraction, message = item[1], "{}: {}".format(name, item[2])
+            elif item[0] == "error":
+                raise RuntimeError("Training failed:\n{}".format(item[1]))
+            else:
+                return item[1]
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        messages.close()
+
+
+def score_file(model, path: str, out: str, batch_rows: int = BATCH_ROWS, progress=None) -> ScoreReport:
+    """
+    Predicts every passenger of the file at path (CSV or column store) and writes
+    PassengerId,Survived to out.
+    """
+    dataset = load_dataset(path)
+    if "PassengerId" not in dataset:
+        raise ValueError("{} has no PassengerId column".format(path))
+    ids = dataset["PassengerId"].values
+    message = "Scoring {}".format(os.path.basename(path))
+    survivors = 0
+    start = time.perf_counter()
+    tmp_path = out + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"PassengerId,Survived\n")
+        for first in range(0, len(dataset), batch_rows):
+            batch = slice(first, min(first + batch_rows, len(dataset)))
+            survived = model.predict(dataset, batch)
+            survivors += int(survived.sum())
+            columns = [NumericColumn("PassengerId", ids[batch]), NumericColumn("Survived", survived)]
+            f.write(format_block(columns, slice(None), "csv"))
+            if progress is not None:
+                progress(batch.stop / len(dataset), message)
+    os.replace(tmp_path, out)
+    return ScoreReport(out, len(dataset), time.perf_counter() - start, survivors)
+
+
+def main(argv=None) -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Train a survival model and score a passenger file")
+    parser.add_argument("--model", choices=sorted(MODELS), default="logistic")
+    parser.add_argument("--train", default="data/train.csv")
+    parser.add_argument("--score", default="data/test.csv")
+    parser.add_argument("--out", help="submission to write, default <model>_submission.csv next to --score")
+    args = parser.parse_args(argv)
+
+    model = train_in_process(args.train, args.model)
+    print("{}: {}".format(model.name, ", ".join(
+        "{} {:.4g}".format(key, value) for key, value in model.metrics.items())))
+    out = args.out or os.path.join(os.path.dirname(args.score), "{}_submission.csv".format(args.model))
+    report = score_file(model, args.score, out)
+    print("{:,} rows scored in {:.3f} s ({:,.0f} rows/s), {:,} survivors -> {}".format(
+        report.rows, report.seconds, report.rows_per_second, report.survivors, report.path))
+
+
+if __name__ == "__main__":
+    main()
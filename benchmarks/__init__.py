@@ -0,0 +1,5 @@
+"""
+Benchmarks for the analytics engines. Run each one from the repository root, e.g.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_table_model
+"""
@@ -0,0 +1,82 @@
+"""
+Compares the vectorized group-by engine with a naive per-row implementation.
+
+Both compute passenger count, survival rate and mean fare by Pclass, Sex, Embarked and
+age band. The naive version loops over rows in Python the way a first implementation
+with csv.DictReader would.
+
+    python -m benchmarks.bench_aggregate --rows 1000000 10000000 50000000
+"""
+
+import argparse
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from analytics.aggregate import aggregate, AGE_BANDS
+from benchmarks.common import scaled_dataset, print_table
+
+KEYS = ["Pclass", "Sex", "Embarked", AGE_BANDS]
+AGGS = [("*", "count"), ("Survived", "mean"), ("Fare", "mean")]
+COLUMNS = ["Pclass", "Sex", "Embarked", "Age", "Survived", "Fare"]
+
+
+def naive(dataset) -> dict:
+    edges = AGE_BANDS.edges
+    pclass = dataset["Pclass"].values.tolist()
+    sex = dataset["Sex"].values.tolist()
+    embarked = dataset["Embarked"].values.tolist()
+    age = dataset["Age"].values.tolist()
+    survived = dataset["Survived"].values.tolist()
+    fare = dataset["Fare"].values.tolist()
+
+    groups = defaultdict(lambda: [0, 0, 0.0])
+    for i in range(len(pclass)):
+        a = age[i]
+        if a != a:
+            band = None
+        else:
+            band = sum(1 for e in edges if a >= e)
+        acc = groups[(pclass[i], sex[i], embarked[i], band)]
+        acc[0] += 1
+        acc[1] += survived[i]
+        acc[2] += fare[i]
+    return {key: (n, s / n, f / n) for key, (n, s, f) in groups.items()}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument("--naive-max", type=int, default=None,
+                        help="skip the naive version above this many rows")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    table = []
+    for rows in args.rows:
+        dataset = scaled_dataset(rows, columns=COLUMNS)
+
+        best = np.inf
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = aggregate(dataset, KEYS, AGGS)
+            best = min(best, time.perf_counter() - start)
+
+        naive_s = speedup = "-"
+        if args.naive_max is None or rows <= args.naive_max:
+            start = time.perf_counter()
+            expected = naive(dataset)
+            naive_s = time.perf_counter() - start
+            speedup = "{:.0f}x".format(naive_s / best)
+            naive_s = "{:.3f}".format(naive_s)
+            assert len(expected) == len(result), "group counts differ"
+
+        table.append([rows, len(result), "{:.3f}".format(best), naive_s, speedup])
+        del dataset
+
+    print_table(["rows", "groups", "vectorized_s", "naive_s", "speedup"], table)
+
+
+if __name__ == "__main__":
+    main()
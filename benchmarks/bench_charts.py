@@ -0,0 +1,74 @@
+"""
+Frame times of the chart widget while panning and zooming, for growing row counts.
+
+For every chart the widget renders the full view, then 15 zoom steps into the centre and
+15 pan steps, each rendered offscreen with QWidget.grab(). Frame times should stay flat as
+rows grow; only building the level-of-detail data (once per dataset) scales with rows.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_charts --rows 100000 1000000 10000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+
+from analytics.charts import ChartData
+from analytics.gui.chart_page import ChartWidget, CHARTS
+from benchmarks.common import scaled_dataset, timed, print_table
+
+STEPS = 15
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--size", type=int, nargs=2, default=[1200, 700])
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    table = []
+    for rows in args.rows:
+        dataset = scaled_dataset(rows, columns=["Age", "Fare", "Survived"])
+        results = {}
+        with timed(results, "build"):
+            data = ChartData(dataset)
+
+        widget = ChartWidget()
+        widget.resize(*args.size)
+        widget.set_data(data)
+        for label, kind in CHARTS:
+            widget.set_kind(kind)
+            frames = []
+
+            def render():
+                start = time.perf_counter()
+                widget.grab()
+                frames.append(time.perf_counter() - start)
+
+            render()
+            for _ in range(STEPS):
+                widget.zoom(0.8)
+                render()
+            for _ in range(STEPS):
+                widget.pan(25, 10)
+                render()
+
+            ms = np.array(frames) * 1000
+            table.append([
+                "{:,}".format(rows), label, "{:.2f}".format(results["build"]),
+                "{:.1f}".format(ms[0]), "{:.1f}".format(np.median(ms)), "{:.1f}".format(ms.max()),
+            ])
+        del widget, data, dataset
+
+    print("widget {}x{}".format(*args.size))
+    print_table(["rows", "chart", "build s", "full ms", "median ms", "max ms"], table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Exporting rows: csv.writer / json.dumps over Python rows vs analytics.export's vectorized blocks.
+
+For a scaled train.csv, every other row in shuffled order (a filtered, sorted selection)
+is written to a temporary directory as
+
+    rows        one Python list of cells per row through csv.writer or json.dumps, what
+                exporting the table's rows one by one costs
+    export      analytics.export.export_rows(), blocks formatted by NumPy from the column
+                buffers and written as they are
+
+with the throughput in rows/s and MB/s, next to a plain write of as many bytes (what the
+disk allows).
+
+    python -m benchmarks.bench_export --rows 100000 1000000
+"""
+
+import argparse
+import csv
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from analytics.export import export_rows
+from benchmarks.common import scaled_dataset, timed, print_table
+
+COLUMNS = ["PassengerId", "Survived", "Pclass", "Name", "Sex", "Age", "SibSp", "Parch", "Ticket", "Fare",
+           "Cabin", "Embarked"]
+
+
+def python_rows(dataset, rows, path: str, fmt: str) -> None:
+    cols = [dataset[name] for name in COLUMNS]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(COLUMNS)
+            for row in rows.tolist():
+                writer.writerow([col.format(row) for col in cols])
+        else:
+            for row in rows.tolist():
+                f.write(json.dumps(dict(zip(COLUMNS, (col.format(row) for col in cols)))) + "\n")
+
+
+def raw_write(path: str, size: int) -> None:
+    with open(path, "wb") as f:
+        f.write(np.zeros(size, dtype=np.uint8))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--formats", nargs="+", default=["csv", "jsonl"])
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    table = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            dataset = scaled_dataset(rows, columns=COLUMNS)
+            selection = rng.permutation(rows)[:rows // 2]
+            for fmt in args.formats:
+                path = os.path.join(tmp, "export." + fmt)
+                results = {}
+                with timed(results, "rows"):
+                    python_rows(dataset, selection, path, fmt)
+                with timed(results, "export"):
+                    report = export_rows(dataset, path, selection, COLUMNS)
+                with timed(results, "disk"):
+                    raw_write(path + ".raw", report.bytes)
+                megabytes = report.bytes / 1e6
+                for method in ("rows", "export", "disk"):
+                    seconds = results[method]
+                    table.append([
+                        "{:,}".format(rows), fmt, method, "{:.0f}".format(seconds * 1000),
+                        "{:,.0f}".format(len(selection) / seconds), "{:.0f}".format(megabytes / seconds),
+                    ])
+    print_table(["rows", "format", "method", "ms", "rows/s", "MB/s"], table)
+
+
+if __name__ == "__main__":
+    main()
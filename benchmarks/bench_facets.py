@@ -0,0 +1,121 @@
+"""
+Facet filtering and facet counts per widget change: bitmap index vs boolean masks.
+
+A random walk of --changes widget changes (toggle a class or port, pick a sex, move the
+SibSp / Parch limits) is replayed. After every change both engines produce the matching
+rows and the counts of every facet value under the other facets' filters:
+
+    masks    np.isin on the columns for every facet, AND of the masks, np.bincount of
+             each column under the other facets' masks (what the panel would do without
+             an index)
+    bitmaps  analytics.facets.facet_filter, counts alone timed separately
+
+    python -m benchmarks.bench_facets --rows 1000000 10000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from analytics.facets import BitmapIndex, facet_filter, FACET_COLUMNS
+from benchmarks.common import scaled_dataset, timed, print_table
+
+
+def random_changes(index: BitmapIndex, count: int, rng) -> list:
+    selection = {}
+    selections = []
+    for _ in range(count):
+        column = index.columns[rng.integers(len(index.columns))]
+        values = index.values[column]
+        if column in ("SibSp", "Parch"):
+            limit = values[rng.integers(len(values))]
+            allowed = [v for v in values if (v >= limit if column == "SibSp" else v <= limit)]
+        elif column in ("Sex", "Survived"):
+            allowed = [values[rng.integers(len(values))]] if rng.random() < 0.7 else values
+        else:
+            allowed = list(selection.get(column, values))
+            value = values[rng.integers(len(values))]
+            allowed = [v for v in allowed if v != value] if value in allowed else allowed + [value]
+        if len(allowed) == len(values):
+            selection.pop(column, None)
+        else:
+            selection[column] = allowed
+        selections.append(dict(selection))
+    return selections
+
+
+def with_masks(dataset, index: BitmapIndex, selection: dict) -> tuple:
+    codes = {}
+    for column, values in index.values.items():
+        col = dataset[column]
+        if hasattr(col, "codes"):
+            lookup = {v: i for i, v in enumerate(col.categories)}
+            codes[column] = (col.codes, [lookup.get(v, -1) for v in values])
+        else:
+            codes[column] = (col.values, values)
+    masks = {}
+    for column, allowed in selection.items():
+        data, keys = codes[column]
+        masks[column] = np.isin(data, [keys[index.values[column].index(v)] for v in allowed])
+    counts = {}
+    for column, (data, keys) in codes.items():
+        others = np.ones(len(dataset), dtype=np.bool_)
+        for other, mask in masks.items():
+            if other != column:
+                others &= mask
+        hist = np.bincount(np.searchsorted(np.sort(keys), data[others]), minlength=len(keys))
+        counts[column] = hist[np.argsort(np.argsort(keys))]
+    rows = np.ones(len(dataset), dtype=np.bool_)
+    for mask in masks.values():
+        rows &= mask
+    return np.flatnonzero(rows), counts
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--changes", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    table = []
+    for rows in args.rows:
+        dataset = scaled_dataset(rows, columns=list(FACET_COLUMNS))
+        results = {}
+        with timed(results, "build"):
+            index = BitmapIndex.build(dataset)
+        size = sum(b.nbytes for b in index.bitmaps.values())
+
+        mask_ms, bitmap_ms, count_ms = [], [], []
+        for selection in random_changes(index, args.changes, rng):
+            start = time.perf_counter()
+            expected_rows, expected_counts = with_masks(dataset, index, selection)
+            mask_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            result = facet_filter(index, selection)
+            bitmap_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            index.facet_counts(selection)
+            count_ms.append((time.perf_counter() - start) * 1000)
+
+            matched = np.arange(rows) if result.rows is None else result.rows
+            assert np.array_equal(matched, expected_rows)
+            assert all(np.array_equal(result.counts[c], expected_counts[c]) for c in expected_counts)
+
+        table.append([
+            "{:,}".format(rows), "{:.2f}".format(results["build"]), "{:.1f}".format(size / 2 ** 20),
+            "{:.1f}".format(np.median(mask_ms)), "{:.1f}".format(np.median(bitmap_ms)),
+            "{:.1f}".format(np.median(count_ms)), "{:.1f}".format(max(count_ms)),
+        ])
+        del dataset, index
+
+    print("{} widget changes, results checked against the masks".format(args.changes))
+    print_table(["rows", "build s", "bitmaps MiB", "masks ms", "bitmaps ms", "counts ms", "counts max ms"], table)
+
+
+if __name__ == "__main__":
+    main()
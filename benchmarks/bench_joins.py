@@ -0,0 +1,86 @@
+"""
+Comparing submissions: a dict per PassengerId vs the join indexes of analytics/joins.py.
+
+A base file of --rows passengers (ids 1..n, a Survived column as the truth) and
+--submissions prediction files, each holding the ids in shuffled order:
+
+    dict        {PassengerId: row} of the base, then one Python lookup per submission row
+    cold        compare_submissions() with an empty cache: the base index and every
+                alignment are computed
+    one more    one submission added to a warm cache, what adding a file on the
+                Submissions page costs: one lookup pass over its keys
+    sparse      the base keyed on ids that are far apart (sorted index, searchsorted)
+
+    python -m benchmarks.bench_joins --rows 100000 1000000 --submissions 8
+"""
+
+import argparse
+
+import numpy as np
+
+from analytics.cache import ResultCache
+from analytics.columns import Dataset, NumericColumn
+from analytics.joins import compare_submissions
+from benchmarks.common import timed, print_table
+
+
+def passengers(ids: np.ndarray, survived: np.ndarray, name: str) -> Dataset:
+    # A fingerprint as if loaded from a file, so results can be cached. No source, there
+    # is no file whose changes would make them stale.
+    return Dataset({"PassengerId": NumericColumn("PassengerId", ids), "Survived": NumericColumn("Survived", survived)},
+                   None, (name, 0, 0))
+
+
+def dict_compare(base: Dataset, submissions: list) -> np.ndarray:
+    rows = {key: row for row, key in enumerate(base["PassengerId"].values.tolist())}
+    predictions = np.full((len(submissions), len(base)), -1, dtype=np.int8)
+    for i, submission in enumerate(submissions):
+        for key, value in zip(submission["PassengerId"].values.tolist(), submission["Survived"].values.tolist()):
+            row = rows.get(key)
+            if row is not None:
+                predictions[i, row] = value
+    return predictions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--submissions", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    table = []
+    for rows in args.rows:
+        ids = np.arange(1, rows + 1, dtype=np.int32)
+        truth = rng.integers(0, 2, rows).astype(np.int8)
+        submissions = []
+        for i in range(args.submissions + 1):
+            order = rng.permutation(rows)
+            submissions.append(passengers(ids[order], np.where(rng.random(rows) < 0.8, truth[order], 1 - truth[order])
+                                          .astype(np.int8), "submission{}.csv".format(i)))
+        *submissions, extra = submissions
+        base = passengers(ids, truth, "train.csv")
+        sparse = passengers(ids.astype(np.int64) * 1_000_003, truth, "sparse.csv")
+        sparse_submissions = [passengers(s["PassengerId"].values.astype(np.int64) * 1_000_003, s["Survived"].values,
+                                         s.fingerprint[0]) for s in submissions]
+
+        results = {}
+        with timed(results, "dict"):
+            expected = dict_compare(base, submissions)
+        cache = ResultCache()
+        with timed(results, "cold"):
+            comparison = compare_submissions(base, submissions, cache=cache)
+        assert np.array_equal(comparison.predictions, expected)
+        with timed(results, "one more"):
+            compare_submissions(base, submissions + [extra], cache=cache)
+        with timed(results, "sparse"):
+            sparse_comparison = compare_submissions(sparse, sparse_submissions, cache=ResultCache())
+        assert np.array_equal(sparse_comparison.predictions, expected)
+        table.append(["{:,}".format(rows), args.submissions] +
+                     ["{:.1f}".format(results[step] * 1000) for step in ("dict", "cold", "one more", "sparse")] +
+                     ["{:.1%}".format(comparison.accuracy().mean())])
+    print_table(["rows", "files", "dict ms", "cold ms", "one more ms", "sparse ms", "mean accuracy"], table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup time of a tabbed window: eager pages versus LazyTabWidget.
+The eager window is a plain QTabWidget, as in tutorial/app5.py.
+
+Every page is a realistic analytics page: a passenger table over the dataset plus a
+survival summary computed when the page is built. The time measured is from creating the
+window to its first paint.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_lazy_tabs --rows 1000000 --pages 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication, QTabWidget, QWidget, QVBoxLayout, QLabel
+
+from analytics.aggregate import survival_rate
+from analytics.gui.lazy_pages import LazyTabWidget
+from analytics.gui.table_model import PassengerTableModel, PassengerTableView
+from benchmarks.common import scaled_dataset, print_table
+
+KEYS = [["Pclass"], ["Sex"], ["Embarked"], ["Pclass", "Sex"], ["SibSp"], ["Parch"], ["Sex", "Embarked"]]
+
+
+def make_page(dataset, index: int) -> QWidget:
+    keys = KEYS[index % len(KEYS)]
+    page = QWidget()
+    layout = QVBoxLayout()
+    result = survival_rate(dataset, keys)
+    layout.addWidget(QLabel("{} groups by {}".format(len(result), keys)))
+    view = PassengerTableView()
+    view.setModel(PassengerTableModel(dataset))
+    layout.addWidget(view)
+    page.setLayout(layout)
+    return page
+
+
+def startup(app, dataset, pages: int, lazy: bool) -> float:
+    start = time.perf_counter()
+    if lazy:
+        tabs = LazyTabWidget()
+        for i in range(pages):
+            tabs.add_lazy_tab(lambda i=i: make_page(dataset, i), "Page {}".format(i))
+    else:
+        tabs = QTabWidget()
+        for i in range(pages):
+            tabs.addTab(make_page(dataset, i), "Page {}".format(i))
+    tabs.resize(1000, 700)
+    tabs.show()
+    # Draw synchronously so the measurement includes the first paint
+    tabs.repaint()
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    tabs.close()
+    tabs.deleteLater()
+    app.processEvents()
+    return elapsed
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[2, 4, 8, 16])
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    dataset = scaled_dataset(args.rows, columns=["PassengerId", "Survived", "Pclass", "Sex", "Age",
+                                                 "SibSp", "Parch", "Fare", "Embarked"])
+    table = []
+    for pages in args.pages:
+        eager = startup(app, dataset, pages, lazy=False)
+        lazy = startup(app, dataset, pages, lazy=True)
+        table.append([pages, "{:.1f}".format(eager * 1000), "{:.1f}".format(lazy * 1000),
+                      "{:.1f}x".format(eager / lazy)])
+    print("rows {:,}".format(args.rows))
+    print_table(["pages", "eager_ms", "lazy_ms", "speedup"], table)
+
+
+if __name__ == "__main__":
+    main()
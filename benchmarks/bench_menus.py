@@ -0,0 +1,110 @@
+"""
+Opening the table's context menu: a new QMenu and QActions per right click vs the ActionRegistry.
+
+    per event   what tutorial/app3.py does: build a QMenu and its actions, compute their
+                enabled state, show it, and throw it all away when it closes
+    registry    ActionRegistry.popup(): the cached menu, predicates evaluated once
+                because the context changed, then shown
+
+Every open is timed from the request to the menu's Show event (the latency the
+registry records), and compared with one frame at 60 Hz.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_menus --opens 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QObject, QEvent, QPoint
+from PyQt5.QtWidgets import QApplication, QWidget, QMenu, QAction
+
+from analytics.gui.actions import ActionRegistry, ActionContext
+from analytics.gui.batching import FRAME_MS
+from benchmarks.common import print_table
+
+NAMES = ["filter_value", "clear_filters", None, "sort_ascending", "sort_descending", "group_by", None, "copy"]
+
+
+class _ShowTimer(QObject):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.start = None
+        self.samples = []
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() == QEvent.Show and self.start is not None:
+            self.samples.append((time.perf_counter() - self.start) * 1000)
+            self.start = None
+        return False
+
+
+def context(i: int) -> ActionContext:
+    return ActionContext(None, "Sex" if i % 2 else "Name", i, "male", bool(i % 3), bool(i % 5))
+
+
+def predicate(name: str):
+    return lambda context: context.column is not None and (name != "copy" or context.selected)
+
+
+def per_event(parent, opens: int) -> list:
+    timer = _ShowTimer()
+    for i in range(opens):
+        timer.start = time.perf_counter()
+        menu = QMenu(parent)
+        menu.installEventFilter(timer)
+        ctx = context(i)
+        for name in NAMES:
+            if name is None:
+                menu.addSeparator()
+                continue
+            action = QAction(name.replace("_", " ").capitalize(), parent)
+            action.setEnabled(predicate(name)(ctx))
+            menu.addAction(action)
+        menu.popup(QPoint(100, 100))
+        menu.hide()
+        menu.deleteLater()
+        QApplication.processEvents()
+    return timer.samples
+
+
+def registry(parent, opens: int) -> list:
+    current = [context(0)]
+    actions = ActionRegistry(lambda: current[0], parent=parent)
+    for name in NAMES:
+        if name is not None:
+            actions.add(name, name.replace("_", " ").capitalize(), enabled=predicate(name))
+    samples = []
+    for i in range(opens):
+        current[0] = context(i)
+        menu = actions.popup("table", NAMES, QPoint(100, 100))
+        samples.append(actions.latencies["table"][-1])
+        menu.hide()
+        QApplication.processEvents()
+    return samples
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--opens", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    parent = QWidget()
+    table = []
+    for label, run in (("per event", per_event), ("registry", registry)):
+        samples = sorted(run(parent, args.opens))
+        table.append([
+            label, "{:,}".format(len(samples)), "{:.3f}".format(samples[len(samples) // 2]),
+            "{:.3f}".format(samples[int(len(samples) * 0.99)]), "{:.3f}".format(samples[-1]),
+            "{:,}".format(sum(s > FRAME_MS for s in samples)),
+        ])
+    print_table(["menu", "opens", "median ms", "p99 ms", "max ms", "over {} ms".format(FRAME_MS)], table)
+
+
+if __name__ == "__main__":
+    main()
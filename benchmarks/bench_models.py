@@ -0,0 +1,70 @@
+"""
+Survival models: training time in and out of process, and batch scoring throughput.
+
+Training fits each model on a synthetic file of --train-rows rows (benchmarks/synthetic.py)
+directly and through analytics.training.train_in_process, the difference is the cost of
+the child process: spawning it, importing NumPy and the loaders, and memory-mapping the
+file. Scoring runs score_file on files of --rows rows with several batch sizes and
+reports rows per second, encoding and writing the submission included.
+
+    python -m benchmarks.bench_models --train-rows 100000 --rows 100000 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from analytics.loader import load_dataset
+from analytics.models import train_model, MODELS
+from analytics.training import train_in_process, score_file
+from benchmarks.common import print_table
+from benchmarks.synthetic import synthetic_csv
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--train-rows", type=int, default=100_000)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--batch-rows", type=int, nargs="+", default=[4096, 65536, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "analytics-benchmarks"))
+    args = parser.parse_args(argv)
+
+    train_path = synthetic_csv(args.data_dir, args.train_rows, args.seed)
+    dataset = load_dataset(train_path)
+    models = {}
+    training = []
+    for kind, model_type in MODELS.items():
+        start = time.perf_counter()
+        models[kind] = train_model(dataset, kind)
+        direct = time.perf_counter() - start
+        start = time.perf_counter()
+        train_in_process(train_path, kind)
+        child = time.perf_counter() - start
+        training.append([
+            model_type.name, "{:.2f}".format(direct), "{:.2f}".format(child),
+            "{:.1%}".format(models[kind].metrics["validation_accuracy"]),
+        ])
+    print("training on {:,} rows".format(args.train_rows))
+    print_table(["model", "in process s", "child process s", "validation accuracy"], training)
+
+    scoring = []
+    out = os.path.join(args.data_dir, "bench_submission.csv")
+    for rows in args.rows:
+        path = synthetic_csv(args.data_dir, rows, args.seed + 1)
+        load_dataset(path)  # sidecar written, so every run below loads the same way
+        for kind, model in models.items():
+            for batch_rows in args.batch_rows:
+                report = score_file(model, path, out, batch_rows=batch_rows)
+                scoring.append([
+                    "{:,}".format(rows), MODELS[kind].name, "{:,}".format(batch_rows),
+                    "{:.2f}".format(report.seconds), "{:,.0f}".format(report.rows_per_second),
+                ])
+    os.remove(out)
+    print()
+    print_table(["rows", "model", "batch rows", "s", "rows/s"], scoring)
+
+
+if __name__ == "__main__":
+    main()
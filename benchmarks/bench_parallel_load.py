@@ -0,0 +1,56 @@
+"""
+Measures how parsing a CSV scales with the number of worker processes.
+
+Every run parses the same scaled copy of train.csv with analytics.parallel and checks that
+the result is identical to the single-process loader.read_csv, which is the baseline for
+the speedup column. Speedup is bounded by the number of cores and by the serial part in
+the parent (finding range boundaries and merging the string columns).
+
+    python -m benchmarks.bench_parallel_load --rows 2000000 --workers 1 2 4 8 16
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from analytics.loader import read_csv
+from analytics.parallel import read_csv_parallel
+from benchmarks.common import write_scaled_csv, same_dataset, print_table
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args(argv)
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "train.csv")
+    try:
+        write_scaled_csv(args.rows, path)
+        print("{:,} rows, {:.0f} MB, {} cores".format(args.rows, os.path.getsize(path) / 1e6, os.cpu_count()))
+
+        start = time.perf_counter()
+        expected = read_csv(path)
+        baseline = time.perf_counter() - start
+        table = [["read_csv", "{:.2f}".format(baseline), "1.00", "{:,.0f}".format(args.rows / baseline), "-"]]
+
+        for workers in args.workers:
+            start = time.perf_counter()
+            dataset = read_csv_parallel(path, workers)
+            elapsed = time.perf_counter() - start
+            table.append([
+                workers, "{:.2f}".format(elapsed), "{:.2f}".format(baseline / elapsed),
+                "{:,.0f}".format(args.rows / elapsed), "yes" if same_dataset(expected, dataset) else "NO",
+            ])
+            del dataset
+
+        print_table(["workers", "seconds", "speedup", "rows/s", "identical"], table)
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cost of the slot profiler (analytics/gui/profiler.py), off and on.
+
+Off, the GUI classes are exactly the classes as written, so there's nothing to measure
+but the baseline. On, every method call goes through a timing wrapper. Both are shown
+on the hottest Python code the GUI has, the table model's data() and headerData() while
+the view paints a screenful of cells, and on a bare call to a trivial method.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_profiler --rows 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+import types
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+
+from analytics.gui.profiler import SlotProfiler
+from analytics.gui.table_model import PassengerTableModel, PassengerTableView
+from benchmarks.common import scaled_dataset, print_table
+
+FRAMES = 30
+
+
+def instrumented_copy(cls, profiler: SlotProfiler):
+    # A subclass holding the same functions, wrapped, as @instrumented would with profiling on
+    functions = {k: v for k, v in vars(cls).items() if isinstance(v, types.FunctionType)}
+    return profiler.instrument(type(cls.__name__, (cls,), functions))
+
+
+class _Plain:
+    def method(self, value):
+        return value
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--size", type=int, nargs=2, default=[1200, 700])
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    dataset = scaled_dataset(args.rows)
+    profiler = SlotProfiler()
+    table = []
+
+    for label, model_type in [("off", PassengerTableModel), ("on", instrumented_copy(PassengerTableModel, profiler))]:
+        model = model_type(dataset)
+        view = PassengerTableView()
+        view.setModel(model)
+        view.resize(*args.size)
+        view.grab()
+        frames = []
+        for i in range(FRAMES):
+            view.verticalScrollBar().setValue(i * 997 % max(model.rowCount(), 1))
+            start = time.perf_counter()
+            view.grab()
+            frames.append(time.perf_counter() - start)
+        table.append(["table frame, profiling " + label, "{:.2f} ms".format(np.median(frames) * 1000)])
+        del view, model
+
+    calls = 1_000_000
+    for label, obj in [("off", _Plain()), ("on", instrumented_copy(_Plain, profiler)())]:
+        method = obj.method
+        start = time.perf_counter()
+        for i in range(calls):
+            method(i)
+        table.append(["method call, profiling " + label, "{:.3f} us".format((time.perf_counter() - start) / calls * 1e6)])
+
+    print("{:,} rows, view {}x{}, {} recorded calls".format(
+        args.rows, args.size[0], args.size[1], sum(stat[0] for stat in profiler.stats.values())))
+    print_table(["", "median"], table)
+    del app
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Quantiles and histograms of Age and Fare from the partition sketches vs exact ones.
+Both sides answer the same random filters on Pclass, Sex and Embarked.
+
+The exact side builds the row mask of the filter and runs np.quantile / np.histogram on
+the selected values, which is what every query cost before the sketches. The sketch side
+merges the matching partitions (analytics.sketches). Scaled datasets repeat the 891
+train.csv rows, so Age and Fare get a little noise to make the values distinct, otherwise
+ties would hide any rank error. Rank error is reported in ranks and relative to the
+documented bound (sketch.error).
+
+    python -m benchmarks.bench_sketches --rows 1000000 10000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from analytics.columns import NumericColumn
+from analytics.sketches import SketchIndex, PARTITION_KEYS, SKETCH_COLUMNS
+from benchmarks.common import scaled_dataset, timed, print_table
+
+QS = np.linspace(0.01, 0.99, 99)
+
+
+def random_filters(dataset, count: int, rng) -> list:
+    # Null labels read back as "" from .values but are None in the sketches, leave them out
+    choices = {key: sorted(set(dataset[key].values.tolist()) - {None, ""}, key=str) for key in PARTITION_KEYS}
+    filters = []
+    for _ in range(count):
+        where = {}
+        for key, labels in choices.items():
+            if rng.random() < 0.6:
+                n = int(rng.integers(1, len(labels) + 1))
+                where[key] = [labels[i] for i in rng.choice(len(labels), n, replace=False)]
+        filters.append(where)
+    return filters
+
+
+def rank_error(sorted_values: np.ndarray, answers: np.ndarray) -> np.ndarray:
+    # Distance from the target rank to the ranks the answer holds in the sorted values
+    target = np.ceil(QS * len(sorted_values))
+    first = np.searchsorted(sorted_values, answers, side="left") + 1
+    last = np.searchsorted(sorted_values, answers, side="right")
+    return np.maximum(0, np.maximum(first - target, target - last))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    table = []
+    for rows in args.rows:
+        dataset = scaled_dataset(rows, columns=list(PARTITION_KEYS + SKETCH_COLUMNS))
+        for name in SKETCH_COLUMNS:
+            values = dataset[name].values + rng.uniform(0, 0.01, rows).astype(np.float32)
+            dataset.columns[name] = NumericColumn(name, values, dataset[name].validity)
+
+        results = {}
+        with timed(results, "build"):
+            index = SketchIndex.build(dataset)
+        meta, arrays = index.to_buffers()
+        stored = sum(a.nbytes for a in arrays.values())
+
+        filters = random_filters(dataset, args.queries, rng)
+        for name in SKETCH_COLUMNS:
+            column = dataset[name].values
+            exact_s, sketch_s, hist_exact_s, hist_sketch_s = 0.0, 0.0, 0.0, 0.0
+            errors, ratios = [], []
+            for where in filters:
+                start = time.perf_counter()
+                mask = np.ones(rows, dtype=np.bool_)
+                for key, labels in where.items():
+                    mask &= np.isin(dataset[key].values, np.array(labels, dtype=object))
+                selected = column[mask]
+                selected = selected[~np.isnan(selected)]
+                if len(selected):
+                    np.quantile(selected, QS, method="inverted_cdf")
+                exact_s += time.perf_counter() - start
+
+                start = time.perf_counter()
+                np.histogram(selected, bins=index.edges[name])
+                hist_exact_s += time.perf_counter() - start
+
+                start = time.perf_counter()
+                sketch = index.sketch(name, where)
+                answers = sketch.quantiles(QS)
+                sketch_s += time.perf_counter() - start
+
+                start = time.perf_counter()
+                index.histogram(name, where)
+                hist_sketch_s += time.perf_counter() - start
+
+                if len(selected):
+                    error = rank_error(np.sort(selected), answers).max()
+                    errors.append(error / len(selected))
+                    ratios.append(error / sketch.error if sketch.error else 0.0)
+
+            n = len(filters)
+            table.append([
+                "{:,}".format(rows), name, "{:.2f}".format(results["build"]),
+                "{:.0f}".format(stored / 1024),
+                "{:.2f}".format(exact_s / n * 1000), "{:.3f}".format(sketch_s / n * 1000),
+                "{:.2f}".format(hist_exact_s / n * 1000), "{:.3f}".format(hist_sketch_s / n * 1000),
+                "{:.4%}".format(max(errors)), "{:.2f}".format(max(ratios)),
+            ])
+        del dataset, index
+
+    print("{} random filters, {} quantiles each".format(args.queries, len(QS)))
+    print_table([
+        "rows", "column", "build s", "stored KiB", "exact q ms", "sketch q ms",
+        "exact hist ms", "sketch hist ms", "max rank err", "err/bound",
+    ], table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Sorting the table: QSortFilterProxyModel vs the cached permutations of analytics/sorting.py.
+
+The proxy model sorts by calling lessThan() on pairs of display strings from Python, so
+it is only run up to --proxy-rows. The sort engine is timed for every step of a sorting
+session on Fare, then Fare/Age/Name:
+
+    cold       first sort by the key, ranks of the columns included
+    again      the same key, e.g. after the filters changed back
+    reversed   every direction flipped (a second click on the header)
+    filtered   a search/facet result (--fraction of the rows) in sorted order, against
+               sorting the filtered rows from scratch with np.lexsort
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_sort --rows 100000 1000000 10000000
+"""
+
+import argparse
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtCore import Qt, QSortFilterProxyModel
+from PyQt5.QtWidgets import QApplication
+
+from analytics.gui.table_model import PassengerTableModel
+from analytics.sorting import SortEngine
+from benchmarks.common import scaled_dataset, timed, print_table
+
+KEYS = [
+    ("Fare", [("Fare", True)]),
+    ("Fare, Age, Name", [("Fare", False), ("Age", True), ("Name", True)]),
+]
+
+
+def proxy_sort(dataset, column: str) -> float:
+    model = PassengerTableModel(dataset, fetch_batch=len(dataset))
+    proxy = QSortFilterProxyModel()
+    proxy.setSourceModel(model)
+    results = {}
+    with timed(results, "sort"):
+        proxy.sort(dataset.column_names.index(column), Qt.AscendingOrder)
+    return results["sort"]
+
+
+def resorted(dataset, keys: list, rows: np.ndarray) -> np.ndarray:
+    # Sorting the filtered rows again, without the engine
+    columns = []
+    for column, ascending in reversed(keys):
+        col = dataset[column]
+        values = col.codes[rows] if hasattr(col, "codes") else col.values[rows]
+        if not ascending:
+            values = -values if values.dtype.kind in "if" else -np.unique(values, return_inverse=True)[1]
+        columns.append(values)
+    return rows[np.lexsort(columns)]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--proxy-rows", type=int, default=100_000)
+    parser.add_argument("--fraction", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    rng = np.random.default_rng(args.seed)
+    table = []
+    for rows in args.rows:
+        dataset = scaled_dataset(rows)
+        engine = SortEngine(dataset)
+        filtered = np.flatnonzero(rng.random(rows) < args.fraction)
+        for label, keys in KEYS:
+            results = {}
+            with timed(results, "cold"):
+                engine.permutation(keys)
+            with timed(results, "again"):
+                engine.permutation(keys)
+            with timed(results, "reversed"):
+                engine.permutation([(column, not ascending) for column, ascending in keys])
+            with timed(results, "filtered"):
+                engine.sorted_rows(keys, filtered)
+            with timed(results, "resorted"):
+                resorted(dataset, keys, filtered)
+            proxy = "-"
+            if len(keys) == 1 and rows <= args.proxy_rows:
+                proxy = "{:.0f}".format(proxy_sort(dataset, keys[0][0]) * 1000)
+            table.append(["{:,}".format(rows), label, proxy] + [
+                "{:.1f}".format(results[step] * 1000) for step in ("cold", "again", "reversed", "filtered", "resorted")
+            ])
+        del dataset, engine
+
+    print("filtered: {:.0%} of the rows".format(args.fraction))
+    print_table(["rows", "key", "proxy ms", "cold ms", "again ms", "reversed ms", "filtered ms", "resorted ms"], table)
+    del app
+
+
+if __name__ == "__main__":
+    main()
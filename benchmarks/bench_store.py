@@ -0,0 +1,117 @@
+"""
+Opening a file: CSV (parsed, or through its sidecar) vs column store files, cold and warm.
+
+Cold opens evict the file from the page cache first (posix_fadvise DONTNEED, which works
+on clean pages without privileges), so they include reading it from disk. Warm opens
+find it in memory. Each open is timed in a fresh process, like a launch of the app:
+
+    csv            parse the CSV, no sidecar
+    csv+sidecar    memory-map the sidecar written by an earlier open
+    store          read every column of the .pcol file
+    store zlib     the same, deflated
+    pruned         Survived, Pclass and Fare only
+    pushdown       pruned, and only PassengerId below 10% of the rows: the row groups
+                   after that are skipped by their statistics
+
+    python -m benchmarks.bench_store --rows 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from analytics.loader import load_dataset, cache_path
+from analytics.store import write_store, StoreReader, ROW_GROUP_ROWS
+from benchmarks.common import print_table
+from benchmarks.synthetic import synthetic_csv
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRUNED = ["Survived", "Pclass", "Fare"]
+
+# Runs in the child process: one open, timed, printed as JSON
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from analytics.loader import load_dataset
+from analytics.store import read_store
+kind, path, columns, where = json.loads(sys.argv[1])
+if kind == "csv":
+    dataset = load_dataset(path)
+else:
+    dataset = read_store(path, columns, where)
+print(json.dumps([time.perf_counter() - start, len(dataset)]))
+"""
+
+
+def evict(*paths) -> None:
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as f:
+            os.fsync(f.fileno())
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def open_in_child(kind: str, path: str, columns=None, where=None) -> tuple:
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD, json.dumps([kind, path, columns, where])],
+        cwd=REPO, capture_output=True, text=True, check=True,
+    )
+    seconds, rows = json.loads(result.stdout.strip().splitlines()[-1])
+    return seconds, rows
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "analytics-benchmarks"))
+    args = parser.parse_args(argv)
+
+    table = []
+    for rows in args.rows:
+        path = synthetic_csv(args.data_dir, rows, args.seed)
+        dataset = load_dataset(path)
+        plain = write_store(dataset, os.path.splitext(path)[0] + ".pcol")
+        packed = write_store(dataset, os.path.splitext(path)[0] + ".zlib.pcol", compression="zlib")
+        groups = len(StoreReader(plain).row_groups)
+        where = [["PassengerId", "<=", rows // 10]]
+        del dataset
+
+        cases = [
+            ("csv", "csv", path, None, None, [cache_path(path)]),
+            ("csv+sidecar", "csv", path, None, None, []),
+            ("store", "store", plain, None, None, []),
+            ("store zlib", "store", packed, None, None, []),
+            ("pruned", "store", plain, PRUNED, None, []),
+            ("pushdown", "store", plain, PRUNED, where, []),
+        ]
+        for label, kind, target, columns, condition, remove in cases:
+            times = []
+            for cold in (True, False):
+                for extra in remove:
+                    if os.path.exists(extra):
+                        os.remove(extra)
+                if cold:
+                    evict(target, cache_path(target))
+                seconds, count = open_in_child(kind, target, columns, condition)
+                times.append(seconds)
+            size = os.path.getsize(cache_path(path) if label == "csv+sidecar" else target)
+            table.append([
+                "{:,}".format(rows), label, "{:.1f}".format(size / 1e6), "{:,}".format(count),
+                "{:.0f}".format(times[0] * 1000), "{:.0f}".format(times[1] * 1000),
+            ])
+        for extra in (plain, packed, cache_path(path)):
+            if os.path.exists(extra):
+                os.remove(extra)
+
+    print("{:,} rows per row group ({} at {:,} rows), times include the imports".format(
+        ROW_GROUP_ROWS, groups, args.rows[-1]))
+    print_table(["rows", "open", "MB", "rows read", "cold ms", "warm ms"], table)
+
+
+if __name__ == "__main__":
+    main()
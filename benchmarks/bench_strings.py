@@ -0,0 +1,86 @@
+"""
+String columns: Python str objects vs one UTF-8 buffer with offsets, and the derived columns.
+
+For Name and Ticket of a scaled train.csv:
+
+    memory     bytes held by an object array of str (array plus every str object)
+               against the UTF-8 buffer and its offsets
+    decode     every row to str, what a sidecar open used to do for each string column
+    format     --cells single cells, what the table's data() calls do
+    take       a shuffled selection of all rows (sorting, filtering)
+
+and for the derived columns, what a query on titles costs with and without them:
+
+    Title == "Master"   a regular expression over every Name, against comparing codes
+
+    python -m benchmarks.bench_strings --rows 100000 1000000
+"""
+
+import argparse
+import re
+import sys
+
+import numpy as np
+
+from benchmarks.common import scaled_dataset, timed, print_table
+
+COLUMNS = ["Name", "Ticket"]
+_TITLE = re.compile(r",\s*([^.]*)\.")
+
+
+def object_bytes(values: list) -> int:
+    return 8 * len(values) + sum(map(sys.getsizeof, values))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--cells", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    table = []
+    titles = []
+    for rows in args.rows:
+        dataset = scaled_dataset(rows, columns=COLUMNS + ["Title"])
+        shuffled = rng.permutation(rows)
+        cells = rng.integers(0, rows, args.cells).tolist()
+        for name in COLUMNS:
+            col = dataset[name]
+            results = {}
+            with timed(results, "decode"):
+                values = col.decode()
+            with timed(results, "format"):
+                for row in cells:
+                    col.format(row)
+            with timed(results, "take"):
+                col.take(shuffled)
+            table.append([
+                "{:,}".format(rows), name,
+                "{:.1f}".format(object_bytes(values) / 1e6), "{:.1f}".format(col.nbytes / 1e6),
+                "{:.0f}".format(results["decode"] * 1000),
+                "{:.0f}".format(results["format"] / args.cells * 1e9),
+                "{:.0f}".format(results["take"] * 1000),
+            ])
+            del values
+
+        results = {}
+        names = dataset["Name"].decode()
+        with timed(results, "regex"):
+            regex = np.array([m is not None and m.group(1) == "Master" for m in map(_TITLE.search, names)])
+        title = dataset["Title"]
+        with timed(results, "codes"):
+            codes = title.codes == title.code_of("Master")
+        assert np.array_equal(regex, codes)
+        titles.append([
+            "{:,}".format(rows), "{:,}".format(int(codes.sum())),
+            "{:.1f}".format(results["regex"] * 1000), "{:.2f}".format(results["codes"] * 1000),
+        ])
+
+    print_table(["rows", "column", "str MB", "buffer MB", "decode ms", "format ns/cell", "take ms"], table)
+    print()
+    print_table(["rows", "masters", "regex ms", "Title codes ms"], titles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures the passenger table model against the number of rows.
+
+For every size this times model construction, setting the model on a view, and the
+average cost of scrolling to a random position and repainting the viewport. With a
+virtual model all of these should stay flat as the row count grows.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_table_model --rows 10000 1000000 10000000
+"""
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from analytics.gui.table_model import PassengerTableModel, PassengerTableView
+from benchmarks.common import scaled_dataset, timed, print_table
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def bench(app, rows: int, scrolls: int) -> dict:
+    dataset = scaled_dataset(rows)
+    results = {"rows": rows}
+
+    view = PassengerTableView()
+    view.resize(1200, 800)
+    view.show()
+    app.processEvents()
+    rss_before = max_rss_mb()
+
+    with timed(results, "construct_s"):
+        model = PassengerTableModel(dataset)
+    with timed(results, "set_model_s"):
+        view.setModel(model)
+        app.processEvents()
+    with timed(results, "fetch_all_s"):
+        model.fetch_all()
+        app.processEvents()
+
+    bar = view.verticalScrollBar()
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(scrolls):
+        bar.setValue(rng.randint(0, bar.maximum()))
+        view.viewport().repaint()
+    results["scroll_repaint_ms"] = (time.perf_counter() - start) / scrolls * 1000
+    results["rss_growth_mb"] = max_rss_mb() - rss_before
+
+    view.close()
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--scrolls", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = [bench(app, rows, args.scrolls) for rows in args.rows]
+
+    header = list(results[0])
+    print_table(header, [["{:.4f}".format(r[k]) if isinstance(r[k], float) else r[k] for k in header] for r in results])
+
+
+if __name__ == "__main__":
+    main()
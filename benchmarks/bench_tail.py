@@ -0,0 +1,79 @@
+"""
+Picking up appended rows with a TailFollower vs loading the whole file again.
+
+A scaled train.csv of --rows rows is loaded with its extras and search index, then
+records from train.csv are appended in batches of each --append size and every batch is
+picked up with one poll (analytics.tail). The poll covers everything a follow-mode
+refresh needs: parsing, the column store, sketches, facet bitmaps, search index, running
+summaries and facet counts. The first poll only seeds the summaries and isn't counted.
+The reload column is what the window did before: parse, build extras and search index.
+
+After the last batch the followed dataset is checked against a fresh read_csv.
+
+    python -m benchmarks.bench_tail --rows 1000000 --append 10 1000 100000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from analytics.gui.main_window import SUMMARY_PAGES
+from analytics.loader import read_csv, build_extras
+from analytics.search import SearchIndex
+from analytics.tail import TailFollower
+from benchmarks.common import write_scaled_csv, same_dataset, timed, print_table, TRAIN_CSV
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--append", type=int, nargs="+", default=[10, 1000, 100_000])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with open(TRAIN_CSV, newline="", encoding="utf-8") as f:
+        records = f.read().splitlines(keepends=True)[1:]
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "train.csv")
+    try:
+        write_scaled_csv(args.rows, path)
+        results = {}
+        with timed(results, "reload"):
+            dataset = build_extras(read_csv(path))
+            index = SearchIndex.build(dataset)
+        follower = TailFollower(dataset, index, [keys for _, _, keys in SUMMARY_PAGES])
+        follower.accept(follower.poll())
+
+        table = []
+        for size in args.append:
+            batch = "".join(records[i % len(records)] for i in range(size))
+            times = []
+            for _ in range(args.repeat):
+                with open(path, "a", newline="", encoding="utf-8") as f:
+                    f.write(batch)
+                start = time.perf_counter()
+                update = follower.poll()
+                times.append(time.perf_counter() - start)
+                assert update.kind == "appended" and len(update.dataset) - update.start == size
+                follower.accept(update)
+            table.append([
+                "{:,}".format(size), "{:,}".format(len(follower.dataset)),
+                "{:.1f}".format(np.median(times) * 1000), "{:.1f}".format(max(times) * 1000),
+                "{:,.0f}".format(size / np.median(times)), "{:.0f}".format(results["reload"] * 1000),
+            ])
+
+        assert same_dataset(follower.dataset, read_csv(path))
+        print("{:,} rows to start with, {} polls per append size, results checked against read_csv".format(
+            args.rows, args.repeat))
+        print_table(["appended", "rows after", "poll ms", "poll max ms", "rows/s", "reload ms"], table)
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures event loop latency while a data-heavy task runs on the task pool.
+
+A 1 ms QTimer records the gaps between its ticks while a CSV is parsed (without the
+sidecar cache) in the background. The worst gap is how long the window would have been
+frozen, it should stay under a frame (16 ms).
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_tasks --rows 1000000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtCore import QTimer, QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+from analytics.loader import read_csv
+from analytics.gui.tasks import TaskManager
+from benchmarks.common import write_scaled_csv
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    path = os.path.join(tempfile.mkdtemp(), "train.csv")
+    write_scaled_csv(args.rows, path)
+
+    gaps = []
+    last = [time.perf_counter()]
+
+    def tick():
+        now = time.perf_counter()
+        gaps.append(now - last[0])
+        last[0] = now
+
+    timer = QTimer()
+    timer.setInterval(1)
+    timer.timeout.connect(tick)
+
+    loop = QEventLoop()
+    tasks = TaskManager()
+    tasks.busy_changed.connect(lambda busy: busy or loop.quit())
+
+    start = time.perf_counter()
+    timer.start()
+    tasks.submit("load", read_csv, path)
+    loop.exec()
+    timer.stop()
+    elapsed = time.perf_counter() - start
+
+    gaps_ms = np.array(gaps) * 1000
+    print("rows {:,}  task {:.2f} s  ticks {}".format(args.rows, elapsed, len(gaps)))
+    print("event loop gap ms: median {:.2f}  p99 {:.2f}  max {:.2f}".format(
+        np.median(gaps_ms), np.percentile(gaps_ms, 99), gaps_ms.max()))
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Repaints and event loop latency under a flood of progress signals, with and without batching.
+The batched side routes the updates through an UpdateBatcher.
+
+A Python thread emits a (count, text) signal at --rate events per second for --seconds.
+The signal reaches the GUI thread as queued events and updates a row of labels and a
+progress bar, either directly (as tutorial/app2.py wires textChanged to setText) or
+through an UpdateBatcher. Paint events on those widgets are counted, and a 5 ms probe
+timer measures how late the event loop gets to it.
+
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_ui_batching --rate 10000
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtCore import QObject, QEvent, QTimer, QEventLoop, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel, QProgressBar
+
+from analytics.gui.batching import UpdateBatcher
+from benchmarks.common import print_table
+
+PROBE_MS = 5
+LABELS = 4
+
+
+class Emitter(QObject):
+    event = pyqtSignal(int, str)
+    done = pyqtSignal()
+
+
+class PaintCounter(QObject):
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+
+    def eventFilter(self, obj, event) -> bool:
+        if event.type() == QEvent.Paint:
+            self.count += 1
+        return False
+
+
+def emit_events(emitter: Emitter, rate: int, seconds: float) -> None:
+    # Emit in 1 ms bursts, sleeping only has about millisecond resolution
+    per_ms = max(1, rate // 1000)
+    start = time.perf_counter()
+    sent = 0
+    while sent < rate * seconds:
+        for _ in range(per_ms):
+            emitter.event.emit(sent, "Processed {:,} rows".format(sent * 100))
+            sent += 1
+        ahead = start + sent / rate - time.perf_counter()
+        if ahead > 0:
+            time.sleep(ahead)
+    emitter.done.emit()
+
+
+def run(batched: bool, rate: int, seconds: float) -> list:
+    window = QWidget()
+    layout = QVBoxLayout()
+    labels = [QLabel() for _ in range(LABELS)]
+    bar = QProgressBar()
+    bar.setRange(0, int(rate * seconds))
+    for w in labels + [bar]:
+        layout.addWidget(w)
+    window.setLayout(layout)
+    window.show()
+
+    counter = PaintCounter()
+    for w in labels + [bar]:
+        w.installEventFilter(counter)
+
+    def update(sent: int, text: str) -> None:
+        for label in labels:
+            label.setText(text)
+        bar.setValue(sent)
+
+    emitter = Emitter()
+    batcher = None
+    if batched:
+        batcher = UpdateBatcher()
+        for w in labels + [bar]:
+            batcher.add_widget(w)
+        emitter.event.connect(batcher.slot("progress", update))
+    else:
+        emitter.event.connect(update)
+
+    lateness = []
+    expected = [time.perf_counter() + PROBE_MS / 1000]
+
+    def probe() -> None:
+        now = time.perf_counter()
+        lateness.append(max(0.0, now - expected[0]))
+        expected[0] = now + PROBE_MS / 1000
+
+    timer = QTimer()
+    timer.setInterval(PROBE_MS)
+    timer.timeout.connect(probe)
+
+    loop = QEventLoop()
+    emitter.done.connect(loop.quit)
+    received = [0]
+    emitter.event.connect(lambda *args: received.__setitem__(0, received[0] + 1))
+
+    QApplication.processEvents()
+    counter.count = 0
+    timer.start()
+    start = time.perf_counter()
+    thread = threading.Thread(target=emit_events, args=(emitter, rate, seconds))
+    thread.start()
+    loop.exec()
+    thread.join()
+    if batcher is not None:
+        batcher.flush()
+    QApplication.processEvents()
+    elapsed = time.perf_counter() - start
+    timer.stop()
+    window.close()
+
+    late_ms = np.array(lateness) * 1000
+    return [
+        "batched" if batched else "direct", "{:,}".format(received[0]), counter.count,
+        "{:.1f}".format(counter.count / elapsed),
+        "{:.2f}".format(np.median(late_ms)), "{:.2f}".format(np.percentile(late_ms, 99)),
+        "{:.2f}".format(late_ms.max()), "{:.2f}".format(elapsed),
+    ]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rate", type=int, default=10_000, help="events per second")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    rows = [run(batched, args.rate, args.seconds) for batched in (False, True)]
+    print("{:,} events/s for {} s, {} labels and a progress bar".format(args.rate, args.seconds, LABELS))
+    print_table(
+        ["updates", "events", "paints", "paints/s", "late ms p50", "p99", "max", "seconds"], rows
+    )
+
+
+if __name__ == "__main__":
+    main()
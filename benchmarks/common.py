@@ -0,0 +1,82 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from analytics.columns import Dataset
+from analytics.loader import load_dataset
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+TRAIN_CSV = os.path.join(DATA_DIR, "train.csv")
+
+
+def scaled_dataset(rows: int, path: str = TRAIN_CSV, columns=None):
+    """
+    Repeats the rows of a data/ file until the dataset has the requested length.
+    columns limits the copy to the columns a benchmark needs.
+    """
+    base = load_dataset(path)
+    if columns is not None:
+        base = Dataset({name: base[name] for name in columns}, base.source)
+    return base.take(np.resize(np.arange(len(base)), rows))
+
+
+def write_scaled_csv(rows: int, path: str, source: str = TRAIN_CSV) -> None:
+    """
+    Writes a CSV with the header of source and its records repeated up to `rows` rows.
+    """
+    with open(source, newline="", encoding="utf-8") as f:
+        header, *lines = f.read().splitlines(keepends=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(header)
+        for _ in range(rows // len(lines)):
+            f.writelines(lines)
+        f.writelines(lines[:rows % len(lines)])
+
+
+def same_dataset(a, b) -> bool:
+    """
+    True if two datasets hold exactly the same columns: types, values, nulls and
+    categorical codes.
+    """
+    if a.column_names != b.column_names or len(a) != len(b):
+        return False
+    for name in a.column_names:
+        x, y = a[name], b[name]
+        if type(x) is not type(y) or (x.validity is None) != (y.validity is None):
+            return False
+        if x.validity is not None and not np.array_equal(x.validity, y.validity):
+            return False
+        if hasattr(x, "codes"):
+            if x.categories != y.categories or x.codes.dtype != y.codes.dtype \
+                    or not np.array_equal(x.codes, y.codes):
+                return False
+        elif hasattr(x, "offsets"):
+            (x_data, x_offsets), (y_data, y_offsets) = x.compact(), y.compact()
+            if not np.array_equal(x_offsets, y_offsets) or not np.array_equal(x_data, y_data):
+                return False
+        elif x.values.dtype != y.values.dtype \
+                or not np.array_equal(x.values, y.values, equal_nan=x.values.dtype.kind == "f"):
+            return False
+    return True
+
+
+@contextmanager
+def timed(results: dict, key: str):
+    """
+    Stores the wall time of the with-block in results[key], in seconds.
+    """
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+def print_table(header: list, rows: list) -> None:
+    widths = [max(len(str(x)) for x in col) for col in zip(header, *rows)]
+    for line in [header] + rows:
+        print("  ".join(str(x).rjust(w) for x, w in zip(line, widths)))
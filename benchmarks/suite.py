@@ -0,0 +1,276 @@
+"""
+Benchmark suite: load, filter, group-by, sort and render timings on synthetic files.
+The files grow in size and the timings are recorded as JSON, so two commits can be compared.
+
+The single-topic scripts next to this one (bench_*.py) explain one optimization each.
+This one runs the paths a user goes through on every file, at every --rows size, on
+files from benchmarks/synthetic.py (kept in --data-dir between runs):
+
+    load.cold      parse, extras and sidecar written (no sidecar to start with)
+    load.warm      sidecar memory-mapped
+    load.search    search index built
+    filter.*       a search, a narrower search, facet filters and a plain NumPy mask
+    groupby.*      the survival table of every summary page and exact Age quantiles
+    sort.*         first sorts, the reverse of a cached sort and a search result sorted
+    render.*       table view and every chart painted offscreen with QWidget.grab()
+
+Every stage runs --repeat times and the JSON keeps all timings with the machine, library
+versions and git commit they were measured on:
+
+    python -m benchmarks.suite --rows 10000 100000 1000000 --out before.json
+    python -m benchmarks.suite --rows 10000 100000 1000000 --out after.json
+    python -m benchmarks.suite --compare before.json after.json
+
+--compare matches stages by name and rows and exits with status 1 when any of them got
+slower by more than --threshold (on the median), so it can gate a CI job. Rendering
+uses QT_QPA_PLATFORM=offscreen unless another platform is set.
+
+Sizes up to 10^8 rows work given the disk (7 GB per file) and memory (about 8 GB loaded),
+use --repeat 1 there.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PyQt5.QtCore import QT_VERSION_STR
+from PyQt5.QtWidgets import QApplication
+
+from analytics.aggregate import survival_rate
+from analytics.charts import ChartData
+from analytics.facets import facet_filter
+from analytics.gui.chart_page import ChartWidget, CHARTS
+from analytics.gui.table_model import PassengerTableModel, PassengerTableView
+from analytics.loader import load_dataset, cache_path
+from analytics.reports import SUMMARY_PAGES
+from analytics.search import SearchIndex
+from analytics.sketches import describe
+from analytics.sorting import SortEngine
+from benchmarks.common import print_table
+from benchmarks.synthetic import synthetic_csv
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIEW_SIZE = (1200, 700)
+
+
+class Recorder:
+    """
+    Runs stages and keeps their timings. Stages not matching `only` (name prefixes) are
+    skipped and return None.
+    """
+
+    def __init__(self, repeat: int, only=None) -> None:
+        self.repeat = repeat
+        self.only = only
+        self.results = []
+        self.rows = None
+
+    def wanted(self, name: str) -> bool:
+        return not self.only or any(name.startswith(prefix) for prefix in self.only)
+
+    def measure(self, name: str, fn, setup=None):
+        """
+        Times fn() --repeat times, calling setup() untimed before each run. Returns the
+        value of the last run.
+        """
+        if not self.wanted(name):
+            return None
+        seconds = []
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            value = fn()
+            seconds.append(time.perf_counter() - start)
+        self.results.append({
+            "rows": self.rows, "stage": name, "seconds": seconds,
+            "best": min(seconds), "median": float(np.median(seconds)),
+        })
+        return value
+
+
+def _remove_sidecar(path: str) -> None:
+    if os.path.exists(cache_path(path)):
+        os.remove(cache_path(path))
+
+
+def run_file(recorder: Recorder, path: str) -> None:
+    recorder.measure("load.cold", lambda: load_dataset(path), setup=lambda: _remove_sidecar(path))
+    # The warm load also gives the dataset every other stage works on
+    dataset = load_dataset(path)
+    recorder.measure("load.warm", lambda: load_dataset(path))
+    index = recorder.measure("load.search", lambda: SearchIndex.build(dataset))
+    if index is None:
+        index = SearchIndex.build(dataset)
+
+    facets = dataset.extras["facets"]
+    common = index.search("mr")
+    recorder.measure("filter.search", lambda: index.search("mr"))
+    recorder.measure("filter.search_narrow", lambda: index.search("mr ja", common))
+    selection = {"Pclass": [1, 3], "Sex": ["female"], "Embarked": ["S", "C"]}
+    recorder.measure("filter.facets", lambda: facet_filter(facets, selection))
+    recorder.measure("filter.facets_search", lambda: facet_filter(facets, selection, common.rows))
+    age, fare = dataset["Age"].values, dataset["Fare"].values
+    recorder.measure("filter.mask", lambda: np.flatnonzero((age >= 18) & (fare > 50)))
+
+    for label, _, keys in SUMMARY_PAGES:
+        name = "groupby." + label.lower().replace(" ", "_")
+        recorder.measure(name, lambda keys=keys: survival_rate(dataset, keys))
+    recorder.measure("groupby.by_class_filtered", lambda: survival_rate(dataset, ["Pclass", "Sex"], rows=common.rows))
+    recorder.measure("groupby.quantiles", lambda: describe(dataset, "Age", common.rows))
+
+    # A new engine per run, so these are first sorts with nothing cached
+    for name, keys in [("fare", [("Fare", True)]), ("class_fare", [("Pclass", True), ("Fare", False)]),
+                       ("name", [("Name", True)])]:
+        recorder.measure("sort." + name, lambda keys=keys: SortEngine(dataset).permutation(keys))
+    keys = [("Pclass", True), ("Fare", False)]
+    engines = {}
+
+    def sorted_once():
+        engines["sorter"] = SortEngine(dataset)
+        engines["sorter"].permutation(keys)
+
+    sorted_once()
+    recorder.measure("sort.reversed", lambda: engines["sorter"].permutation([("Pclass", False), ("Fare", True)]),
+                     setup=sorted_once)
+    recorder.measure("sort.filtered", lambda: engines["sorter"].sorted_rows(keys, common.rows))
+
+    if recorder.wanted("render"):
+        run_render(recorder, dataset)
+
+
+def run_render(recorder: Recorder, dataset) -> None:
+    model = PassengerTableModel()
+    view = PassengerTableView()
+    view.setModel(model)
+    view.resize(*VIEW_SIZE)
+
+    def show_table():
+        model.set_dataset(dataset)
+        view.grab()
+
+    def scroll_to_end():
+        model.fetch_all()
+        view.scrollToBottom()
+        view.grab()
+
+    recorder.measure("render.table", show_table)
+    recorder.measure("render.table_end", scroll_to_end, setup=lambda: model.set_dataset(dataset))
+
+    data = recorder.measure("render.chart_data", lambda: ChartData(dataset)) or ChartData(dataset)
+    chart = ChartWidget()
+    chart.resize(*VIEW_SIZE)
+    chart.set_data(data)
+    for _, kind in CHARTS:
+        def paint(kind=kind):
+            chart.set_kind(kind)
+            chart.grab()
+        recorder.measure("render.chart_" + kind, paint, setup=lambda: chart.set_data(data))
+    del model, view, chart
+
+
+def _git_commit() -> tuple:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO, capture_output=True, text=True, check=True)
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                cwd=REPO, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit.stdout.strip(), bool(status.stdout.strip())
+
+
+def machine_info(args) -> dict:
+    commit, dirty = _git_commit()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "qt": QT_VERSION_STR,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+    }
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """
+    Prints the change of every stage measured in both files. Returns the number of
+    stages slower by more than threshold.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    before = {(r["rows"], r["stage"]): r["median"] for r in old["results"]}
+    table = []
+    slower = 0
+    for r in new["results"]:
+        key = (r["rows"], r["stage"])
+        if key not in before:
+            continue
+        ratio = r["median"] / before[key] if before[key] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "slower"
+            slower += 1
+        elif ratio < 1 / (1 + threshold):
+            flag = "faster"
+        table.append([
+            "{:,}".format(r["rows"]), r["stage"], "{:.2f}".format(before[key] * 1000),
+            "{:.2f}".format(r["median"] * 1000), "{:.2f}x".format(ratio), flag,
+        ])
+    print("{} ({}) -> {} ({})".format(
+        old_path, (old["meta"]["commit"] or "?")[:10], new_path, (new["meta"]["commit"] or "?")[:10]))
+    print_table(["rows", "stage", "old ms", "new ms", "new/old", ""], table)
+    return slower
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", help="only run stages starting with these, e.g. load sort")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "analytics-benchmarks"))
+    parser.add_argument("--out", help="JSON file to write the results to")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown --compare reports")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    recorder = Recorder(args.repeat, args.stages)
+    for rows in args.rows:
+        path = synthetic_csv(args.data_dir, rows, args.seed)
+        recorder.rows = rows
+        run_file(recorder, path)
+        _remove_sidecar(path)
+
+    table = [
+        ["{:,}".format(r["rows"]), r["stage"], "{:.2f}".format(r["best"] * 1000), "{:.2f}".format(r["median"] * 1000)]
+        for r in recorder.results
+    ]
+    print_table(["rows", "stage", "best ms", "median ms"], table)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"meta": machine_info(args), "results": recorder.results}, f, indent=1)
+        print("written to {}".format(args.out))
+    del app
+
+
+if __name__ == "__main__":
+    main()
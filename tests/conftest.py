@@ -0,0 +1,30 @@
+"""
+Shared fixtures. The data files are copied to a temporary folder, so the sidecar caches
+and exports the tests write never end up in data/.
+"""
+
+import shutil
+
+import pytest
+
+from tests.helpers import data_file
+
+
+@pytest.fixture
+def train_csv(tmp_path) -> str:
+    path = str(tmp_path / "train.csv")
+    shutil.copyfile(data_file("train.csv"), path)
+    return path
+
+
+@pytest.fixture
+def test_csv(tmp_path) -> str:
+    path = str(tmp_path / "test.csv")
+    shutil.copyfile(data_file("test.csv"), path)
+    return path
+
+
+@pytest.fixture
+def train(train_csv):
+    from analytics.loader import load_dataset
+    return load_dataset(train_csv, use_cache=False)
@@ -0,0 +1,37 @@
+"""
+Data files and comparisons of datasets for the tests, see also
+benchmarks.common.same_dataset for the exact comparison of the buffers.
+"""
+
+import os
+
+import numpy as np
+
+from analytics.schema import NUMERIC, CATEGORICAL
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def data_file(name: str) -> str:
+    return os.path.join(DATA_DIR, name)
+
+
+def cells(col) -> list:
+    """
+    The values of a column as Python objects, None for nulls. Unlike the buffers they
+    don't depend on the order categories were first seen in.
+    """
+    null = col.null_mask()
+    if col.kind == NUMERIC:
+        values = col.values.tolist()
+        null = null | np.isnan(col.values) if col.values.dtype.kind == "f" else null
+    elif col.kind == CATEGORICAL:
+        values = [col.categories[code] if code >= 0 else None for code in col.codes.tolist()]
+    else:
+        values = col.decode()
+    return [None if n else v for v, n in zip(values, null.tolist())]
+
+
+def same_cells(a, b) -> bool:
+    return a.column_names == [name for name in b.column_names if name in a] \
+        and all(cells(a[name]) == cells(b[name]) for name in a.column_names)
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+import pytest
+
+from analytics.aggregate import aggregate, group_ids, AGE_BANDS
+from analytics.schema import Bins
+from tests.helpers import cells
+
+KEYS = [["Pclass"], ["Sex", "Embarked"], [AGE_BANDS], ["Pclass", Bins("Fare", (10, 50)), "Survived"], []]
+AGGS = [("*", "count"), ("Survived", "mean"), ("Age", "count"), ("Age", "sum"), ("Age", "mean"),
+        ("Fare", "min"), ("Age", "max")]
+
+
+def band(key: Bins, value):
+    if value is None:
+        return None
+    labels = key.labels()
+    for i, edge in enumerate(key.edges):
+        if value < edge:
+            return labels[i]
+    return labels[-1]
+
+
+def plain_groups(dataset, by: list, rows) -> dict:
+    """
+    key labels -> rows, one row at a time.
+    """
+    columns = []
+    for key in by:
+        if isinstance(key, Bins):
+            columns.append([band(key, value) for value in cells(dataset[key.column])])
+        else:
+            columns.append(cells(dataset[key]))
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(column[row] for column in columns), []).append(row)
+    return groups
+
+
+def plain_aggregate(dataset, column: str, func: str, rows: list):
+    if column == "*":
+        return len(rows)
+    values = [v for v in (cells(dataset[column])[row] for row in rows) if v is not None]
+    if func == "count":
+        return len(values)
+    if func == "sum":
+        return sum(values)
+    if not values:
+        return math.nan
+    return {"mean": sum(values) / len(values), "min": min(values), "max": max(values)}[func]
+
+
+@pytest.mark.parametrize("by", KEYS)
+@pytest.mark.parametrize("filtered", [False, True])
+def test_matches_plain_group_by(train, by, filtered):
+    rows = np.flatnonzero(train["Parch"].values > 0) if filtered else None
+    result = aggregate(train, by, AGGS, rows=rows)
+    expected = plain_groups(train, by, range(len(train)) if rows is None else rows.tolist())
+
+    names = [key.name if isinstance(key, Bins) else key for key in by]
+    labels = list(zip(*[result.keys[name] for name in names])) if names else [()]
+    assert sorted(labels, key=repr) == sorted(expected, key=repr)
+    for i, label in enumerate(labels):
+        for column, func in AGGS:
+            name = "count" if column == "*" else "{}:{}".format(column, func)
+            got = result.values[name][i]
+            want = plain_aggregate(train, column, func, expected[label])
+            assert got == pytest.approx(want, rel=1e-5, nan_ok=True), (label, name)
+
+
+def test_mask_rows(train):
+    mask = train["Sex"].codes == train["Sex"].code_of("male")
+    a = aggregate(train, ["Pclass"], [("Survived", "mean")], rows=mask)
+    b = aggregate(train, ["Pclass"], [("Survived", "mean")], rows=np.flatnonzero(mask))
+    assert np.array_equal(a.values["Survived:mean"], b.values["Survived:mean"])
+
+
+def test_group_ids_label_every_row(train):
+    group, labels = group_ids(train, ["Pclass", "Embarked"])
+    pclass, embarked = cells(train["Pclass"]), cells(train["Embarked"])
+    for row in range(len(train)):
+        assert (labels[0][group[row]], labels[1][group[row]]) == (pclass[row], embarked[row])
+
+
+def test_unknown_aggregate(train):
+    with pytest.raises(ValueError):
+        aggregate(train, ["Pclass"], [("Age", "median")])
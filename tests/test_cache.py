@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+from analytics.aggregate import aggregate, AGE_BANDS
+from analytics.cache import ResultCache, normalize_query
+from analytics.loader import load_dataset
+
+
+def test_hit_after_put(train):
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return aggregate(train, ["Pclass"])
+
+    first = cache.get_or_compute(train, ("survival", ["Pclass"]), compute)
+    again = cache.get_or_compute(train, ("survival", ("Pclass",)), compute)
+    assert again is first and len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_query_normalization():
+    rows = np.arange(10)
+    assert normalize_query({"b": [1, 2], "a": {3, 1}}) == normalize_query({"a": {1, 3}, "b": (1, 2)})
+    assert normalize_query(("rows", rows)) == normalize_query(("rows", rows.copy()))
+    assert normalize_query(("rows", rows)) != normalize_query(("rows", rows[::-1].copy()))
+    assert normalize_query(("rows", rows)) != normalize_query(("rows", rows.astype(np.int32)))
+    assert normalize_query([AGE_BANDS]) != normalize_query([tuple(AGE_BANDS)])
+
+
+def test_derived_datasets_always_miss(train):
+    cache = ResultCache()
+    subset = train.take(np.arange(10))
+    cache.put(subset, "q", 1)
+    assert cache.get(subset, "q") is None and len(cache) == 0
+
+
+def test_lru_eviction_under_budget(train):
+    cache = ResultCache(budget=3000)
+    for i in range(4):
+        cache.put(train, i, i, size=1000)
+    assert cache.get(train, 0) is None
+    cache.get(train, 1)
+    cache.put(train, 4, 4, size=1000)
+    # 2 was the least recently used once 1 was read
+    assert [cache.get(train, i) for i in range(5)] == [None, 1, None, 3, 4]
+    assert cache.used == 3000 and cache.stats()["evictions"] == 2
+    cache.put(train, "huge", None, size=4000)
+    assert len(cache) == 3 and cache.get(train, "huge") is None
+
+
+def test_changed_file_misses(train_csv):
+    cache = ResultCache()
+    dataset = load_dataset(train_csv, use_cache=False)
+    cache.put(dataset, "q", "old")
+    assert cache.get(dataset, "q") == "old"
+    with open(train_csv, "a") as f:
+        f.write('892,0,3,"Test, Mr. Row",male,30,0,0,1,7.25,,S\n')
+    assert cache.get(dataset, "q") is None
+    assert len(cache) == 0
+    cache.put(dataset, "q", "old")
+    assert cache.invalidate_stale() == 1
+    reloaded = load_dataset(train_csv, use_cache=False)
+    cache.put(reloaded, "q", "new")
+    os.utime(train_csv, ns=(0, 0))
+    assert cache.invalidate_stale() == 1 and len(cache) == 0
@@ -0,0 +1,55 @@
+import json
+import math
+
+import numpy as np
+
+from analytics.columns import Dataset, NumericColumn
+from analytics.export import export_rows
+from analytics.loader import read_csv
+from analytics.store import read_store
+from benchmarks.common import same_dataset
+from tests.helpers import same_cells
+
+
+def test_csv_round_trip(train, tmp_path):
+    report = export_rows(train, str(tmp_path / "all.csv"))
+    assert report.rows == len(train)
+    assert same_dataset(read_csv(report.path), train)
+
+
+def test_rows_in_display_order(train, tmp_path):
+    rows = np.argsort(train["Fare"].values, kind="stable")[::-1][:100]
+    exported = read_csv(export_rows(train, str(tmp_path / "top.csv"), rows=rows).path)
+    assert same_cells(exported, train.take(rows))
+
+
+def test_pcol_round_trip(train, tmp_path):
+    rows = train["Sex"].codes == train["Sex"].code_of("female")
+    exported = read_store(export_rows(train, str(tmp_path / "women.pcol"), rows=rows).path)
+    assert same_cells(exported, train.take(np.flatnonzero(rows)))
+
+
+def test_jsonl_values(train, tmp_path):
+    path = export_rows(train, str(tmp_path / "all.jsonl"), columns=["PassengerId", "Name", "Age", "Cabin"]).path
+    with open(path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["Name"] for r in records] == train["Name"].decode()
+    age = train["Age"].values
+    # Written with the fewest decimals that read back as the same float32
+    assert [None if r["Age"] is None else np.float32(r["Age"]) for r in records] == \
+        [None if np.isnan(a) else a for a in age]
+    cabin = train["Cabin"]
+    assert sum(r["Cabin"] is None for r in records) == int(cabin.null_mask().sum())
+
+
+def test_signed_zero_and_infinities(tmp_path):
+    values = np.array([-0.0, 0.0, np.inf, -np.inf, np.nan, -2.5, 1e300])
+    dataset = Dataset({"x": NumericColumn("x", values)})
+    with open(export_rows(dataset, str(tmp_path / "x.jsonl")).path) as f:
+        written = [json.loads(line)["x"] for line in f]
+    assert math.copysign(1, written[0]) == -1 and math.copysign(1, written[1]) == 1
+    assert written[2:5] == [None, None, None]
+    assert written[5:] == [-2.5, 1e300]
+    with open(export_rows(dataset, str(tmp_path / "x.csv")).path) as f:
+        lines = f.read().splitlines()[1:]
+    assert lines == ["-0.0", "0", "inf", "-inf", "", "-2.5", "1e+300"]
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from analytics.facets import BitmapIndex, facet_filter, pack_rows, unpack_rows
+
+SELECTIONS = [
+    {},
+    {"Pclass": [1, 3]},
+    {"Sex": ["female"], "Embarked": ["S", None]},
+    {"SibSp": [1, 2, 3, 4, 5, 8], "Parch": [0], "Survived": [1]},
+    {"Pclass": []},
+]
+
+
+def column_values(dataset, name: str) -> list:
+    col = dataset[name]
+    if hasattr(col, "codes"):
+        return [col.categories[code] if code >= 0 else None for code in col.codes.tolist()]
+    return col.values.tolist()
+
+
+def plain_mask(dataset, selection: dict, skip: str = None) -> np.ndarray:
+    mask = np.ones(len(dataset), dtype=np.bool_)
+    for name, allowed in selection.items():
+        if name != skip:
+            mask &= np.array([value in allowed for value in column_values(dataset, name)])
+    return mask
+
+
+@pytest.mark.parametrize("selection", SELECTIONS)
+@pytest.mark.parametrize("searched", [False, True])
+def test_matches_plain_filter(train, selection, searched):
+    index = BitmapIndex.build(train)
+    base = np.flatnonzero(np.char.find(np.array(train["Name"].decode()), "Mr") >= 0) if searched else None
+    result = facet_filter(index, selection, base)
+
+    base_mask = np.ones(len(train), dtype=np.bool_)
+    if base is not None:
+        base_mask[:] = False
+        base_mask[base] = True
+    expected = np.flatnonzero(plain_mask(train, selection) & base_mask)
+    if not selection and base is None:
+        assert result.rows is None
+    else:
+        assert result.rows.tolist() == expected.tolist()
+    assert result.matched == len(expected)
+    for name, values in index.values.items():
+        # Every column counted under the filters of the other columns only
+        others = plain_mask(train, selection, skip=name) & base_mask
+        column = column_values(train, name)
+        plain = [sum(1 for row in np.flatnonzero(others) if column[row] == value) for value in values]
+        assert result.counts[name].tolist() == plain
+
+
+def test_repeated_base_rows(train):
+    index = BitmapIndex.build(train)
+    base = np.array([5, 3, 3, 9, 5, 1])
+    for selection in [{}, {"Pclass": [1, 2, 3]}]:
+        result = facet_filter(index, selection, base)
+        assert result.rows.tolist() == [1, 3, 5, 9]
+        assert result.matched == 4
+
+
+def test_extend_matches_build(train):
+    head = train.take(slice(0, 600))
+    extended = BitmapIndex.build(head).extend(train, 600)
+    built = BitmapIndex.build(train)
+    for selection in SELECTIONS:
+        a, b = facet_filter(extended, selection), facet_filter(built, selection)
+        assert (a.rows is None and b.rows is None) or a.rows.tolist() == b.rows.tolist()
+
+
+def test_pack_round_trip():
+    mask = np.random.default_rng(0).random(1000) < 0.3
+    assert np.array_equal(unpack_rows(pack_rows(mask), len(mask)), np.flatnonzero(mask))
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from analytics.cache import ResultCache
+from analytics.columns import Dataset, NumericColumn, pack_validity
+from analytics.joins import JoinIndex, join, compare_submissions
+from analytics.loader import load_dataset
+from tests.helpers import data_file
+
+
+def submission(ids, survived, source=None) -> Dataset:
+    return Dataset({
+        "PassengerId": NumericColumn("PassengerId", np.asarray(ids, dtype=np.int64)),
+        "Survived": NumericColumn("Survived", np.asarray(survived, dtype=np.int8)),
+    }, source)
+
+
+@pytest.mark.parametrize("keys", [
+    np.array([5, 3, 9, 1]),
+    np.array([5, 3, 9, 10 ** 12]),
+    np.array([0.5, -2.0, 7.25, 3.0]),
+])
+def test_lookup(keys):
+    index = JoinIndex(keys)
+    needles = np.concatenate([keys[::-1], keys[:1] + 1000])
+    assert index.lookup(needles).tolist() == [3, 2, 1, 0, -1]
+
+
+def test_duplicate_keys():
+    with pytest.raises(ValueError):
+        JoinIndex(np.array([1, 2, 2]))
+
+
+def test_left_join_nulls(train):
+    right = submission([3, 1, 7], [1, 0, 1])
+    joined = join(train.take(np.arange(4)), right, how="left", suffix="_sub")
+    assert joined["Survived_sub"].values[[0, 2]].tolist() == [0, 1]
+    assert joined["Survived_sub"].null_mask().tolist() == [False, True, False, True]
+
+
+def test_compare_submissions(train):
+    ids = train["PassengerId"].values
+    truth = train["Survived"].values
+    women = (train["Sex"].codes == train["Sex"].code_of("female")).astype(np.int8)
+    everyone_died = submission(ids, np.zeros(len(ids)), "died.csv")
+    # Half the passengers, shuffled, some predictions null
+    rng = np.random.default_rng(0)
+    half = rng.permutation(len(ids))[:len(ids) // 2]
+    valid = np.ones(len(half), dtype=np.bool_)
+    valid[:10] = False
+    partial = submission(ids[half], women[half], "partial.csv")
+    partial["Survived"].validity = pack_validity(valid)
+
+    comparison = compare_submissions(
+        train, [submission(ids, women, "women.csv"), everyone_died, partial], cache=ResultCache()
+    )
+    assert comparison.names == ["women.csv", "died.csv", "partial.csv"]
+    assert comparison.matched().tolist() == [len(ids), len(ids), len(half) - 10]
+    scored = half[valid]
+    accuracy = comparison.accuracy()
+    assert accuracy[0] == pytest.approx(np.mean(women == truth))
+    assert accuracy[1] == pytest.approx(np.mean(truth == 0))
+    assert accuracy[2] == pytest.approx(np.mean(women[scored] == truth[scored]))
+    tn, fp, fn, tp = comparison.confusion(0).ravel()
+    assert (tn, fp, fn, tp) == (
+        np.sum((truth == 0) & (women == 0)), np.sum((truth == 0) & (women == 1)),
+        np.sum((truth == 1) & (women == 0)), np.sum((truth == 1) & (women == 1)),
+    )
+    agreement = comparison.agreement()
+    assert np.allclose(np.diag(agreement), 1)
+    assert agreement[0, 1] == pytest.approx(np.mean(women == 0))
+    assert agreement[0, 2] == 1
+
+
+def test_gender_submission_on_test_csv():
+    base = load_dataset(data_file("test.csv"), use_cache=False)
+    gender = load_dataset(data_file("gender_submission.csv"), use_cache=False)
+    comparison = compare_submissions(base, [gender])
+    assert comparison.truth is None
+    assert comparison.matched().tolist() == [len(base)]
+    with pytest.raises(ValueError):
+        comparison.accuracy()
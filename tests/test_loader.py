@@ -0,0 +1,50 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from analytics.loader import load_dataset, read_csv, cache_path, read_cache, write_cache
+from analytics.reports import summary
+from benchmarks.common import same_dataset
+
+
+def test_sidecar_round_trip(train_csv):
+    parsed = load_dataset(train_csv)
+    assert os.path.exists(cache_path(train_csv))
+    cached = load_dataset(train_csv)
+    assert same_dataset(parsed, cached)
+    assert cached.fingerprint == parsed.fingerprint
+    assert set(cached.extras) == set(parsed.extras)
+    assert cached.extras["sketches"].count() == len(parsed)
+
+
+def test_concurrent_sidecar_writes(train_csv):
+    dataset = load_dataset(train_csv, use_cache=False)
+    with ThreadPoolExecutor(8) as pool:
+        paths = list(pool.map(lambda _: write_cache(dataset), range(16)))
+    assert set(paths) == {cache_path(train_csv)}
+    assert same_dataset(read_cache(paths[0], source=train_csv), dataset)
+    assert sorted(os.listdir(os.path.dirname(train_csv))) == sorted(["train.csv", os.path.basename(paths[0])])
+
+
+def test_stale_sidecar_is_rebuilt(train_csv):
+    load_dataset(train_csv)
+    with open(train_csv, "rb") as f:
+        lines = f.read().splitlines(keepends=True)
+    with open(train_csv, "wb") as f:
+        f.writelines(lines[:101])
+    assert len(load_dataset(train_csv)) == 100
+
+
+def test_blank_numbers_are_missing(tmp_path):
+    path = str(tmp_path / "two.csv")
+    with open(path, "w") as f:
+        f.write("PassengerId,Age\n1,22\n2,\n")
+    age = read_csv(path)["Age"].values
+    assert age[0] == 22 and np.isnan(age[1])
+
+
+def test_summary_without_survived(test_csv):
+    result = summary(load_dataset(test_csv, use_cache=False), ["Pclass"])
+    assert "Survived:mean" not in result.values
+    assert result.values["count"].sum() == 418
@@ -0,0 +1,76 @@
+"""
+The window's asynchronous paths, offscreen. Skipped without PyQt5.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+from PyQt5.QtCore import Qt, QTimer  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def wait(app, until, timeout_ms: int = 5000) -> None:
+    """
+    Runs the event loop until until() is true.
+    """
+    for _ in range(timeout_ms // 20):
+        if until():
+            return
+        QTimer.singleShot(20, app.quit)
+        app.exec_()
+    raise AssertionError("Timed out")
+
+
+@pytest.fixture
+def window(app, train_csv):
+    from analytics.gui.main_window import MainWindow
+    window = MainWindow()
+    window.show()
+    window.open_file(train_csv)
+    wait(app, lambda: window.dataset is not None and window.rows is None and window.model.rowCount() > 0)
+    yield window
+    window.tasks.cancel_all()
+    window.close()
+
+
+def search(app, window, text: str) -> None:
+    window.search_box.setText(text)
+    window.on_search_requested(text)
+    wait(app, lambda: window.rows is not None and not window.tasks.is_running("Faceting"))
+
+
+def test_context_menu_row_after_the_rows_change(app, window):
+    while window.model.rowCount() <= 150:
+        window.model.fetchMore(window.model.index(0, 0).parent())
+    index = window.model.index(150, 3)
+    window.table.scrollTo(index)
+    window.on_table_context_menu(window.table.visualRect(index).center())
+    window.actions.menus["table"].hide()
+    assert window.actions.context.row == 150
+
+    search(app, window, "mrs. william")
+    assert len(window.rows) < 150
+    context = window.action_context()
+    assert context.row is None and context.column is None
+
+
+def test_results_of_another_file_are_dropped(app, window, test_csv):
+    train = window.dataset
+    window.table.sortByColumn(train.column_names.index("Fare"), Qt.AscendingOrder)
+    wait(app, lambda: window.model.rows is not None)
+    sorter = window.sorter
+
+    window.open_file(test_csv)
+    wait(app, lambda: window.dataset is not train and window.model.rowCount() > 0)
+    rows = window.model.rows
+    window.show_search_result(object(), ("search", "stale"), train)
+    window.show_sorted_rows(sorter, np.arange(len(train)))
+    assert window.rows is None and window.model.rows is rows
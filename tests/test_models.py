@@ -0,0 +1,123 @@
+import csv
+import math
+import multiprocessing
+import statistics
+
+import numpy as np
+import pytest
+
+from analytics.loader import load_dataset
+from analytics.models import FeatureEncoder, GradientBoostedTrees, train_model, accuracy
+from analytics.training import train_in_process, score_file
+from tests.helpers import cells
+
+
+def plain_features(encoder, dataset, row: int) -> list:
+    """
+    The features of one row, written out the way the module docstring describes them.
+    """
+    names = ["Pclass", "Sex", "Embarked", "Age", "SibSp", "Parch", "Fare"]
+    values = {name: cells(dataset[name])[row] for name in names}
+    features = []
+    for name, known in encoder.categories.items():
+        features += [1.0 if values[name] == value else 0.0 for value in known]
+    pclass = encoder.categories["Pclass"].index(values["Pclass"])
+    sex = encoder.categories["Sex"].index(values["Sex"])
+    age = values["Age"]
+    fare = values["Fare"] if values["Fare"] is not None else encoder.fare_medians[pclass]
+    features += [encoder.age_medians[pclass, sex] if age is None else age, float(age is None),
+                 values["SibSp"], values["Parch"], math.log1p(fare)]
+    return features
+
+
+def test_encoder_learns_from_training_rows(train):
+    encoder = FeatureEncoder().fit(train)
+    pclass, sex, age = cells(train["Pclass"]), cells(train["Sex"]), cells(train["Age"])
+    for i, c in enumerate(encoder.categories["Pclass"]):
+        for j, s in enumerate(encoder.categories["Sex"]):
+            ages = [a for p, x, a in zip(pclass, sex, age) if p == c and x == s and a is not None]
+            assert encoder.age_medians[i, j] == pytest.approx(statistics.median(ages))
+
+
+@pytest.mark.parametrize("name", ["train", "test"])
+def test_transform_matches_plain_encoding(train, train_csv, test_csv, name):
+    encoder = FeatureEncoder().fit(train)
+    dataset = train if name == "train" else load_dataset(test_csv, use_cache=False)
+    X = encoder.transform(dataset)
+    assert X.shape == (len(dataset), len(encoder.feature_names))
+    for row in range(len(dataset)):
+        assert X[row].tolist() == pytest.approx(plain_features(encoder, dataset, row), rel=1e-6), row
+    assert np.array_equal(encoder.transform(dataset, slice(100, 200)), X[100:200])
+    assert np.array_equal(encoder.transform(dataset, np.arange(100, 200)), X[100:200])
+
+
+def plain_tree_score(model, x: list) -> float:
+    score = model.base
+    for t in range(len(model.leaves)):
+        node = 0
+        for level in range(model.depth):
+            heap = 2 ** level - 1 + node
+            node = 2 * node + (x[model.features[t, heap]] >= model.thresholds[t, heap])
+        score += model.leaves[t][node]
+    return 1 / (1 + math.exp(-score))
+
+
+def test_trees_predict_like_a_plain_walk(train):
+    X = FeatureEncoder().fit(train).transform(train)
+    y = train["Survived"].values.astype(np.float64)
+    model = GradientBoostedTrees(trees=20).fit(X, y)
+    probability = model.predict_proba(X)
+    for row in range(0, len(X), 7):
+        assert probability[row] == pytest.approx(plain_tree_score(model, X[row].tolist()))
+
+
+@pytest.mark.parametrize("kind", ["logistic", "gbdt"])
+def test_train_model(train, kind):
+    model = train_model(train, kind, validation=0.2, seed=1)
+    survived = cells(train["Survived"])
+    predicted = model.predict(train).tolist()
+    plain = sum(1 for a, b in zip(predicted, survived) if a == b) / len(survived)
+    assert model.metrics["train_accuracy"] == pytest.approx(plain)
+    assert plain > 0.78 and model.metrics["validation_accuracy"] > 0.7
+    assert model.metrics["validation_rows"] == 178 and model.metrics["rows"] == 891
+    again = train_model(train, kind, validation=0.2, seed=1)
+    assert np.array_equal(again.predict_proba(train), model.predict_proba(train))
+
+
+def test_train_model_errors(train):
+    with pytest.raises(ValueError):
+        train_model(train, "forest")
+    with pytest.raises(ValueError):
+        train_model(train, "logistic", rows=[0])
+    assert math.isnan(accuracy(np.zeros(0), np.zeros(0)))
+
+
+def test_train_in_process_and_score(train, train_csv, test_csv, tmp_path):
+    fractions = []
+    model = train_in_process(train_csv, "logistic", progress=lambda fraction, _: fractions.append(fraction))
+    assert fractions and fractions == sorted(fractions)
+    local = train_model(train, "logistic")
+    test = load_dataset(test_csv, use_cache=False)
+    assert np.allclose(model.predict_proba(test), local.predict_proba(test))
+
+    out = str(tmp_path / "submission.csv")
+    report = score_file(model, test_csv, out, batch_rows=100)
+    with open(out, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["PassengerId", "Survived"]
+    assert [int(row[0]) for row in rows[1:]] == cells(test["PassengerId"])
+    assert [int(row[1]) for row in rows[1:]] == model.predict(test).tolist()
+    assert report.rows == len(test) == 418
+    assert report.survivors == sum(int(row[1]) for row in rows[1:])
+
+
+def test_cancelled_training_stops_the_child(train_csv):
+    class Cancelled(Exception):
+        pass
+
+    def progress(fraction, message):
+        raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        train_in_process(train_csv, "gbdt", progress=progress)
+    assert not multiprocessing.active_children()
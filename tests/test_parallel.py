@@ -0,0 +1,47 @@
+import csv
+import io
+
+import pytest
+
+from analytics.loader import read_csv
+from analytics.parallel import read_csv_parallel, record_ranges
+from benchmarks.common import same_dataset
+from tests.helpers import same_cells
+
+QUOTED = 'PassengerId,Survived,Pclass,Name,Sex,Age,SibSp,Parch,Ticket,Fare,Cabin,Embarked\n' + "".join(
+    '{},{},{},"Row {}, Mr. ""Quoted""\nName",male,{},0,0,T {},7.25,,S\n'.format(i, i % 2, 1 + i % 3, i, i % 80, i)
+    for i in range(1, 300)
+)
+
+
+@pytest.fixture
+def quoted_csv(tmp_path) -> str:
+    path = str(tmp_path / "quoted.csv")
+    with open(path, "w", newline="") as f:
+        f.write(QUOTED)
+    return path
+
+
+@pytest.mark.parametrize("parts", [1, 3, 16, 1000])
+def test_ranges_hold_whole_records(quoted_csv, parts):
+    header, ranges = record_ranges(quoted_csv, parts)
+    with open(quoted_csv, "rb") as f:
+        data = f.read()
+    assert header == QUOTED.split("\n", 1)[0].split(",")
+    assert ranges[0][0] == data.index(b"\n") + 1
+    assert ranges[-1][1] == len(data)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    for start, end in ranges:
+        rows = list(csv.reader(io.StringIO(data[start:end].decode("utf-8"), newline="")))
+        assert all(len(row) == len(header) for row in rows)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_matches_read_csv(train_csv, workers):
+    assert same_dataset(read_csv_parallel(train_csv, workers=workers), read_csv(train_csv))
+
+
+def test_quoted_newlines(quoted_csv):
+    parallel, whole = read_csv_parallel(quoted_csv, workers=2), read_csv(quoted_csv)
+    assert same_dataset(parallel, whole) and same_cells(parallel, whole)
+    assert parallel["Name"].format(0) == 'Row 1, Mr. "Quoted"\nName'
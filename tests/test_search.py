@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from analytics.search import SearchIndex, normalize, SEARCH_COLUMNS
+
+QUERIES = ["phillips", "mr", "mrs. w", "a/5", "braund ow", "kate phillips", "sm", "john mr.", "pc 17", "zzz", "m"]
+
+
+def plain_search(dataset, query: str) -> np.ndarray:
+    """
+    Rows where every word of query starts some word of the row, one row at a time.
+    """
+    values = [dataset[name].decode() for name in SEARCH_COLUMNS]
+    wanted = normalize(query)
+    rows = []
+    for row, texts in enumerate(zip(*values)):
+        words = [word for text in texts for word in normalize(text)]
+        if all(any(word.startswith(prefix) for word in words) for prefix in wanted):
+            rows.append(row)
+    return np.array(rows, dtype=np.int64)
+
+
+@pytest.fixture(scope="module")
+def indexed():
+    from analytics.loader import read_csv
+    from tests.helpers import data_file
+    dataset = read_csv(data_file("train.csv"))
+    return dataset, SearchIndex.build(dataset)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_matches_plain_search(indexed, query):
+    dataset, index = indexed
+    assert index.search(query).rows.tolist() == plain_search(dataset, query).tolist()
+
+
+def test_word_repeated_in_a_row(indexed):
+    dataset, index = indexed
+    rows = index.search("phillips").rows
+    assert len(rows) == len(np.unique(rows)) == 1
+    assert "Phillips Marshall" in dataset["Name"].format(int(rows[0]))
+    for word in range(len(index.words)):
+        assert np.all(np.diff(index.postings[index.starts[word]:index.starts[word + 1]]) > 0)
+
+
+def test_narrowing_while_typing(indexed):
+    dataset, index = indexed
+    previous = None
+    for typed in ["k", "ka", "kat", "kate", "kate ", "kate p", "kate ph", "kate phillips"]:
+        previous = index.search(typed, previous)
+        assert previous.rows.tolist() == plain_search(dataset, typed).tolist()
+
+
+def test_segments_match_one_index(indexed):
+    dataset, index = indexed
+    segmented = SearchIndex.build(dataset.take(slice(0, 500))).extend(dataset, 500)
+    for query in QUERIES:
+        assert segmented.search(query).rows.tolist() == index.search(query).rows.tolist()
+
+
+def test_empty_query(indexed):
+    assert indexed[1].search("  ,").rows is None
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from analytics.sketches import SketchIndex, QuantileSketch, describe, SKETCH_COLUMNS
+from tests.helpers import cells
+
+WHERE = [None, {"Pclass": [1, 2]}, {"Sex": ["female"], "Embarked": ["S", None]}, {"Pclass": []}]
+QS = [0, 0.1, 0.25, 0.5, 0.75, 0.9, 1]
+
+
+def plain_rows(dataset, where: dict) -> list:
+    keep = [True] * len(dataset)
+    for key, allowed in (where or {}).items():
+        keep = [k and value in allowed for k, value in zip(keep, cells(dataset[key]))]
+    return [row for row, k in enumerate(keep) if k]
+
+
+def rank_error(values: list, q: float, answer: float) -> float:
+    """
+    How many ranks answer is away from the nearest rank quantile q of sorted values.
+    """
+    target = max(int(np.ceil(q * len(values))), 1)
+    lo = int(np.searchsorted(values, answer, side="left")) + 1
+    hi = int(np.searchsorted(values, answer, side="right"))
+    if lo > hi:
+        return np.inf
+    return max(lo - target, target - hi, 0)
+
+
+@pytest.mark.parametrize("k", [2048, 16])
+@pytest.mark.parametrize("where", WHERE)
+def test_quantiles_within_bound(train, k, where):
+    index = SketchIndex.build(train, k=k)
+    rows = plain_rows(train, where)
+    for name in SKETCH_COLUMNS:
+        column = cells(train[name])
+        values = sorted(column[row] for row in rows if column[row] is not None)
+        sketch = index.sketch(name, where)
+        assert sketch.count == len(values)
+        answers = sketch.quantiles(QS)
+        if not values:
+            assert np.all(np.isnan(answers))
+            continue
+        # Partitions of at most k values are kept whole, then the answers are exact
+        bound = 0 if k >= len(train) else sketch.error
+        assert answers[0] == values[0] and answers[-1] == values[-1]
+        for q, answer in zip(QS, answers):
+            assert rank_error(values, q, answer) <= bound, (name, q)
+
+
+@pytest.mark.parametrize("where", WHERE)
+def test_counts_and_histograms_are_exact(train, where):
+    index = SketchIndex.build(train)
+    rows = plain_rows(train, where)
+    assert index.count(where) == len(rows)
+    for name in SKETCH_COLUMNS:
+        column = [cells(train[name])[row] for row in rows]
+        assert index.missing(name, where) == column.count(None)
+        edges, counts = index.histogram(name, where)
+        plain = [0] * len(counts)
+        for value in column:
+            if value is not None:
+                # Bins are [edge, next edge), the top value goes in the last one
+                plain[min(sum(1 for edge in edges[1:] if edge <= value), len(counts) - 1)] += 1
+        assert counts.tolist() == plain
+
+
+def test_merge_weights_add_up():
+    rng = np.random.default_rng(0)
+    parts = [np.sort(rng.normal(size=n)) for n in (10, 500, 3000)]
+    merged = QuantileSketch.merge([QuantileSketch.from_sorted(p, k=64) for p in parts])
+    assert merged.count == 3510
+    assert merged.low == min(p[0] for p in parts) and merged.high == max(p[-1] for p in parts)
+
+
+def test_extend_matches_build(train):
+    index = SketchIndex.build(train.take(slice(0, 300)))
+    for end in (500, 700, 891):
+        index = index.extend(train.take(slice(0, end)), index.count())
+    built = SketchIndex.build(train)
+    for where in WHERE:
+        assert index.count(where) == built.count(where)
+        for name in SKETCH_COLUMNS:
+            a, b = index.quantiles(name, QS, where), built.quantiles(name, QS, where)
+            assert np.array_equal(a, b, equal_nan=True)
+            # The bins stay those of the first 300 rows, only the totals compare
+            assert index.histogram(name, where)[1].sum() == built.histogram(name, where)[1].sum()
+
+
+@pytest.mark.parametrize("where", WHERE[:3])
+def test_describe_matches_exact(train, where):
+    train.extras["sketches"] = SketchIndex.build(train)
+    rows = np.array(plain_rows(train, where), dtype=np.int64)
+    sketched = describe(train, "Fare", rows=None if where is None else rows, where=where)
+    exact = describe(train, "Fare", rows=None if where is None else rows)
+    assert sketched.keys["Group"] == exact.keys["Group"]
+    for name, values in exact.values.items():
+        assert np.array_equal(sketched.values[name], values, equal_nan=True), name
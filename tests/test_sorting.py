@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from analytics.columns import Dataset, NumericColumn, StringColumn, pack_validity
+from analytics.schema import NUMERIC, CATEGORICAL
+from analytics.sorting import SortEngine
+
+KEYS = [
+    [("Fare", True)],
+    [("Age", False)],
+    [("Name", True)],
+    [("Embarked", False)],
+    [("Pclass", True), ("Age", False), ("Name", True)],
+    [("Sex", False), ("Ticket", True), ("Fare", False)],
+    [("Cabin", True), ("SibSp", False), ("PassengerId", True)],
+]
+
+
+def lexsort_keys(dataset, column: str, ascending: bool) -> list:
+    """
+    (missing, rank) arrays that np.lexsort orders the way SortEngine should: values
+    ascending or descending, missing values last ascending and first descending.
+    """
+    col = dataset[column]
+    missing = col.null_mask().copy()
+    if col.kind == NUMERIC:
+        values = col.values.astype(np.float64)
+        missing |= np.isnan(values)
+        _, rank = np.unique(np.where(missing, 0, values), return_inverse=True)
+    elif col.kind == CATEGORICAL:
+        labels = np.array([col.categories[code] if code >= 0 else "" for code in col.codes.tolist()])
+        _, rank = np.unique(labels, return_inverse=True)
+    else:
+        _, rank = np.unique(np.array(col.decode()), return_inverse=True)
+    if ascending:
+        return [missing, rank]
+    return [~missing, -rank]
+
+
+def expected_order(dataset, keys) -> np.ndarray:
+    arrays = []
+    for column, ascending in keys:
+        arrays.extend(lexsort_keys(dataset, column, ascending))
+    # np.lexsort sorts by the last key first
+    return np.lexsort(arrays[::-1])
+
+
+@pytest.mark.parametrize("keys", KEYS)
+def test_matches_lexsort(train, keys):
+    engine = SortEngine(train)
+    assert np.array_equal(engine.permutation(keys), expected_order(train, keys))
+
+
+@pytest.mark.parametrize("keys", KEYS)
+def test_flipped_from_cache(train, keys):
+    engine = SortEngine(train)
+    engine.permutation(keys)
+    flipped = [(column, not ascending) for column, ascending in keys]
+    assert np.array_equal(engine.permutation(flipped), expected_order(train, flipped))
+
+
+@pytest.mark.parametrize("count", [5, 500])
+def test_filtered_rows(train, count):
+    engine = SortEngine(train)
+    keys = [("Pclass", False), ("Fare", True)]
+    rows = np.sort(np.random.default_rng(count).choice(len(train), count, replace=False))
+    order = expected_order(train, keys)
+    assert np.array_equal(engine.sorted_rows(keys, rows), order[np.isin(order, rows)])
+
+
+def test_utf8_byte_ranks():
+    values = ["", "a", "a\x00", "ab", "abcdefgh", "abcdefgh\x00", "abcdefghi", "é", "z", "中", "😀", "a", ""]
+    validity = pack_validity(np.array([True] * (len(values) - 1) + [False]))
+    dataset = Dataset({
+        "s": StringColumn.from_values("s", values, validity),
+        "i": NumericColumn("i", np.arange(len(values))),
+    })
+    order = SortEngine(dataset).permutation([("s", True)]).tolist()
+    # Code point order, equal strings in file order, the null last
+    assert order == sorted(range(len(values) - 1), key=lambda i: (values[i], i)) + [len(values) - 1]
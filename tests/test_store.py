@@ -0,0 +1,26 @@
+import numpy as np
+
+from analytics.store import write_store, read_store
+from benchmarks.common import same_dataset
+
+
+def test_round_trip(train, tmp_path):
+    path = write_store(train, str(tmp_path / "train.pcol"), row_group_rows=128)
+    read = read_store(path)
+    assert same_dataset(train, read)
+    assert read.extras["facets"].values == train.extras["facets"].values
+
+
+def test_column_and_row_group_pruning(train, tmp_path):
+    path = write_store(train, str(tmp_path / "train.pcol"), row_group_rows=128)
+    read = read_store(path, columns=["PassengerId", "Fare"], where=[("Pclass", "==", 1), ("Fare", ">", 50)])
+    expected = np.flatnonzero((train["Pclass"].values == 1) & (train["Fare"].values > 50))
+    assert read.column_names == ["PassengerId", "Fare"]
+    assert np.array_equal(read["PassengerId"].values, train["PassengerId"].values[expected])
+
+
+def test_string_predicates(train, tmp_path):
+    path = write_store(train, str(tmp_path / "train.pcol"), row_group_rows=128)
+    read = read_store(path, columns=["Name"], where=[("Name", ">=", "S"), ("Name", "<", "T")])
+    names = train["Name"].decode()
+    assert read["Name"].decode() == [name for name in names if "S" <= name < "T"]
@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+from analytics.aggregate import aggregate, AGE_BANDS
+from analytics.loader import read_csv
+from analytics.streaming import last_record_end, iter_record_chunks, iter_batches, \
+    RunningAggregate, stream_aggregate
+from tests.helpers import cells
+
+AGGS = [("*", "count"), ("Survived", "mean"), ("Age", "sum"), ("Fare", "min"), ("Age", "max")]
+
+
+def by_label(result) -> dict:
+    labels = list(zip(*[result.keys[name] for name in result.key_names])) if result.key_names else [()]
+    return {label: [result.values[name][i] for name in sorted(result.values)]
+            for i, label in enumerate(labels)}
+
+
+def test_last_record_end():
+    assert last_record_end(b'1,"Braund,\nMr. Owen"\n2,"Heikkinen') == 21
+    assert last_record_end(b'1,"Braund,\nMr. Owen') == 0
+    assert last_record_end(b'1,"say ""hi""\n",x\n2,') == 18
+    assert last_record_end(b"no newline") == 0
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 7, 100, 4096])
+def test_chunks_end_on_records(train_csv, chunk_bytes):
+    with open(train_csv, "rb") as f:
+        data = f.read()
+    chunks = list(iter_record_chunks(io.BytesIO(data), chunk_bytes))
+    assert b"".join(chunks) == data
+    assert all(last_record_end(chunk) == len(chunk) for chunk in chunks[:-1])
+
+
+@pytest.mark.parametrize("chunk_bytes", [100, 5000])
+def test_batches_match_read_csv(train_csv, chunk_bytes):
+    whole = read_csv(train_csv)
+    batches = list(iter_batches(train_csv, chunk_bytes=chunk_bytes, batch_rows=64))
+    assert sum(len(batch) for batch in batches) == len(whole)
+    assert all(len(batch) <= 64 for batch in batches)
+    for name in whole.column_names:
+        assert [value for batch in batches for value in cells(batch[name])] == cells(whole[name])
+
+
+@pytest.mark.parametrize("by", [["Pclass"], ["Sex", "Embarked"], [AGE_BANDS], []])
+def test_stream_aggregate_matches_aggregate(train_csv, by):
+    expected = by_label(aggregate(read_csv(train_csv), by, AGGS))
+    result = stream_aggregate(train_csv, by, AGGS, chunk_bytes=3000)
+    got = by_label(result)
+    assert sorted(got, key=repr) == sorted(expected, key=repr)
+    for label, values in expected.items():
+        assert got[label] == pytest.approx(values, rel=1e-5, nan_ok=True), label
+
+
+def test_running_copy_is_independent(train_csv):
+    batches = list(iter_batches(train_csv, chunk_bytes=20000))
+    running = RunningAggregate(["Pclass"], [("*", "count")])
+    running.update(batches[0])
+    snapshot = running.copy()
+    for batch in batches[1:]:
+        running.update(batch)
+    assert sum(snapshot.result().values["count"]) == len(batches[0])
+    assert sum(running.result().values["count"]) == running.rows == 891
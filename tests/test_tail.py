@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+
+from analytics.loader import read_csv, build_extras
+from analytics.reports import SUMMARY_PAGES
+from analytics.search import SearchIndex
+from analytics.tail import TailFollower
+from tests.helpers import same_cells
+
+
+def follow(path: str) -> TailFollower:
+    dataset = build_extras(read_csv(path))
+    follower = TailFollower(dataset, SearchIndex.build(dataset), [keys for _, _, keys in SUMMARY_PAGES])
+    # The first poll only seeds the running summaries
+    follower.accept(follower.poll())
+    return follower
+
+
+def append(path: str, records: list) -> None:
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        f.write("".join(records))
+
+
+def test_appends_match_a_full_reload(tmp_path, train_csv):
+    with open(train_csv, encoding="utf-8") as f:
+        records = f.read().splitlines(keepends=True)[1:]
+    path = str(tmp_path / "growing.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write("PassengerId,Survived,Pclass,Name,Sex,Age,SibSp,Parch,Ticket,Fare,Cabin,Embarked\n")
+        f.writelines(records[:300])
+    follower = follow(path)
+
+    for start, end in [(300, 301), (301, 600), (600, len(records))]:
+        append(path, records[start:end])
+        update = follower.poll()
+        assert update.kind == "appended" and update.start == start and len(update.dataset) == end
+        follower.accept(update)
+
+    full = build_extras(read_csv(path))
+    # A full load numbers categories alphabetically, appends give new ones the next code
+    assert same_cells(follower.dataset, full)
+    assert follower.dataset.extras["facets"].values == full.extras["facets"].values
+    assert follower.dataset.extras["sketches"].count() == len(full)
+    for keys, result in update.summaries.items():
+        counts = result.values["count"]
+        assert counts.sum() == len(full)
+
+
+def test_partial_record_waits(tmp_path, train_csv):
+    path = str(tmp_path / "train.csv")
+    with open(train_csv, encoding="utf-8") as f:
+        text = f.read()
+    cut = text.index("\n", len(text) // 2) + 1
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(text[:cut])
+    follower = follow(path)
+    rows = len(follower.dataset)
+
+    next_end = text.index("\n", cut) + 1
+    append(path, [text[cut:cut + 10]])
+    assert follower.poll().kind == "unchanged"
+    append(path, [text[cut + 10:next_end]])
+    update = follower.poll()
+    assert update.kind == "appended" and len(update.dataset) == rows + 1
+    assert np.array_equal(update.dataset["PassengerId"].values[-1:], read_csv(path)["PassengerId"].values[-1:])
+
+
+def test_rewritten_file_is_replaced(tmp_path, train_csv):
+    follower = follow(train_csv)
+    with open(train_csv, "rb") as f:
+        data = f.read()
+    # Written to another file and renamed over it, like editors and exporters do
+    with open(train_csv + ".new", "wb") as f:
+        f.write(data.replace(b"Braund", b"Brxund", 1))
+    os.replace(train_csv + ".new", train_csv)
+    assert follower.poll().kind == "replaced"
+
+
+def test_changed_bytes_before_the_offset(train_csv):
+    follower = follow(train_csv)
+    with open(train_csv, "rb") as f:
+        data = f.read()
+    last = data.rindex(b"\n", 0, len(data) - 1) + 1
+    # Same inode and bigger, but the last record was edited before one more was added
+    with open(train_csv, "r+b") as f:
+        f.seek(last)
+        f.write(data[last:].replace(b"Dooley", b"Doolex") + data[last:])
+    assert follower.poll().kind == "replaced"